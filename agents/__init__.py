@@ -3,14 +3,20 @@ from .context_agent import ContextAgent, create_context_agent
 from .pattern_agent import PatternAgent, create_pattern_agent
 from .decision_agent import DecisionAgent, create_decision_agent
 from .empathy_agent import EmpathyAgent, create_empathy_agent
+from .fused_agent import FusedDecisionEmpathyAgent, create_fused_agent
+from .speculative_agent import SpeculativeDecisionEmpathyAgent, create_speculative_agent
 
 __all__ = [
     "ContextAgent",
     "PatternAgent",
     "DecisionAgent",
     "EmpathyAgent",
+    "FusedDecisionEmpathyAgent",
+    "SpeculativeDecisionEmpathyAgent",
     "create_context_agent",
     "create_pattern_agent",
     "create_decision_agent",
-    "create_empathy_agent"
+    "create_empathy_agent",
+    "create_fused_agent",
+    "create_speculative_agent"
 ]
@@ -1,15 +1,28 @@
 """
 Context Agent - Analyzes customer events and extracts contextual information.
 """
-import json
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+import random
+import threading
+from typing import Dict, Any, Optional
 from langchain_core.prompts import PromptTemplate
 
-from models import AgentState, SentimentType
-from config.prompts import SYSTEM_PROMPTS
+from models import AgentState, SentimentType, EventType
 from config import settings
 from utils.data_analytics import DataAnalytics
+from utils.llm_factory import create_tiered_chat_models
+from utils.prompt_builder import build_agent_prompt
+from utils.model_router import ModelRouter
+from utils.degradation import DegradationController
+
+
+# Proactive event types whose context is fully determined by monitor data
+RULE_ELIGIBLE_EVENT_TYPES = [
+    EventType.PROACTIVE_RETENTION,
+    EventType.PROACTIVE_CHECK_IN
+]
+
+# Sentiment ordering used to compare rule and LLM results
+SENTIMENT_SCALE = ["very_negative", "negative", "neutral", "positive", "very_positive"]
 
 
 class ContextAgent:
@@ -19,23 +32,210 @@ class ContextAgent:
     - Urgency level
     - Customer risk score
     - Context summary
+    
+    System-generated proactive events (retention / check-in) are analyzed with
+    deterministic rules from the monitor alert; the LLM is only used for
+    free-text events or when rule confidence is low.
     """
     
+    # Rule-vs-LLM statistics shared by all instances (one per workflow)
+    _stats_lock = threading.Lock()
+    rule_stats = {
+        "rule_runs": 0,
+        "llm_runs": 0,
+        "low_confidence_fallbacks": 0,
+        "compared": 0,
+        "agreed": 0
+    }
+    
     def __init__(self, model_name: str = None, temperature: float = 0.3):
         """Initialize the Context Agent."""
         self.model_name = model_name or settings.CONTEXT_AGENT_MODEL
         self.temperature = temperature
         
         # Initialize LLM
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        self.llms = create_tiered_chat_models("context_agent", self.model_name, self.temperature)
+        self.llm = self.llms["large"]
         
         # Initialize data analytics for context enrichment
         self.analytics = DataAnalytics()
     
+    @staticmethod
+    def _has_free_text(event) -> bool:
+        """
+        Check if the event carries free text the rules cannot interpret.
+        
+        Monitor alerts are tagged with source='proactive_monitor' and carry a
+        templated description; anything else (payment gateway, demos, notes)
+        is treated as free text.
+        """
+        metadata = event.metadata or {}
+        if metadata.get('source') != 'proactive_monitor':
+            return True
+        return bool(metadata.get('customer_message') or metadata.get('notes'))
+    
+    def _rule_based_analysis(self, state: AgentState, cohort_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Derive context deterministically from monitor alert features.
+        
+        Args:
+            state: Current agent state
+            cohort_data: Cohort comparison for the customer
+            
+        Returns:
+            Context result with a `confidence` value, or None if the event is
+            not rule-eligible
+        """
+        event = state.event
+        metadata = event.metadata or {}
+        
+        if event.event_type not in RULE_ELIGIBLE_EVENT_TYPES or self._has_free_text(event):
+            return None
+        
+        churn_risk = metadata.get('churn_risk')
+        if churn_risk is None:
+            return None
+        churn_risk = float(churn_risk)
+        health_score = metadata.get('health_score')
+        
+        # Composite risk: churn risk dominates, low health adds to it
+        if health_score is not None:
+            risk = 0.7 * churn_risk + 0.3 * (1.0 - float(health_score))
+        else:
+            risk = churn_risk
+        risk = max(0.0, min(1.0, risk))
+        
+        # Sentiment is inferred from the customer's health trajectory
+        if risk >= 0.75:
+            sentiment = SentimentType.VERY_NEGATIVE
+        elif risk >= 0.5:
+            sentiment = SentimentType.NEGATIVE
+        elif risk >= 0.3:
+            sentiment = SentimentType.NEUTRAL
+        else:
+            sentiment = SentimentType.POSITIVE
+        
+        # Urgency follows risk, VIP and high-value customers need extra attention
+        if risk >= 0.85:
+            urgency = 5
+        elif risk >= 0.7:
+            urgency = 4
+        elif risk >= 0.5:
+            urgency = 3
+        elif risk >= 0.3:
+            urgency = 2
+        else:
+            urgency = 1
+        if state.customer.is_vip or state.customer.is_high_value:
+            urgency = min(urgency + 1, 5)
+        
+        # Confidence drops near classification boundaries and with missing features
+        margin = min(abs(risk - threshold) for threshold in (0.3, 0.5, 0.7, 0.75, 0.85))
+        confidence = 0.5 + 0.5 * min(margin / 0.05, 1.0)
+        if health_score is None:
+            confidence -= 0.15
+        if not metadata.get('reasons'):
+            confidence -= 0.1
+        
+        reasons = metadata.get('reasons') or ["General churn risk indicators"]
+        customer = state.customer
+        summary = (
+            f"Proactive {event.event_type.value.replace('proactive_', '').replace('_', ' ')} for {customer.segment} customer "
+            f"{customer.full_name} ({customer.loyalty_tier}, LTV ${customer.lifetime_value:,.2f}). "
+            f"Churn risk {churn_risk:.0%}"
+        )
+        if health_score is not None:
+            summary += f", health score {float(health_score):.0%}"
+        summary += f". Drivers: {', '.join(reasons[:3])}."
+        if cohort_data:
+            summary += f" Customer is at {cohort_data.get('customer_percentile', 50):.0f} percentile in their cohort."
+        
+        return {
+            "sentiment": sentiment.value,
+            "urgency_level": urgency,
+            "customer_risk_score": round(risk, 3),
+            "context_summary": summary,
+            "confidence": round(max(0.0, confidence), 3)
+        }
+    
+    def _llm_analysis(self, state: AgentState, data_context: str) -> Dict[str, Any]:
+        """
+        Run the LLM context analysis.
+        
+        Args:
+            state: Current agent state
+            data_context: Data-driven enrichment appended to the prompt
+            
+        Returns:
+            Parsed LLM result (raises on failure)
+        """
+        prompt = build_agent_prompt(
+            "context_agent",
+            {
+                "customer_name": state.customer.full_name,
+                "customer_id": state.customer.customer_id,
+                "segment": state.customer.segment,
+                "loyalty_tier": state.customer.loyalty_tier,
+                "lifetime_value": state.customer.lifetime_value,
+                "preferred_category": state.customer.preferred_category,
+                "event_type": state.event.event_type.value,
+                "description": state.event.description,
+                "timestamp": state.event.timestamp.isoformat()
+            },
+            # Add data-driven context
+            f"\n\nREAL CUSTOMER DATA CONTEXT:{data_context}" if data_context else ""
+        )
+        
+        # Validated JSON response (one bounded repair call on malformed output)
+        return ModelRouter.invoke(self.llms, state, prompt)
+    
+    @staticmethod
+    def _apply_result(state: AgentState, result: Dict[str, Any]):
+        """Copy an analysis result onto the state."""
+        state.sentiment = SentimentType(result["sentiment"])
+        state.urgency_level = int(result["urgency_level"])
+        state.customer_risk_score = float(result["customer_risk_score"])
+        state.context_summary = result["context_summary"]
+    
+    @classmethod
+    def _record_agreement(cls, rule_result: Dict[str, Any], llm_result: Dict[str, Any]):
+        """Compare rule and LLM results (same sentiment +/-1 step and urgency +/-1)."""
+        try:
+            sentiment_gap = abs(
+                SENTIMENT_SCALE.index(rule_result["sentiment"]) -
+                SENTIMENT_SCALE.index(llm_result["sentiment"])
+            )
+            urgency_gap = abs(int(rule_result["urgency_level"]) - int(llm_result["urgency_level"]))
+        except (KeyError, ValueError, TypeError):
+            return
+        
+        with cls._stats_lock:
+            cls.rule_stats["compared"] += 1
+            if sentiment_gap <= 1 and urgency_gap <= 1:
+                cls.rule_stats["agreed"] += 1
+    
+    @classmethod
+    def _count(cls, key: str):
+        """Increment a rule statistic."""
+        with cls._stats_lock:
+            cls.rule_stats[key] += 1
+    
+    @classmethod
+    def get_rule_stats(cls) -> Dict[str, Any]:
+        """
+        Report how often the rule fast path replaced the LLM call.
+        
+        Returns:
+            Counts plus rule ratio and rule-vs-LLM agreement rate
+        """
+        with cls._stats_lock:
+            stats = dict(cls.rule_stats)
+        
+        total = stats["rule_runs"] + stats["llm_runs"]
+        stats["rule_ratio"] = stats["rule_runs"] / total if total else 0.0
+        stats["agreement_rate"] = stats["agreed"] / stats["compared"] if stats["compared"] else None
+        return stats
+    
     def analyze(self, state: AgentState) -> AgentState:
         """
         Analyze the customer event and extract context.
@@ -66,55 +266,68 @@ class ContextAgent:
             data_context += f"\n- {segment_stats['total_customers']} total customers in {state.customer.segment} segment"
             data_context += f"\n- Segment average LTV: ${segment_stats['avg_lifetime_value']:.2f}"
         
-        # Prepare prompt with real data enrichment
-        prompt_text = SYSTEM_PROMPTS["context_agent"].format(
-            customer_name=state.customer.full_name,
-            customer_id=state.customer.customer_id,
-            segment=state.customer.segment,
-            loyalty_tier=state.customer.loyalty_tier,
-            lifetime_value=state.customer.lifetime_value,
-            preferred_category=state.customer.preferred_category,
-            event_type=state.event.event_type.value,
-            description=state.event.description,
-            timestamp=state.event.timestamp.isoformat()
-        )
-        
-        # Add data-driven context
-        if data_context:
-            prompt_text += f"\n\nREAL CUSTOMER DATA CONTEXT:{data_context}"
+        # ⚡ Rule-only fast path for data-determined proactive events
+        # (in degraded mode rules are accepted at any confidence)
+        degraded = DegradationController.stage_degraded(state, "context")
+        rule_result = None
+        if settings.CONTEXT_RULES_ENABLED or degraded:
+            rule_result = self._rule_based_analysis(state, cohort_data)
         
-        # Get response from LLM
-        try:
-            response = self.llm.invoke(prompt_text)
+        if rule_result and (degraded or rule_result["confidence"] >= settings.CONTEXT_RULE_MIN_CONFIDENCE):
+            self._apply_result(state, rule_result)
+            state.metadata['context_mode'] = 'rules'
+            self._count("rule_runs")
             
-            # Parse JSON response
-            content = response.content
+            state.add_message(
+                "context_agent",
+                f"Context derived from monitor data (rules{', degraded mode' if degraded else ''}, "
+                f"confidence={rule_result['confidence']:.2f}): "
+                f"Sentiment={state.sentiment.value}, "
+                f"Urgency={state.urgency_level}/5, Risk={state.customer_risk_score:.2f}"
+            )
             
-            # Extract JSON from markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            # Optional audit sample to keep measuring rule-vs-LLM agreement
+            if not degraded and settings.CONTEXT_RULE_AUDIT_RATE > 0 and random.random() < settings.CONTEXT_RULE_AUDIT_RATE:
+                try:
+                    self._record_agreement(rule_result, self._llm_analysis(state, data_context))
+                except Exception:
+                    pass
             
-            result = json.loads(content)
+            return state
+        
+        if rule_result:
+            self._count("low_confidence_fallbacks")
+        
+        # Get response from LLM
+        try:
+            result = self._llm_analysis(state, data_context)
+            self._count("llm_runs")
             
             # Update state
-            state.sentiment = SentimentType(result["sentiment"])
-            state.urgency_level = int(result["urgency_level"])
-            state.customer_risk_score = float(result["customer_risk_score"])
-            state.context_summary = result["context_summary"]
+            self._apply_result(state, result)
+            state.metadata['context_mode'] = 'llm'
+            
+            if rule_result:
+                self._record_agreement(rule_result, result)
             
             state.add_message(
                 "context_agent",
                 f"Context analyzed: Sentiment={state.sentiment.value}, "
                 f"Urgency={state.urgency_level}/5, Risk={state.customer_risk_score:.2f}"
             )
-            
+        
         except Exception as e:
             state.add_message(
                 "context_agent",
                 f"Error during analysis: {str(e)}"
             )
+            
+            if rule_result:
+                # Low-confidence rules still beat static defaults
+                self._apply_result(state, rule_result)
+                state.metadata['context_mode'] = 'rules'
+                return state
+            
             # Set default values
             state.sentiment = SentimentType.NEUTRAL
             state.urgency_level = 3
@@ -2,17 +2,63 @@
 Decision Agent - Makes decisions on actions and escalations.
 Enhanced with compliance checks, multi-channel recommendations, and escalation tracking.
 """
-import json
 from typing import Dict, Any, List, Optional
-from langchain_openai import ChatOpenAI
 
 from models import AgentState
-from config.prompts import SYSTEM_PROMPTS
 from config import settings
 from utils.data_analytics import DataAnalytics
+from utils.llm_factory import create_tiered_chat_models
+from utils.prompt_builder import build_agent_prompt
+from utils.model_router import ModelRouter
 from utils.escalation_tracker import EscalationTracker
 
 
+def mark_state_handled(state: AgentState, skip_decision: Dict[str, Any],
+                       agent: str = "decision_agent") -> AgentState:
+    """
+    Record a `handled` outcome for a customer already escalated to a human.
+    
+    Used by the decision agent and by the workflow entry gate so that
+    escalated customers short-circuit without any model traffic.
+    
+    Args:
+        state: Current agent state
+        skip_decision: Result of EscalationTracker.should_skip_customer
+        agent: Name of the agent recording the outcome
+        
+    Returns:
+        Updated state marked as handled
+    """
+    state.add_message(
+        agent,
+        f"⏭️ SKIPPING: {skip_decision['reason']}"
+    )
+    state.add_message(
+        agent,
+        f"Context: {skip_decision['context']}"
+    )
+    
+    # Mark this explicitly in state
+    state.escalation_needed = False  # Don't re-escalate
+    state.priority_level = "handled"  # Special status
+    state.recommended_action = f"Customer already escalated ({skip_decision.get('escalation_id')}). Human agent handling."
+    state.action_taken = "Skipped - human agent handling"
+    
+    # A run restored from a scan checkpoint may already hold the automated offer and message
+    state.discount_applied = None
+    state.discount_auto_approved = False
+    state.discount_executed = False
+    state.personalized_response = None
+    
+    if skip_decision.get('assigned_to'):
+        state.add_message(
+            agent,
+            f"Assigned to: {skip_decision['assigned_to']}"
+        )
+    
+    return state
+
+
 class DecisionAgent:
     """Makes strategic proactive decisions.
 
@@ -31,11 +77,8 @@ class DecisionAgent:
         self.temperature = temperature
         
         # Initialize LLM
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        self.llms = create_tiered_chat_models("decision_agent", self.model_name, self.temperature)
+        self.llm = self.llms["large"]
         
         # Initialize data analytics for support history and churn insights
         self.analytics = DataAnalytics()
@@ -249,47 +292,21 @@ class DecisionAgent:
         # Default to low
         return "low"
     
-    def make_decision(self, state: AgentState) -> AgentState:
+    def check_active_escalation(self, state: AgentState) -> bool:
         """
-        Make decision on actions and escalations.
-        Enhanced with compliance checks, multi-channel recommendations, and escalation tracking.
+        Mark the state `handled` if the customer is already with a human agent.
         
         Args:
-            state: Current agent state with context and pattern analysis
+            state: Current agent state
             
         Returns:
-            Updated state with decision, compliance info, and channel recommendations
+            True if the customer was skipped
         """
-        if not state.customer or not state.context_summary:
-            state.add_message("decision_agent", "Error: Missing required data")
-            return state
-        
-        # 🚨 NEW: Check if customer is already escalated to human
         skip_decision = self.escalation_tracker.should_skip_customer(state.customer.customer_id)
         
         if skip_decision['should_skip']:
-            # Customer is currently being handled by human - skip automated intervention
-            state.add_message(
-                "decision_agent",
-                f"⏭️ SKIPPING: {skip_decision['reason']}"
-            )
-            state.add_message(
-                "decision_agent",
-                f"Context: {skip_decision['context']}"
-            )
-            
-            # Mark this explicitly in state
-            state.escalation_needed = False  # Don't re-escalate
-            state.priority_level = "handled"  # Special status
-            state.recommended_action = f"Customer already escalated ({skip_decision.get('escalation_id')}). Human agent handling."
-            
-            if skip_decision.get('assigned_to'):
-                state.add_message(
-                    "decision_agent",
-                    f"Assigned to: {skip_decision['assigned_to']}"
-                )
-            
-            return state
+            mark_state_handled(state, skip_decision)
+            return True
         
         # If stale escalation, add context
         if skip_decision.get('is_stale'):
@@ -298,6 +315,21 @@ class DecisionAgent:
                 f"⚠️ Note: {skip_decision['context']}"
             )
         
+        return False
+    
+    def build_decision_context(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Collect compliance, channel and data context for a decision prompt.
+        
+        Shared by the decision agent and the fused decision+empathy agent.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Dictionary with `compliance`, `channels`, `prompt_fields` and
+            `enhanced_context` (text appended to the prompt)
+        """
         # Check marketing compliance
         compliance_info = self._check_marketing_compliance(state.customer)
         
@@ -321,151 +353,206 @@ class DecisionAgent:
         if churn_data and churn_data.get('is_churned'):
             enhanced_context += f"\n⚠️ CHURN ALERT: Customer has churned - Reason: {churn_data.get('churn_reason')}\n"
         
-        # Prepare prompt
-        prompt_text = SYSTEM_PROMPTS["decision_agent"].format(
-            customer_name=state.customer.full_name,
-            segment=state.customer.segment,
-            loyalty_tier=state.customer.loyalty_tier,
-            lifetime_value=state.customer.lifetime_value,
-            is_vip=state.customer.is_vip,
-            event_type=state.event.event_type.value if state.event else "unknown",
-            sentiment=state.sentiment.value if state.sentiment else "unknown",
-            urgency_level=state.urgency_level or 3,
-            customer_risk_score=state.customer_risk_score or 0.5,
-            churn_risk=state.predicted_churn_risk or 0.5,
-            context_summary=state.context_summary,
-            historical_insights=state.historical_insights or "No insights available"
-        )
+        prompt_fields = {
+            "customer_name": state.customer.full_name,
+            "segment": state.customer.segment,
+            "loyalty_tier": state.customer.loyalty_tier,
+            "lifetime_value": state.customer.lifetime_value,
+            "is_vip": state.customer.is_vip,
+            "event_type": state.event.event_type.value if state.event else "unknown",
+            "sentiment": state.sentiment.value if state.sentiment else "unknown",
+            "urgency_level": state.urgency_level or 3,
+            "customer_risk_score": state.customer_risk_score or 0.5,
+            "churn_risk": state.predicted_churn_risk or 0.5,
+            "context_summary": state.context_summary,
+            "historical_insights": state.historical_insights or "No insights available"
+        }
         
-        # Add enhanced context
-        prompt_text += enhanced_context
+        return {
+            "compliance": compliance_info,
+            "channels": recommended_channels,
+            "prompt_fields": prompt_fields,
+            "enhanced_context": enhanced_context
+        }
+    
+    def apply_decision(
+        self,
+        state: AgentState,
+        result: Dict[str, Any],
+        compliance_info: Dict[str, Any],
+        recommended_channels: List[Dict[str, Any]]
+    ) -> AgentState:
+        """
+        Apply a model decision and enforce the deterministic business rules.
         
-        # Get response from LLM - Agent decides EVERYTHING
-        try:
-            response = self.llm.invoke(prompt_text)
-            content = response.content
-            
-            # Extract JSON from markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            result = json.loads(content)
+        Discount auto-approval, escalation, priority and compliance are always
+        decided locally, whatever the model returned.
+        
+        Args:
+            state: Current agent state
+            result: Parsed decision (recommended_action, incentive_offered, reasoning)
+            compliance_info: Result of _check_marketing_compliance
+            recommended_channels: Result of _recommend_channels
             
-            # Extract agent's decisions
-            state.recommended_action = result.get("recommended_action", "")
+        Returns:
+            Updated state
+        """
+        # Extract agent's decisions
+        state.recommended_action = result.get("recommended_action", "")
+        
+        # 🎁 Extract incentive decision from AGENT (not hardcoded)
+        incentive = result.get("incentive_offered") or {}
+        discount_pct = None
+        auto_approved = False
+        
+        if incentive.get("type") == "discount" and incentive.get("discount_percentage"):
+            discount_pct = float(incentive.get("discount_percentage", 0))
+            auto_approved = discount_pct <= 10  # System rule: ≤10% = auto-approve
             
-            # 🎁 Extract incentive decision from AGENT (not hardcoded)
-            incentive = result.get("incentive_offered", {})
-            discount_pct = None
-            auto_approved = False
+            state.discount_applied = discount_pct
+            state.discount_auto_approved = auto_approved
             
-            if incentive.get("type") == "discount" and incentive.get("discount_percentage"):
-                discount_pct = float(incentive.get("discount_percentage", 0))
-                auto_approved = discount_pct <= 10  # System rule: ≤10% = auto-approve
-                
-                state.discount_applied = discount_pct
-                state.discount_auto_approved = auto_approved
-                
-                # 🔥 EXECUTE if auto-approved (not just recommend)
-                if auto_approved:
-                    state.discount_executed = True
-                    state.action_taken = f"Applied {discount_pct}% discount to customer account"
-                    state.add_message(
-                        "decision_agent",
-                        f"✅ EXECUTED: {discount_pct}% discount applied to customer account"
-                    )
-                else:
-                    state.discount_executed = False
-                    state.action_taken = "Escalated to human for discount approval"
-                    state.add_message(
-                        "decision_agent",
-                        f"⚠️ ESCALATION REQUIRED: {discount_pct}% discount needs human approval (>10% threshold)"
-                    )
+            # 🔥 EXECUTE if auto-approved (not just recommend)
+            if auto_approved:
+                state.discount_executed = True
+                state.action_taken = f"Applied {discount_pct}% discount to customer account"
+                state.add_message(
+                    "decision_agent",
+                    f"✅ EXECUTED: {discount_pct}% discount applied to customer account"
+                )
             else:
-                # Agent chose not to offer discount or offered different incentive
-                incentive_type = incentive.get("type", "none")
-                if incentive_type != "none":
-                    # 🔥 EXECUTE the alternative incentive
-                    state.action_taken = f"Applied {incentive_type} incentive"
-                    state.add_message(
-                        "decision_agent",
-                        f"✅ EXECUTED: {incentive_type} - {incentive.get('reasoning', 'N/A')}"
-                    )
-                else:
-                    state.action_taken = "Sent personalized engagement message (no incentive)"
-            
-            # Determine escalation based on agent's decision + system rules
-            escalation_needed = self._should_escalate(state, discount_pct)
-            state.escalation_needed = escalation_needed
-            
-            if escalation_needed:
-                # Override action_taken if escalated
-                state.action_taken = "Escalated to human agent"
-            
-            # Determine priority
-            priority_level = self._determine_priority(state)
-            state.priority_level = priority_level
-            
-            # 🚨 NEW: Create escalation record if escalation is needed
-            if state.escalation_needed:
-                escalation_reason = result.get("reasoning", "Automated escalation based on customer risk")
-                escalation_id = self.escalation_tracker.create_escalation(
-                    customer_id=state.customer.customer_id,
-                    reason=escalation_reason,
-                    priority=state.priority_level,
-                    health_score=state.customer_risk_score or 0,
-                    assigned_to=None  # Will be assigned by human agent team
+                state.discount_executed = False
+                state.action_taken = "Escalated to human for discount approval"
+                state.add_message(
+                    "decision_agent",
+                    f"⚠️ ESCALATION REQUIRED: {discount_pct}% discount needs human approval (>10% threshold)"
                 )
-                
+        else:
+            # Agent chose not to offer discount or offered different incentive
+            incentive_type = incentive.get("type", "none")
+            if incentive_type != "none":
+                # 🔥 EXECUTE the alternative incentive
+                state.action_taken = f"Applied {incentive_type} incentive"
+                state.metadata['incentive'] = incentive_type  # Messages must mention it (see decision_class)
                 state.add_message(
                     "decision_agent",
-                    f"🚨 Escalation created: {escalation_id}"
+                    f"✅ EXECUTED: {incentive_type} - {incentive.get('reasoning', 'N/A')}"
                 )
+            else:
+                state.action_taken = "Sent personalized engagement message (no incentive)"
+        
+        # Determine escalation based on agent's decision + system rules
+        escalation_needed = self._should_escalate(state, discount_pct)
+        state.escalation_needed = escalation_needed
+        
+        if escalation_needed:
+            # Override action_taken if escalated
+            state.action_taken = "Escalated to human agent"
+        
+        # Determine priority
+        priority_level = self._determine_priority(state)
+        state.priority_level = priority_level
+        
+        # 🚨 NEW: Create escalation record if escalation is needed
+        if state.escalation_needed:
+            escalation_reason = result.get("reasoning", "Automated escalation based on customer risk")
+            escalation_id = self.escalation_tracker.create_escalation(
+                customer_id=state.customer.customer_id,
+                reason=escalation_reason,
+                priority=state.priority_level,
+                health_score=state.customer_risk_score or 0,
+                assigned_to=None  # Will be assigned by human agent team
+            )
+            # Kept so a resumed run does not mistake its own escalation for a human's
+            state.metadata['escalation_id'] = escalation_id
             
-            # Store compliance and channel info in metadata
-            if not hasattr(state, 'metadata'):
-                state.metadata = {}
-            state.metadata['compliance'] = compliance_info
-            state.metadata['recommended_channels'] = recommended_channels
-            
-            # Build decision message
-            decision_msg = f"Decision made: Priority={state.priority_level}, "
-            decision_msg += f"Escalation={'Yes' if state.escalation_needed else 'No'}, "
-            decision_msg += f"Marketing={'Allowed' if compliance_info['can_send_marketing'] else 'RESTRICTED'}"
-            
-            state.add_message("decision_agent", decision_msg)
-            
-            # Add channel recommendations
-            primary_channels = [ch for ch in recommended_channels if ch['priority'] in ['primary', 'high']]
-            if primary_channels:
-                channels_msg = "Recommended channels: " + ", ".join([
-                    f"{ch['channel']} ({ch['priority']})" for ch in primary_channels
-                ])
-                state.add_message("decision_agent", channels_msg)
-            
-            # Add compliance restrictions if any
-            if compliance_info['restrictions']:
-                state.add_message("decision_agent", f"⚠️ Restrictions: {'; '.join(compliance_info['restrictions'][:2])}")
+            state.add_message(
+                "decision_agent",
+                f"🚨 Escalation created: {escalation_id}"
+            )
+        
+        # Store compliance and channel info in metadata
+        if not hasattr(state, 'metadata'):
+            state.metadata = {}
+        state.metadata['compliance'] = compliance_info
+        state.metadata['recommended_channels'] = recommended_channels
+        
+        # Build decision message
+        decision_msg = f"Decision made: Priority={state.priority_level}, "
+        decision_msg += f"Escalation={'Yes' if state.escalation_needed else 'No'}, "
+        decision_msg += f"Marketing={'Allowed' if compliance_info['can_send_marketing'] else 'RESTRICTED'}"
+        
+        state.add_message("decision_agent", decision_msg)
+        
+        # Add channel recommendations
+        primary_channels = [ch for ch in recommended_channels if ch['priority'] in ['primary', 'high']]
+        if primary_channels:
+            channels_msg = "Recommended channels: " + ", ".join([
+                f"{ch['channel']} ({ch['priority']})" for ch in primary_channels
+            ])
+            state.add_message("decision_agent", channels_msg)
+        
+        # Add compliance restrictions if any
+        if compliance_info['restrictions']:
+            state.add_message("decision_agent", f"⚠️ Restrictions: {'; '.join(compliance_info['restrictions'][:2])}")
+        
+        # Add reasoning to messages
+        if "reasoning" in result:
+            state.add_message("decision_agent", f"Reasoning: {result['reasoning']}")
+        
+        return state
+    
+    def make_decision(self, state: AgentState) -> AgentState:
+        """
+        Make decision on actions and escalations.
+        Enhanced with compliance checks, multi-channel recommendations, and escalation tracking.
+        
+        Args:
+            state: Current agent state with context and pattern analysis
             
-            # Add reasoning to messages
-            if "reasoning" in result:
-                state.add_message("decision_agent", f"Reasoning: {result['reasoning']}")
+        Returns:
+            Updated state with decision, compliance info, and channel recommendations
+        """
+        if not state.customer or not state.context_summary:
+            state.add_message("decision_agent", "Error: Missing required data")
+            return state
+        
+        # 🚨 NEW: Check if customer is already escalated to human
+        if self.check_active_escalation(state):
+            # Customer is currently being handled by human - skip automated intervention
+            return state
+        
+        decision_context = self.build_decision_context(state)
+        compliance_info = decision_context["compliance"]
+        recommended_channels = decision_context["channels"]
+        
+        # Prepare prompt (static prefix + customer data with enhanced context)
+        prompt = build_agent_prompt(
+            "decision_agent",
+            decision_context["prompt_fields"],
+            decision_context["enhanced_context"]
+        )
+        
+        # Get response from LLM - Agent decides EVERYTHING
+        try:
+            result = ModelRouter.invoke(self.llms, state, prompt)
             
+            self.apply_decision(state, result, compliance_info, recommended_channels)
+        
         except Exception as e:
             state.add_message(
                 "decision_agent",
                 f"Error during decision making: {str(e)}"
             )
-            # Set default values
+            # Rule-based defaults, flagged so they are never mistaken for a model decision
             state.recommended_action = "Review customer issue and provide appropriate response"
-            state.escalation_needed = escalation_needed
-            state.priority_level = priority_level
+            state.escalation_needed = self._should_escalate(state)
+            state.priority_level = self._determine_priority(state)
             
             # Store compliance and channel info even on error
             if not hasattr(state, 'metadata'):
                 state.metadata = {}
+            state.metadata['decision_fallback'] = True
             state.metadata['compliance'] = compliance_info
             state.metadata['recommended_channels'] = recommended_channels
         
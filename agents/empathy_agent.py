@@ -2,16 +2,46 @@
 Empathy Agent - Generates empathetic, personalized customer responses.
 Enhanced with festival awareness and product-context sensitivity.
 """
-import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-from langchain_openai import ChatOpenAI
 
 from models import AgentState
-from config.prompts import SYSTEM_PROMPTS
 from config import settings
 from utils.data_analytics import DataAnalytics
+from utils.llm_factory import create_tiered_chat_models
+from utils.prompt_builder import build_agent_prompt
+from utils.model_router import ModelRouter
+from utils.streaming import create_message_streamer, current_stream_sink
+from utils.message_cache import (
+    MessageSkeletonCache,
+    action_description,
+    NAME_PLACEHOLDER,
+    CATEGORY_PLACEHOLDER,
+    DISCOUNT_PLACEHOLDER,
+    decision_class,
+    fillable,
+    render_skeleton,
+    unfilled_placeholders
+)
+from utils.token_budget import ContextSection
 from utils.festival_context import FestivalContextManager
+from utils.degradation import DegradationController
+
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "hi": "Hindi",
+    "ta": "Tamil",
+    "te": "Telugu",
+    "bn": "Bengali"
+}
+
+SKELETON_INSTRUCTIONS = (
+    "MESSAGE TEMPLATE: This message is sent to several customers with the same profile. "
+    f"Write {NAME_PLACEHOLDER} wherever the customer's first name goes and {CATEGORY_PLACEHOLDER} for "
+    "their preferred category. Do not add any other customer-specific details or placeholders."
+)
+SKELETON_DISCOUNT_INSTRUCTIONS = f"Write {DISCOUNT_PLACEHOLDER} for the discount percentage."
 
 
 class EmpathyAgent:
@@ -29,11 +59,8 @@ class EmpathyAgent:
         self.temperature = temperature
         
         # Initialize LLM with higher temperature for creativity
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        self.llms = create_tiered_chat_models("empathy_agent", self.model_name, self.temperature)
+        self.llm = self.llms["large"]
         
         # Initialize data analytics for personalization insights
         self.analytics = DataAnalytics()
@@ -96,30 +123,23 @@ class EmpathyAgent:
         
         return "\n".join(guidelines)
     
-    def generate_response(self, state: AgentState) -> AgentState:
+    def build_personalization(self, state: AgentState) -> Dict[str, Any]:
         """
-        Generate personalized, empathetic response using REAL customer data insights.
-        Enhanced with language support and NPS awareness.
+        Build the data-driven personalization context for a response prompt.
+        
+        Shared by the empathy agent and the fused decision+empathy agent.
         
         Args:
-            state: Current agent state with all analyses complete
+            state: Current agent state
             
         Returns:
-            Updated state with personalized response
+            Dictionary with `language_name`, `personalization_notes`,
+            `sections` (the same notes as ranked ContextSections for the
+            token budget) and `tone_guidelines`
         """
-        if not state.customer or not state.recommended_action:
-            state.add_message("empathy_agent", "Error: Missing required data")
-            return state
-        
         # Get language preference
         customer_language = state.customer.language or "en"
-        language_name = {
-            "en": "English",
-            "hi": "Hindi", 
-            "ta": "Tamil",
-            "te": "Telugu",
-            "bn": "Bengali"
-        }.get(customer_language, "English")
+        language_name = LANGUAGE_NAMES.get(customer_language, "English")
         
         # Get real data insights for personalization
         cohort_data = self.analytics.compare_with_cohort(state.customer)
@@ -138,10 +158,15 @@ class EmpathyAgent:
                 state.customer.preferred_category
             )
         
-        # Build enhanced context for LLM
-        enhanced_context = []
+        # Build enhanced context for LLM as ranked sections
+        sections = []
+        
+        def add_section(name: str, lines: List[str], priority: int, **kwargs):
+            if lines:
+                sections.append(ContextSection(name, "\n".join(lines), priority, **kwargs))
         
         # 🎉 Festival & Seasonal Context (Priority #1)
+        enhanced_context = []
         if festival_context:
             enhanced_context.append(f"🎉 FESTIVAL CONTEXT: {festival_context['festival_name']}")
             enhanced_context.append(f"   Significance: {festival_context['significance']}")
@@ -175,14 +200,18 @@ class EmpathyAgent:
         elif seasonal_context['season'] != 'general':
             enhanced_context.append(f"🌤️ SEASONAL CONTEXT: {seasonal_context['season'].title()} season")
             enhanced_context.append(f"   Messaging tone: {seasonal_context['messaging_tone']}")
+        add_section("festival_context", enhanced_context, priority=4)
         
-        # Language context
+        # Language context (never trimmed - the response language depends on it)
+        enhanced_context = []
         if customer_language != "en":
             enhanced_context.append(f"🌐 LANGUAGE: Customer prefers {language_name}")
             enhanced_context.append(f"Use culturally appropriate greetings and expressions for {language_name} speakers")
             enhanced_context.append("If response is in English, mention availability of support in their language")
+        add_section("language", enhanced_context, priority=5, required=True)
         
         # NPS context
+        enhanced_context = []
         if nps_data:
             nps_category = nps_data.get('nps_category')
             nps_score = nps_data.get('nps_score')
@@ -193,8 +222,10 @@ class EmpathyAgent:
                 enhanced_context.append("Acknowledge past issues and show commitment to improvement")
             elif nps_category == "Promoter":
                 enhanced_context.append("✓ Loyal advocate - reinforce positive relationship")
+        add_section("nps", enhanced_context, priority=4)
         
         # Support history context
+        enhanced_context = []
         if support_history:
             ticket_count = support_history.get('total_tickets', 0)
             avg_csat = support_history.get('avg_csat')
@@ -205,78 +236,315 @@ class EmpathyAgent:
                     enhanced_context.append(f"Average CSAT: {avg_csat:.1f}/5.0")
                     if avg_csat < 3.5:
                         enhanced_context.append("⚠️ Low historical satisfaction - extra care needed")
+        add_section("support_history", enhanced_context, priority=3)
         
         # Cohort performance
+        enhanced_context = []
         if cohort_data and cohort_data.get('above_average'):
             enhanced_context.append(f"This customer is in the top {100 - cohort_data['customer_percentile']:.0f}% of their cohort")
             enhanced_context.append("Emphasize their valued status")
+        add_section("cohort", enhanced_context, priority=2)
         
         # LTV context
+        enhanced_context = []
         if segment_stats:
             avg_ltv = segment_stats.get('avg_lifetime_value', 0)
             if state.customer.lifetime_value > avg_ltv * 1.5:
                 enhanced_context.append("Customer has significantly above-average lifetime value")
                 enhanced_context.append("Use premium, exclusive language")
+        add_section("lifetime_value", enhanced_context, priority=2)
         
-        personalization_notes = "\n".join(enhanced_context) if enhanced_context else "Standard personalization"
+        if not sections:
+            add_section("standard", ["Standard personalization"], priority=1, required=True)
+        personalization_notes = "\n".join(section.text for section in sections)
         
         # Get tone guidelines (now includes NPS awareness)
         tone_guidelines = self._determine_tone_guidelines(state)
         
-        # 🎁 Format discount info for prompt
-        discount_info = "No discount applied"
-        if state.discount_applied and state.discount_auto_approved:
-            discount_info = f"✅ SYSTEM AUTO-APPROVED: {state.discount_applied}% discount has been applied to customer's account. MUST mention this in the message naturally (e.g., 'We've added a {state.discount_applied}% discount to your account' or 'You'll see a {state.discount_applied}% discount on your next purchase')"
-        elif state.discount_applied and not state.discount_auto_approved:
-            discount_info = f"⚠️ {state.discount_applied}% discount pending human approval - DO NOT mention discount in message yet"
-        
-        # Prepare prompt with real data context
-        prompt_text = SYSTEM_PROMPTS["empathy_agent"].format(
-            customer_name=state.customer.full_name,
-            segment=state.customer.segment,
-            loyalty_tier=state.customer.loyalty_tier,
-            preferred_category=state.customer.preferred_category,
-            event_type=state.event.event_type.value if state.event else "inquiry",
-            description=state.event.description if state.event else "Customer inquiry",
-            sentiment=state.sentiment.value if state.sentiment else "neutral",
-            urgency_level=state.urgency_level or 3,
-            recommended_action=state.recommended_action,
-            discount_info=discount_info,
-            priority_level=state.priority_level or "medium",
-            escalation_needed=state.escalation_needed
-        )
+        return {
+            "language_name": language_name,
+            "personalization_notes": personalization_notes,
+            "sections": sections,
+            "tone_guidelines": tone_guidelines
+        }
+    
+    @staticmethod
+    def describe_discount(discount: Any, auto_approved: bool) -> str:
+        """
+        Discount instruction for the response prompt.
         
-        # Add data-driven personalization context
-        prompt_text += f"\n\nADDITIONAL PERSONALIZATION CONTEXT (from real customer data):\n{personalization_notes}"
-        prompt_text += f"\n\nTONE GUIDELINES:\n{tone_guidelines}"
+        Args:
+            discount: Discount percentage (or a placeholder such as {DISCOUNT_PCT})
+            auto_approved: Discount was applied without human approval
+            
+        Returns:
+            Prompt text telling the model whether to mention the discount
+        """
+        if not discount:
+            return "No discount applied"
+        if auto_approved:
+            return f"✅ SYSTEM AUTO-APPROVED: {discount}% discount has been applied to customer's account. MUST mention this in the message naturally (e.g., 'We've added a {discount}% discount to your account' or 'You'll see a {discount}% discount on your next purchase')"
+        return f"⚠️ {discount}% discount pending human approval - DO NOT mention discount in message yet"
+    
+    @classmethod
+    def format_discount_info(cls, state: AgentState) -> str:
+        """Describe the decided discount so the message mentions it only when applied."""
+        return cls.describe_discount(state.discount_applied, state.discount_auto_approved)
+    
+    def apply_response(self, state: AgentState, result: Dict[str, Any], language_name: str) -> AgentState:
+        """
+        Copy a generated response onto the state.
         
-        # Get response from LLM
-        try:
-            response = self.llm.invoke(prompt_text)
-            content = response.content
+        Args:
+            state: Current agent state
+            result: Parsed response (personalized_response, tone, empathy_score)
+            language_name: Customer language used for the response
             
-            # Extract JSON from markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+        Returns:
+            Updated state
+        """
+        state.personalized_response = result.get("personalized_response", "")
+        state.tone = result.get("tone", "professional")
+        state.empathy_score = float(result.get("empathy_score", 0.7))
+        
+        state.add_message(
+            "empathy_agent",
+            f"Response generated: Empathy score={state.empathy_score:.2f}, "
+            f"Tone={state.tone}, Language={language_name}"
+        )
+        return state
+    
+    def skeleton_key(self, state: AgentState) -> Tuple[str, ...]:
+        """
+        Message skeleton cache key of a run.
+        
+        Args:
+            state: Agent state after the decision stage
             
-            result = json.loads(content)
+        Returns:
+            (language, festival or season, segment, tone, category shown,
+            action class, discount bucket)
+        """
+        festival = self.festival_manager.get_current_festival_context()
+        if festival:
+            occasion = festival['festival_name']
+        else:
+            occasion = f"season:{self.festival_manager.get_seasonal_context()['season']}"
+        
+        # Tone: the inputs of the tone guidelines, coarsened to what changes them
+        nps_data = self.analytics.get_customer_nps(state.customer)
+        sentiment = state.sentiment.value if state.sentiment else "neutral"
+        tone = "/".join([
+            (nps_data or {}).get('nps_category') or "unknown",
+            "negative" if "negative" in sentiment else "positive" if "positive" in sentiment else "neutral",
+            "urgent" if (state.urgency_level or 0) >= 4 or state.priority_level == "critical" else "routine"
+        ])
+        
+        return (
+            state.customer.language or "en",
+            occasion,
+            state.customer.segment,
+            tone,
+            "category" if state.customer.preferred_category else "no_category",
+            *decision_class(state)
+        )
+    
+    def _generate_skeleton(self, state: AgentState, key: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """
+        Ask the model for a placeholder message shared by every customer of `key`.
+        
+        Only key-level context (language, festival/season, tone) is sent;
+        customer-specific history stays out of the skeleton.
+        
+        Returns:
+            Parsed response with placeholders, or None if the call failed
+        """
+        action_class = key[-2]
+        language_name = LANGUAGE_NAMES.get(state.customer.language or "en", "English")
+        
+        lines = []
+        festival = self.festival_manager.get_current_festival_context()
+        if festival:
+            lines.append(f"🎉 FESTIVAL CONTEXT: {festival['festival_name']}")
+            lines.append(f"   Significance: {festival['significance']}")
+            greeting = self.festival_manager.get_festival_greeting(state.customer.language or "en")
+            if greeting:
+                lines.append(f"   Suggested Greeting: {greeting}")
+        else:
+            seasonal = self.festival_manager.get_seasonal_context()
+            if seasonal['season'] != 'general':
+                lines.append(f"🌤️ SEASONAL CONTEXT: {seasonal['season'].title()} season")
+                lines.append(f"   Messaging tone: {seasonal['messaging_tone']}")
+        if language_name != "English":
+            lines.append(f"🌐 LANGUAGE: Customer prefers {language_name}")
+        
+        openings = [opening for opening in MessageSkeletonCache.openings(key) if opening]
+        instructions = SKELETON_INSTRUCTIONS
+        if key[-1] != "none":
+            instructions += " " + SKELETON_DISCOUNT_INSTRUCTIONS
+        if openings:
+            instructions += "\nOpen differently from these earlier versions:\n" + "\n".join(f"- {o}" for o in openings)
+        
+        sections = [
+            ContextSection("skeleton", instructions, required=True),
+            ContextSection("tone_guidelines", f"TONE GUIDELINES:\n{self._determine_tone_guidelines(state)}", required=True)
+        ]
+        if lines:
+            sections.insert(0, ContextSection("occasion", "\n".join(lines), priority=5, required=True))
+        
+        prompt = build_agent_prompt(
+            "empathy_agent",
+            {
+                "customer_name": NAME_PLACEHOLDER,
+                "segment": state.customer.segment,
+                "loyalty_tier": state.customer.loyalty_tier,
+                "preferred_category": CATEGORY_PLACEHOLDER if state.customer.preferred_category else None,
+                "event_type": state.event.event_type.value,
+                "description": "Proactive outreach to a customer at risk of churning",
+                "sentiment": state.sentiment.value if state.sentiment else "neutral",
+                "urgency_level": state.urgency_level or 3,
+                "recommended_action": action_description(action_class),
+                "discount_info": self.describe_discount(
+                    DISCOUNT_PLACEHOLDER if state.discount_applied else None, state.discount_auto_approved
+                ),
+                "priority_level": state.priority_level or "medium",
+                "escalation_needed": state.escalation_needed
+            },
+            "\n\nMESSAGE CONTEXT:\n",
+            sections=sections
+        )
+        
+        try:
+            return ModelRouter.invoke(self.llms, state, prompt)
+        except Exception as e:
+            print(f"[WARN] Message skeleton generation failed: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _renders_for(skeleton: str, key: Tuple[str, ...], state: AgentState) -> bool:
+        """Whether a skeleton that was not cached can still be rendered for this one customer."""
+        if not skeleton or not fillable(skeleton, key):
+            return False
+        if key[-1] == "auto":  # The applied discount must be in the message
+            return DISCOUNT_PLACEHOLDER in skeleton or f"{state.discount_applied:g}" in skeleton
+        return True
+    
+    def _respond_from_skeleton(self, state: AgentState) -> bool:
+        """
+        Use a cached (or newly written) message skeleton for this run.
+        
+        Returns:
+            True if the response was set from a skeleton
+        """
+        key = self.skeleton_key(state)
+        skeleton = MessageSkeletonCache.checkout(key)
+        outcome = "hit"
+        
+        if skeleton is None:
+            skeleton = self._generate_skeleton(state, key)
+            if skeleton is None:
+                return False
+            outcome = "stored" if MessageSkeletonCache.store(key, skeleton) else "uncached"
+            # Not cacheable (e.g. no name placeholder) but still this customer's message if it
+            # renders cleanly - a second full generation would double the model calls
+            if not self._renders_for(skeleton.get("personalized_response", ""), key, state):
+                return False
+        
+        message = render_skeleton(skeleton["personalized_response"], state)
+        if unfilled_placeholders(message):
+            print(f"[WARN] Message skeleton left placeholders {unfilled_placeholders(message)} - generating in full")
+            return False
+        self.apply_response(
+            state,
+            {**skeleton, "personalized_response": message},
+            LANGUAGE_NAMES.get(state.customer.language or "en", "English")
+        )
+        state.metadata['message_skeleton'] = outcome
+        
+        # The rendered message is ready at once - hand it to the caller's sink in one piece
+        sink = current_stream_sink()
+        if sink:
+            sink("empathy_agent", message)
+        return True
+    
+    def generate_response(self, state: AgentState, discount_info: Optional[str] = None) -> AgentState:
+        """
+        Generate personalized, empathetic response using REAL customer data insights.
+        Enhanced with language support and NPS awareness.
+        
+        Args:
+            state: Current agent state with all analyses complete
+            discount_info: Discount instruction to use instead of the state's
+                decided discount (speculative drafts, never served from the
+                message skeleton cache)
             
-            # Update state
-            state.personalized_response = result.get("personalized_response", "")
-            state.tone = result.get("tone", "professional")
-            state.empathy_score = float(result.get("empathy_score", 0.7))
+        Returns:
+            Updated state with personalized response
+        """
+        if not state.customer or not state.recommended_action:
+            state.add_message("empathy_agent", "Error: Missing required data")
+            return state
+        
+        # Customer already with a human agent - no automated message
+        if state.priority_level == "handled":
+            state.add_message("empathy_agent", "Skipped: customer is being handled by a human agent")
+            return state
+        
+        # Under load the templated (language-aware) message replaces the LLM
+        if DegradationController.stage_degraded(state, "empathy"):
+            state.personalized_response = self._generate_fallback_response(state)
+            state.tone = "professional and empathetic"
+            state.empathy_score = 0.6
+            state.metadata['empathy_mode'] = 'template'
+            state.add_message("empathy_agent", "Templated response sent (degraded mode)")
+            return state
+        
+        # Bulk campaign messages are rendered from a shared skeleton when possible
+        if discount_info is None and MessageSkeletonCache.cacheable(state) and self._respond_from_skeleton(state):
+            return state
+        
+        personalization = self.build_personalization(state)
+        language_name = personalization["language_name"]
+        tone_guidelines = personalization["tone_guidelines"]
+        
+        # 🎁 Format discount info for prompt
+        if discount_info is None:
+            discount_info = self.format_discount_info(state)
+        
+        # Prepare prompt with real data context (static prefix + customer data block)
+        prompt = build_agent_prompt(
+            "empathy_agent",
+            {
+                "customer_name": state.customer.full_name,
+                "segment": state.customer.segment,
+                "loyalty_tier": state.customer.loyalty_tier,
+                "preferred_category": state.customer.preferred_category,
+                "event_type": state.event.event_type.value if state.event else "inquiry",
+                "description": state.event.description if state.event else "Customer inquiry",
+                "sentiment": state.sentiment.value if state.sentiment else "neutral",
+                "urgency_level": state.urgency_level or 3,
+                "recommended_action": state.recommended_action,
+                "discount_info": discount_info,
+                "priority_level": state.priority_level or "medium",
+                "escalation_needed": state.escalation_needed
+            },
+            # Add data-driven personalization context (trimmed to the token budget)
+            "\n\nADDITIONAL PERSONALIZATION CONTEXT (from real customer data):\n",
+            sections=personalization["sections"] + [
+                ContextSection("tone_guidelines", f"TONE GUIDELINES:\n{tone_guidelines}", required=True)
+            ]
+        )
+        
+        # Get response from LLM (message text streamed to the caller's sink, if any)
+        streamer = create_message_streamer("empathy_agent")
+        try:
+            result = ModelRouter.invoke(self.llms, state, prompt, on_chunk=streamer)
             
-            state.add_message(
-                "empathy_agent",
-                f"Response generated: Empathy score={state.empathy_score:.2f}, "
-                f"Tone={state.tone}, Language={language_name}"
-            )
+            self.apply_response(state, result, language_name)
             
         except Exception as e:
             print(f"[DEBUG] Empathy Agent Error: {str(e)}")
-            print(f"[DEBUG] Response content: {response.content if 'response' in locals() else 'No response'}")
+            print(f"[DEBUG] Response content: {getattr(e, 'content', None) or 'No response'}")
             state.add_message(
                 "empathy_agent",
                 f"Error generating response: {str(e)}"
@@ -286,6 +554,11 @@ class EmpathyAgent:
             state.personalized_response = self._generate_fallback_response(state)
             state.tone = "professional and empathetic"
             state.empathy_score = 0.6
+            state.metadata['empathy_mode'] = 'fallback'
+        
+        finally:
+            if streamer:
+                streamer.finish()
         
         return state
     
@@ -302,13 +575,7 @@ class EmpathyAgent:
         """
         # Get language preference
         customer_language = state.customer.language or "en"
-        language_name = {
-            "en": "English",
-            "hi": "Hindi", 
-            "ta": "Tamil",
-            "te": "Telugu",
-            "bn": "Bengali"
-        }.get(customer_language, "English")
+        language_name = LANGUAGE_NAMES.get(customer_language, "English")
         
         # Get NPS and support data
         nps_data = self.analytics.get_customer_nps(state.customer)
@@ -0,0 +1,139 @@
+"""
+Fused Decision + Empathy Agent - Decides the action and writes the message in one call.
+Deterministic compliance, escalation and priority rules are still applied locally.
+"""
+from typing import Optional
+
+from models import AgentState
+from config import settings
+from utils.llm_factory import create_tiered_chat_models
+from utils.prompt_builder import build_agent_prompt
+from utils.model_router import ModelRouter
+from utils.streaming import create_message_streamer
+from utils.token_budget import ContextSection
+from utils.degradation import DegradationController
+from .decision_agent import DecisionAgent
+from .empathy_agent import EmpathyAgent
+
+
+class FusedDecisionEmpathyAgent:
+    """
+    Replaces the sequential Decision (Niti) and Empathy (Karuna) calls with a
+    single structured call returning:
+    - recommended_action, incentive_offered, reasoning
+    - personalized_response, tone, empathy_score
+    
+    Compliance, discount auto-approval, escalation and priority are enforced by
+    the DecisionAgent rules after the call. If the fused call fails, the agent
+    falls back to the regular two-call path.
+    """
+    
+    def __init__(
+        self,
+        decision_agent: Optional[DecisionAgent] = None,
+        empathy_agent: Optional[EmpathyAgent] = None,
+        model_name: str = None,
+        temperature: float = 0.5
+    ):
+        """Initialize the Fused Agent."""
+        self.model_name = model_name or settings.FUSED_AGENT_MODEL
+        self.temperature = temperature
+        
+        # Single LLM for both stages (between decision 0.3 and empathy 0.7)
+        self.llms = create_tiered_chat_models("fused_agent", self.model_name, self.temperature)
+        self.llm = self.llms["large"]
+        
+        # Reuse the stage agents for prompt context, local rules and fallback
+        self.decision_agent = decision_agent or DecisionAgent()
+        self.empathy_agent = empathy_agent or EmpathyAgent()
+        self.escalation_tracker = self.decision_agent.escalation_tracker
+    
+    def decide_and_respond(self, state: AgentState) -> AgentState:
+        """
+        Make the decision and generate the customer message in one LLM call.
+        
+        Args:
+            state: Current agent state with context and pattern analysis
+            
+        Returns:
+            Updated state with decision and personalized response
+        """
+        if not state.customer or not state.context_summary:
+            state.add_message("fused_agent", "Error: Missing required data")
+            return state
+        
+        # Customer already with a human agent - no automated decision or message
+        if self.decision_agent.check_active_escalation(state):
+            return state
+        
+        # Templated empathy under load: only the decision needs the LLM
+        if DegradationController.stage_degraded(state, "empathy"):
+            state = self.decision_agent(state)
+            return self.empathy_agent(state)
+        
+        decision_context = self.decision_agent.build_decision_context(state)
+        compliance_info = decision_context["compliance"]
+        recommended_channels = decision_context["channels"]
+        
+        # Priority and baseline escalation only depend on upstream analysis,
+        # so they can be fixed before the call and shown to the model
+        previous_priority = state.priority_level
+        state.priority_level = self.decision_agent._determine_priority(state)
+        baseline_escalation = self.decision_agent._should_escalate(state)
+        
+        personalization = self.empathy_agent.build_personalization(state)
+        
+        prompt = build_agent_prompt(
+            "fused_agent",
+            {
+                **decision_context["prompt_fields"],
+                "preferred_category": state.customer.preferred_category,
+                "description": state.event.description if state.event else "Customer inquiry",
+                "priority_level": state.priority_level,
+                "escalation_needed": baseline_escalation
+            },
+            decision_context["enhanced_context"]
+            + "\n\nADDITIONAL PERSONALIZATION CONTEXT (from real customer data):\n",
+            sections=personalization["sections"] + [
+                ContextSection("tone_guidelines", f"TONE GUIDELINES:\n{personalization['tone_guidelines']}", required=True)
+            ]
+        )
+        
+        # The message part is streamed to the caller's sink, if any
+        streamer = create_message_streamer("fused_agent")
+        try:
+            result = ModelRouter.invoke(self.llms, state, prompt, on_chunk=streamer)
+        
+        except Exception as e:
+            if streamer:
+                streamer.finish()
+            state.add_message(
+                "fused_agent",
+                f"Fused call failed ({str(e)}) - falling back to separate decision and empathy calls"
+            )
+            state.priority_level = previous_priority
+            state = self.decision_agent(state)
+            return self.empathy_agent(state)
+        
+        if streamer:
+            streamer.finish()
+        
+        # Deterministic business rules are applied locally, as in the 4-call pipeline
+        self.decision_agent.apply_decision(state, result, compliance_info, recommended_channels)
+        self.empathy_agent.apply_response(state, result, personalization["language_name"])
+        
+        state.metadata['pipeline_mode'] = 'fused'
+        state.add_message("fused_agent", "Decision and response generated in a single call")
+        
+        return state
+    
+    def __call__(self, state: AgentState) -> AgentState:
+        """Make the agent callable."""
+        return self.decide_and_respond(state)
+
+
+# Factory function for LangGraph
+def create_fused_agent(decision_agent: Optional[DecisionAgent] = None,
+                       empathy_agent: Optional[EmpathyAgent] = None):
+    """Create a fused decision+empathy agent instance."""
+    return FusedDecisionEmpathyAgent(decision_agent, empathy_agent)
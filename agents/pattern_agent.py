@@ -2,17 +2,31 @@
 Pattern Agent - Identifies patterns and predicts customer behavior.
 Enhanced with PROACTIVE prediction capabilities.
 """
-import json
-from typing import Dict, Any, List, Optional
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 
 from models import AgentState, EventType
-from config.prompts import SYSTEM_PROMPTS
 from config import settings
 from utils.data_analytics import DataAnalytics
-from utils.monitor import ProactiveMonitor, CustomerHealthScore
+from utils.llm_factory import create_tiered_chat_models
+from utils.prompt_builder import build_agent_prompt
+from utils.model_router import ModelRouter
+from utils.token_budget import ContextSection
+from utils.degradation import DegradationController
+from utils.monitor import ProactiveMonitor, CustomerHealthScore, intervention_window
+from utils.tracing import span
+
+
+PREFETCH_MAX_PENDING = 256  # Runs whose prefetched analytics were never joined are dropped beyond this
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=settings.PATTERN_PREFETCH_WORKERS, thread_name_prefix="pattern-prefetch")
 
 
 class PatternAgent:
@@ -23,68 +37,239 @@ class PatternAgent:
     - Provide historical insights
     - Recommend preventive actions
     - [NEW] PROACTIVE: Predict future behavior and optimal intervention timing
+    
+    The local analytics only read the customer and event, so `prefetch` starts
+    them on a thread pool when the run starts; they then run while the context
+    agent waits on its model call and are joined in `analyze_patterns`.
     """
     
+    # Prefetch statistics shared by all instances (one per workflow)
+    _stats_lock = threading.Lock()
+    prefetch_stats = {
+        "runs": 0,
+        "used": 0,
+        "computed_inline": 0,
+        "dropped": 0,
+        "cancelled": 0,
+        "background_s": 0.0,
+        "wait_s": 0.0
+    }
+    
     def __init__(self, model_name: str = None, temperature: float = 0.5):
         """Initialize the Pattern Agent."""
         self.model_name = model_name or settings.PATTERN_AGENT_MODEL
         self.temperature = temperature
         
         # Initialize LLM
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        self.llms = create_tiered_chat_models("pattern_agent", self.model_name, self.temperature)
+        self.llm = self.llms["large"]
         
         # Initialize data analytics for real pattern matching
         self.analytics = DataAnalytics()
         
         # Initialize proactive monitor for health scoring
         self.health_calculator = CustomerHealthScore()
+        
+        # Prefetched analytics by run (see prefetch)
+        self._prefetch_lock = threading.Lock()
+        self._prefetches: "OrderedDict[str, Dict[str, Future]]" = OrderedDict()
     
-    def _get_historical_context(self, state: AgentState) -> str:
+    def _get_historical_context(self, state: AgentState,
+                                data_sections: Optional[List[ContextSection]] = None) -> List[ContextSection]:
         """
         Get historical context for the customer using REAL dataset analysis.
+        
+        Args:
+            state: Current agent state
+            data_sections: Prefetched result of _get_customer_data_sections
+        
+        Returns:
+            Ranked sections for the `historical_context` prompt field
         """
+        sections = list(data_sections) if data_sections is not None else self._get_customer_data_sections(state)
+        
+        # Current state
         context_parts = []
+        context_parts.append(f"CURRENT SITUATION:")
+        context_parts.append(f"  - Urgency: {state.urgency_level}/5")
+        context_parts.append(f"  - Sentiment: {state.sentiment.value if state.sentiment else 'unknown'}")
+        context_parts.append(f"  - Risk score: {state.customer_risk_score:.2f}")
+        sections.append(ContextSection("current_situation", "\n".join(context_parts), 5,
+                                       field="historical_context", required=True))
+        
+        return sections
+    
+    def _get_customer_data_sections(self, state: AgentState) -> List[ContextSection]:
+        """Segment, cohort and category sections (customer data only)."""
+        sections = []
+        
+        def add_section(name: str, lines: List[str], priority: int, **kwargs):
+            sections.append(ContextSection(name, "\n".join(lines), priority, field="historical_context", **kwargs))
         
         # Get segment statistics from actual data
         segment_stats = self.analytics.get_segment_statistics(state.customer.segment)
         if segment_stats:
+            context_parts = []
             context_parts.append(f"SEGMENT ANALYSIS ({state.customer.segment}):")
             context_parts.append(f"  - Total {state.customer.segment} customers in database: {segment_stats['total_customers']}")
             context_parts.append(f"  - Average LTV for segment: ${segment_stats['avg_lifetime_value']:.2f}")
             context_parts.append(f"  - This customer's LTV: ${state.customer.lifetime_value:.2f}")
             context_parts.append(f"  - Segment represents {segment_stats['percentage_of_total']:.1f}% of customer base")
+            add_section("segment_analysis", context_parts, priority=2)
         
         # Compare with cohort (same segment + tier)
         cohort_comparison = self.analytics.compare_with_cohort(state.customer)
         if cohort_comparison:
-            context_parts.append(f"\nCOHORT COMPARISON ({state.customer.segment} + {state.customer.loyalty_tier}):")
+            context_parts = []
+            context_parts.append(f"COHORT COMPARISON ({state.customer.segment} + {state.customer.loyalty_tier}):")
             context_parts.append(f"  - Cohort size: {cohort_comparison['cohort_size']} customers")
             context_parts.append(f"  - Customer is at {cohort_comparison['customer_percentile']:.1f} percentile in cohort")
             if cohort_comparison['above_average']:
                 context_parts.append(f"  - ⚠️ Above average by ${cohort_comparison['ltv_difference']:.2f} (valuable customer)")
             else:
                 context_parts.append(f"  - Below average by ${abs(cohort_comparison['ltv_difference']):.2f}")
+            add_section("cohort_comparison", context_parts, priority=3)
         
         # Category insights
         category_insights = self.analytics.get_category_insights(state.customer.preferred_category)
         if category_insights:
-            context_parts.append(f"\nCATEGORY INSIGHTS ({state.customer.preferred_category}):")
+            context_parts = []
+            context_parts.append(f"CATEGORY INSIGHTS ({state.customer.preferred_category}):")
             context_parts.append(f"  - {category_insights['total_customers']} customers prefer this category")
             context_parts.append(f"  - Average LTV in category: ${category_insights['avg_lifetime_value']:.2f}")
+            add_section("category_insights", context_parts, priority=1)
         
-        # Current state
-        context_parts.append(f"\nCURRENT SITUATION:")
-        context_parts.append(f"  - Urgency: {state.urgency_level}/5")
-        context_parts.append(f"  - Sentiment: {state.sentiment.value if state.sentiment else 'unknown'}")
-        context_parts.append(f"  - Risk score: {state.customer_risk_score:.2f}")
+        return sections
+    
+    def prefetch(self, state: AgentState):
+        """
+        Start this run's local analytics on the prefetch pool.
+        
+        Called when the run starts; the work only reads the customer and
+        event, never the context agent's output.
+        
+        Args:
+            state: Agent state entering the workflow
+        """
+        if not settings.PATTERN_PREFETCH_ENABLED or not state.customer:
+            return
+        if DegradationController.stage_degraded(state, "pattern"):
+            return
+        
+        tasks: Dict[str, Callable[[], Any]] = {
+            "customer_data": lambda: self._get_customer_data_sections(state),
+            "similar_patterns": lambda: self._get_similar_patterns(state),
+            "similar_customers": lambda: self.analytics.find_similar_customers(state.customer, limit=3)
+        }
+        if state.event and getattr(state.event, 'is_proactive', False):
+            tasks["predictions"] = lambda: self.predict_future_behavior(state)
+        
+        run_id = uuid.uuid4().hex
+        state.metadata['prefetch_id'] = run_id
+        # Analytics spans stay in the run's trace
+        futures = {
+            name: _prefetch_executor.submit(contextvars.copy_context().run, self._timed, name, task)
+            for name, task in tasks.items()
+        }
         
-        return "\n".join(context_parts)
+        with self._prefetch_lock:
+            self._prefetches[run_id] = futures
+            while len(self._prefetches) > PREFETCH_MAX_PENDING:
+                _, stale = self._prefetches.popitem(last=False)
+                for future in stale.values():
+                    future.cancel()
+                self._count("dropped")
+        self._count("runs")
+    
+    def cancel_prefetch(self, state: AgentState):
+        """
+        Drop this run's prefetched analytics when the pattern stage will not run.
+        
+        Called when the run routes around the pattern stage or fails before it,
+        so the work stops and the entry does not hold the state until evicted.
+        """
+        prefetched = self._take_prefetch(state)
+        if not prefetched:
+            return
+        for future in prefetched.values():
+            future.cancel()
+        self._count("cancelled")
     
-    def _get_similar_patterns(self, state: AgentState) -> str:
+    @staticmethod
+    def _timed(name: str, task: Callable[[], Any]):
+        """Run a prefetch task, returning (result, seconds)."""
+        started = time.monotonic()
+        with span(f"analytics.{name}", prefetched=True):
+            result = task()
+        return result, time.monotonic() - started
+    
+    def _take_prefetch(self, state: AgentState) -> Dict[str, Future]:
+        """Remove and return the prefetched analytics of this run (empty if none)."""
+        run_id = state.metadata.pop('prefetch_id', None)
+        if not run_id:
+            return {}
+        with self._prefetch_lock:
+            return self._prefetches.pop(run_id, {})
+    
+    def _prefetched(self, prefetched: Dict[str, Future], name: str, compute: Callable[[], Any]) -> Any:
+        """
+        Join a prefetched result, or compute it inline if it was not prefetched or failed.
+        
+        Args:
+            prefetched: Futures from _take_prefetch
+            name: Prefetch task name
+            compute: Inline computation of the same result
+        """
+        future = prefetched.get(name)
+        if future is not None and not future.cancelled():
+            started = time.monotonic()
+            try:
+                result, background_s = future.result()
+            except Exception as e:
+                print(f"[WARN] Pattern prefetch '{name}' failed: {e}")
+            else:
+                with self._stats_lock:
+                    self.prefetch_stats["used"] += 1
+                    self.prefetch_stats["background_s"] += background_s
+                    self.prefetch_stats["wait_s"] += time.monotonic() - started
+                return result
+        
+        if settings.PATTERN_PREFETCH_ENABLED:
+            self._count("computed_inline")
+        with span(f"analytics.{name}", prefetched=False):
+            return compute()
+    
+    @classmethod
+    def _count(cls, key: str):
+        """Increment a prefetch statistic."""
+        with cls._stats_lock:
+            cls.prefetch_stats[key] += 1
+    
+    @classmethod
+    def get_prefetch_stats(cls) -> Dict[str, Any]:
+        """
+        Report how much local analytics time was hidden behind model calls.
+        
+        Returns:
+            Counts plus background analytics time, time the pattern stage
+            still waited for it, and the hidden share
+        """
+        with cls._stats_lock:
+            stats = dict(cls.prefetch_stats)
+        
+        stats["hidden_s"] = round(max(0.0, stats["background_s"] - stats["wait_s"]), 3)
+        stats["hidden_ratio"] = stats["hidden_s"] / stats["background_s"] if stats["background_s"] else 0.0
+        stats["background_s"] = round(stats["background_s"], 3)
+        stats["wait_s"] = round(stats["wait_s"], 3)
+        return stats
+    
+    @classmethod
+    def reset_prefetch_stats(cls):
+        """Clear prefetch statistics."""
+        with cls._stats_lock:
+            cls.prefetch_stats = {key: 0.0 if key.endswith("_s") else 0 for key in cls.prefetch_stats}
+    
+    def _get_similar_patterns(self, state: AgentState) -> List[ContextSection]:
         """
         🎯 DUAL-LAYER PATTERN MATCHING (ENHANCED!)
         
@@ -93,13 +278,22 @@ class PatternAgent:
         
         This gives us BOTH "who else is like this customer" AND 
         "how did we solve this type of problem before"
+        
+        Returns:
+            Ranked sections for the `similar_patterns` prompt field
+            (issue-level evidence outranks general segment/event notes)
         """
-        patterns = []
+        sections = []
+        
+        def add_section(name: str, lines: List[str], priority: int):
+            # Keep the banner and summary line when compacted
+            sections.append(ContextSection(name, "\n".join(lines), priority, field="similar_patterns", min_lines=4))
         
         # ========== LAYER 1: SIMILAR CUSTOMERS ==========
         similar_customers = self.analytics.find_similar_customers(state.customer, limit=5)
         
         if similar_customers:
+            patterns = []
             patterns.append("=" * 70)
             patterns.append("🔍 LAYER 1: SIMILAR CUSTOMER PROFILES")
             patterns.append("=" * 70)
@@ -111,6 +305,7 @@ class PatternAgent:
                 patterns.append(f"    - LTV: ${similar['lifetime_value']:.2f}, {similar['loyalty_tier']} tier")
                 patterns.append(f"    - Similarity: {similar['similarity_score']:.2%}")
                 patterns.append(f"    - Match reasons: {', '.join(similar['similarity_reasons'][:2])}\n")
+            add_section("similar_customers", patterns, priority=3)
         
         # ========== LAYER 2: SIMILAR ISSUES (NEW!) ==========
         if state.event:
@@ -126,7 +321,8 @@ class PatternAgent:
             )
             
             if similar_issues:
-                patterns.append("\n" + "=" * 70)
+                patterns = []
+                patterns.append("=" * 70)
                 patterns.append("🎯 LAYER 2: SIMILAR HISTORICAL ISSUES (INTELLIGENT MATCHING!)")
                 patterns.append("=" * 70)
                 patterns.append(f"Found {len(similar_issues)} similar past issues in support tickets:\n")
@@ -139,6 +335,7 @@ class PatternAgent:
                     patterns.append(f"    - Resolution: {str(issue['resolution'])[:60]}...")
                     patterns.append(f"    - Outcome: {issue['csat_score']:.1f}/5 CSAT ({issue['effectiveness']})")
                     patterns.append(f"    - Keywords matched: {', '.join(issue['matched_keywords'][:3])}\n")
+                add_section("similar_issues", patterns, priority=4)
                 
                 # ========== RESOLUTION EFFECTIVENESS ANALYSIS ==========
                 effectiveness = self.analytics.get_resolution_effectiveness_analysis(
@@ -146,7 +343,8 @@ class PatternAgent:
                     state.customer.segment
                 )
                 
-                patterns.append("\n" + "=" * 70)
+                patterns = []
+                patterns.append("=" * 70)
                 patterns.append("📊 RESOLUTION EFFECTIVENESS ANALYSIS")
                 patterns.append("=" * 70)
                 patterns.append(f"Historical Success Rate:")
@@ -176,26 +374,32 @@ class PatternAgent:
                             f"  ✗ {ap['resolution']} "
                             f"(resulted in {ap['csat']:.1f}/5 CSAT for {ap['segment']})"
                         )
+                add_section("resolution_effectiveness", patterns, priority=4)
             else:
-                patterns.append("\n" + "=" * 70)
+                patterns = []
+                patterns.append("=" * 70)
                 patterns.append("🎯 LAYER 2: SIMILAR HISTORICAL ISSUES")
                 patterns.append("=" * 70)
                 patterns.append("  No directly matching historical issues found.")
                 patterns.append("  Using general best practices for this event type.\n")
+                add_section("similar_issues", patterns, priority=4)
         
         # ========== SEGMENT BEHAVIORAL PATTERNS ==========
         segment_patterns = self.analytics.get_segment_behavioral_patterns(state.customer.segment)
         if segment_patterns:
-            patterns.append("\n" + "=" * 70)
+            patterns = []
+            patterns.append("=" * 70)
             patterns.append(f"📈 SEGMENT BEHAVIORAL PATTERNS ({state.customer.segment})")
             patterns.append("=" * 70)
             for pattern in segment_patterns:
                 patterns.append(f"  - {pattern}")
+            add_section("segment_patterns", patterns, priority=2)
         
         # ========== EVENT TYPE INSIGHTS ==========
         if state.event:
             event_type = state.event.event_type.value
-            patterns.append(f"\n" + "=" * 70)
+            patterns = []
+            patterns.append("=" * 70)
             patterns.append(f"💡 GENERAL EVENT TYPE INSIGHTS ({event_type})")
             patterns.append("=" * 70)
             if "delay" in event_type.lower() or "delivery" in event_type.lower():
@@ -214,8 +418,9 @@ class PatternAgent:
                 patterns.append("  - Questions indicate engagement - positive signal")
                 patterns.append("  - Helpful responses drive future purchases")
                 patterns.append("  - Upsell opportunity if handled well")
+            add_section("event_type_insights", patterns, priority=1)
         
-        return "\n".join(patterns)
+        return sections
     
     def predict_future_behavior(self, state: AgentState) -> Dict[str, Any]:
         """
@@ -333,41 +538,10 @@ class PatternAgent:
                                       order_stats: Dict[str, Any]) -> Dict[str, Any]:
         """
         Calculate optimal time window for proactive intervention.
-        Enhanced with order patterns and engagement data.
+        Enhanced with order patterns and engagement data (shared with the
+        scan's InterventionScheduler, see utils.monitor.intervention_window).
         """
-        # Get days since last order if available
-        days_since_order = order_stats.get('days_since_last_order') if order_stats else None
-        
-        # Adjust urgency based on churn risk and engagement
-        if churn_risk >= 0.7:
-            urgency_msg = "Act within 7 days to prevent churn"
-            if customer.is_inactive and days_since_order and days_since_order > 60:
-                urgency_msg = f"CRITICAL: Customer inactive for {customer.days_since_active} days, last order {days_since_order} days ago"
-            
-            return {
-                "start_days": 0,
-                "end_days": 7,
-                "urgency": "immediate",
-                "message": urgency_msg
-            }
-        elif churn_risk >= 0.5:
-            urgency_msg = "Reach out within 2-3 weeks"
-            if days_since_order and days_since_order > 30:
-                urgency_msg = f"Customer hasn't ordered in {days_since_order} days - re-engagement needed"
-            
-            return {
-                "start_days": 7,
-                "end_days": 21,
-                "urgency": "soon",
-                "message": urgency_msg
-            }
-        else:
-            return {
-                "start_days": 21,
-                "end_days": 60,
-                "urgency": "normal",
-                "message": "Monitor and engage within 2 months"
-            }
+        return intervention_window(churn_risk, customer, order_stats)
     
     def _get_proactive_recommendations(
         self, 
@@ -467,17 +641,20 @@ class PatternAgent:
         
         return recommendations
     
-    def generate_proactive_insights(self, state: AgentState) -> str:
+    def generate_proactive_insights(self, state: AgentState,
+                                    predictions: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate comprehensive proactive insights for the customer.
         
         Args:
             state: Current agent state
+            predictions: Result of predict_future_behavior, if already computed
             
         Returns:
             Formatted string with proactive insights
         """
-        predictions = self.predict_future_behavior(state)
+        if predictions is None:
+            predictions = self.predict_future_behavior(state)
         
         if not predictions:
             return "Unable to generate proactive insights"
@@ -519,40 +696,45 @@ class PatternAgent:
         Returns:
             Updated state with pattern analysis
         """
+        # Join the analytics prefetched at run start (also drops them on early exit)
+        prefetched = self._take_prefetch(state)
+        
         if not state.customer or not state.context_summary:
             state.add_message("pattern_agent", "Error: Missing context data")
             return state
         
-        # Get historical data
-        historical_context = self._get_historical_context(state)
-        similar_patterns = self._get_similar_patterns(state)
+        # Under load the data-driven churn analysis stands in for the LLM
+        if DegradationController.stage_degraded(state, "pattern"):
+            self._apply_data_driven_analysis(state, "Degraded mode - using data-driven churn calculation")
+            state.metadata['pattern_mode'] = 'rules'
+            state.add_message(
+                "pattern_agent",
+                f"Pattern analysis (rules, degraded mode): Churn risk={state.predicted_churn_risk:.2f}"
+            )
+            return state
+        
+        # Get historical data as ranked sections (fitted to the token budget)
+        sections = self._get_historical_context(
+            state, self._prefetched(prefetched, "customer_data", lambda: self._get_customer_data_sections(state))
+        ) + self._prefetched(prefetched, "similar_patterns", lambda: self._get_similar_patterns(state))
         
         # Prepare prompt
-        prompt_text = SYSTEM_PROMPTS["pattern_agent"].format(
-            customer_name=state.customer.full_name,
-            segment=state.customer.segment,
-            loyalty_tier=state.customer.loyalty_tier,
-            lifetime_value=state.customer.lifetime_value,
-            event_type=state.event.event_type.value if state.event else "unknown",
-            sentiment=state.sentiment.value if state.sentiment else "unknown",
-            urgency_level=state.urgency_level or 3,
-            risk_score=state.customer_risk_score or 0.5,
-            historical_context=historical_context,
-            similar_patterns=similar_patterns
-        )
+        prompt = build_agent_prompt("pattern_agent", {
+            "customer_name": state.customer.full_name,
+            "segment": state.customer.segment,
+            "loyalty_tier": state.customer.loyalty_tier,
+            "lifetime_value": state.customer.lifetime_value,
+            "event_type": state.event.event_type.value if state.event else "unknown",
+            "sentiment": state.sentiment.value if state.sentiment else "unknown",
+            "urgency_level": state.urgency_level or 3,
+            "risk_score": state.customer_risk_score or 0.5,
+            "historical_context": "",
+            "similar_patterns": ""
+        }, sections=sections)
         
         # Get response from LLM
         try:
-            response = self.llm.invoke(prompt_text)
-            content = response.content
-            
-            # Extract JSON from markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            result = json.loads(content)
+            result = ModelRouter.invoke(self.llms, state, prompt)
             
             # Calculate churn risk using REAL data analytics
             data_driven_churn_risk = self.analytics.calculate_churn_risk(state.customer, state)
@@ -564,7 +746,10 @@ class PatternAgent:
             state.historical_insights = result.get("historical_insights", "")
             
             # Store similar patterns with actual customer data
-            similar_customers = self.analytics.find_similar_customers(state.customer, limit=3)
+            similar_customers = self._prefetched(
+                prefetched, "similar_customers",
+                lambda: self.analytics.find_similar_customers(state.customer, limit=3)
+            )
             state.similar_patterns = [{
                 "pattern_summary": result.get("pattern_summary", ""),
                 "preventive_recommendations": result.get("preventive_recommendations", []),
@@ -582,11 +767,11 @@ class PatternAgent:
             
             # ADD PROACTIVE PREDICTIONS for proactive events
             if state.event and hasattr(state.event, 'is_proactive') and state.event.is_proactive:
-                proactive_insights = self.generate_proactive_insights(state)
+                predictions = self._prefetched(prefetched, "predictions", lambda: self.predict_future_behavior(state))
+                proactive_insights = self.generate_proactive_insights(state, predictions)
                 state.add_message("pattern_agent", f"Proactive predictions generated:\n{proactive_insights}")
                 
                 # Store proactive predictions in similar_patterns for later use
-                predictions = self.predict_future_behavior(state)
                 if state.similar_patterns:
                     state.similar_patterns[0]['proactive_predictions'] = predictions
             
@@ -596,17 +781,21 @@ class PatternAgent:
                 f"Error during pattern analysis: {str(e)}"
             )
             # Use data-driven fallback even if LLM fails
-            state.predicted_churn_risk = self.analytics.calculate_churn_risk(state.customer, state)
-            state.historical_insights = "LLM analysis failed - using data-driven churn calculation"
-            
-            similar_customers = self.analytics.find_similar_customers(state.customer, limit=3)
-            state.similar_patterns = [{
-                "pattern_summary": "Fallback analysis",
-                "similar_customers_count": len(similar_customers)
-            }]
+            self._apply_data_driven_analysis(state, "LLM analysis failed - using data-driven churn calculation")
         
         return state
     
+    def _apply_data_driven_analysis(self, state: AgentState, insights: str):
+        """Fill the pattern fields from data analytics alone (no LLM)."""
+        state.predicted_churn_risk = self.analytics.calculate_churn_risk(state.customer, state)
+        state.historical_insights = insights
+        
+        similar_customers = self.analytics.find_similar_customers(state.customer, limit=3)
+        state.similar_patterns = [{
+            "pattern_summary": "Fallback analysis",
+            "similar_customers_count": len(similar_customers)
+        }]
+    
     def __call__(self, state: AgentState) -> AgentState:
         """Make the agent callable."""
         return self.analyze_patterns(state)
@@ -0,0 +1,273 @@
+"""
+Speculative Decision + Empathy Agent - Drafts the customer message while the decision is made.
+The draft is written for the predicted decision and kept only if the actual decision matches.
+"""
+import contextvars
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from models import AgentState
+from config import settings
+from utils.streaming import stream_sink
+from utils.degradation import DegradationController
+from utils.message_cache import ACTION_DESCRIPTIONS, DISCOUNT_PLACEHOLDER, decision_class
+from .decision_agent import DecisionAgent
+from .empathy_agent import EmpathyAgent
+
+
+_executor = ThreadPoolExecutor(max_workers=settings.SPECULATIVE_WORKERS, thread_name_prefix="speculative-empathy")
+
+
+class SpeculativeDecisionEmpathyAgent:
+    """
+    Runs the Decision (Niti) and Empathy (Karuna) stages concurrently.
+    
+    The likely decision is predicted from the churn risk of the pattern
+    analysis and the decision agent's deterministic escalation rules:
+    - no incentive for low churn risk
+    - a small auto-approved discount for moderate churn risk
+    - high churn risk or a baseline escalation is not speculated on
+    
+    The empathy draft for the prediction runs on a copy of the state while
+    the decision call runs. It is kept if the decision has the same action
+    class and discount bucket (the actual percentage is filled into the
+    draft's {DISCOUNT_PCT} placeholder); otherwise the message is
+    regenerated from the actual decision.
+    """
+    
+    # Speculation outcomes shared by all instances (one per workflow)
+    _stats_lock = threading.Lock()
+    speculation_stats = {
+        "runs": 0,
+        "speculated": 0,
+        "hits": 0,
+        "misses": 0,
+        "skipped": {},
+        "miss_reasons": {},
+        "saved_s": 0.0,
+        "wasted_draft_s": 0.0
+    }
+    
+    def __init__(self, decision_agent: Optional[DecisionAgent] = None,
+                 empathy_agent: Optional[EmpathyAgent] = None):
+        """Initialize the Speculative Agent."""
+        self.decision_agent = decision_agent or DecisionAgent()
+        self.empathy_agent = empathy_agent or EmpathyAgent()
+        self.escalation_tracker = self.decision_agent.escalation_tracker
+    
+    def predict_decision(self, state: AgentState) -> Tuple[Optional[Tuple[str, str]], Optional[str]]:
+        """
+        Predict the decision class from upstream analysis.
+        
+        Args:
+            state: Agent state after context and pattern analysis
+            
+        Returns:
+            Tuple of (predicted class, None) or (None, reason speculation is skipped)
+        """
+        if DegradationController.stage_degraded(state, "empathy"):
+            return None, "empathy_degraded"
+        if self.decision_agent._should_escalate(state):
+            return None, "escalation_likely"
+        
+        churn_risk = state.predicted_churn_risk or 0.0
+        if churn_risk >= settings.SPECULATIVE_MAX_CHURN_RISK:
+            return None, "high_churn_risk"
+        
+        if churn_risk < settings.SPECULATIVE_OFFER_MIN_CHURN:
+            return ("engagement", "none"), None
+        return ("retention_offer", "auto"), None
+    
+    def _draft(self, draft: AgentState, predicted: Tuple[str, str]) -> Tuple[AgentState, float]:
+        """Generate the message for the predicted decision on a copy of the state (not streamed)."""
+        started = time.monotonic()
+        draft.recommended_action = ACTION_DESCRIPTIONS[predicted[0]]
+        draft.priority_level = self.decision_agent._determine_priority(draft)
+        draft.escalation_needed = False
+        
+        discount_info = None
+        if predicted[1] == "auto":
+            discount_info = self.empathy_agent.describe_discount(DISCOUNT_PLACEHOLDER, True) + (
+                f". Write the percentage exactly as the placeholder {DISCOUNT_PLACEHOLDER} - it is filled in later"
+            )
+        
+        with stream_sink(None):
+            draft = self.empathy_agent.generate_response(draft, discount_info=discount_info)
+        return draft, time.monotonic() - started
+    
+    def _draft_miss_reason(self, state: AgentState, draft: AgentState,
+                           predicted: Tuple[str, str]) -> Optional[str]:
+        """Why the draft cannot be used for the actual decision, or None if it can."""
+        if decision_class(state) != predicted:
+            return "decision_mismatch"
+        if state.metadata.get('decision_fallback'):
+            return "decision_fallback"
+        if draft.metadata.get('empathy_mode') or not draft.personalized_response:
+            return "draft_failed"
+        if predicted[1] == "auto" and DISCOUNT_PLACEHOLDER not in draft.personalized_response:
+            return "placeholder_missing"
+        return None
+    
+    def decide_and_respond(self, state: AgentState) -> AgentState:
+        """
+        Make the decision while the message is drafted in parallel.
+        
+        Args:
+            state: Current agent state with context and pattern analysis
+            
+        Returns:
+            Updated state with decision and personalized response
+        """
+        if not state.customer or not state.context_summary:
+            state.add_message("speculative_agent", "Error: Missing required data")
+            return state
+        
+        # Customer already with a human agent - no automated decision or message
+        if self.decision_agent.check_active_escalation(state):
+            return state
+        
+        self._count("runs")
+        predicted, skip_reason = self.predict_decision(state)
+        if predicted is None:
+            self._count_reason("skipped", skip_reason)
+            state.metadata['speculation'] = {"outcome": "skipped", "reason": skip_reason, "saved_s": 0.0}
+            state = self.decision_agent(state)
+            return self.empathy_agent(state)
+        
+        self._count("speculated")
+        started = time.monotonic()
+        # The decision agent mutates `state` while the draft runs, so the draft gets its own copy
+        context = contextvars.copy_context()
+        future = _executor.submit(context.run, self._draft, copy.deepcopy(state), predicted)
+        
+        state = self.decision_agent(state)
+        decision_s = time.monotonic() - started
+        
+        # The draft only needs to be awaited if the decision can use it
+        if decision_class(state) != predicted:
+            future.add_done_callback(self._record_wasted_draft)
+            return self._miss(state, predicted, "decision_mismatch")
+        
+        try:
+            draft, draft_s = future.result()
+        except Exception as e:
+            state.add_message("speculative_agent", f"Speculative draft failed: {str(e)}")
+            return self._miss(state, predicted, "draft_failed")
+        
+        miss_reason = self._draft_miss_reason(state, draft, predicted)
+        if miss_reason:
+            self._add_wasted(draft_s)
+            return self._miss(state, predicted, miss_reason)
+        
+        if state.discount_applied:
+            draft.personalized_response = draft.personalized_response.replace(
+                DISCOUNT_PLACEHOLDER, f"{state.discount_applied:g}"
+            )
+        state.personalized_response = draft.personalized_response
+        state.tone = draft.tone
+        state.empathy_score = draft.empathy_score
+        
+        # Sequential pipeline would have taken decision + empathy back to back
+        saved_s = max(0.0, decision_s + draft_s - (time.monotonic() - started))
+        with self._stats_lock:
+            self.speculation_stats["hits"] += 1
+            self.speculation_stats["saved_s"] += saved_s
+        
+        state.metadata['speculation'] = {
+            "outcome": "hit",
+            "predicted": "/".join(predicted),
+            "saved_s": round(saved_s, 3)
+        }
+        state.metadata['pipeline_mode'] = 'speculative'
+        state.add_message(
+            "empathy_agent",
+            f"Response generated: Empathy score={state.empathy_score:.2f}, "
+            f"Tone={state.tone} (speculative draft, {saved_s:.2f}s saved)"
+        )
+        return state
+    
+    def _miss(self, state: AgentState, predicted: Tuple[str, str], reason: str) -> AgentState:
+        """Discard the draft and generate the message for the actual decision."""
+        self._count("misses")
+        self._count_reason("miss_reasons", reason)
+        state.metadata['speculation'] = {
+            "outcome": "miss",
+            "reason": reason,
+            "predicted": "/".join(predicted),
+            "actual": "/".join(decision_class(state)),
+            "saved_s": 0.0
+        }
+        state.metadata['pipeline_mode'] = 'speculative'
+        return self.empathy_agent(state)
+    
+    @classmethod
+    def _record_wasted_draft(cls, future):
+        """Count the model time spent on a draft that was not used."""
+        if not future.exception():
+            cls._add_wasted(future.result()[1])
+    
+    @classmethod
+    def _add_wasted(cls, seconds: float):
+        """Add discarded draft time."""
+        with cls._stats_lock:
+            cls.speculation_stats["wasted_draft_s"] += seconds
+    
+    @classmethod
+    def _count(cls, key: str):
+        """Increment a speculation statistic."""
+        with cls._stats_lock:
+            cls.speculation_stats[key] += 1
+    
+    @classmethod
+    def _count_reason(cls, key: str, reason: str):
+        """Increment a skip or miss reason."""
+        with cls._stats_lock:
+            reasons = cls.speculation_stats[key]
+            reasons[reason] = reasons.get(reason, 0) + 1
+    
+    @classmethod
+    def get_speculation_stats(cls) -> Dict[str, Any]:
+        """
+        Report how often the speculative draft was used.
+        
+        Returns:
+            Counts plus hit rate over speculated runs, total and mean latency
+            saved per hit, and model time spent on discarded drafts
+        """
+        with cls._stats_lock:
+            stats = copy.deepcopy(cls.speculation_stats)
+        
+        stats["hit_rate"] = stats["hits"] / stats["speculated"] if stats["speculated"] else None
+        stats["avg_saved_s"] = round(stats["saved_s"] / stats["hits"], 3) if stats["hits"] else 0.0
+        stats["saved_s"] = round(stats["saved_s"], 3)
+        stats["wasted_draft_s"] = round(stats["wasted_draft_s"], 3)
+        return stats
+    
+    @classmethod
+    def reset(cls):
+        """Clear statistics."""
+        with cls._stats_lock:
+            cls.speculation_stats = {
+                "runs": 0,
+                "speculated": 0,
+                "hits": 0,
+                "misses": 0,
+                "skipped": {},
+                "miss_reasons": {},
+                "saved_s": 0.0,
+                "wasted_draft_s": 0.0
+            }
+    
+    def __call__(self, state: AgentState) -> AgentState:
+        """Make the agent callable."""
+        return self.decide_and_respond(state)
+
+
+# Factory function for LangGraph
+def create_speculative_agent(decision_agent: Optional[DecisionAgent] = None,
+                             empathy_agent: Optional[EmpathyAgent] = None):
+    """Create a speculative decision+empathy agent instance."""
+    return SpeculativeDecisionEmpathyAgent(decision_agent, empathy_agent)
@@ -5,15 +5,19 @@ import sys
 import json
 import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils import ProactiveMonitor, DataAnalytics, EscalationTracker, MemoryHandler
-from workflows import create_cx_workflow, run_workflow, stream_workflow
+from utils import ProactiveMonitor, DataAnalytics, EscalationTracker, MemoryHandler, PromptStats, ParseStats, CallGuard, DegradationController
+from utils import TrafficScheduler, traffic_priority, classify_traffic, ModelRouter, StreamStats, stream_sink
+from utils import MessageSkeletonCache, ScanCheckpointStore, SpanStats, InterventionScheduler, ScanBudget
+from workflows import create_cx_workflow, run_workflow, run_workflow_batch
 from models import AgentState, CustomerEvent, EventType, Customer
+from agents import ContextAgent, PatternAgent, SpeculativeDecisionEmpathyAgent
 from config import settings
 import pandas as pd
 
@@ -37,6 +41,7 @@ monitor = ProactiveMonitor()
 analytics = DataAnalytics()
 escalation_tracker = EscalationTracker()
 memory_handler = MemoryHandler()
+intervention_scheduler = InterventionScheduler(analytics)
 workflow = create_cx_workflow()
 
 print("✅ ProCX Backend ready")
@@ -301,8 +306,9 @@ def process_single_customer(customer_id):
         # Create event
         event = create_proactive_event(customer, alert)
         
-        # Process through agents
-        intervention = run_agents_with_tracking(customer, event, alert)
+        # Process through agents (interactive traffic goes ahead of running scans)
+        with traffic_priority(classify_traffic(customer, alert, interactive=True)):
+            intervention = run_agents_with_tracking(customer, event, alert)
         
         return jsonify({
             'success': True,
@@ -338,10 +344,19 @@ def trigger_proactive_scan():
         data = request.json or {}
         max_customers = data.get('maxCustomers', 10)  # Process 10 customers
         min_risk = data.get('riskThreshold', 0.7)
+        resume = data.get('resume')  # Scan ID, or true for the most recent incomplete scan
+        if resume is True:
+            resume = 'latest'
+        # Optional hard limits (0 = unlimited; omitted = SCAN_TOKEN_BUDGET / SCAN_COST_BUDGET / SCAN_DEADLINE_S)
+        budget = ScanBudget(
+            max_tokens=data.get('tokenBudget'),
+            max_cost=data.get('costBudget'),
+            deadline_s=data.get('deadlineSeconds')
+        )
         
         thread = threading.Thread(
             target=run_proactive_scan_with_agents,
-            args=(max_customers, min_risk),
+            args=(max_customers, min_risk, resume, budget if budget.limited else None),
             daemon=True
         )
         thread.start()
@@ -353,15 +368,29 @@ def trigger_proactive_scan():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def run_proactive_scan_with_agents(max_customers, min_risk):
+def run_proactive_scan_with_agents(max_customers, min_risk, resume=None, budget=None):
     global recent_interventions, recent_events, agent_history
     
     try:
+        # A resumed scan keeps its customers; each restarts from its last completed stage
+        checkpoints = None
+        if resume:
+            checkpoints = ScanCheckpointStore.latest_incomplete() if resume == 'latest' else ScanCheckpointStore.open(resume)
+            if checkpoints is None:
+                print(f"[WARN] No scan checkpoint to resume ({resume}) - starting a new scan")
+            else:
+                params = checkpoints.manifest['params']
+                max_customers = params['max_interventions']
+                min_risk = params['min_churn_risk']
+        
         # Emit scan started
         socketio.emit('scan_started', {
             'timestamp': datetime.now().isoformat(),
             'maxCustomers': max_customers,
-            'riskThreshold': min_risk
+            'riskThreshold': min_risk,
+            'scanId': checkpoints.scan_id if checkpoints else None,
+            'resumed': checkpoints is not None,
+            'budget': budget.report()['limits'] if budget else None
         })
         
         # Detect at-risk customers - SAME as CLI dashboard
@@ -372,63 +401,253 @@ def run_proactive_scan_with_agents(max_customers, min_risk):
             'timestamp': datetime.now().isoformat()
         })
         
-        # Process each customer
+        # Customers already with a human agent never enter the agent queue
+        # (a resumed scan keeps its own customers; the workflow gate handles escalations)
+        scanned_alerts = alerts
+        alerts, handled_alerts = monitor.split_escalated_alerts(alerts)
+        for alert in handled_alerts:
+            mark_customer_handled(alert['customer'], alert['escalation']['reason'])
+        
+        if checkpoints is not None:
+            scanned_by_id = {alert['customer'].customer_id: alert for alert in scanned_alerts}
+            finished = checkpoints.completed_customers()
+            scan_alerts = [
+                scanned_by_id[customer_id] for customer_id in checkpoints.manifest['customer_ids']
+                if customer_id in scanned_by_id and customer_id not in finished
+            ]
+            print(f"[RESUME] Scan {checkpoints.scan_id}: {len(finished)} customers already completed, "
+                  f"{len(scan_alerts)} to resume")
+        elif settings.INTERVENTION_SCHEDULER_ENABLED:
+            # Most value at risk with the nearest window deadline first; the rest wait for a later scan
+            scan_alerts, deferred_alerts = intervention_scheduler.plan(alerts, max_customers)
+            socketio.emit('customers_scheduled', {
+                'scheduled': len(scan_alerts),
+                'deferred': len(deferred_alerts),
+                'deferredDue': sum(1 for alert in deferred_alerts if alert['schedule']['due']),
+                'timestamp': datetime.now().isoformat()
+            })
+        else:
+            scan_alerts = alerts[:max_customers]
+        
+        if checkpoints is None and settings.SCAN_CHECKPOINTS_ENABLED:
+            checkpoints = ScanCheckpointStore.create(
+                {'min_churn_risk': min_risk, 'max_interventions': max_customers},
+                [alert['customer'].customer_id for alert in scan_alerts]
+            )
+            print(f"[CHECKPOINT] Scan {checkpoints.scan_id}")
+        
+        # Each customer is reported to the dashboard as soon as its run finishes
         completed_customers = []
-        for i, alert in enumerate(alerts[:max_customers], 1):
-            customer = alert['customer']
+        for entry in iter_scan_results(scan_alerts, checkpoints, budget):
+            customer = entry['customer']
+            completed_customers.append(f"{customer.first_name} {customer.last_name}")
+            if entry['result'] is None:
+                continue  # Contacted recently (customer_skipped already emitted)
+            
+            # Save intervention (None = already handled by a human)
+            intervention_data = entry['intervention']
+            if intervention_data:
+                recent_interventions.insert(0, intervention_data)
+                if len(recent_interventions) > 50:
+                    recent_interventions.pop()
+                
+                socketio.emit('intervention_complete', intervention_data)
             
             # Emit queue status showing: completed, processing, queued
-            remaining_alerts = alerts[i:max_customers]
-            queued_names = [f"{a['customer'].first_name} {a['customer'].last_name}" for a in remaining_alerts[:3]]
+            processing = entry['processing']
+            queued_alerts = [] if budget and budget.stop_reason else scan_alerts[len(completed_customers) + len(processing):]
+            DegradationController.report_queue_depth(len(processing) + len(queued_alerts))
             
             socketio.emit('customer_queue_status', {
-                'completed': completed_customers[-1] if completed_customers else None,
-                'processing': f"{customer.first_name} {customer.last_name}",
-                'queued': queued_names,
-                'queuedCount': len(remaining_alerts)
-            })
-            
-            socketio.emit('customer_started', {
-                'index': i,
-                'total': min(max_customers, len(alerts)),
-                'customerId': customer.customer_id,
-                'customerName': f"{customer.first_name} {customer.last_name}",
-                'healthScore': int(alert['health_score'] * 100),
-                'churnRisk': int(alert['churn_risk'] * 100)
+                'completed': completed_customers[-1],
+                'processing': ", ".join(processing) or None,
+                'queued': [f"{a['customer'].first_name} {a['customer'].last_name}" for a in queued_alerts[:3]],
+                'queuedCount': len(queued_alerts)
             })
-            
-            # Create event
-            event = create_proactive_event(customer, alert)
-            
-            # Run through agents with tracking
-            intervention_data = run_agents_with_tracking(customer, event, alert)
-            
-            # Save intervention
-            recent_interventions.insert(0, intervention_data)
-            if len(recent_interventions) > 50:
-                recent_interventions.pop()
-            
-            socketio.emit('intervention_complete', intervention_data)
-            
-            # Add to completed list
-            completed_customers.append(f"{customer.first_name} {customer.last_name}")
-            
-            time.sleep(0.5)  # Small delay for visual effect
+        
+        DegradationController.report_queue_depth(0)
+        if checkpoints:
+            progress = checkpoints.get_progress()
+            if progress['completed'] == progress['customers']:
+                checkpoints.complete()
+        
+        budget_report = budget.finish() if budget else None
+        if budget_report:
+            print(f"[BUDGET] {budget_report['processed']} processed, {budget_report['deferred']} deferred "
+                  f"({budget_report['stop_reason'] or 'within budget'})")
         
         socketio.emit('scan_complete', {
             'timestamp': datetime.now().isoformat(),
-            'processed': min(max_customers, len(alerts))
+            'processed': len(scan_alerts) - budget_report['deferred'] if budget_report else len(scan_alerts),
+            'deferred': budget_report['deferred'] if budget_report else 0,
+            'budget': budget_report,
+            'scanId': checkpoints.scan_id if checkpoints else None
         })
         
     except Exception as e:
         print(f"Error in run_proactive_scan_with_agents: {e}")
+        DegradationController.report_queue_depth(0)
         import traceback
         traceback.print_exc()
         socketio.emit('scan_error', {'error': str(e)})
 
+def iter_scan_results(scan_alerts, checkpoints=None, budget=None, compact=None):
+    """Yield each scan customer as its run finishes (reported, checkpointed, then compacted per SCAN_COMPACT_RESULTS):
+    {customer, alert, result (None = contacted recently), intervention, processing (names still in flight)}"""
+    compact = settings.SCAN_COMPACT_RESULTS if compact is None else compact
+    total = len(scan_alerts)
+    alerts_by_id = {alert['customer'].customer_id: (i, alert) for i, alert in enumerate(scan_alerts, 1)}
+    running = {}
+    running_lock = threading.Lock()
+    skipped = []  # Contacted recently: yielded before the next finished run
+    
+    def initial_states():
+        for alert in scan_alerts:
+            customer = alert['customer']
+            # Over budget: runs in flight finish, the remaining customers are deferred
+            if budget and not budget.admit(customer.customer_id):
+                continue
+            event = create_proactive_event(customer, alert)
+            initial_state = begin_agent_run(customer, event)
+            if initial_state is None:
+                if budget:
+                    budget.release(customer.customer_id)
+                if checkpoints:
+                    checkpoints.complete_customer(customer.customer_id, 'skipped')
+                skipped.append({'customer': customer, 'alert': alert, 'result': None, 'intervention': None})
+                continue
+            yield checkpoints.attach(initial_state) if checkpoints else initial_state
+    
+    @contextmanager
+    def run_context(state):
+        customer = state.customer
+        i, alert = alerts_by_id[customer.customer_id]
+        with running_lock:
+            running[customer.customer_id] = f"{customer.first_name} {customer.last_name}"
+        socketio.emit('customer_started', {
+            'index': i,
+            'total': total,
+            'customerId': customer.customer_id,
+            'customerName': f"{customer.first_name} {customer.last_name}",
+            'healthScore': int(alert['health_score'] * 100),
+            'churnRisk': int(alert['churn_risk'] * 100)
+        })
+        
+        # VIP/critical customers ahead of bulk; message streamed while generated
+        with traffic_priority(classify_traffic(customer, alert)), \
+                stream_sink(create_message_stream_emitter(customer)):
+            if budget:
+                with budget.meter(customer.customer_id):
+                    yield
+            else:
+                yield
+    
+    def on_step(node, state):
+        emit_agent_progress(node, state, alerts_by_id[state.customer.customer_id][1])
+    
+    # With a budget, customers are admitted only when a worker is about to take them
+    for result in run_workflow_batch(workflow, initial_states(), run_context=run_context, on_step=on_step,
+                                     queue_size=settings.BATCH_WORKERS if budget else None):
+        while skipped:
+            yield skipped.pop(0)
+        
+        customer = result.state.customer
+        _, alert = alerts_by_id[customer.customer_id]
+        if budget:
+            budget.settle(customer.customer_id, result.state if result.error is None else None)
+        with running_lock:
+            running.pop(customer.customer_id, None)
+            processing = list(running.values())
+        
+        try:
+            if result.error is not None:
+                raise result.error
+            intervention_data = report_agent_run(customer, alert, result.state, result.elapsed)
+            InterventionScheduler.record_result(alert, result.state)
+        except Exception as e:
+            intervention_data = agent_run_failed(customer, e)
+        
+        # Failed runs stay open, so resuming the scan retries them from their last stage
+        failed = bool(intervention_data and intervention_data.get('error'))
+        if checkpoints and not failed:
+            checkpoints.complete_customer(customer.customer_id, intervention_data['status'] if intervention_data else 'handled')
+        if compact and not failed:
+            result.state.compact()
+        
+        yield {
+            'customer': customer,
+            'alert': alert,
+            'result': result.state,
+            'intervention': intervention_data,
+            'processing': processing
+        }
+    
+    yield from skipped
+
+def mark_customer_handled(customer, reason):
+    """Record a `handled` outcome for a customer already escalated to a human"""
+    processed_customers[customer.customer_id] = {
+        'status': 'handled',
+        'customerName': f"{customer.first_name} {customer.last_name}",
+        'timestamp': datetime.now().isoformat(),
+        'reason': reason,
+        'intervention': None
+    }
+    
+    socketio.emit('customer_skipped', {
+        'customerId': customer.customer_id,
+        'customerName': f"{customer.first_name} {customer.last_name}",
+        'reason': reason,
+        'status': 'handled'
+    })
+
+def create_message_stream_emitter(customer):
+    """Stream sink forwarding message chunks for one customer over Socket.IO"""
+    state = {'index': 0}
+    
+    def emit_chunk(agent, text):
+        if state['index'] == 0:
+            socketio.emit('message_stream_started', {
+                'agent': 'karuna',
+                'customerId': customer.customer_id,
+                'source': agent
+            })
+        socketio.emit('message_chunk', {
+            'agent': 'karuna',
+            'customerId': customer.customer_id,
+            'index': state['index'],
+            'text': text
+        })
+        state['index'] += 1
+    
+    return emit_chunk
+
 def run_agents_with_tracking(customer, event, alert):
     """Run all 4 agents with REAL timing - emits events during actual execution"""
     
+    initial_state = begin_agent_run(customer, event)
+    if initial_state is None:
+        return None  # Skip processing
+    
+    try:
+        # Run the FULL workflow (all 4 agents sequentially); each agent is reported
+        # as its node completes and the customer message is streamed while generated
+        start_time = time.time()
+        with stream_sink(create_message_stream_emitter(customer)):
+            final_state = run_workflow(
+                workflow, initial_state,
+                on_step=lambda node, state: emit_agent_progress(node, state, alert)
+            )
+        total_duration = time.time() - start_time
+        
+        return report_agent_run(customer, alert, final_state, total_duration)
+    
+    except Exception as e:
+        return agent_run_failed(customer, e)
+
+def begin_agent_run(customer, event):
+    """Initial workflow state for a customer, or None if contacted in the last 24 hours"""
+    
     global processed_customers
     
     # 🔥 NEW: Check if customer was already contacted in last 24 hours
@@ -467,8 +686,6 @@ def run_agents_with_tracking(customer, event, alert):
             
             return None  # Skip processing
     
-    agent_results = {}
-    
     # Mark customer as PROCESSING (internal tracking only, don't emit yet)
     processed_customers[customer.customer_id] = {
         'status': 'processing',
@@ -477,230 +694,240 @@ def run_agents_with_tracking(customer, event, alert):
         'intervention': None
     }
     
+    print(f"[WORKFLOW] Processing customer {customer.customer_id} - {customer.first_name} {customer.last_name}")
+    
     # Create initial state
-    initial_state = AgentState(
+    return AgentState(
         customer=customer,
         event=event,
         messages=[]
     )
-    
-    print(f"[WORKFLOW] Processing customer {customer.customer_id} - {customer.first_name} {customer.last_name}")
-    
-    try:
-        # Agent 1: Bodha (Context Agent) - START
-        socketio.emit('agent_started', {
-            'agent': 'bodha',
-            'agentName': 'Bodha - Context Agent',
-            'customerId': customer.customer_id,
-            'description': 'Analyzing customer context and sentiment'
-        })
-        time.sleep(1.5)  # Visual delay for agent processing
-        
-        # Run the FULL workflow (all 4 agents sequentially)
-        start_time = time.time()
-        final_state = run_workflow(workflow, initial_state)
-        total_duration = time.time() - start_time
-        
-        print(f"[WORKFLOW] Completed in {total_duration:.2f}s for customer {customer.customer_id}")
-        print(f"[AI RESULTS] Sentiment: {final_state.sentiment}, Urgency: {final_state.urgency_level}, Escalation: {final_state.escalation_needed}")
-        print(f"[AI RESULTS] Recommended Action: {final_state.recommended_action}")
-        print(f"[AI RESULTS] Message Length: {len(final_state.personalized_response) if final_state.personalized_response else 0} chars")
-        
-        # Extract REAL results from final state (agents have already run)
-        agent_results['bodha'] = {
-            'sentiment': final_state.sentiment.value if final_state.sentiment else 'neutral',
-            'urgency': final_state.urgency_level if final_state.urgency_level else 3,
-            'riskScore': final_state.customer_risk_score if final_state.customer_risk_score else alert['churn_risk'],
-            'contextSummary': final_state.context_summary or 'Customer context analyzed',
-            'duration': round(total_duration * 0.25, 2)
+
+AGENT_INFO = {
+    'bodha': ('Bodha - Context Agent', 'Analyzing customer context and sentiment'),
+    'dhyana': ('Dhyana - Pattern Agent', 'Identifying behavioral patterns and churn signals'),
+    'niti': ('Niti - Decision Agent', 'Determining best intervention strategy'),
+    'karuna': ('Karuna - Empathy Agent', 'Generating personalized message')
+}
+
+# Workflow nodes timed for each dashboard agent (fused/speculative runs report the
+# combined decision+empathy stage under Niti)
+AGENT_STAGES = {
+    'bodha': ('context_agent', 'proactive_context'),
+    'dhyana': ('pattern_agent', 'proactive_pattern'),
+    'niti': ('decision_agent', 'proactive_decision', 'decision_empathy', 'proactive_decision_empathy'),
+    'karuna': ('empathy_agent', 'proactive_empathy', 'escalation_handler')
+}
+
+# Dashboard agents finished / started when each workflow node completes
+# (the combined decision+empathy stage runs Niti and Karuna together)
+COMBINED_STAGE = 'decision_empathy' in workflow.nodes
+NODE_COMPLETES = {
+    'context_agent': ('bodha',),
+    'pattern_agent': ('dhyana',),
+    'decision_agent': ('niti',),
+    'empathy_agent': ('karuna',),
+    'decision_empathy': ('niti', 'karuna')
+}
+NODE_STARTS = {
+    'escalation_gate': ('bodha',),
+    'context_agent': ('dhyana',),
+    'pattern_agent': ('niti', 'karuna') if COMBINED_STAGE else ('niti',),
+    'decision_agent': ('karuna',)
+}
+
+def agent_duration(final_state, agent):
+    """Measured seconds of an agent's workflow stages in a finished run"""
+    timings = final_state.metadata.get('stage_timings', {})
+    return round(sum(timings.get(stage, 0.0) for stage in AGENT_STAGES[agent]), 2)
+
+def build_agent_results(agent, customer, alert, state):
+    """Dashboard results of one agent from the state after its stage"""
+    if agent == 'bodha':
+        return {
+            'sentiment': state.sentiment.value if state.sentiment else 'neutral',
+            'urgency': state.urgency_level if state.urgency_level else 3,
+            'riskScore': state.customer_risk_score if state.customer_risk_score else alert['churn_risk'],
+            'contextSummary': state.context_summary or 'Customer context analyzed',
+            'duration': agent_duration(state, 'bodha')
         }
-        
-        # Agent 1: Bodha (Context Agent) - COMPLETE
-        socketio.emit('agent_completed', {
-            'agent': 'bodha',
-            'customerId': customer.customer_id,
-            'results': agent_results['bodha']
-        })
-        time.sleep(0.5)
-        
-        # Agent 2: Dhyana (Pattern Agent) - START
-        socketio.emit('agent_started', {
-            'agent': 'dhyana',
-            'agentName': 'Dhyana - Pattern Agent',
-            'customerId': customer.customer_id,
-            'description': 'Identifying behavioral patterns and churn signals'
-        })
-        time.sleep(1.5)
-        
-        # Extract REAL pattern analysis from final_state
-        agent_results['dhyana'] = {
-            'churnRisk': int((final_state.predicted_churn_risk or alert['churn_risk']) * 100),
+    if agent == 'dhyana':
+        return {
+            'churnRisk': int((state.predicted_churn_risk or alert['churn_risk']) * 100),
             'patterns': alert['reasons'][:2] if alert.get('reasons') else [],
-            'historicalInsights': final_state.historical_insights or 'Pattern analysis complete',
-            'similarCases': len(final_state.similar_patterns) if final_state.similar_patterns else 3,
-            'duration': round(total_duration * 0.25, 2)
+            'historicalInsights': state.historical_insights or 'Pattern analysis complete',
+            'similarCases': len(state.similar_patterns) if state.similar_patterns else 3,
+            'duration': agent_duration(state, 'dhyana')
         }
-        
-        # Agent 2: Dhyana (Pattern Agent) - COMPLETE
-        socketio.emit('agent_completed', {
-            'agent': 'dhyana',
-            'customerId': customer.customer_id,
-            'results': agent_results['dhyana']
-        })
-        time.sleep(0.5)
-        
-        # Agent 3: Niti (Decision Agent) - START
-        socketio.emit('agent_started', {
-            'agent': 'niti',
-            'agentName': 'Niti - Decision Agent',
-            'customerId': customer.customer_id,
-            'description': 'Determining best intervention strategy'
-        })
-        time.sleep(1.5)
-        
-        # Extract REAL decision from final_state
-        agent_results['niti'] = {
-            'action': final_state.recommended_action or 'Personalized outreach recommended',
-            'actionTaken': final_state.action_taken or 'Preparing intervention',
-            'priority': final_state.priority_level or 'high',
+    if agent == 'niti':
+        return {
+            'action': state.recommended_action or 'Personalized outreach recommended',
+            'actionTaken': state.action_taken or 'Preparing intervention',
+            'priority': state.priority_level or 'high',
             'channels': ['email', 'sms'],
-            'escalate': final_state.escalation_needed,
-            'discountApplied': final_state.discount_applied if final_state.discount_applied else None,
-            'discountAutoApproved': final_state.discount_auto_approved if hasattr(final_state, 'discount_auto_approved') else False,
-            'duration': round(total_duration * 0.25, 2)
+            'escalate': state.escalation_needed,
+            'discountApplied': state.discount_applied if state.discount_applied else None,
+            'discountAutoApproved': state.discount_auto_approved if hasattr(state, 'discount_auto_approved') else False,
+            'duration': agent_duration(state, 'niti')
         }
-        
-        # Agent 3: Niti (Decision Agent) - COMPLETE
+    
+    full_message = state.personalized_response or f"Dear {customer.first_name}, we value your business and would like to address your concerns."
+    return {
+        'message': full_message,  # Send FULL message to frontend
+        'messagePreview': full_message[:200] + '...' if len(full_message) > 200 else full_message,
+        'language': customer.language or 'en',
+        'tone': state.tone or 'empathetic',
+        'empathyScore': state.empathy_score if state.empathy_score else 0.8,
+        'duration': agent_duration(state, 'karuna')
+    }
+
+def emit_agent_progress(node, state, alert):
+    """Report the dashboard agents a workflow node just finished, and the ones it hands over to"""
+    customer = state.customer
+    
+    # Escalation gate short-circuited the run - no agents run for this customer
+    if state.priority_level == 'handled':
+        return
+    
+    for agent in NODE_COMPLETES.get(node, ()):
         socketio.emit('agent_completed', {
-            'agent': 'niti',
+            'agent': agent,
             'customerId': customer.customer_id,
-            'results': agent_results['niti']
+            'results': build_agent_results(agent, customer, alert, state)
         })
-        time.sleep(0.5)
-        
-        # Agent 4: Karuna (Empathy Agent) - START
+    
+    for agent in NODE_STARTS.get(node, ()):
+        agent_name, description = AGENT_INFO[agent]
         socketio.emit('agent_started', {
-            'agent': 'karuna',
-            'agentName': 'Karuna - Empathy Agent',
+            'agent': agent,
+            'agentName': agent_name,
             'customerId': customer.customer_id,
-            'description': 'Generating personalized message'
+            'description': description
         })
-        time.sleep(1.5)
-        
-        # Extract REAL personalized message from final_state
-        full_message = final_state.personalized_response or f"Dear {customer.first_name}, we value your business and would like to address your concerns."
-        agent_results['karuna'] = {
-            'message': full_message,  # Send FULL message to frontend
-            'messagePreview': full_message[:200] + '...' if len(full_message) > 200 else full_message,
-            'language': customer.language or 'en',
-            'tone': final_state.tone or 'empathetic',
-            'empathyScore': final_state.empathy_score if final_state.empathy_score else 0.8,
-            'duration': round(total_duration * 0.25, 2)
-        }
-        
-        # Agent 4: Karuna (Empathy Agent) - COMPLETE
-        socketio.emit('agent_completed', {
-            'agent': 'karuna',
-            'customerId': customer.customer_id,
-            'results': agent_results['karuna']
-        })
-        time.sleep(0.5)
-        
-        # Create intervention summary with REAL AI data
-        is_escalated = final_state.escalation_needed
-        
-        intervention = {
-            'id': f"INT_{customer.customer_id}_{int(time.time())}",
-            'customerId': customer.customer_id,
-            'customerName': f"{customer.first_name} {customer.last_name}",
-            'timestamp': datetime.now().isoformat(),
-            'type': 'proactive',
-            'healthScore': int(alert['health_score'] * 100),
-            'churnRisk': int(alert['churn_risk'] * 100),
-            'priority': final_state.priority_level or 'high',
-            'action': final_state.recommended_action or 'Personalized retention outreach',
-            'aiRecommendation': final_state.recommended_action or 'AI analysis complete',
-            'message': agent_results['karuna']['message'],  # FULL AI-generated message
-            'language': customer.language or 'en',
-            'agents': agent_results,
-            'escalated': is_escalated,
-            'status': 'escalated' if is_escalated else 'sent',
-            'channels': ['email', 'sms'],
-            'sentiment': final_state.sentiment.value if final_state.sentiment else 'neutral',
-            'urgencyLevel': final_state.urgency_level,
-            'discountApplied': final_state.discount_applied,
-            'actionTaken': final_state.action_taken or 'Intervention prepared'
-        }
-        
-        # Log the action taken with REAL AI data
-        if is_escalated:
-            print(f"[CRITICAL] Customer {customer.customer_id} escalated to human")
-            print(f"[REASON] {final_state.recommended_action}")
-        else:
-            print(f"[AUTO-SENT] Message ready for {customer.customer_id} via {intervention['channels']}")
-            print(f"[AI ACTION] {final_state.recommended_action}")
-            if final_state.discount_applied:
-                print(f"[DISCOUNT] {final_state.discount_applied}% discount applied")
-            print(f"[MESSAGE PREVIEW] {agent_results['karuna']['message'][:150]}...")
-        
-        # Update processed_customers with final status
-        final_status = 'escalated' if is_escalated else 'sent'
-        processed_customers[customer.customer_id] = {
-            'status': final_status,
-            'customerName': f"{customer.first_name} {customer.last_name}",
-            'timestamp': datetime.now().isoformat(),
-            'intervention': intervention
-        }
-        
-        # Emit status change to UI
-        socketio.emit('customer_status_changed', {
-            'customerId': customer.customer_id,
-            'customerName': f"{customer.first_name} {customer.last_name}",
-            'status': final_status
-        })
-        
-        # If escalation needed, create escalation record
-        if is_escalated:
-            try:
-                escalation_id = escalation_tracker.create_escalation(
-                    customer_id=customer.customer_id,
-                    reason=final_state.recommended_action or agent_results.get('niti', {}).get('action', 'Escalation needed'),
-                    priority=agent_results.get('niti', {}).get('priority', 'high')
-                )
-                
-                intervention['escalationId'] = escalation_id
-                
-                socketio.emit('escalation_created', {
-                    'escalationId': escalation_id,
-                    'customerId': customer.customer_id,
-                    'customerName': f"{customer.first_name} {customer.last_name}",
-                    'timestamp': datetime.now().isoformat(),
-                    'priority': agent_results.get('niti', {}).get('priority', 'high')
-                })
-                
-                print(f"[ESCALATION] Created escalation {escalation_id} for {customer.customer_id}")
-            except Exception as e:
-                print(f"Error creating escalation: {e}")
-        
-        # 🔥 NEW: Save interaction to memory
+
+def report_agent_run(customer, alert, final_state, total_duration):
+    """Emit per-agent results of a finished workflow run and record the intervention"""
+    
+    global processed_customers
+    
+    agent_results = {}
+    
+    print(f"[WORKFLOW] Completed in {total_duration:.2f}s for customer {customer.customer_id}")
+    
+    # Escalation gate short-circuited the run - no agent output to report
+    if final_state.priority_level == 'handled':
+        print(f"[HANDLED] {customer.customer_id} already escalated - human agent handling")
+        mark_customer_handled(customer, final_state.recommended_action)
+        return None
+    
+    print(f"[AI RESULTS] Sentiment: {final_state.sentiment}, Urgency: {final_state.urgency_level}, Escalation: {final_state.escalation_needed}")
+    print(f"[AI RESULTS] Recommended Action: {final_state.recommended_action}")
+    print(f"[AI RESULTS] Message Length: {len(final_state.personalized_response) if final_state.personalized_response else 0} chars")
+    
+    # REAL results from the final state (each agent was reported as its node completed)
+    for agent in AGENT_INFO:
+        agent_results[agent] = build_agent_results(agent, customer, alert, final_state)
+    
+    # Create intervention summary with REAL AI data
+    is_escalated = final_state.escalation_needed
+    
+    intervention = {
+        'id': f"INT_{customer.customer_id}_{int(time.time())}",
+        'customerId': customer.customer_id,
+        'customerName': f"{customer.first_name} {customer.last_name}",
+        'timestamp': datetime.now().isoformat(),
+        'type': 'proactive',
+        'healthScore': int(alert['health_score'] * 100),
+        'churnRisk': int(alert['churn_risk'] * 100),
+        'priority': final_state.priority_level or 'high',
+        'action': final_state.recommended_action or 'Personalized retention outreach',
+        'aiRecommendation': final_state.recommended_action or 'AI analysis complete',
+        'message': agent_results['karuna']['message'],  # FULL AI-generated message
+        'language': customer.language or 'en',
+        'agents': agent_results,
+        'escalated': is_escalated,
+        'status': 'escalated' if is_escalated else 'sent',
+        'channels': ['email', 'sms'],
+        'sentiment': final_state.sentiment.value if final_state.sentiment else 'neutral',
+        'urgencyLevel': final_state.urgency_level,
+        'discountApplied': final_state.discount_applied,
+        'actionTaken': final_state.action_taken or 'Intervention prepared',
+        'mode': final_state.metadata.get('degradation_mode', 'full'),
+        'modelTier': final_state.metadata.get('model_tier', 'large'),
+        'speculation': final_state.metadata.get('speculation'),
+        'stageTimings': final_state.metadata.get('stage_timings', {})
+    }
+    
+    # Log the action taken with REAL AI data
+    if is_escalated:
+        print(f"[CRITICAL] Customer {customer.customer_id} escalated to human")
+        print(f"[REASON] {final_state.recommended_action}")
+    else:
+        print(f"[AUTO-SENT] Message ready for {customer.customer_id} via {intervention['channels']}")
+        print(f"[AI ACTION] {final_state.recommended_action}")
+        if final_state.discount_applied:
+            print(f"[DISCOUNT] {final_state.discount_applied}% discount applied")
+        print(f"[MESSAGE PREVIEW] {agent_results['karuna']['message'][:150]}...")
+    
+    # Update processed_customers with final status
+    final_status = 'escalated' if is_escalated else 'sent'
+    processed_customers[customer.customer_id] = {
+        'status': final_status,
+        'customerName': f"{customer.first_name} {customer.last_name}",
+        'timestamp': datetime.now().isoformat(),
+        'intervention': intervention
+    }
+    
+    # Emit status change to UI
+    socketio.emit('customer_status_changed', {
+        'customerId': customer.customer_id,
+        'customerName': f"{customer.first_name} {customer.last_name}",
+        'status': final_status
+    })
+    
+    # If escalation needed, create escalation record
+    if is_escalated:
         try:
-            memory_handler.save_interaction(final_state)
-            print(f"[MEMORY] Saved interaction for customer {customer.customer_id}")
+            escalation_id = escalation_tracker.create_escalation(
+                customer_id=customer.customer_id,
+                reason=final_state.recommended_action or agent_results.get('niti', {}).get('action', 'Escalation needed'),
+                priority=agent_results.get('niti', {}).get('priority', 'high')
+            )
+            
+            intervention['escalationId'] = escalation_id
+            
+            socketio.emit('escalation_created', {
+                'escalationId': escalation_id,
+                'customerId': customer.customer_id,
+                'customerName': f"{customer.first_name} {customer.last_name}",
+                'timestamp': datetime.now().isoformat(),
+                'priority': agent_results.get('niti', {}).get('priority', 'high')
+            })
+            
+            print(f"[ESCALATION] Created escalation {escalation_id} for {customer.customer_id}")
         except Exception as e:
-            print(f"⚠️ Warning: Could not save to memory: {e}")
-        
-        return intervention
-        
+            print(f"Error creating escalation: {e}")
+    
+    # 🔥 NEW: Save interaction to memory
+    try:
+        memory_handler.save_interaction(final_state)
+        print(f"[MEMORY] Saved interaction for customer {customer.customer_id}")
     except Exception as e:
-        print(f"❌ Error in run_agents_with_tracking for {customer.customer_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            'id': f"INT_{customer.customer_id}_{int(time.time())}",
-            'customerId': customer.customer_id,
-            'customerName': f"{customer.first_name} {customer.last_name}",
-            'error': str(e)
-        }
+        print(f"⚠️ Warning: Could not save to memory: {e}")
+    
+    return intervention
+
+def agent_run_failed(customer, e):
+    """Intervention record for a workflow run that raised"""
+    print(f"❌ Error in run_agents_with_tracking for {customer.customer_id}: {e}")
+    import traceback
+    traceback.print_exception(type(e), e, e.__traceback__)
+    return {
+        'id': f"INT_{customer.customer_id}_{int(time.time())}",
+        'customerId': customer.customer_id,
+        'customerName': f"{customer.first_name} {customer.last_name}",
+        'error': str(e)
+    }
 
 def create_proactive_event(customer, alert):
     """Create proactive event"""
@@ -713,7 +940,8 @@ def create_proactive_event(customer, alert):
         metadata={
             'health_score': alert['health_score'],
             'churn_risk': alert['churn_risk'],
-            'reasons': alert['reasons']
+            'reasons': alert['reasons'],
+            'source': alert.get('source', 'proactive_monitor')
         }
     )
 
@@ -858,6 +1086,42 @@ def get_intervention_history():
     """Get intervention history"""
     return jsonify(recent_interventions[:50])
 
+@app.route('/api/metrics')
+def get_pipeline_metrics():
+    """Get agent pipeline metrics (LLM usage, fast paths)"""
+    return jsonify({
+        'contextAgent': ContextAgent.get_rule_stats(),
+        'patternPrefetch': PatternAgent.get_prefetch_stats(),
+        'prompts': PromptStats.get_prompt_stats(),
+        'parsing': ParseStats.get_parse_stats(),
+        'llmCalls': CallGuard.get_call_stats(),
+        'degradation': DegradationController.get_status(),
+        'traffic': TrafficScheduler.get_traffic_stats(),
+        'routing': ModelRouter.get_routing_stats(),
+        'streaming': StreamStats.get_stream_stats(),
+        'speculation': SpeculativeDecisionEmpathyAgent.get_speculation_stats(),
+        'messageCache': MessageSkeletonCache.get_cache_stats(),
+        'scanCheckpoints': ScanCheckpointStore.get_checkpoint_stats(),
+        'scheduler': InterventionScheduler.get_scheduler_stats(),
+        'scanBudget': ScanBudget.get_budget_stats(),
+        'spans': SpanStats.get_span_stats()
+    })
+
+@app.route('/api/scan/checkpoints')
+def get_scan_checkpoints():
+    """Get progress of checkpointed scans (most recent first)"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify([
+        ScanCheckpointStore(manifest['scan_id']).get_progress()
+        for manifest in ScanCheckpointStore.list_scans()[:limit]
+    ])
+
+@app.route('/api/metrics/tokens')
+def get_token_telemetry():
+    """Get per-call prompt/completion token telemetry (most recent first)"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify(PromptStats.get_recent_calls(limit))
+
 # =============================================================================
 # WEBSOCKET HANDLERS
 # =============================================================================
@@ -964,6 +1228,8 @@ def run_background_interventions():
                 try:
                     event = create_proactive_event(customer, alert)
                     intervention = run_agents_with_tracking(customer, event, alert)
+                    if not intervention:
+                        continue
                     
                     # Save intervention
                     recent_interventions.insert(0, intervention)
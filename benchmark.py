@@ -0,0 +1,695 @@
+"""
+ProCX Benchmark Suite - Latency and token usage of agent pipeline variants.
+
+Suites:
+    fused   Compare the 4-call pipeline with the fused decision+empathy mode
+    guard   Tail latency without vs with call deadlines and hedged requests
+            (most useful with --model fake and a heavy-tailed latency setting)
+    degrade Full pipeline vs adaptive degradation under a tight queue SLO
+    traffic Interactive requests during a rate-limited bulk scan, FIFO vs
+            priority scheduling
+    tiering Large model for every customer vs routing by case complexity
+    stream  Time to the first streamed message chunk vs the full empathy call
+    speculative
+            Sequential decision -> empathy vs drafting the message in parallel
+            with the decision (hit rate and latency saved)
+    prefetch
+            Pattern analytics computed in the pattern stage vs prefetched
+            while the context agent's model call runs
+    skeleton
+            Empathy call per customer vs cached message skeletons rendered
+            per customer
+    batch   Customers one after another vs run_workflow_batch on a worker
+            pool (scan wall time)
+    codec   Round-trip checks of the binary state codec on final workflow
+            states, and its size and encode/decode time vs to_dict + JSON
+
+Usage:
+    python benchmark.py --suite fused --customers 5
+    python benchmark.py --model fake              # offline, deterministic
+"""
+import sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import statistics
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Optional
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from models import AgentState, CustomerEvent, EventType
+from utils import ProactiveMonitor, PromptStats, ParseStats, CallGuard, FakeChatModel, DegradationController
+from utils import TrafficScheduler, traffic_priority, ModelRouter, StreamStats, stream_sink, MessageSkeletonCache
+from utils import state_codec
+from utils.memory_handler import CustomJSONEncoder
+from workflows import create_proactive_workflow, run_workflow_batch
+from agents import PatternAgent, SpeculativeDecisionEmpathyAgent
+from config import settings
+
+
+class UsageCounter(BaseCallbackHandler):
+    """Counts LLM calls and prompt/completion tokens for one pipeline run."""
+    
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+    
+    def on_llm_end(self, response, **kwargs):
+        """Accumulate token usage reported by the chat model."""
+        input_tokens = 0
+        output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        
+        # Fall back to provider-level totals
+        if not input_tokens and not output_tokens and response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            input_tokens = token_usage.get("prompt_tokens", 0)
+            output_tokens = token_usage.get("completion_tokens", 0)
+        
+        with self._lock:
+            self.llm_calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+
+def load_benchmark_alerts(count: int, min_churn_risk: float = 0.6) -> List[Dict[str, Any]]:
+    """
+    Pick the top at-risk customers used as the benchmark workload.
+    
+    Args:
+        count: Number of customers
+        min_churn_risk: Minimum churn risk threshold (0-1)
+        
+    Returns:
+        Alerts from ProactiveMonitor.detect_churn_risks
+    """
+    monitor = ProactiveMonitor()
+    alerts = monitor.detect_churn_risks(min_churn_risk=min_churn_risk)
+    return alerts[:count]
+
+
+def build_state(alert: Dict[str, Any]) -> AgentState:
+    """Build a fresh proactive AgentState for an alert (same event as main.py)."""
+    customer = alert['customer']
+    event_type = EventType.PROACTIVE_RETENTION if alert['churn_risk'] >= 0.7 else EventType.PROACTIVE_CHECK_IN
+    event = CustomerEvent(
+        event_id=f"BENCH_{customer.customer_id}_{int(time.time())}",
+        customer=customer,
+        event_type=event_type,
+        timestamp=datetime.now(),
+        description=f"Proactive intervention - churn risk: {alert['churn_risk']:.1%}",
+        metadata=alert
+    )
+    return AgentState(event=event, customer=customer)
+
+
+def run_pipeline(name: str, workflow_factory: Callable, alerts: List[Dict[str, Any]],
+                 overrides: Optional[Dict[str, Any]] = None, workers: int = 0) -> Dict[str, Any]:
+    """
+    Run one pipeline variant over the workload.
+    
+    Each variant gets its own escalation store so escalations created by one
+    run do not short-circuit customers in the next.
+    
+    Args:
+        name: Variant label
+        workflow_factory: Callable returning a compiled workflow
+        alerts: Benchmark workload
+        overrides: Settings to change for this variant only
+        workers: Run customers with run_workflow_batch on this many workers
+            (0 = one after another)
+        
+    Returns:
+        Latency and token metrics for the variant
+    """
+    with _settings_overrides(overrides):
+        return _run_variant(name, workflow_factory, alerts, workers)
+
+
+@contextmanager
+def _settings_overrides(overrides: Optional[Dict[str, Any]]):
+    """Temporarily change settings, restoring the previous values afterwards."""
+    overrides = overrides or {}
+    previous = {key: getattr(settings, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            setattr(settings, key, value)
+
+
+def _run_variant(name: str, workflow_factory: Callable, alerts: List[Dict[str, Any]],
+                 workers: int = 0) -> Dict[str, Any]:
+    """Run one variant with the current settings (see run_pipeline)."""
+    settings.DATA_DIR = Path(tempfile.mkdtemp(prefix=f"procx_bench_{name}_"))
+    workflow = workflow_factory()
+    
+    PromptStats.reset()
+    ParseStats.reset()
+    CallGuard.reset()
+    FakeChatModel.reset()
+    DegradationController.reset()
+    TrafficScheduler.reset()
+    ModelRouter.reset()
+    SpeculativeDecisionEmpathyAgent.reset()
+    MessageSkeletonCache.reset()
+    PatternAgent.reset_prefetch_stats()
+    counter = UsageCounter()
+    latencies = []
+    failures = 0
+    
+    started = time.perf_counter()
+    if workers:
+        states = (build_state(alert) for alert in alerts)
+        completed = 0
+        for result in run_workflow_batch(workflow, states, workers=workers, config={"callbacks": [counter]}):
+            completed += 1
+            DegradationController.report_queue_depth(len(alerts) - completed)
+            if result.error is not None:
+                print(f"[WARN] {name}: {result.state.customer.customer_id} failed: {result.error}")
+                failures += 1
+            elif not result.state.personalized_response:
+                failures += 1
+            latencies.append(result.elapsed)
+    else:
+        for index, alert in enumerate(alerts, 1):
+            DegradationController.report_queue_depth(len(alerts) - index)
+            state = build_state(alert)
+            t0 = time.perf_counter()
+            try:
+                result = workflow.invoke({"state": state}, config={"callbacks": [counter]})["state"]
+                if not result.personalized_response:
+                    failures += 1
+            except Exception as e:
+                print(f"[WARN] {name}: {alert['customer'].customer_id} failed: {e}")
+                failures += 1
+            latencies.append(time.perf_counter() - t0)
+    wall_time = time.perf_counter() - started
+    DegradationController.report_queue_depth(0)
+    
+    customers = len(alerts) or 1
+    call_stats = CallGuard.get_call_stats()
+    return {
+        "pipeline": name,
+        "customers": len(alerts),
+        "workers": workers,
+        "failures": failures,
+        "wall_time_s": round(wall_time, 3),
+        "latency_mean_s": round(statistics.mean(latencies), 3) if latencies else 0.0,
+        "latency_p50_s": round(statistics.median(latencies), 3) if latencies else 0.0,
+        "latency_p95_s": round(_percentile(latencies, 0.95), 3) if latencies else 0.0,
+        "llm_calls": counter.llm_calls,
+        "llm_calls_per_customer": round(counter.llm_calls / customers, 2),
+        "input_tokens": counter.input_tokens,
+        "output_tokens": counter.output_tokens,
+        "total_tokens_per_customer": round((counter.input_tokens + counter.output_tokens) / customers, 1),
+        "cached_tokens": sum(stats["cached_tokens"] for stats in PromptStats.get_prompt_stats().values()),
+        "parse_failures": sum(stats["failed"] for stats in ParseStats.get_parse_stats().values()),
+        "llm_timeouts": sum(stats["timeouts"] for stats in call_stats.values()),
+        "hedged_requests": sum(stats["hedged"] for stats in call_stats.values()),
+        "runs_by_mode": DegradationController.get_status()["runs_by_mode"],
+        "routing": ModelRouter.get_routing_stats(recent=0),
+        "speculation": SpeculativeDecisionEmpathyAgent.get_speculation_stats(),
+        "message_cache": MessageSkeletonCache.get_cache_stats(),
+        "prefetch": PatternAgent.get_prefetch_stats(),
+        "prompts": PromptStats.get_prompt_stats(),
+        "parsing": ParseStats.get_parse_stats(),
+        "calls": call_stats
+    }
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _print_comparison(results: List[Dict[str, Any]]):
+    """Print variants side by side with savings relative to the first one."""
+    columns = [
+        ("latency_mean_s", "Mean latency (s)"),
+        ("latency_p95_s", "p95 latency (s)"),
+        ("llm_calls_per_customer", "LLM calls / customer"),
+        ("input_tokens", "Prompt tokens"),
+        ("output_tokens", "Completion tokens"),
+        ("total_tokens_per_customer", "Tokens / customer"),
+        ("cached_tokens", "Cached prompt tokens"),
+        ("parse_failures", "Parse failures"),
+        ("llm_timeouts", "LLM timeouts"),
+        ("hedged_requests", "Hedged requests"),
+        ("failures", "Failures")
+    ]
+    
+    baseline = results[0]
+    print(f"\n{'Metric':<24}" + "".join(f"{r['pipeline']:>16}" for r in results))
+    print("-" * (24 + 16 * len(results)))
+    for key, label in columns:
+        print(f"{label:<24}" + "".join(f"{r[key]:>16}" for r in results))
+    
+    for variant in results[1:]:
+        for key, label in (("latency_mean_s", "latency"), ("total_tokens_per_customer", "tokens")):
+            if baseline[key]:
+                saved = 1 - variant[key] / baseline[key]
+                print(f"[OK] {variant['pipeline']} vs {baseline['pipeline']}: {saved:+.1%} {label} saved")
+
+
+def run_fused_suite(args) -> Dict[str, Any]:
+    """Compare the standard 4-call pipeline with the fused decision+empathy mode."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Fused vs 4-call pipeline on {len(alerts)} customers")
+    
+    results = [
+        run_pipeline("standard", lambda: create_proactive_workflow(fused=False), alerts),
+        run_pipeline("fused", lambda: create_proactive_workflow(fused=True), alerts)
+    ]
+    _print_comparison(results)
+    return {"suite": "fused", "results": results}
+
+
+def run_guard_suite(args) -> Dict[str, Any]:
+    """Compare unbounded LLM calls with per-agent deadlines plus hedged requests."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Call deadlines + hedging on {len(alerts)} customers")
+    
+    unguarded = {
+        "AGENT_TIMEOUT_SECONDS": {},
+        "TIMEOUT_SECONDS": 3600,
+        "HEDGE_REQUESTS": False
+    }
+    guarded = {
+        "HEDGE_REQUESTS": True,
+        "HEDGE_MIN_SAMPLES": min(settings.HEDGE_MIN_SAMPLES, max(3, len(alerts) // 2))
+    }
+    
+    results = [
+        run_pipeline("unguarded", create_proactive_workflow, alerts, unguarded),
+        run_pipeline("guarded", create_proactive_workflow, alerts, guarded)
+    ]
+    _print_comparison(results)
+    return {"suite": "guard", "results": results}
+
+
+def run_degrade_suite(args) -> Dict[str, Any]:
+    """Compare a scan with degradation disabled against one under a tight queue SLO."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Adaptive degradation on {len(alerts)} customers")
+    
+    # Queue SLO of a quarter of the workload: the scan starts overloaded and
+    # recovers as the queue drains
+    adaptive = {
+        "DEGRADATION_ENABLED": True,
+        "DEGRADE_QUEUE_DEPTH_SLO": max(1, len(alerts) // 4),
+        "DEGRADE_STEP_SECONDS": 0,
+        "DEGRADE_RECOVERY_SECONDS": 0
+    }
+    
+    results = [
+        run_pipeline("full", create_proactive_workflow, alerts, {"DEGRADATION_ENABLED": False}),
+        run_pipeline("adaptive", create_proactive_workflow, alerts, adaptive)
+    ]
+    _print_comparison(results)
+    for result in results:
+        runs = ", ".join(f"{mode}={count}" for mode, count in result["runs_by_mode"].items() if count)
+        print(f"[DEGRADE] {result['pipeline']}: {runs or 'no runs'}")
+    return {"suite": "degrade", "results": results}
+
+
+def run_tiering_suite(args) -> Dict[str, Any]:
+    """Compare the large model for every customer with complexity-based model routing."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Model tiering on {len(alerts)} customers")
+    
+    results = [
+        run_pipeline("large_only", create_proactive_workflow, alerts, {"MODEL_ROUTING_ENABLED": False}),
+        run_pipeline("tiered", create_proactive_workflow, alerts, {"MODEL_ROUTING_ENABLED": True})
+    ]
+    _print_comparison(results)
+    
+    routing = results[1]["routing"]
+    print(f"[ROUTING] decisions: {routing['decisions']} | reasons: {routing['reasons']} "
+          f"| escalation upgrades: {routing['escalation_upgrades']}")
+    for tier, agents in routing["latency"].items():
+        for agent, latency in sorted(agents.items()):
+            print(f"   {tier:<6} {agent:<16} {latency['calls']:>4} calls | mean {latency['mean_s']:.2f}s | "
+                  f"p95 {latency['p95_s']:.2f}s")
+    return {"suite": "tiering", "results": results}
+
+
+def run_stream_suite(args) -> Dict[str, Any]:
+    """Measure time to the first streamed message chunk and check it matches the final message."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Message streaming on {len(alerts)} customers")
+    
+    settings.DATA_DIR = Path(tempfile.mkdtemp(prefix="procx_bench_stream_"))
+    workflow = create_proactive_workflow()
+    StreamStats.reset()
+    mismatches = 0
+    
+    with _settings_overrides({"EMPATHY_STREAMING": True, "DEGRADATION_ENABLED": False}):
+        for alert in alerts:
+            chunks = []
+            with stream_sink(lambda agent, text: chunks.append(text)):
+                result = workflow.invoke({"state": build_state(alert)})["state"]
+            if chunks and "".join(chunks) != result.personalized_response:
+                mismatches += 1
+    
+    stats = StreamStats.get_stream_stats()
+    for agent, agent_stats in stats.items():
+        print(f"[STREAM] {agent}: {agent_stats['streams']} streams | first chunk after "
+              f"{agent_stats['avg_first_chunk_s']}s | full message after {agent_stats['avg_duration_s']}s")
+    print(f"[STREAM] Streamed text differs from the final message for {mismatches} customers")
+    return {"suite": "stream", "results": [{"streams": stats, "mismatches": mismatches}]}
+
+
+def run_speculative_suite(args) -> Dict[str, Any]:
+    """Compare sequential decision and empathy calls with speculative empathy drafts."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Speculative empathy on {len(alerts)} customers")
+    
+    results = [
+        run_pipeline("standard", lambda: create_proactive_workflow(fused=False, speculative=False), alerts),
+        run_pipeline("speculative", lambda: create_proactive_workflow(speculative=True), alerts)
+    ]
+    _print_comparison(results)
+    
+    speculation = results[1]["speculation"]
+    hit_rate = speculation["hit_rate"]
+    print(f"[SPECULATE] {speculation['speculated']}/{speculation['runs']} runs speculated | "
+          f"hit rate {f'{hit_rate:.0%}' if hit_rate is not None else 'n/a'} | "
+          f"avg {speculation['avg_saved_s']:.2f}s saved per hit | "
+          f"{speculation['wasted_draft_s']:.2f}s spent on discarded drafts")
+    print(f"[SPECULATE] skipped: {speculation['skipped']} | misses: {speculation['miss_reasons']}")
+    return {"suite": "speculative", "results": results}
+
+
+def run_prefetch_suite(args) -> Dict[str, Any]:
+    """Compare inline pattern analytics with analytics prefetched at run start."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Pattern analytics prefetch on {len(alerts)} customers")
+    
+    # The context agent's model call is what the prefetch overlaps, so the
+    # rule fast path is off in both variants
+    results = [
+        run_pipeline("inline", create_proactive_workflow, alerts,
+                     {"PATTERN_PREFETCH_ENABLED": False, "CONTEXT_RULES_ENABLED": False}),
+        run_pipeline("prefetch", create_proactive_workflow, alerts,
+                     {"PATTERN_PREFETCH_ENABLED": True, "CONTEXT_RULES_ENABLED": False})
+    ]
+    _print_comparison(results)
+    
+    prefetch = results[1]["prefetch"]
+    print(f"[PREFETCH] {prefetch['runs']} runs | {prefetch['background_s']:.2f}s analytics in background, "
+          f"{prefetch['wait_s']:.2f}s waited ({prefetch['hidden_ratio']:.0%} hidden) | "
+          f"{prefetch['computed_inline']} computed inline, {prefetch['dropped']} dropped")
+    return {"suite": "prefetch", "results": results}
+
+
+def run_skeleton_suite(args) -> Dict[str, Any]:
+    """Compare one empathy call per customer with cached message skeletons."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Message skeleton cache on {len(alerts)} customers")
+    
+    results = [
+        run_pipeline("per_customer", create_proactive_workflow, alerts, {"MESSAGE_CACHE_ENABLED": False}),
+        run_pipeline("skeleton", create_proactive_workflow, alerts, {"MESSAGE_CACHE_ENABLED": True})
+    ]
+    _print_comparison(results)
+    
+    cache = results[1]["message_cache"]
+    empathy_calls = {
+        result["pipeline"]: result["prompts"].get("empathy_agent", {}).get("calls", 0) for result in results
+    }
+    print(f"[CACHE] empathy calls: {empathy_calls} | {cache['hits']}/{cache['lookups']} rendered from cache "
+          f"({cache['hit_rate']:.0%}) | {cache['skeletons']} skeletons for {cache['keys']} keys | "
+          f"{cache['rejected_similar']} too similar, {cache['invalid']} invalid")
+    return {"suite": "skeleton", "results": results}
+
+
+def run_batch_suite(args) -> Dict[str, Any]:
+    """Compare a sequential scan with run_workflow_batch on a worker pool."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] Sequential vs batch scan on {len(alerts)} customers ({settings.BATCH_WORKERS} workers)")
+    
+    # Queue-depth degradation would react to the scan itself, so it is off in both variants
+    overrides = {"DEGRADATION_ENABLED": False}
+    results = [
+        run_pipeline("sequential", create_proactive_workflow, alerts, overrides),
+        run_pipeline("batch", create_proactive_workflow, alerts, overrides, workers=settings.BATCH_WORKERS)
+    ]
+    _print_comparison(results)
+    
+    sequential, batch = results
+    speedup = sequential["wall_time_s"] / batch["wall_time_s"] if batch["wall_time_s"] else 0.0
+    print(f"[BATCH] scan wall time {sequential['wall_time_s']}s -> {batch['wall_time_s']}s "
+          f"({speedup:.1f}x) | failures {sequential['failures']} -> {batch['failures']}")
+    return {"suite": "batch", "results": results}
+
+
+def _normalized(state: AgentState) -> str:
+    """Canonical JSON of a state, for comparing round trips."""
+    return json.dumps(state.to_dict(), cls=CustomJSONEncoder, sort_keys=True)
+
+
+def _check_round_trip(state: AgentState, record_file: Path) -> List[str]:
+    """
+    Round-trip one state through the binary codec, a record file and the JSON fallback.
+    
+    Returns:
+        Descriptions of every mismatch (empty if the state survived all of them)
+    """
+    problems = []
+    expected = _normalized(state)
+    decoded = state_codec.loads(state_codec.dumps(state))
+    if _normalized(decoded) != expected:
+        problems.append("binary round trip changed the state")
+    if state.event and decoded.event.customer is not decoded.customer:
+        problems.append("customer shared by state and event was decoded twice")
+    if state.event and (decoded.event.event_type is not state.event.event_type
+                        or decoded.event.timestamp != state.event.timestamp):
+        problems.append("event type or timestamp changed")
+    
+    # A checkpoint-style record file with a record cut short by a "crash"
+    with open(record_file, "wb") as f:
+        state_codec.append_record(f, {"stage": "empathy_agent", "state": state})
+        state_codec.append_record(f, {"stage": "truncated", "state": state})
+    record_file.write_bytes(record_file.read_bytes()[:-7])
+    records = list(state_codec.read_records(record_file))
+    if [record["stage"] for record in records] != ["empathy_agent"] or _normalized(records[0]["state"]) != expected:
+        problems.append("record file round trip failed")
+    
+    with _settings_overrides({"STATE_CODEC": "json"}):
+        fallback = AgentState.from_dict(state_codec.loads(state_codec.dumps(state)))
+    if _normalized(fallback) != expected:
+        problems.append("JSON fallback round trip changed the state")
+    return problems
+
+
+def _time_per_state(fn: Callable, items: List[Any], repeat: int) -> float:
+    """Mean microseconds per item of `fn` over `repeat` passes."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - started) / (repeat * len(items)) * 1e6
+
+
+def run_codec_suite(args) -> Dict[str, Any]:
+    """Round-trip and compare the binary state codec with to_dict + JSON on real final states."""
+    if not state_codec.binary_enabled():
+        print("[BENCH] codec: ormsgpack is not installed (or STATE_CODEC=json) - skipped")
+        return {"suite": "codec", "skipped": True}
+    
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    print(f"[BENCH] State codec v{state_codec.CODEC_VERSION} on the final states of {len(alerts)} customers")
+    with _settings_overrides({"DATA_DIR": Path(tempfile.mkdtemp(prefix="procx_bench_codec_"))}):
+        workflow = create_proactive_workflow()
+        states = [
+            result.state for result in run_workflow_batch(workflow, (build_state(alert) for alert in alerts))
+            if result.error is None
+        ]
+    
+    failures = 0
+    record_file = Path(tempfile.mkdtemp(prefix="procx_bench_codec_")) / "records.mpk"
+    for state in states:
+        for problem in _check_round_trip(state, record_file):
+            failures += 1
+            print(f"[FAIL] {state.customer.customer_id}: {problem}")
+    
+    json_payloads = [json.dumps(state.to_dict(), cls=CustomJSONEncoder).encode("utf-8") for state in states]
+    binary_payloads = [state_codec.dumps(state) for state in states]
+    repeat = 200
+    result = {
+        "suite": "codec",
+        "states": len(states),
+        "round_trip_failures": failures,
+        "json_bytes_mean": round(statistics.mean(len(p) for p in json_payloads)) if states else 0,
+        "binary_bytes_mean": round(statistics.mean(len(p) for p in binary_payloads)) if states else 0,
+        "json_encode_us": round(_time_per_state(
+            lambda state: json.dumps(state.to_dict(), cls=CustomJSONEncoder).encode("utf-8"), states, repeat), 1),
+        "binary_encode_us": round(_time_per_state(state_codec.dumps, states, repeat), 1),
+        "json_decode_us": round(_time_per_state(
+            lambda payload: AgentState.from_dict(json.loads(payload)), json_payloads, repeat), 1),
+        "binary_decode_us": round(_time_per_state(state_codec.loads, binary_payloads, repeat), 1)
+    }
+    
+    ratio = result["binary_bytes_mean"] / result["json_bytes_mean"] if result["json_bytes_mean"] else 0.0
+    print(f"[CODEC] {len(states)} states, {failures} round-trip failures | size {result['json_bytes_mean']} -> "
+          f"{result['binary_bytes_mean']} bytes ({ratio:.0%} of JSON)")
+    print(f"[CODEC] encode {result['json_encode_us']} -> {result['binary_encode_us']} us/state | "
+          f"decode {result['json_decode_us']} -> {result['binary_decode_us']} us/state")
+    return result
+
+
+def _run_mixed_traffic(name: str, alerts: List[Dict[str, Any]], interactive: List[Dict[str, Any]],
+                       interactive_priority: str) -> Dict[str, Any]:
+    """
+    Run a bulk scan on a background thread while interactive requests arrive.
+    
+    Args:
+        name: Variant label
+        alerts: Bulk scan workload
+        interactive: Customers requested interactively during the scan
+        interactive_priority: Priority class given to the interactive requests
+        
+    Returns:
+        Interactive latency, scan wall time and queue waits per priority class
+    """
+    settings.DATA_DIR = Path(tempfile.mkdtemp(prefix=f"procx_bench_{name}_"))
+    PromptStats.reset()
+    ParseStats.reset()
+    CallGuard.reset()
+    FakeChatModel.reset()
+    DegradationController.reset()
+    TrafficScheduler.reset()
+    ModelRouter.reset()
+    
+    def run_scan():
+        workflow = create_proactive_workflow()
+        with traffic_priority("bulk"):
+            for alert in alerts:
+                workflow.invoke({"state": build_state(alert)})
+    
+    started = time.perf_counter()
+    scan = threading.Thread(target=run_scan, daemon=True)
+    scan.start()
+    
+    # Let the scan saturate the budget before the first interactive request
+    time.sleep(1.0)
+    workflow = create_proactive_workflow()
+    latencies = []
+    with traffic_priority(interactive_priority):
+        for alert in interactive:
+            t0 = time.perf_counter()
+            workflow.invoke({"state": build_state(alert)})
+            latencies.append(time.perf_counter() - t0)
+    
+    scan.join()
+    classes = TrafficScheduler.get_traffic_stats()["classes"]
+    return {
+        "pipeline": name,
+        "interactive_requests": len(latencies),
+        "interactive_latency_mean_s": round(statistics.mean(latencies), 3) if latencies else 0.0,
+        "interactive_latency_max_s": round(max(latencies), 3) if latencies else 0.0,
+        "scan_wall_time_s": round(time.perf_counter() - started, 3),
+        "queue_wait": {
+            priority: {key: stats[key] for key in ("requests", "delayed", "avg_wait_s", "p95_wait_s", "max_wait_s")}
+            for priority, stats in classes.items()
+        }
+    }
+
+
+def run_traffic_suite(args) -> Dict[str, Any]:
+    """Compare interactive latency during a rate-limited scan: FIFO vs priority classes."""
+    alerts = load_benchmark_alerts(args.customers, args.min_churn_risk)
+    interactive = alerts[:max(1, len(alerts) // 4)]
+    print(f"[BENCH] {len(interactive)} interactive requests during a {len(alerts)}-customer scan")
+    
+    # One request per second: the scan alone saturates the budget
+    limits = {
+        "LLM_RATE_LIMIT_ENABLED": True,
+        "LLM_REQUESTS_PER_MINUTE": 60,
+        "LLM_RATE_LIMIT_BURST_SECONDS": 1,
+        "DEGRADATION_ENABLED": False
+    }
+    with _settings_overrides(limits):
+        results = [
+            _run_mixed_traffic("fifo", alerts, interactive, "bulk"),
+            _run_mixed_traffic("priority", alerts, interactive, "interactive")
+        ]
+    
+    for result in results:
+        print(f"\n[TRAFFIC] {result['pipeline']}: interactive mean {result['interactive_latency_mean_s']}s "
+              f"(max {result['interactive_latency_max_s']}s), scan wall time {result['scan_wall_time_s']}s")
+        for priority, waits in result["queue_wait"].items():
+            print(f"   {priority:<12} {waits['requests']:>4} calls | avg wait {waits['avg_wait_s']:.2f}s | "
+                  f"p95 {waits['p95_wait_s']:.2f}s | max {waits['max_wait_s']:.2f}s")
+    return {"suite": "traffic", "results": results}
+
+
+SUITES = {
+    "batch": run_batch_suite,
+    "codec": run_codec_suite,
+    "fused": run_fused_suite,
+    "guard": run_guard_suite,
+    "degrade": run_degrade_suite,
+    "traffic": run_traffic_suite,
+    "tiering": run_tiering_suite,
+    "stream": run_stream_suite,
+    "speculative": run_speculative_suite,
+    "skeleton": run_skeleton_suite,
+    "prefetch": run_prefetch_suite
+}
+
+
+def main():
+    """Parse arguments and run the selected benchmark suites."""
+    parser = argparse.ArgumentParser(description="ProCX agent pipeline benchmarks")
+    parser.add_argument("--suite", choices=sorted(SUITES) + ["all"], default="all",
+                        help="Benchmark suite to run")
+    parser.add_argument("--customers", type=int, default=5,
+                        help="Number of at-risk customers in the workload")
+    parser.add_argument("--min-churn-risk", type=float, default=0.6,
+                        help="Minimum churn risk for workload customers")
+    parser.add_argument("--model", default=None,
+                        help="Override LLM_MODEL for all agents (use 'fake' to run offline)")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    if args.model:
+        settings.LLM_MODEL = args.model
+    
+    suites = sorted(SUITES) if args.suite == "all" else [args.suite]
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "model": settings.LLM_MODEL,
+        "suites": [SUITES[name](args) for name in suites]
+    }
+    
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\n[OK] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
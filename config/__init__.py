@@ -1,5 +1,5 @@
 """Config package initialization."""
 from .settings import *
-from .prompts import SYSTEM_PROMPTS
+from .prompts import SYSTEM_PROMPTS, DATA_TEMPLATES
 
-__all__ = ["SYSTEM_PROMPTS"]
+__all__ = ["SYSTEM_PROMPTS", "DATA_TEMPLATES"]
@@ -27,12 +27,133 @@ LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT", "AgentMAX-CX")
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")  # Using GPT-4o for better quality responses
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "2000"))
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))  # Provider minimum prefix length for prompt caching
+# USD per 1M (prompt, completion) tokens; longest matching model-name prefix wins, others use the default
+LLM_PRICES_PER_1M_TOKENS = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00)
+}
+LLM_DEFAULT_PRICE_PER_1M_TOKENS = (
+    float(os.getenv("LLM_PROMPT_PRICE_PER_1M", "2.50")),
+    float(os.getenv("LLM_COMPLETION_PRICE_PER_1M", "10.00"))
+)
 
 # Agent Configuration
-CONTEXT_AGENT_MODEL = os.getenv("CONTEXT_AGENT_MODEL", "gpt-4o")
-PATTERN_AGENT_MODEL = os.getenv("PATTERN_AGENT_MODEL", "gpt-4o")
-DECISION_AGENT_MODEL = os.getenv("DECISION_AGENT_MODEL", "gpt-4o")
-EMPATHY_AGENT_MODEL = os.getenv("EMPATHY_AGENT_MODEL", "gpt-4o")
+CONTEXT_AGENT_MODEL = os.getenv("CONTEXT_AGENT_MODEL", LLM_MODEL)
+PATTERN_AGENT_MODEL = os.getenv("PATTERN_AGENT_MODEL", LLM_MODEL)
+DECISION_AGENT_MODEL = os.getenv("DECISION_AGENT_MODEL", LLM_MODEL)
+EMPATHY_AGENT_MODEL = os.getenv("EMPATHY_AGENT_MODEL", LLM_MODEL)
+FUSED_AGENT_MODEL = os.getenv("FUSED_AGENT_MODEL", DECISION_AGENT_MODEL)
+
+# Pipeline Mode
+# "standard" = separate decision and empathy calls (4-call pipeline)
+# "fused"    = one structured call returns decision + personalized message
+# "speculative" = the message is drafted from the predicted decision while the
+#                 decision call runs, and kept if the actual decision matches
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "standard").lower()
+SPECULATIVE_OFFER_MIN_CHURN = float(os.getenv("SPECULATIVE_OFFER_MIN_CHURN", "0.4"))  # Predict a small discount from here
+SPECULATIVE_MAX_CHURN_RISK = float(os.getenv("SPECULATIVE_MAX_CHURN_RISK", "0.75"))  # Above: approval/escalation likely, no draft
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "8"))
+
+# Message Streaming
+# The customer message is streamed to dashboard clients while it is generated
+# (empathy/fused agent, only when the caller sets a stream sink)
+EMPATHY_STREAMING = os.getenv("EMPATHY_STREAMING", "true").lower() == "true"
+
+# Batch Execution
+# Proactive scans run customers through the workflow on a worker pool
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "0"))  # Runs in flight + awaiting the consumer (0 = 2 x workers)
+
+# Scan Checkpoints (per-customer, per-stage state under DATA_DIR/scans; restarted scans resume)
+SCAN_CHECKPOINTS_ENABLED = os.getenv("SCAN_CHECKPOINTS_ENABLED", "true").lower() == "true"
+SCAN_CHECKPOINT_RETENTION_DAYS = int(os.getenv("SCAN_CHECKPOINT_RETENTION_DAYS", "7"))  # Completed scans kept this long
+
+# Sharded Scans (main.py --shards: scoring and workflows in worker processes, customers split by customer_id hash)
+SCAN_SHARDS = int(os.getenv("SCAN_SHARDS", "0"))  # Worker processes (0 = one per CPU core)
+
+# Pipelined Scans (main.py --pipelined: agent workers start on alerts while scoring continues)
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", "10"))  # Customers scored per chunk before its alerts are queued
+SCAN_PIPELINE_QUEUE_SIZE = int(os.getenv("SCAN_PIPELINE_QUEUE_SIZE", "0"))  # Queued alerts awaiting a worker (0 = max interventions)
+
+# Intervention Scheduling (scans pick customers by value at risk and intervention-window deadline)
+INTERVENTION_SCHEDULER_ENABLED = os.getenv("INTERVENTION_SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_MODEL_BUDGET_S = float(os.getenv("SCHEDULER_MODEL_BUDGET_S", "0"))  # Model-seconds one scan may plan for (0 = unlimited)
+SCHEDULER_EST_MODEL_S = float(os.getenv("SCHEDULER_EST_MODEL_S", "8.0"))  # Model-seconds per customer until runs have been measured
+SCHEDULER_DUE_DAYS = int(os.getenv("SCHEDULER_DUE_DAYS", "7"))  # Customers whose window closes within this are scheduled first
+
+# Scan Budgets (a scan stops admitting customers once projected tokens, cost or time would exceed a limit; 0 = no limit)
+SCAN_TOKEN_BUDGET = int(os.getenv("SCAN_TOKEN_BUDGET", "0"))  # Prompt + completion tokens per scan
+SCAN_COST_BUDGET = float(os.getenv("SCAN_COST_BUDGET", "0"))  # USD per scan (LLM_PRICES_PER_1M_TOKENS)
+SCAN_DEADLINE_S = float(os.getenv("SCAN_DEADLINE_S", "0"))  # Wall-clock seconds from scan start
+SCAN_BUDGET_EST_RUN_TOKENS = int(os.getenv("SCAN_BUDGET_EST_RUN_TOKENS", "3000"))  # Per customer until runs have been measured
+SCAN_BUDGET_EST_RUN_COST = float(os.getenv("SCAN_BUDGET_EST_RUN_COST", "0.012"))  # Per customer until runs have been measured
+
+# Streaming Scans (results yielded as each customer finishes; see ProCX.iter_proactive_scan)
+SCAN_COMPACT_RESULTS = os.getenv("SCAN_COMPACT_RESULTS", "true").lower() == "true"  # Drop bulky state fields once persisted
+
+# Pattern Agent Analytics Prefetch
+# Local pattern analytics start on a thread pool when a run starts, overlapping
+# the context agent's model call
+PATTERN_PREFETCH_ENABLED = os.getenv("PATTERN_PREFETCH_ENABLED", "true").lower() == "true"
+PATTERN_PREFETCH_WORKERS = int(os.getenv("PATTERN_PREFETCH_WORKERS", "4"))
+
+# Empathy Message Skeleton Cache
+# Proactive campaign messages are generated once per (language, festival, segment,
+# tone, action class, discount bucket) as a skeleton and rendered per customer
+MESSAGE_CACHE_ENABLED = os.getenv("MESSAGE_CACHE_ENABLED", "false").lower() == "true"
+MESSAGE_CACHE_MAX_USES = int(os.getenv("MESSAGE_CACHE_MAX_USES", "20"))  # Renders per skeleton before a new one is written
+MESSAGE_CACHE_VARIANTS = int(os.getenv("MESSAGE_CACHE_VARIANTS", "3"))  # Skeletons kept per key
+MESSAGE_CACHE_MAX_SIMILARITY = float(os.getenv("MESSAGE_CACHE_MAX_SIMILARITY", "0.9"))  # New variants above this are not cached
+
+# Context Agent Rule-Based Fast Path
+# System-generated proactive events are analyzed deterministically; the LLM is
+# only called for free-text events or when rule confidence is below threshold
+CONTEXT_RULES_ENABLED = os.getenv("CONTEXT_RULES_ENABLED", "true").lower() == "true"
+CONTEXT_RULE_MIN_CONFIDENCE = float(os.getenv("CONTEXT_RULE_MIN_CONFIDENCE", "0.6"))
+CONTEXT_RULE_AUDIT_RATE = float(os.getenv("CONTEXT_RULE_AUDIT_RATE", "0.0"))  # Share of rule runs also sent to LLM to measure agreement
+
+# Prompt Token Budgets (total prompt tokens per call)
+# Ranked context sections are compacted lowest-priority first to stay within budget
+PROMPT_TOKEN_BUDGETS = {
+    "context_agent": int(os.getenv("CONTEXT_AGENT_TOKEN_BUDGET", "800")),
+    "pattern_agent": int(os.getenv("PATTERN_AGENT_TOKEN_BUDGET", "1500")),
+    "decision_agent": int(os.getenv("DECISION_AGENT_TOKEN_BUDGET", "1200")),
+    "empathy_agent": int(os.getenv("EMPATHY_AGENT_TOKEN_BUDGET", "1200")),
+    "fused_agent": int(os.getenv("FUSED_AGENT_TOKEN_BUDGET", "1800"))
+}
+TOKEN_TELEMETRY_LOG = os.getenv("TOKEN_TELEMETRY_LOG", "false").lower() == "true"  # Per-call JSONL in logs/
+
+# Tracing (OpenTelemetry spans per workflow stage, LLM call, prompt build, parse and analytics)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()  # none (in-process stats only), console, file
+TRACING_FILE = LOGS_DIR / os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "procx")
+
+# Structured Output Parsing
+# Malformed agent JSON gets at most one short repair call (never a full re-run)
+RESPONSE_REPAIR_ENABLED = os.getenv("RESPONSE_REPAIR_ENABLED", "true").lower() == "true"
+
+# Fake Chat Model (LLM_MODEL=fake runs the pipeline offline and deterministically)
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "42"))
+FAKE_LLM_LATENCY_SCALE = float(os.getenv("FAKE_LLM_LATENCY_SCALE", "1.0"))  # 0 = no simulated latency
+FAKE_LLM_LATENCY = {  # (median, p95) seconds to first token, lognormal
+    "context_agent": (0.6, 1.5),
+    "pattern_agent": (1.2, 3.0),
+    "decision_agent": (1.0, 2.5),
+    "empathy_agent": (1.0, 2.5),
+    "fused_agent": (1.4, 3.5),
+    "default": (0.5, 1.2)
+}
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "80"))
+FAKE_LLM_SMALL_MODEL_SPEEDUP = float(os.getenv("FAKE_LLM_SMALL_MODEL_SPEEDUP", "2.5"))  # "mini"/"small" model names
+FAKE_LLM_STRAGGLER_RATE = float(os.getenv("FAKE_LLM_STRAGGLER_RATE", "0.0"))  # Share of calls hit by a slow provider
+FAKE_LLM_STRAGGLER_FACTOR = float(os.getenv("FAKE_LLM_STRAGGLER_FACTOR", "10"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0.0"))  # Share of calls raising a provider error
+FAKE_LLM_MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0.0"))  # Share of responses with truncated JSON
+
+# State Serialization (checkpoints, memory store and scan worker IPC)
+# "msgpack" = compact versioned binary (utils/state_codec.py, needs ormsgpack); "json" = to_dict JSON
+STATE_CODEC = os.getenv("STATE_CODEC", "msgpack").lower()
 
 # Memory Configuration
 MEMORY_MAX_HISTORY = int(os.getenv("MEMORY_MAX_HISTORY", "50"))
@@ -40,7 +161,47 @@ MEMORY_RELEVANCE_THRESHOLD = float(os.getenv("MEMORY_RELEVANCE_THRESHOLD", "0.7"
 
 # Workflow Configuration
 MAX_ITERATIONS = int(os.getenv("MAX_ITERATIONS", "10"))
-TIMEOUT_SECONDS = int(os.getenv("TIMEOUT_SECONDS", "60"))
+TIMEOUT_SECONDS = int(os.getenv("TIMEOUT_SECONDS", "60"))  # Upper bound for any single LLM call
+
+# LLM Call Guard (deadlines, hedged requests, circuit breakers)
+AGENT_TIMEOUT_SECONDS = {  # Per-agent deadline; the agent falls back to rules when it is missed
+    "context_agent": min(TIMEOUT_SECONDS, float(os.getenv("CONTEXT_AGENT_TIMEOUT", "20"))),
+    "pattern_agent": min(TIMEOUT_SECONDS, float(os.getenv("PATTERN_AGENT_TIMEOUT", "30"))),
+    "decision_agent": min(TIMEOUT_SECONDS, float(os.getenv("DECISION_AGENT_TIMEOUT", "30"))),
+    "empathy_agent": min(TIMEOUT_SECONDS, float(os.getenv("EMPATHY_AGENT_TIMEOUT", "30"))),
+    "fused_agent": min(TIMEOUT_SECONDS, float(os.getenv("FUSED_AGENT_TIMEOUT", "45")))
+}
+LLM_CALL_WORKERS = int(os.getenv("LLM_CALL_WORKERS", "32"))
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"  # Duplicate slow calls after p95 latency
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # Latency history needed before hedging
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "1.0"))
+HEDGE_HISTORY_SIZE = int(os.getenv("HEDGE_HISTORY_SIZE", "200"))
+CIRCUIT_BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))  # Consecutive failures to open
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+
+# LLM Traffic Scheduler (client-side rate limits; interactive > vip > bulk)
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_RATE_LIMIT_BURST_SECONDS = float(os.getenv("LLM_RATE_LIMIT_BURST_SECONDS", "10"))  # Max burst = this many seconds of budget
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "400"))  # Reserved per call, corrected after
+LLM_SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv("LLM_SCHEDULER_MAX_WAIT_SECONDS", "120"))  # Then the agent falls back
+
+# Adaptive Degradation (under load: pattern rules -> context rules -> templated empathy)
+DEGRADATION_ENABLED = os.getenv("DEGRADATION_ENABLED", "true").lower() == "true"
+DEGRADE_QUEUE_DEPTH_SLO = int(os.getenv("DEGRADE_QUEUE_DEPTH_SLO", "25"))  # Queued customers
+DEGRADE_STAGE_LATENCY_SLO = {  # p90 LLM call latency (seconds) per agent
+    "context_agent": float(os.getenv("CONTEXT_AGENT_LATENCY_SLO", "8")),
+    "pattern_agent": float(os.getenv("PATTERN_AGENT_LATENCY_SLO", "12")),
+    "decision_agent": float(os.getenv("DECISION_AGENT_LATENCY_SLO", "12")),
+    "empathy_agent": float(os.getenv("EMPATHY_AGENT_LATENCY_SLO", "12")),
+    "fused_agent": float(os.getenv("FUSED_AGENT_LATENCY_SLO", "18"))
+}
+DEGRADE_LATENCY_WINDOW_SECONDS = float(os.getenv("DEGRADE_LATENCY_WINDOW_SECONDS", "120"))
+DEGRADE_MIN_SAMPLES = int(os.getenv("DEGRADE_MIN_SAMPLES", "3"))
+DEGRADE_STEP_SECONDS = float(os.getenv("DEGRADE_STEP_SECONDS", "10"))  # Min time between degrading steps
+DEGRADE_RECOVERY_SECONDS = float(os.getenv("DEGRADE_RECOVERY_SECONDS", "60"))  # Min time before stepping back up
+DEGRADE_RECOVERY_RATIO = float(os.getenv("DEGRADE_RECOVERY_RATIO", "0.7"))  # Recover below this share of the SLOs
 
 # Risk Thresholds
 HIGH_VALUE_CUSTOMER_THRESHOLD = 5000.0
@@ -55,5 +216,19 @@ PRIORITY_MAPPING = {
     "Occasional": "low"
 }
 
+# Model Tiering (small model for low-value, low-risk runs; large for VIP/critical)
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+SMALL_LLM_MODEL = os.getenv("SMALL_LLM_MODEL", "gpt-4o-mini")
+AGENT_SMALL_MODELS = {
+    "context_agent": os.getenv("CONTEXT_AGENT_SMALL_MODEL", SMALL_LLM_MODEL),
+    "pattern_agent": os.getenv("PATTERN_AGENT_SMALL_MODEL", SMALL_LLM_MODEL),
+    "decision_agent": os.getenv("DECISION_AGENT_SMALL_MODEL", SMALL_LLM_MODEL),
+    "empathy_agent": os.getenv("EMPATHY_AGENT_SMALL_MODEL", SMALL_LLM_MODEL),
+    "fused_agent": os.getenv("FUSED_AGENT_SMALL_MODEL", SMALL_LLM_MODEL)
+}
+ROUTING_LARGE_SEGMENTS = ["VIP"]  # Always on the large model
+ROUTING_SMALL_MAX_LTV = float(os.getenv("ROUTING_SMALL_MAX_LTV", str(HIGH_VALUE_CUSTOMER_THRESHOLD)))
+ROUTING_SMALL_MAX_CHURN_RISK = float(os.getenv("ROUTING_SMALL_MAX_CHURN_RISK", "0.8"))  # "critical" from 0.8
+
 # Dataset Configuration
 DATASET_PATH = DATA_DIR / "AgentMAX_CX_dataset.xlsx"  # Original multi-sheet dataset (18 sheets with orders, churn_labels, etc.)
@@ -42,10 +42,11 @@ def cleanup_demo_data():
     """Clean up demo customer data for fresh run"""
     demo_customer_id = "VIP999999"
     
-    # Remove memory files
-    memory_file = Path(f"data/memory/{demo_customer_id}.jsonl")
-    if memory_file.exists():
-        memory_file.unlink()
+    # Remove memory files (JSONL or binary records)
+    for suffix in (".jsonl", ".mpk"):
+        memory_file = Path(f"data/memory/{demo_customer_id}{suffix}")
+        if memory_file.exists():
+            memory_file.unlink()
     
     # Remove escalation files
     escalation_dir = Path("data/escalations")
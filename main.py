@@ -4,19 +4,30 @@ ProCX Platform - Proactive Customer Experience System
 100% proactive multi-agent AI system for customer churn prevention.
 Built for AgentMAX Hackathon 2025.
 """
+import contextvars
+import multiprocessing
+import os
+import queue
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager, nullcontext, redirect_stdout
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Callable, Iterator, Optional, Dict, Any, List, Tuple
 import json
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from models import AgentState, EventType, Customer, CustomerEvent
-from utils import MemoryHandler, ProactiveMonitor
-from workflows import create_cx_workflow, run_workflow
+from utils import MemoryHandler, ProactiveMonitor, PromptStats, ParseStats, CallGuard, DegradationController
+from utils import TrafficScheduler, traffic_priority, classify_traffic, ModelRouter, MessageSkeletonCache
+from utils import ScanCheckpointStore, SpanStats, AlertPriorityQueue, InterventionScheduler, ScanBudget, customer_shard
+from utils import to_wire, from_wire
+from workflows import BatchResult, create_cx_workflow, run_workflow, run_workflow_batch
+from agents import ContextAgent, PatternAgent, SpeculativeDecisionEmpathyAgent
+from agents.decision_agent import mark_state_handled
 from config import settings
 
 
@@ -43,6 +54,7 @@ class ProCX:
         # Initialize components
         self.memory_handler = MemoryHandler()
         self.proactive_monitor = ProactiveMonitor()
+        self.intervention_scheduler = InterventionScheduler(self.proactive_monitor.analytics)
         
         # Create workflow
         print("   Creating proactive workflow with multi-agent system...")
@@ -61,34 +73,9 @@ class ProCX:
         Returns:
             Final agent state after workflow
         """
-        # 🔥 NEW: Check if customer was already contacted today
-        recent_history = self.memory_handler.get_recent_interactions(
-            event.customer.customer_id,
-            days=1  # Last 24 hours
-        )
-        
-        if recent_history:
-            last_interaction = recent_history[0]
-            timestamp = datetime.fromisoformat(last_interaction['timestamp'])
-            hours_ago = (datetime.now() - timestamp).total_seconds() / 3600
-            
-            if hours_ago < 24:
-                if verbose:
-                    print(f"\n{'='*70}")
-                    print(f"[SKIP] Customer already contacted {hours_ago:.1f} hours ago")
-                    print(f"[SKIP] {event.customer.full_name} ({event.customer.customer_id})")
-                    print(f"{'='*70}\n")
-                
-                # Return the previous state instead of re-processing
-                return AgentState(
-                    customer=event.customer,
-                    event=event,
-                    messages=[{
-                        "agent": "duplicate_prevention",
-                        "message": f"Skipped: Already contacted {hours_ago:.1f} hours ago",
-                        "timestamp": datetime.now().isoformat()
-                    }]
-                )
+        skipped = self._check_recent_contact(event, verbose=verbose)
+        if skipped is not None:
+            return skipped
         
         if verbose:
             print(f"\n{'='*70}")
@@ -127,30 +114,165 @@ class ProCX:
                 traceback.print_exc()
             return initial_state
     
+    def _check_recent_contact(self, event: CustomerEvent, verbose: bool = True) -> Optional[AgentState]:
+        """
+        Skip customers contacted in the last 24 hours.
+        
+        Args:
+            event: Customer event to process
+            verbose: Print detailed output
+            
+        Returns:
+            Duplicate-prevention state if the customer is skipped, otherwise None
+        """
+        # 🔥 NEW: Check if customer was already contacted today
+        recent_history = self.memory_handler.get_recent_interactions(
+            event.customer.customer_id,
+            days=1  # Last 24 hours
+        )
+        
+        if recent_history:
+            last_interaction = recent_history[0]
+            timestamp = datetime.fromisoformat(last_interaction['timestamp'])
+            hours_ago = (datetime.now() - timestamp).total_seconds() / 3600
+            
+            if hours_ago < 24:
+                if verbose:
+                    print(f"\n{'='*70}")
+                    print(f"[SKIP] Customer already contacted {hours_ago:.1f} hours ago")
+                    print(f"[SKIP] {event.customer.full_name} ({event.customer.customer_id})")
+                    print(f"{'='*70}\n")
+                
+                # Return the previous state instead of re-processing
+                return AgentState(
+                    customer=event.customer,
+                    event=event,
+                    messages=[{
+                        "agent": "duplicate_prevention",
+                        "message": f"Skipped: Already contacted {hours_ago:.1f} hours ago",
+                        "timestamp": datetime.now().isoformat()
+                    }]
+                )
+        return None
+    
+    @staticmethod
+    def _outcome(state: AgentState) -> str:
+        """Final outcome of a customer run, as recorded in scan checkpoints."""
+        if state.priority_level == "handled":
+            return "handled"
+        return "escalated" if state.escalation_needed else "sent"
+    
+    @classmethod
+    def result_summary(cls, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        JSON-ready summary of one intervention result (e.g. a line of `--jsonl` output).
+        
+        Args:
+            entry: Intervention result yielded by iter_proactive_scan
+            
+        Returns:
+            Customer, risk, outcome (sent, escalated, handled, skipped or
+            failed), action, discount, message and stage timings
+        """
+        customer, alert, state = entry['customer'], entry['alert'], entry['result']
+        if entry.get('error'):
+            outcome = "failed"
+        elif state.messages and state.messages[0].get("agent") == "duplicate_prevention":
+            outcome = "skipped"
+        else:
+            outcome = cls._outcome(state)
+        return {
+            "customer_id": customer.customer_id,
+            "customer_name": customer.full_name,
+            "churn_risk": round(alert['churn_risk'], 4),
+            "health_score": round(alert['health_score'], 4),
+            "outcome": outcome,
+            "recommended_action": state.recommended_action,
+            "discount_applied": state.discount_applied,
+            "priority": state.priority_level,
+            "message": state.personalized_response,
+            "stage_timings": state.metadata.get('stage_timings', {}),
+            "error": entry.get('error')
+        }
+    
     def run_proactive_scan(
         self,
         min_churn_risk: float = 0.6,
         max_interventions: int = 5,
-        verbose: bool = True
+        verbose: bool = True,
+        resume: Optional[str] = None,
+        budget: Optional[ScanBudget] = None
     ) -> list:
         """
         Run proactive scan to identify and intervene with at-risk customers.
         
+        Collects iter_proactive_scan with full final states; callers that
+        handle results one at a time should iterate that instead.
+        
         Args:
             min_churn_risk: Minimum churn risk threshold (0-1)
             max_interventions: Maximum number of interventions to process
             verbose: Print detailed output
-            include_escalation_demo: Add synthetic escalation case for demo
+            resume: Scan ID to resume ("latest" = most recent incomplete
+                scan); its customers and parameters replace the arguments
+            budget: Token, cost and time limits (defaults to the SCAN_*_BUDGET
+                and SCAN_DEADLINE_S settings); customers that would exceed
+                them are deferred and stay resumable
             
         Returns:
-            List of intervention results
+            List of intervention results in completion order (customers
+            finished by an earlier run of a resumed scan, or deferred by the
+            budget, are not included)
         """
+        return list(self.iter_proactive_scan(min_churn_risk, max_interventions, verbose, resume, budget, compact=False))
+    
+    def iter_proactive_scan(
+        self,
+        min_churn_risk: float = 0.6,
+        max_interventions: int = 5,
+        verbose: bool = True,
+        resume: Optional[str] = None,
+        budget: Optional[ScanBudget] = None,
+        compact: Optional[bool] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Run a proactive scan, yielding each intervention as soon as it finishes.
+        
+        Nothing is kept once a result has been yielded, so memory does not
+        grow with the scan. The scan summary is printed (and the budget and
+        checkpoints finished) when the iterator is exhausted or closed; a
+        consumer that stops early leaves the remaining customers resumable.
+        
+        Args:
+            min_churn_risk: Minimum churn risk threshold (0-1)
+            max_interventions: Maximum number of interventions to process
+            verbose: Print detailed output
+            resume: Scan ID to resume (see run_proactive_scan)
+            budget: Token, cost and time limits (see run_proactive_scan)
+            compact: Compact each final state once it is saved to memory
+                (see AgentState.compact; defaults to SCAN_COMPACT_RESULTS)
+                
+        Yields:
+            Intervention result (customer, alert, final state) per customer,
+            in completion order
+        """
+        budget = budget or ScanBudget()
+        if not budget.limited:
+            budget = None
+        checkpoints, min_churn_risk, max_interventions = self._open_resumed_scan(
+            resume, min_churn_risk, max_interventions
+        )
+        
         if verbose:
             print(f"\n{'='*70}")
             print(f"[SCAN] PROACTIVE CUSTOMER SCAN")
             print(f"{'='*70}")
             print(f"Scanning for at-risk customers...")
             print(f"Risk threshold: {min_churn_risk:.0%}")
+            if budget:
+                print(f"Budget: tokens {f'{budget.max_tokens:,}' if budget.max_tokens else 'unlimited'} | "
+                      f"cost {f'${budget.max_cost:.2f}' if budget.max_cost else 'unlimited'} | "
+                      f"deadline {f'{budget.deadline_s:g}s' if budget.deadline_s else 'none'}")
         
         # Detect at-risk customers
         at_risk_customers = self.proactive_monitor.detect_churn_risks(
@@ -160,80 +282,783 @@ class ProCX:
         if verbose:
             print(f"[WARNING] Found {len(at_risk_customers)} at-risk customers requiring intervention!")
         
-        if not at_risk_customers:
+        interventions_to_process, checkpoints, handled_results = self._select_alerts(
+            at_risk_customers, checkpoints, min_churn_risk, max_interventions, verbose
+        )
+        if interventions_to_process is None:
+            return
+        
+        completed = 0
+        try:
+            for entry in handled_results:
+                completed += 1
+                yield entry
+            for _, entry in self._iter_alerts(interventions_to_process, checkpoints, verbose, budget=budget,
+                                              compact=compact):
+                completed += 1
+                yield entry
+        finally:
+            self._finish_scan(completed, checkpoints, verbose, budget=budget)
+    
+    def run_sharded_scan(
+        self,
+        min_churn_risk: float = 0.6,
+        max_interventions: int = 5,
+        shards: Optional[int] = None,
+        verbose: bool = True,
+        resume: Optional[str] = None
+    ) -> list:
+        """
+        Run the proactive scan across worker processes, one per shard.
+        
+        Customers are split into shards by a stable hash of their ID
+        (customer_shard). Every worker scores its shard with ProactiveMonitor;
+        the alerts are merged and the top `max_interventions` are picked as in
+        run_proactive_scan, then each worker runs the workflow for the picked
+        customers of its shard. Workers are forked where the platform allows
+        it, so they share the dataset this process loaded instead of reading
+        it again. Alerts and results cross the process boundary in the
+        state_codec binary format.
+        
+        Args:
+            min_churn_risk: Minimum churn risk threshold (0-1)
+            max_interventions: Maximum number of interventions to process
+            shards: Worker processes (defaults to settings.SCAN_SHARDS, or one per CPU core)
+            verbose: Print detailed output
+            resume: Scan ID to resume ("latest" = most recent incomplete scan)
+            
+        Returns:
+            List of intervention results, in priority order
+        """
+        shards = max(1, shards or settings.SCAN_SHARDS or os.cpu_count() or 1)
+        checkpoints, min_churn_risk, max_interventions = self._open_resumed_scan(
+            resume, min_churn_risk, max_interventions
+        )
+        
+        if verbose:
+            print(f"\n{'='*70}")
+            print(f"[SCAN] PROACTIVE CUSTOMER SCAN ({shards} shards)")
+            print(f"{'='*70}")
+            print(f"Scanning for at-risk customers...")
+            print(f"Risk threshold: {min_churn_risk:.0%}")
+        
+        # Loaded once here; forked workers share it copy-on-write
+        self.proactive_monitor.analytics.preload()
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+        mp_context = multiprocessing.get_context(start_method)
+        progress = mp_context.Queue()
+        summaries = {
+            shard: {"shard": shard, "alerts": 0, "done": 0, "processed": 0, "outcomes": {},
+                    "scoring_s": 0.0, "workflow_s": 0.0, "pid": None}
+            for shard in range(shards)
+        }
+        
+        with ProcessPoolExecutor(max_workers=shards, mp_context=mp_context,
+                                 initializer=_init_shard_worker, initargs=(progress,)) as pool:
+            # Score every shard in parallel and merge the alerts
+            at_risk_customers = []
+            scoring = [pool.submit(_score_shard, shard, shards, min_churn_risk) for shard in range(shards)]
+            for future in as_completed(scoring):
+                shard, payload, elapsed = future.result()
+                alerts = from_wire(payload)
+                at_risk_customers.extend(alerts)
+                summaries[shard].update(alerts=len(alerts), scoring_s=elapsed)
+                if verbose:
+                    print(f"[SHARD {shard}] Scored: {len(alerts)} at-risk customers in {elapsed:.2f}s")
+            at_risk_customers.sort(key=lambda alert: alert['churn_risk'], reverse=True)
+            
             if verbose:
-                print("[OK] No high-risk customers detected at this time.")
-            return []
+                print(f"[WARNING] Found {len(at_risk_customers)} at-risk customers requiring intervention!")
+            
+            interventions_to_process, checkpoints, handled_results = self._select_alerts(
+                at_risk_customers, checkpoints, min_churn_risk, max_interventions, verbose
+            )
+            if interventions_to_process is None:
+                return []
+            
+            # Each shard runs the workflow for its own picked customers
+            shard_alerts: Dict[int, List[Dict[str, Any]]] = {}
+            for alert in interventions_to_process:
+                shard_alerts.setdefault(customer_shard(alert['customer'].customer_id, shards), []).append(alert)
+            
+            scan_id = checkpoints.scan_id if checkpoints else None
+            pending = {
+                pool.submit(_process_shard, shard, to_wire(alerts), scan_id) for shard, alerts in shard_alerts.items()
+            }
+            results_by_id = {}
+            while pending:
+                done, pending = wait(pending, timeout=0.5)
+                self._report_shard_progress(progress, shard_alerts, summaries, verbose)
+                for future in done:
+                    shard_result = future.result()
+                    SpanStats.merge(shard_result['spans'])
+                    ScanCheckpointStore.merge_stats(shard_result['checkpoints'])
+                    InterventionScheduler.merge_stats(shard_result['scheduler'])
+                    summaries[shard_result['shard']].update(
+                        processed=shard_result['processed'],
+                        outcomes=shard_result['outcomes'],
+                        workflow_s=shard_result['elapsed'],
+                        pid=shard_result['pid']
+                    )
+                    for entry in from_wire(shard_result['results']):
+                        results_by_id[entry['customer'].customer_id] = entry
+        
+        results = handled_results + [
+            results_by_id[alert['customer'].customer_id] for alert in interventions_to_process
+            if alert['customer'].customer_id in results_by_id
+        ]
+        self._finish_scan(len(results), checkpoints, verbose, shard_summaries=[
+            summaries[shard] for shard in sorted(shard_alerts)
+        ])
+        return results
+    
+    def run_pipelined_scan(
+        self,
+        min_churn_risk: float = 0.6,
+        max_interventions: int = 5,
+        workers: Optional[int] = None,
+        verbose: bool = True
+    ) -> list:
+        """
+        Run the proactive scan with scoring and agent processing overlapped.
+        
+        A producer scores customers in chunks (ProactiveMonitor.iter_churn_risks)
+        and queues each chunk's alerts in an AlertPriorityQueue while agent
+        workers take the riskiest queued alert and run it through the workflow,
+        so the first intervention does not wait for the whole book to be
+        scored. Unlike run_proactive_scan, the `max_interventions` customers
+        are the riskiest found by the time a worker is free, not the riskiest
+        of the whole scan; scoring stops once every slot is taken.
+        
+        Args:
+            min_churn_risk: Minimum churn risk threshold (0-1)
+            max_interventions: Maximum number of interventions to process
+            workers: Agent worker threads (defaults to settings.BATCH_WORKERS)
+            verbose: Print detailed output
+            
+        Returns:
+            List of intervention results, in completion order
+        """
+        workers = max(1, workers or settings.BATCH_WORKERS)
+        
+        if verbose:
+            print(f"\n{'='*70}")
+            print(f"[SCAN] PROACTIVE CUSTOMER SCAN (pipelined, {workers} workers)")
+            print(f"{'='*70}")
+            print(f"Scanning for at-risk customers...")
+            print(f"Risk threshold: {min_churn_risk:.0%}")
+        
+        checkpoints = None
+        if settings.SCAN_CHECKPOINTS_ENABLED:
+            checkpoints = ScanCheckpointStore.create(
+                {"min_churn_risk": min_churn_risk, "max_interventions": max_interventions}, []
+            )
+            if verbose:
+                print(f"[CHECKPOINT] Scan {checkpoints.scan_id} (resume with --resume {checkpoints.scan_id})")
+        
+        # A slot is used up only when a worker takes an alert, not while it waits for one
+        alert_queue = AlertPriorityQueue(settings.SCAN_PIPELINE_QUEUE_SIZE or max_interventions,
+                                         max_taken=max_interventions)
+        finished = queue.Queue()  # (alert, batch result, skipped state); None when a worker stops
+        pipeline = {"handled": [], "scored_s": None}  # Alerts removed by the bulk escalation gate
+        started = time.monotonic()
         
-        # Process top N interventions
-        interventions_to_process = at_risk_customers[:max_interventions]
+        def produce():
+            try:
+                for chunk in self.proactive_monitor.iter_churn_risks(min_churn_risk=min_churn_risk):
+                    if alert_queue.exhausted:
+                        break
+                    chunk, handled = self.proactive_monitor.split_escalated_alerts(chunk)
+                    pipeline["handled"].extend(handled)
+                    for alert in chunk:
+                        alert_queue.put(alert)
+                    DegradationController.report_queue_depth(len(alert_queue))
+            finally:
+                pipeline["scored_s"] = time.monotonic() - started
+                alert_queue.close()
+        
+        def consume():
+            try:
+                while True:
+                    alert = alert_queue.get()
+                    if alert is None:
+                        return
+                    
+                    if checkpoints:
+                        checkpoints.add_customer(alert['customer'].customer_id)
+                    initial_state, skipped = self._prepare_run(alert, checkpoints, verbose)
+                    if skipped is not None:
+                        finished.put((alert, None, skipped))
+                        continue
+                    
+                    run_started = time.monotonic()
+                    try:
+                        with self._run_context(initial_state):
+                            final_state = run_workflow(self.workflow, initial_state)
+                        batch_result = BatchResult(0, final_state, elapsed=time.monotonic() - run_started)
+                    except Exception as e:
+                        batch_result = BatchResult(0, initial_state, error=e, elapsed=time.monotonic() - run_started)
+                    finished.put((alert, batch_result, None))
+            finally:
+                finished.put(None)
         
         results = []
+        first_result_s = None
+        executor = ThreadPoolExecutor(max_workers=workers + 1, thread_name_prefix="pipelined-scan")
+        try:
+            producer = executor.submit(contextvars.copy_context().run, produce)
+            for _ in range(workers):
+                executor.submit(contextvars.copy_context().run, consume)
+            
+            active = workers
+            while active:
+                item = finished.get()
+                if item is None:
+                    active -= 1
+                    continue
+                
+                alert, batch_result, skipped = item
+                if skipped is not None:
+                    results.append({'customer': alert['customer'], 'alert': alert, 'result': skipped})
+                    continue
+                if first_result_s is None:
+                    first_result_s = time.monotonic() - started
+                results.append(self._record_run(f"#{len(results) + 1}", alert, batch_result, checkpoints, verbose))
+            producer.result()
+        finally:
+            alert_queue.close()
+            executor.shutdown(wait=True)
+            DegradationController.report_queue_depth(0)
+        results.extend(self._handled_result(alert, checkpoints) for alert in pipeline["handled"])
         
-        for idx, alert in enumerate(interventions_to_process, 1):
-            customer = alert['customer']
+        if verbose:
+            queue_stats = alert_queue.stats
+            first = f"{first_result_s:.2f}s" if first_result_s is not None else "n/a"
+            print(f"\n[PIPELINE] First intervention after {first}, scoring stopped after {pipeline['scored_s']:.2f}s "
+                  f"| {queue_stats['queued']} alerts queued, {queue_stats['taken']} taken, "
+                  f"{queue_stats['displaced']} displaced by riskier alerts, {queue_stats['dropped']} dropped "
+                  f"| {len(pipeline['handled'])} already with a human")
+        
+        self._finish_scan(len(results), checkpoints, verbose)
+        return results
+    
+    @staticmethod
+    def _report_shard_progress(progress, shard_alerts: Dict[int, List[Dict[str, Any]]],
+                               summaries: Dict[int, Dict[str, Any]], verbose: bool):
+        """Print customers finished by scan workers since the last call."""
+        while True:
+            try:
+                shard, customer_id, outcome = progress.get_nowait()
+            except queue.Empty:
+                return
+            summary = summaries[shard]
+            summary['done'] += 1
+            if verbose:
+                print(f"[SHARD {shard}] {summary['done']}/{len(shard_alerts[shard])} done - "
+                      f"{customer_id}: {outcome}")
+    
+    def _open_resumed_scan(
+        self,
+        resume: Optional[str],
+        min_churn_risk: float,
+        max_interventions: int
+    ) -> Tuple[Optional[ScanCheckpointStore], float, int]:
+        """
+        Open the checkpoints of a scan to resume.
+        
+        Args:
+            resume: Scan ID to resume ("latest" = most recent incomplete scan), or None
+            min_churn_risk: Risk threshold requested for a new scan
+            max_interventions: Intervention limit requested for a new scan
+            
+        Returns:
+            Tuple of (checkpoint store or None, risk threshold, intervention
+            limit) - a resumed scan keeps its own parameters
+        """
+        if not resume:
+            return None, min_churn_risk, max_interventions
+        
+        checkpoints = ScanCheckpointStore.latest_incomplete() if resume == "latest" else ScanCheckpointStore.open(resume)
+        if checkpoints is None:
+            print(f"[WARN] No scan checkpoint to resume ({resume}) - starting a new scan")
+            return None, min_churn_risk, max_interventions
+        
+        params = checkpoints.manifest['params']
+        return checkpoints, params['min_churn_risk'], params['max_interventions']
+    
+    def _select_alerts(
+        self,
+        at_risk_customers: List[Dict[str, Any]],
+        checkpoints: Optional[ScanCheckpointStore],
+        min_churn_risk: float,
+        max_interventions: int,
+        verbose: bool = True
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[ScanCheckpointStore], List[Dict[str, Any]]]:
+        """
+        Pick the alerts a scan processes and start its checkpoints.
+        
+        New scans take the customers planned by the InterventionScheduler
+        (or the riskiest ones when it is disabled). Customers already with a
+        human agent are removed first and get a `handled` result instead.
+        
+        Args:
+            at_risk_customers: Alerts from detect_churn_risks, highest risk first
+            checkpoints: Checkpoints of a resumed scan, or None for a new scan
+            min_churn_risk: Risk threshold (recorded for resuming)
+            max_interventions: Maximum number of interventions to process
+            verbose: Print detailed output
             
+        Returns:
+            Tuple of (alerts to process, or None if nothing is at risk, the
+            scan's checkpoint store, and the `handled` intervention results
+            of a new scan's escalated customers)
+        """
+        # Skip customers already with a human agent before any LLM calls
+        # (a resumed scan keeps its own customers; the workflow gate handles escalations)
+        scanned_alerts = at_risk_customers
+        at_risk_customers, handled = self.proactive_monitor.split_escalated_alerts(at_risk_customers)
+        
+        if verbose and handled:
+            print(f"[HANDLED] {len(handled)} customers already escalated - human agent handling:")
+            for alert in handled[:5]:
+                customer = alert['customer']
+                print(f"   - {customer.full_name} ({customer.customer_id}): {alert['escalation']['reason']}")
+        
+        if checkpoints is not None:
+            alerts_by_id = {alert['customer'].customer_id: alert for alert in scanned_alerts}
+            finished = checkpoints.completed_customers()
+            customer_ids = checkpoints.manifest['customer_ids']
+            interventions_to_process = [
+                alerts_by_id[customer_id] for customer_id in customer_ids
+                if customer_id in alerts_by_id and customer_id not in finished
+            ]
+            if verbose:
+                print(f"[RESUME] Scan {checkpoints.scan_id}: {len(finished)}/{len(customer_ids)} customers already "
+                      f"completed, {len(interventions_to_process)} to resume")
+            return interventions_to_process, checkpoints, []
+        
+        if not at_risk_customers and not handled:
             if verbose:
-                print(f"\n{'='*70}")
-                print(f"[TARGET] PROACTIVE INTERVENTION #{idx}/{len(interventions_to_process)}")
-                print(f"{'='*70}")
-                print(f"[CUSTOMER] {customer.full_name} ({customer.customer_id})")
-                print(f"   Segment: {customer.segment} | Tier: {customer.loyalty_tier}")
-                print(f"   Lifetime Value: ${customer.lifetime_value:,.2f}")
-                print(f"\n[ANALYSIS] Health Analysis:")
-                health_status = "[CRITICAL]" if alert['health_score'] < 0.4 else "[WARNING]" if alert['health_score'] < 0.6 else "[OK]"
-                risk_status = "[CRITICAL]" if alert['churn_risk'] > 0.7 else "[WARNING]" if alert['churn_risk'] > 0.5 else "[OK]"
-                print(f"   Health Score: {alert['health_score']*100:.1f}% {health_status}")
-                print(f"   Churn Risk: {alert['churn_risk']*100:.1f}% {risk_status}")
-                print(f"   Risk Level: {alert['risk_level'].upper()}")
-            
-            # Create proactive event
-            event_type = EventType.PROACTIVE_RETENTION if alert['churn_risk'] >= 0.7 else EventType.PROACTIVE_CHECK_IN
-            
-            event = CustomerEvent(
-                event_id=f"PROACTIVE_{customer.customer_id}_{int(time.time())}",
-                customer=customer,
-                event_type=event_type,
-                timestamp=datetime.now(),
-                description=f"Proactive intervention - churn risk: {alert['churn_risk']:.1%}",
-                metadata=alert
+                print("[OK] No high-risk customers detected at this time.")
+            return None, None, []
+        
+        if settings.INTERVENTION_SCHEDULER_ENABLED:
+            # Most value at risk with the nearest window deadline first; the rest wait for a later scan
+            interventions_to_process, deferred = self.intervention_scheduler.plan(at_risk_customers, max_interventions)
+            if verbose and deferred:
+                due = sum(1 for alert in deferred if alert['schedule']['due'])
+                print(f"[SCHEDULE] {len(interventions_to_process)} scheduled by value at risk and deadline, "
+                      f"{len(deferred)} deferred to a later scan ({due} with their window closing)")
+        else:
+            # Process top N interventions
+            interventions_to_process = at_risk_customers[:max_interventions]
+        if settings.SCAN_CHECKPOINTS_ENABLED:
+            checkpoints = ScanCheckpointStore.create(
+                {"min_churn_risk": min_churn_risk, "max_interventions": max_interventions},
+                [alert['customer'].customer_id for alert in handled + interventions_to_process]
             )
+            if verbose:
+                print(f"[CHECKPOINT] Scan {checkpoints.scan_id} (resume with --resume {checkpoints.scan_id})")
+        return interventions_to_process, checkpoints, [self._handled_result(alert, checkpoints) for alert in handled]
+    
+    def _handled_result(self, alert: Dict[str, Any], checkpoints: Optional[ScanCheckpointStore]) -> Dict[str, Any]:
+        """
+        Intervention result of a customer removed by the bulk escalation gate.
+        
+        Args:
+            alert: Handled alert from split_escalated_alerts (with its 'escalation' skip decision)
+            checkpoints: Checkpoint store of the scan, or None
             
-            # Process through workflow
-            result = self.process_proactive_event(event, verbose=verbose)
-            results.append({
-                'customer': customer,
-                'alert': alert,
-                'result': result
-            })
+        Returns:
+            Intervention result with the same `handled` state the workflow gate gives
+        """
+        customer = alert['customer']
+        initial_state = AgentState(customer=customer, event=self._alert_event(alert), messages=[])
+        state = mark_state_handled(initial_state, alert['escalation'], agent="escalation_gate")
+        if checkpoints:
+            checkpoints.add_customer(customer.customer_id)
+            checkpoints.complete_customer(customer.customer_id, "handled")
+        return {'customer': customer, 'alert': alert, 'result': state}
+    
+    def _process_alerts(
+        self,
+        interventions_to_process: List[Dict[str, Any]],
+        checkpoints: Optional[ScanCheckpointStore],
+        verbose: bool = True,
+        on_result: Optional[Callable[[str, str], None]] = None,
+        budget: Optional[ScanBudget] = None
+    ) -> list:
+        """
+        Run the selected customers through the workflow on the worker pool.
+        
+        Args:
+            interventions_to_process: Alerts to process, in priority order
+            checkpoints: Checkpoint store of the scan, or None
+            verbose: Print detailed output
+            on_result: Called with (customer ID, outcome) as each customer finishes
+            budget: Token, cost and time limits of the scan
             
-            if verbose and result.personalized_response:
-                print(f"\n[ACTION] Recommended Action: {result.recommended_action}")
+        Returns:
+            List of intervention results in the order of the alerts
+        """
+        results = sorted(self._iter_alerts(interventions_to_process, checkpoints, verbose, on_result, budget),
+                         key=lambda item: item[0])
+        return [entry for _, entry in results]
+    
+    def _iter_alerts(
+        self,
+        interventions_to_process: List[Dict[str, Any]],
+        checkpoints: Optional[ScanCheckpointStore],
+        verbose: bool = True,
+        on_result: Optional[Callable[[str, str], None]] = None,
+        budget: Optional[ScanBudget] = None,
+        compact: Optional[bool] = False
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Run the selected customers through the workflow, yielding each as it finishes.
+        
+        Customers are started as workers free up. With a budget, each one
+        must be admitted first; once the budget refuses a customer, runs in
+        flight finish and the rest are deferred.
+        
+        Args:
+            interventions_to_process: Alerts to process, in priority order
+            checkpoints: Checkpoint store of the scan, or None
+            verbose: Print detailed output
+            on_result: Called with (customer ID, outcome) as each customer finishes
+            budget: Token, cost and time limits of the scan
+            compact: Compact final states once saved (None = SCAN_COMPACT_RESULTS)
+            
+        Yields:
+            Tuple of (position in interventions_to_process, intervention result)
+        """
+        total = len(interventions_to_process)
+        compact = settings.SCAN_COMPACT_RESULTS if compact is None else compact
+        
+        skipped_results = []  # Contacted recently: reported before the next finished run
+        batch_slots = []  # Position in interventions_to_process of each batched state
+        remaining = [total]
+        
+        def initial_states():
+            for idx, alert in enumerate(interventions_to_process):
+                customer_id = alert['customer'].customer_id
+                if budget and not budget.admit(customer_id):
+                    remaining[0] -= 1
+                    continue
                 
-                # Show what agent DID (not just recommended)
-                if result.discount_applied:
-                    if result.discount_auto_approved:
-                        print(f"[EXECUTED] Applied {result.discount_applied}% discount to customer account")
-                    else:
-                        print(f"[PENDING] {result.discount_applied}% discount queued for human approval")
+                initial_state, skipped = self._prepare_run(alert, checkpoints, verbose)
+                if skipped is not None:
+                    if budget:
+                        budget.release(customer_id)
+                    skipped_results.append((idx, {'customer': alert['customer'], 'alert': alert, 'result': skipped}))
+                    remaining[0] -= 1
+                    if on_result:
+                        on_result(customer_id, "skipped")
+                    continue
                 
-                if result.escalation_needed:
-                    print(f"[ESCALATED] Case assigned to human agent (Priority: {result.priority_level})")
-                    print(f"[CONTEXT] Agent prepared: {result.recommended_action[:100]}...")
+                batch_slots.append(idx)
+                yield initial_state
+        
+        run_context = self._run_context
+        if budget:
+            @contextmanager
+            def run_context(state: AgentState):
+                with self._run_context(state), budget.meter(state.customer.customer_id):
+                    yield
+        
+        # Process through workflow on the worker pool, reporting each run as it finishes
+        # (with a budget, customers are admitted only when a worker is about to take them)
+        try:
+            for batch_result in run_workflow_batch(self.workflow, initial_states(), run_context=run_context,
+                                                   queue_size=settings.BATCH_WORKERS if budget else None):
+                remaining[0] -= 1
+                DegradationController.report_queue_depth(remaining[0])
+                while skipped_results:
+                    yield skipped_results.pop(0)
+            
+                idx = batch_slots[batch_result.index]
+                if budget:
+                    budget.settle(interventions_to_process[idx]['customer'].customer_id,
+                                  batch_result.state if batch_result.error is None else None)
+                entry = self._record_run(
+                    f"#{idx + 1}/{total}", interventions_to_process[idx], batch_result, checkpoints, verbose, on_result
+                )
+                # Saved to memory and checkpointed: the consumer only needs the outcome
+                if compact and batch_result.error is None:
+                    entry['result'].compact()
+                yield idx, entry
+        finally:
+            DegradationController.report_queue_depth(0)
+        yield from skipped_results
+    
+    def _prepare_run(
+        self,
+        alert: Dict[str, Any],
+        checkpoints: Optional[ScanCheckpointStore],
+        verbose: bool = True
+    ) -> Tuple[Optional[AgentState], Optional[AgentState]]:
+        """
+        Create the proactive event and initial workflow state of one alert.
+        
+        Args:
+            alert: At-risk customer alert
+            checkpoints: Checkpoint store of the scan, or None
+            verbose: Print detailed output
+            
+        Returns:
+            Tuple of (initial state, None), or (None, duplicate-prevention
+            state) if the customer was contacted in the last 24 hours
+        """
+        customer = alert['customer']
+        event = self._alert_event(alert)
+        
+        skipped = self._check_recent_contact(event, verbose=verbose)
+        if skipped is not None:
+            if checkpoints:
+                checkpoints.complete_customer(customer.customer_id, "skipped")
+            return None, skipped
+        
+        initial_state = AgentState(customer=customer, event=event, messages=[])
+        return (checkpoints.attach(initial_state) if checkpoints else initial_state), None
+    
+    @staticmethod
+    def _alert_event(alert: Dict[str, Any]) -> CustomerEvent:
+        """Proactive event of an at-risk customer alert."""
+        customer = alert['customer']
+        event_type = EventType.PROACTIVE_RETENTION if alert['churn_risk'] >= 0.7 else EventType.PROACTIVE_CHECK_IN
+        
+        return CustomerEvent(
+            event_id=f"PROACTIVE_{customer.customer_id}_{int(time.time())}",
+            customer=customer,
+            event_type=event_type,
+            timestamp=datetime.now(),
+            description=f"Proactive intervention - churn risk: {alert['churn_risk']:.1%}",
+            metadata=alert
+        )
+    
+    @staticmethod
+    def _run_context(state: AgentState):
+        """Traffic priority of a customer's workflow run."""
+        return traffic_priority(classify_traffic(state.customer, state.event.metadata))
+    
+    def _record_run(
+        self,
+        label: str,
+        alert: Dict[str, Any],
+        batch_result: BatchResult,
+        checkpoints: Optional[ScanCheckpointStore],
+        verbose: bool = True,
+        on_result: Optional[Callable[[str, str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Store and report one finished workflow run.
+        
+        Args:
+            label: Position shown in the report (e.g. "#3/10")
+            alert: At-risk customer alert of the run
+            batch_result: Outcome of the run
+            checkpoints: Checkpoint store of the scan, or None
+            verbose: Print detailed output
+            on_result: Called with (customer ID, outcome)
+            
+        Returns:
+            Intervention result (customer, alert, final state, and the error
+            of a failed run)
+        """
+        customer = alert['customer']
+        result = batch_result.state
+        
+        if batch_result.error is None:
+            # Store in memory
+            self.memory_handler.save_interaction(result)
+            InterventionScheduler.record_result(alert, result)
+            if checkpoints:
+                checkpoints.complete_customer(customer.customer_id, self._outcome(result))
+        if on_result:
+            on_result(customer.customer_id, self._outcome(result) if batch_result.error is None else "failed")
+        
+        if verbose:
+            print(f"\n{'='*70}")
+            print(f"[TARGET] PROACTIVE INTERVENTION {label}")
+            print(f"{'='*70}")
+            print(f"[CUSTOMER] {customer.full_name} ({customer.customer_id})")
+            print(f"   Segment: {customer.segment} | Tier: {customer.loyalty_tier}")
+            print(f"   Lifetime Value: ${customer.lifetime_value:,.2f}")
+            print(f"\n[ANALYSIS] Health Analysis:")
+            health_status = "[CRITICAL]" if alert['health_score'] < 0.4 else "[WARNING]" if alert['health_score'] < 0.6 else "[OK]"
+            risk_status = "[CRITICAL]" if alert['churn_risk'] > 0.7 else "[WARNING]" if alert['churn_risk'] > 0.5 else "[OK]"
+            print(f"   Health Score: {alert['health_score']*100:.1f}% {health_status}")
+            print(f"   Churn Risk: {alert['churn_risk']*100:.1f}% {risk_status}")
+            print(f"   Risk Level: {alert['risk_level'].upper()}")
+            if batch_result.error is not None:
+                print(f"\n[ERROR] Error processing event: {str(batch_result.error)}")
+            else:
+                print(f"\n[TIME] Processing time: {batch_result.elapsed:.2f} seconds")
+                timings = result.metadata.get('stage_timings', {})
+                if timings:
+                    print("[STAGES] " + " | ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+        
+        if verbose and result.personalized_response:
+            print(f"\n[ACTION] Recommended Action: {result.recommended_action}")
+            
+            # Show what agent DID (not just recommended)
+            if result.discount_applied:
+                if result.discount_auto_approved:
+                    print(f"[EXECUTED] Applied {result.discount_applied}% discount to customer account")
                 else:
-                    print(f"[COMPLETED] Automated intervention executed successfully")
-                
-                print(f"[MESSAGE] Personalized Message:")
-                # Use safe_print for response that may contain Unicode
-                response_preview = f"   {result.personalized_response[:200]}..."
-                safe_print(response_preview)
+                    print(f"[PENDING] {result.discount_applied}% discount queued for human approval")
+            
+            if result.escalation_needed:
+                print(f"[ESCALATED] Case assigned to human agent (Priority: {result.priority_level})")
+                print(f"[CONTEXT] Agent prepared: {result.recommended_action[:100]}...")
+            else:
+                print(f"[COMPLETED] Automated intervention executed successfully")
+            
+            print(f"[MESSAGE] Personalized Message:")
+            # Use safe_print for response that may contain Unicode
+            response_preview = f"   {result.personalized_response[:200]}..."
+            safe_print(response_preview)
+        
+        entry = {'customer': customer, 'alert': alert, 'result': result}
+        if batch_result.error is not None:
+            entry['error'] = str(batch_result.error)
+        return entry
+    
+    def _finish_scan(
+        self,
+        completed: int,
+        checkpoints: Optional[ScanCheckpointStore],
+        verbose: bool = True,
+        shard_summaries: Optional[List[Dict[str, Any]]] = None,
+        budget: Optional[ScanBudget] = None
+    ):
+        """
+        Complete the scan's checkpoints and print the scan summary.
+        
+        Args:
+            completed: Intervention results the scan produced
+            checkpoints: Checkpoint store of the scan, or None
+            verbose: Print detailed output
+            shard_summaries: Per-shard outcomes of a sharded scan
+            budget: Budget of the scan (its processed vs deferred report is printed)
+        """
+        budget_report = budget.finish() if budget else None
+        if checkpoints:
+            progress = checkpoints.get_progress()
+            if progress['completed'] == progress['customers']:
+                checkpoints.complete()
         
         if verbose:
             print(f"\n{'='*70}")
-            print(f"[OK] Completed {len(results)} proactive interventions")
+            print(f"[OK] Completed {completed} proactive interventions")
+            
+            for summary in shard_summaries or []:
+                outcomes = ", ".join(f"{outcome}={count}" for outcome, count in sorted(summary['outcomes'].items()))
+                print(f"[SHARD {summary['shard']}] {summary['alerts']} at risk, "
+                      f"{summary['processed']} processed ({outcomes or 'none'}) | scoring {summary['scoring_s']:.2f}s, "
+                      f"workflows {summary['workflow_s']:.2f}s (pid {summary['pid']})")
+            
+            if budget_report:
+                limits = budget_report['limits']
+                projected = budget_report['projected_run']
+                stopped = f"stopped by {budget_report['stop_reason']}" if budget_report['stop_reason'] else "within budget"
+                token_limit = f"{limits['tokens']:,}" if limits['tokens'] else "unlimited"
+                cost_limit = f"${limits['cost']:.2f}" if limits['cost'] else "unlimited"
+                deadline = f"{limits['deadline_s']:g}s" if limits['deadline_s'] else "no deadline"
+                print(f"[BUDGET] {budget_report['processed']} processed, {budget_report['deferred']} deferred ({stopped}) "
+                      f"| {budget_report['tokens']:,}/{token_limit} tokens, ${budget_report['cost']:.4f}/{cost_limit}, "
+                      f"{budget_report['elapsed_s']:.1f}s/{deadline} | projected per customer: "
+                      f"{projected['tokens']:,} tokens, ${projected['cost']:.4f}, {projected['seconds']:.2f}s "
+                      f"({projected['source']} averages)")
+                if budget_report['deferred'] and checkpoints:
+                    print(f"[BUDGET] Deferred customers stay pending - resume with --resume {checkpoints.scan_id}")
+            
+            if checkpoints:
+                checkpoint_stats = ScanCheckpointStore.get_checkpoint_stats()
+                print(f"[CHECKPOINT] Scan {checkpoints.scan_id}: {progress['completed']}/{progress['customers']} customers done "
+                      f"| {checkpoint_stats['stages_recorded']} stages checkpointed, "
+                      f"{checkpoint_stats['stages_skipped']} restored without re-running")
+            
+            schedule = InterventionScheduler.get_scheduler_stats()
+            if schedule['plans']:
+                per_model_s = schedule['value_per_model_s']
+                print(f"[SCHEDULE] {schedule['scheduled']} scheduled (${schedule['value_scheduled']:,.2f} at risk), "
+                      f"{schedule['deferred']} deferred ({schedule['deferred_due']} due) | expected value saved "
+                      f"${schedule['value_saved']:,.2f} in {schedule['model_s']:.2f} model-s "
+                      f"({f'${per_model_s:,.2f}' if per_model_s is not None else 'n/a'} per model-s)")
+            
+            context_stats = ContextAgent.get_rule_stats()
+            if context_stats['rule_runs'] or context_stats['llm_runs']:
+                agreement = context_stats['agreement_rate']
+                print(f"[CONTEXT] Rule fast path: {context_stats['rule_runs']} | LLM: {context_stats['llm_runs']} "
+                      f"({context_stats['rule_ratio']:.0%} rule-based, agreement: "
+                      f"{f'{agreement:.0%}' if agreement is not None else 'n/a'})")
+            
+            node_spans = SpanStats.get_span_stats("node.")
+            if node_spans:
+                llm_spans = SpanStats.get_span_stats("llm.")
+                print("[SPANS] " + " | ".join(
+                    f"{name[len('node.'):]} {stats['mean_s']:.2f}s (p95 {stats['p95_s']:.2f}s)"
+                    for name, stats in node_spans.items()
+                ) + (f" | LLM calls {llm_spans['llm.call']['total_s']:.2f}s total" if 'llm.call' in llm_spans else ""))
+            
+            prefetch = PatternAgent.get_prefetch_stats()
+            if prefetch['runs']:
+                print(f"[PREFETCH] Pattern analytics prefetched for {prefetch['runs']} runs | "
+                      f"{prefetch['background_s']:.2f}s computed in background, {prefetch['wait_s']:.2f}s waited "
+                      f"({prefetch['hidden_ratio']:.0%} hidden)")
+            
+            for agent, prompt_stats in PromptStats.get_prompt_stats().items():
+                print(f"[PROMPT] {agent}: prefix {prompt_stats['prefix_hash']} "
+                      f"({prompt_stats['prefix_tokens']} tok, {prompt_stats['prefix_variants']} variant) + "
+                      f"{prompt_stats['avg_data_tokens']:.0f} data tok | cache hits: {prompt_stats['cache_hit_rate']:.0%}")
+                print(f"[TOKENS] {agent}: avg {prompt_stats['avg_prompt_tokens']:.0f} prompt / "
+                      f"{prompt_stats['avg_completion_tokens']:.0f} completion tok (budget {prompt_stats['token_budget']}) | "
+                      f"trimmed {prompt_stats['trimmed_tokens']} tok in {prompt_stats['budget_trimmed_calls']} calls")
+            
+            for agent, parse_stats in ParseStats.get_parse_stats().items():
+                if parse_stats['parsed'] < parse_stats['responses']:
+                    print(f"[PARSE] {agent}: {parse_stats['repaired']} repaired, {parse_stats['failed']} failed "
+                          f"of {parse_stats['responses']} responses (last error: {parse_stats['last_error']})")
+            
+            for agent, call_stats in CallGuard.get_call_stats().items():
+                if call_stats['timeouts'] or call_stats['errors'] or call_stats['short_circuited'] or call_stats['hedged']:
+                    print(f"[GUARD] {agent}: {call_stats['timeouts']} timeouts, {call_stats['errors']} errors, "
+                          f"{call_stats['short_circuited']} short-circuited (breaker {call_stats['breaker_state']}), "
+                          f"{call_stats['hedged']} hedged ({call_stats['hedge_wins']} won)")
+            
+            degradation = DegradationController.get_status()
+            if degradation['transitions'] or degradation['mode'] != 'full':
+                runs = ", ".join(f"{mode}={count}" for mode, count in degradation['runs_by_mode'].items() if count)
+                print(f"[DEGRADE] Mode now {degradation['mode']} after {degradation['transitions']} transitions "
+                      f"| runs: {runs}")
+            
+            for priority, traffic_stats in TrafficScheduler.get_traffic_stats()['classes'].items():
+                if traffic_stats['delayed'] or traffic_stats['rejected']:
+                    print(f"[TRAFFIC] {priority}: {traffic_stats['delayed']}/{traffic_stats['requests']} calls queued "
+                          f"(avg {traffic_stats['avg_wait_s']:.2f}s, p95 {traffic_stats['p95_wait_s']:.2f}s), "
+                          f"{traffic_stats['rejected']} rejected")
+            
+            routing = ModelRouter.get_routing_stats()
+            if routing['enabled']:
+                print(f"[ROUTING] large: {routing['decisions']['large']} | small: {routing['decisions']['small']} "
+                      f"| escalation upgrades: {routing['escalation_upgrades']} | reasons: {routing['reasons']}")
+            
+            speculation = SpeculativeDecisionEmpathyAgent.get_speculation_stats()
+            if speculation['runs']:
+                hit_rate = speculation['hit_rate']
+                print(f"[SPECULATE] {speculation['hits']}/{speculation['speculated']} drafts kept "
+                      f"(hit rate {f'{hit_rate:.0%}' if hit_rate is not None else 'n/a'}, "
+                      f"avg {speculation['avg_saved_s']:.2f}s saved) | skipped: {speculation['skipped']} "
+                      f"| misses: {speculation['miss_reasons']}")
+            
+            message_cache = MessageSkeletonCache.get_cache_stats()
+            if message_cache['lookups']:
+                print(f"[CACHE] Message skeletons: {message_cache['hits']}/{message_cache['lookups']} rendered from cache "
+                      f"({message_cache['hit_rate']:.0%}) | {message_cache['skeletons']} skeletons for "
+                      f"{message_cache['keys']} keys | {message_cache['rejected_similar']} too similar, "
+                      f"{message_cache['invalid']} invalid")
             print(f"{'='*70}\n")
-        
-        return results
     
     def display_health_dashboard(self):
         """Display customer health dashboard."""
@@ -270,6 +1095,55 @@ class ProCX:
         print(f"\n{'='*70}\n")
 
 
+# Sharded scans: per-process state of a scan worker (see ProCX.run_sharded_scan)
+_shard_procx: Optional[ProCX] = None
+_shard_progress = None
+
+
+def _init_shard_worker(progress):
+    """Create the platform once per scan worker process."""
+    global _shard_procx, _shard_progress
+    _shard_procx = ProCX()
+    _shard_progress = progress
+
+
+def _score_shard(shard: int, shards: int, min_churn_risk: float) -> Tuple[int, Any, float]:
+    """Score the customers of one shard (runs in a scan worker process)."""
+    started = time.monotonic()
+    alerts = _shard_procx.proactive_monitor.detect_churn_risks(
+        min_churn_risk=min_churn_risk,
+        shard=(shard, shards)
+    )
+    return shard, to_wire(alerts), time.monotonic() - started
+
+
+def _process_shard(shard: int, alerts: Any, scan_id: Optional[str]) -> Dict[str, Any]:
+    """Run the picked customers of one shard through the workflow (runs in a scan worker process)."""
+    started = time.monotonic()
+    SpanStats.reset()
+    ScanCheckpointStore.reset()
+    InterventionScheduler.reset()
+    checkpoints = ScanCheckpointStore.open(scan_id) if scan_id else None
+    outcomes: Dict[str, int] = {}
+    
+    def on_result(customer_id: str, outcome: str):
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        _shard_progress.put((shard, customer_id, outcome))
+    
+    results = _shard_procx._process_alerts(from_wire(alerts), checkpoints, verbose=False, on_result=on_result)
+    return {
+        "shard": shard,
+        "results": to_wire(results),
+        "processed": len(results),
+        "outcomes": outcomes,
+        "elapsed": time.monotonic() - started,
+        "pid": os.getpid(),
+        "spans": SpanStats.snapshot(),
+        "checkpoints": ScanCheckpointStore.get_checkpoint_stats(),
+        "scheduler": InterventionScheduler.get_scheduler_stats()
+    }
+
+
 def main():
     """Main entry point for ProCX Platform."""
     import argparse
@@ -283,26 +1157,69 @@ def main():
                        help='Maximum number of interventions to process (default: 5)')
     parser.add_argument('--risk-threshold', type=float, default=0.6,
                        help='Minimum churn risk threshold 0-1 (default: 0.6)')
+    parser.add_argument('--resume', nargs='?', const='latest', default=None, metavar='SCAN_ID',
+                       help='Resume an interrupted scan (default: the most recent incomplete one)')
+    parser.add_argument('--pipelined', action='store_true',
+                       help='Start interventions while customers are still being scored')
+    parser.add_argument('--shards', type=int, nargs='?', const=0, default=None, metavar='N',
+                       help='Run the scan in N worker processes split by customer ID '
+                            '(default: SCAN_SHARDS, or one per CPU core)')
+    parser.add_argument('--token-budget', type=int, default=None, metavar='TOKENS',
+                       help='Stop admitting customers before the scan exceeds this many tokens (default: SCAN_TOKEN_BUDGET)')
+    parser.add_argument('--cost-budget', type=float, default=None, metavar='USD',
+                       help='Stop admitting customers before the scan exceeds this cost (default: SCAN_COST_BUDGET)')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                       help='Stop admitting customers that would finish after this many seconds (default: SCAN_DEADLINE_S)')
+    parser.add_argument('--jsonl', action='store_true',
+                       help='Print one JSON line per customer as it finishes instead of the scan report')
     
     args = parser.parse_args()
+    budget_args = (args.token_budget, args.cost_budget, args.deadline)
     
-    # Initialize platform
-    procx = ProCX()
-    
-    if args.dashboard:
-        procx.display_health_dashboard()
-    elif args.interventions:
-        procx.run_proactive_scan(
-            min_churn_risk=args.risk_threshold,
-            max_interventions=args.max_interventions,
-            verbose=True
-        )
-    else:
-        # Default: show both
-        procx.display_health_dashboard()
-        print("\n" + "="*70)
-        print("[TIP] Run with --interventions to execute proactive interventions")
-        print("="*70 + "\n")
+    # In --jsonl mode stdout carries only the records; everything else goes to stderr
+    records = sys.stdout
+    with redirect_stdout(sys.stderr) if args.jsonl else nullcontext():
+        # Initialize platform
+        procx = ProCX()
+        
+        if any(limit is not None for limit in budget_args) and (args.shards is not None or args.pipelined):
+            print("[WARN] --token-budget/--cost-budget/--deadline apply to --interventions scans only")
+        if args.jsonl and (args.shards is not None or args.pipelined):
+            print("[WARN] --jsonl applies to --interventions scans only")
+        
+        if args.dashboard:
+            procx.display_health_dashboard()
+        elif args.shards is not None:
+            procx.run_sharded_scan(
+                min_churn_risk=args.risk_threshold,
+                max_interventions=args.max_interventions,
+                shards=args.shards,
+                verbose=True,
+                resume=args.resume
+            )
+        elif args.pipelined and not args.resume:
+            procx.run_pipelined_scan(
+                min_churn_risk=args.risk_threshold,
+                max_interventions=args.max_interventions,
+                verbose=True
+            )
+        elif args.interventions or args.resume:
+            # Each intervention is reported (and compacted) as it finishes, so large scans stay flat in memory
+            for entry in procx.iter_proactive_scan(
+                min_churn_risk=args.risk_threshold,
+                max_interventions=args.max_interventions,
+                verbose=not args.jsonl,
+                resume=args.resume,
+                budget=ScanBudget(*budget_args)
+            ):
+                if args.jsonl:
+                    print(json.dumps(ProCX.result_summary(entry), default=str), file=records, flush=True)
+        else:
+            # Default: show both
+            procx.display_health_dashboard()
+            print("\n" + "="*70)
+            print("[TIP] Run with --interventions to execute proactive interventions")
+            print("="*70 + "\n")
 
 
 if __name__ == "__main__":
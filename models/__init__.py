@@ -8,6 +8,15 @@ from .customer import (
     SentimentType,
     EventType
 )
+from .responses import (
+    ContextResponse,
+    PatternResponse,
+    IncentiveOffer,
+    DecisionResponse,
+    EmpathyResponse,
+    FusedResponse,
+    RESPONSE_SCHEMAS
+)
 
 __all__ = [
     "Customer",
@@ -16,5 +25,12 @@ __all__ = [
     "Segment",
     "LoyaltyTier",
     "SentimentType",
-    "EventType"
+    "EventType",
+    "ContextResponse",
+    "PatternResponse",
+    "IncentiveOffer",
+    "DecisionResponse",
+    "EmpathyResponse",
+    "FusedResponse",
+    "RESPONSE_SCHEMAS"
 ]
@@ -135,6 +135,11 @@ class Customer:
             "opt_in_marketing": self.opt_in_marketing,
             "language": self.language
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Customer":
+        """Create from a dictionary produced by to_dict."""
+        return cls(**data)
 
 
 @dataclass
@@ -170,6 +175,28 @@ class CustomerEvent:
             "metadata": self.metadata,
             "is_proactive": self.is_proactive
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], customer: Customer) -> "CustomerEvent":
+        """
+        Create from a dictionary produced by to_dict.
+        
+        Args:
+            data: Event dictionary (holds only the customer ID)
+            customer: The event's customer
+        """
+        metadata = dict(data.get("metadata") or {})
+        # Monitor alerts carry the Customer object, serialized as a dict
+        if isinstance(metadata.get("customer"), dict):
+            metadata["customer"] = customer
+        return cls(
+            event_id=data["event_id"],
+            customer=customer,
+            event_type=EventType(data["event_type"]),
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            description=data["description"],
+            metadata=metadata
+        )
 
 
 @dataclass
@@ -213,6 +240,7 @@ class AgentState:
     # Metadata
     processing_time: float = 0.0
     confidence_score: float = 0.0
+    metadata: Dict[str, Any] = field(default_factory=dict)  # Compliance, channels, run modes
     
     def add_message(self, agent: str, message: str):
         """Add a message from an agent."""
@@ -249,3 +277,35 @@ class AgentState:
             "confidence_score": self.confidence_score,
             "metadata": self.metadata if hasattr(self, 'metadata') else None
         }
+    
+    def compact(self) -> "AgentState":
+        """
+        Drop the bulky analysis of a finished run once it has been persisted.
+        
+        The agent message log, matched patterns and long-form context and
+        historical analysis are cleared; the outcome (action, discount,
+        escalation, message, scores) and metadata are kept.
+        
+        Returns:
+            This state, marked `metadata['compacted']`
+        """
+        self.messages = []
+        self.similar_patterns = []
+        self.context_summary = None
+        self.historical_insights = None
+        self.metadata['compacted'] = True
+        return self
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgentState":
+        """Create from a dictionary produced by to_dict (e.g. a scan checkpoint)."""
+        customer = Customer.from_dict(data["customer"]) if data.get("customer") else None
+        event = CustomerEvent.from_dict(data["event"], customer) if data.get("event") else None
+        fields = {key: value for key, value in data.items() if key not in ("event", "customer", "sentiment")}
+        fields["metadata"] = fields.get("metadata") or {}
+        return cls(
+            event=event,
+            customer=customer,
+            sentiment=SentimentType(data["sentiment"]) if data.get("sentiment") else None,
+            **fields
+        )
@@ -0,0 +1,76 @@
+"""
+Response schemas for structured LLM output.
+
+Each agent's JSON response is validated against one of these models before it
+touches the AgentState. Unknown extra keys are kept so agents can still read
+optional fields the prompt asks for.
+"""
+from typing import Optional, List, Literal
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class AgentResponse(BaseModel):
+    """Base model for agent JSON responses (extra keys allowed)."""
+    model_config = ConfigDict(extra="allow")
+
+
+class ContextResponse(AgentResponse):
+    """Context agent: sentiment, urgency and risk."""
+    sentiment: Literal["very_positive", "positive", "neutral", "negative", "very_negative"]
+    urgency_level: int = Field(ge=1, le=5)
+    customer_risk_score: float = Field(ge=0.0, le=1.0)
+    context_summary: str = Field(min_length=1)
+
+
+class PatternResponse(AgentResponse):
+    """Pattern agent: churn prediction and historical insights."""
+    predicted_churn_risk: float = Field(ge=0.0, le=1.0)
+    historical_insights: str = ""
+    pattern_summary: str = ""
+    preventive_recommendations: List[str] = Field(default_factory=list)
+
+
+class IncentiveOffer(AgentResponse):
+    """Proactive incentive chosen by the decision step."""
+    type: str = "none"
+    discount_percentage: Optional[float] = Field(default=None, ge=0.0, le=100.0)
+    reasoning: str = ""
+
+
+class DecisionResponse(AgentResponse):
+    """Decision agent: recommended action, escalation and incentive."""
+    recommended_action: str = Field(min_length=1)
+    escalation_needed: bool = False
+    priority_level: Literal["low", "medium", "high", "critical"] = "medium"
+    action_steps: List[str] = Field(default_factory=list)
+    reasoning: str = ""
+    incentive_offered: Optional[IncentiveOffer] = None
+
+
+class EmpathyResponse(AgentResponse):
+    """Empathy agent: personalized customer message."""
+    personalized_response: str = Field(min_length=1)
+    tone: str = "professional"
+    empathy_score: float = Field(default=0.7, ge=0.0, le=1.0)
+    key_empathy_elements: List[str] = Field(default_factory=list)
+
+
+class FusedResponse(AgentResponse):
+    """Fused decision+empathy agent: decision and message in one response."""
+    recommended_action: str = Field(min_length=1)
+    action_steps: List[str] = Field(default_factory=list)
+    reasoning: str = ""
+    incentive_offered: Optional[IncentiveOffer] = None
+    personalized_response: str = Field(min_length=1)
+    tone: str = "professional"
+    empathy_score: float = Field(default=0.7, ge=0.0, le=1.0)
+
+
+# Schema used to validate each agent's response (keys match config.prompts)
+RESPONSE_SCHEMAS = {
+    "context_agent": ContextResponse,
+    "pattern_agent": PatternResponse,
+    "decision_agent": DecisionResponse,
+    "empathy_agent": EmpathyResponse,
+    "fused_agent": FusedResponse
+}
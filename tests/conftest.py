@@ -0,0 +1,5 @@
+"""Test configuration - makes the project packages importable from tests/."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,210 @@
+"""Round-trip tests of the binary state codec (utils/state_codec.py)."""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from config import settings
+from models import AgentState, Customer, CustomerEvent, EventType, SentimentType
+from utils import state_codec
+from utils.memory_handler import CustomJSONEncoder
+
+pytestmark = pytest.mark.skipif(state_codec.ormsgpack is None, reason="ormsgpack is not installed")
+
+
+@pytest.fixture(autouse=True)
+def binary_codec(monkeypatch):
+    """Every test starts with the binary format on."""
+    monkeypatch.setattr(settings, "STATE_CODEC", "msgpack")
+
+
+def make_customer(customer_id="C100001", segment="VIP", loyalty_tier="Gold") -> Customer:
+    return Customer(
+        customer_id=customer_id,
+        first_name="Riya",
+        last_name="Mehta",
+        email="riya@example.com",
+        segment=segment,
+        lifetime_value=1520.75,
+        preferred_category="Electronics",
+        loyalty_tier=loyalty_tier,
+        language="hi"
+    )
+
+
+def make_state(customer=None) -> AgentState:
+    """Final state of a proactive run whose event metadata is the monitor alert (same customer object)."""
+    customer = customer or make_customer()
+    alert = {
+        "customer": customer,
+        "churn_risk": 0.82,
+        "health_score": 0.31,
+        "risk_level": "high",
+        "source": "proactive_monitor",
+        "schedule": {"due": True, "deadline_days": 3}
+    }
+    event = CustomerEvent(
+        event_id=f"PROACTIVE_{customer.customer_id}_1",
+        customer=customer,
+        event_type=EventType.PROACTIVE_RETENTION,
+        timestamp=datetime(2026, 10, 19, 9, 30, 15, 123456),
+        description="Proactive intervention - churn risk: 82.0%",
+        metadata=alert
+    )
+    state = AgentState(
+        event=event,
+        customer=customer,
+        context_summary="Declining engagement",
+        sentiment=SentimentType.NEGATIVE,
+        urgency_level=4,
+        similar_patterns=[{"pattern": "late_delivery", "score": 0.7}],
+        recommended_action="Send a personalized retention message",
+        escalation_needed=False,
+        priority_level="high",
+        discount_applied=10.0,
+        discount_auto_approved=True,
+        personalized_response="Hi Riya, ...",
+        metadata={"stage_timings": {"context_agent": 0.41}, "recorded": datetime(2026, 10, 19, 9, 31)}
+    )
+    state.add_message("context_agent", "Risk is high")
+    return state
+
+
+def normalized(state: AgentState) -> str:
+    return json.dumps(state.to_dict(), cls=CustomJSONEncoder, sort_keys=True)
+
+
+def test_agent_state_round_trip():
+    state = make_state()
+    decoded = state_codec.loads(state_codec.dumps(state))
+    
+    assert isinstance(decoded, AgentState)
+    assert normalized(decoded) == normalized(state)
+    assert decoded.sentiment is SentimentType.NEGATIVE
+    assert decoded.event.event_type is EventType.PROACTIVE_RETENTION
+    assert decoded.event.timestamp == state.event.timestamp
+    assert decoded.metadata["recorded"] == state.metadata["recorded"]
+
+
+def test_shared_customer_is_stored_once():
+    state = make_state()
+    decoded = state_codec.loads(state_codec.dumps(state))
+    
+    assert decoded.event.customer is decoded.customer
+    assert decoded.event.metadata["customer"] is decoded.customer
+    # The customer's email appears once in the payload although three fields reference it
+    assert state_codec.dumps(state).count(b"riya@example.com") == 1
+
+
+def test_customer_and_event_round_trip():
+    customer = make_customer(segment="Unlisted", loyalty_tier="Platinum")
+    event = make_state(customer).event
+    decoded_customer, decoded_event = state_codec.loads(state_codec.dumps([customer, event]))
+    
+    assert decoded_customer == customer
+    assert decoded_customer.segment == "Unlisted"  # Unknown values stay strings
+    assert decoded_event.customer == customer
+    assert decoded_event.event_type is event.event_type
+    assert decoded_event.metadata["customer"] is decoded_event.customer
+
+
+def test_enums_are_stored_as_indices():
+    packed_customer = dict(zip(state_codec.CUSTOMER_FIELDS, state_codec._pack_customer(make_customer())))
+    assert packed_customer["segment"] == 0  # Segment.VIP
+    assert packed_customer["loyalty_tier"] == 1  # LoyaltyTier.GOLD
+    packed = state_codec._pack_state(make_state())
+    assert packed[2] == list(SentimentType).index(SentimentType.NEGATIVE)
+    assert packed[1][2] == list(EventType).index(EventType.PROACTIVE_RETENTION)
+
+
+def test_naive_and_aware_datetimes():
+    naive = datetime(2026, 10, 19, 9, 30, 15, 123456)
+    aware = datetime(2026, 10, 19, 15, 0, 0, 1, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    decoded_naive, decoded_aware = state_codec.loads(state_codec.dumps([naive, aware]))
+    
+    assert decoded_naive == naive
+    assert decoded_aware == aware.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def test_unknown_codec_version_is_rejected():
+    payload = bytearray(state_codec.dumps(make_state()))
+    payload[1] = state_codec.CODEC_VERSION + 1
+    
+    with pytest.raises(ValueError, match="Unsupported state codec version"):
+        state_codec.loads(bytes(payload))
+
+
+# Binary layout of each codec version: changing a model field list or enum
+# table must bump CODEC_VERSION and add its layout here
+PINNED_SCHEMAS = {
+    2: "f82f6732"
+}
+PINNED_CUSTOMER_FIELDS = [
+    "customer_id", "first_name", "last_name", "email", "segment", "lifetime_value", "preferred_category",
+    "loyalty_tier", "phone", "signup_date", "country", "avg_order_value", "last_active_date",
+    "opt_in_marketing", "language"
+]
+PINNED_STATE_FIELDS = [
+    "context_summary", "urgency_level", "customer_risk_score", "similar_patterns", "historical_insights",
+    "predicted_churn_risk", "recommended_action", "action_taken", "escalation_needed", "priority_level",
+    "discount_applied", "discount_auto_approved", "discount_executed", "empathy_score",
+    "personalized_response", "tone", "messages", "next_agent", "processing_time", "confidence_score", "metadata"
+]
+
+
+def test_schema_is_pinned_to_codec_version():
+    assert state_codec.CUSTOMER_FIELDS == PINNED_CUSTOMER_FIELDS, "Customer fields changed: bump CODEC_VERSION"
+    assert state_codec.STATE_FIELDS == PINNED_STATE_FIELDS, "AgentState fields changed: bump CODEC_VERSION"
+    assert state_codec.SCHEMA_FINGERPRINT.hex() == PINNED_SCHEMAS.get(state_codec.CODEC_VERSION), (
+        f"Schema changed: bump CODEC_VERSION and pin {state_codec.SCHEMA_FINGERPRINT.hex()} "
+        f"for layout {state_codec.schema_layout()}"
+    )
+
+
+def test_payload_of_another_schema_is_rejected(monkeypatch):
+    payload = state_codec.dumps(make_state())
+    monkeypatch.setattr(state_codec, "SCHEMA_FINGERPRINT", b"\x00\x00\x00\x00")
+    
+    with pytest.raises(ValueError, match="another model schema"):
+        state_codec.loads(payload)
+
+
+def test_version_1_payload_is_read_with_its_schema():
+    state = make_state()
+    payload = bytes((state_codec.MAGIC, 1)) + state_codec._pack_body(state)
+    
+    assert normalized(state_codec.loads(payload)) == normalized(state)
+
+
+def test_truncated_record_then_append(tmp_path):
+    path = tmp_path / "C100001.mpk"
+    with state_codec.open_record_log(path) as f:
+        state_codec.append_record(f, {"stage": "a"})
+        state_codec.append_record(f, {"stage": "b", "state": make_state()})
+    path.write_bytes(path.read_bytes()[:-9])  # Crash while writing record b
+    
+    assert list(state_codec.read_records(path)) == [{"stage": "a"}]
+    
+    with state_codec.open_record_log(path) as f:  # Resumed run
+        state_codec.append_record(f, {"stage": "c"})
+        state_codec.append_record(f, {"done": "sent"})
+    
+    assert list(state_codec.read_records(path)) == [{"stage": "a"}, {"stage": "c"}, {"done": "sent"}]
+
+
+def test_json_fallback(monkeypatch):
+    state = make_state()
+    monkeypatch.setattr(settings, "STATE_CODEC", "json")
+    
+    payload = state_codec.dumps({"stage": "empathy_agent", "state": state})
+    assert payload.startswith(b"{")
+    assert state_codec.record_suffix() == state_codec.JSON_SUFFIX
+    
+    decoded = state_codec.loads(payload)
+    assert normalized(state_codec.state_from_payload(decoded["state"])) == normalized(state)
+    
+    # Binary payloads written before the switch stay readable
+    monkeypatch.setattr(settings, "STATE_CODEC", "msgpack")
+    binary = state_codec.dumps(state)
+    monkeypatch.setattr(settings, "STATE_CODEC", "json")
+    assert normalized(state_codec.loads(binary)) == normalized(state)
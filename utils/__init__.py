@@ -1,9 +1,26 @@
 """Utils package initialization."""
 from .memory_handler import MemoryHandler
 from .data_analytics import DataAnalytics
-from .monitor import ProactiveMonitor, CustomerHealthScore, create_proactive_monitor
+from .monitor import ProactiveMonitor, CustomerHealthScore, create_proactive_monitor, customer_shard
 from .escalation_tracker import EscalationTracker, EscalationRecord
 from .festival_context import FestivalContextManager
+from .token_budget import ContextSection, TokenBudget, count_tokens
+from .degradation import DegradationController, DEGRADATION_MODES
+from .traffic_scheduler import TrafficScheduler, RateLimitWaitError, PRIORITY_CLASSES, traffic_priority, classify_traffic
+from .call_guard import CallGuard, CircuitBreaker, LLMCallError, LLMTimeoutError, CircuitOpenError, guarded_invoke
+from .prompt_builder import AgentPrompt, PromptStats, build_agent_prompt, invoke_prompt, token_meter
+from .llm_factory import create_chat_model, create_tiered_chat_models, model_cost
+from .fake_llm import FakeChatModel, FakeLLMError, is_fake_model
+from .response_parser import ResponseParseError, ParseStats, extract_json_object, parse_response, invoke_structured
+from .model_router import ModelRouter, MODEL_TIERS
+from .streaming import JsonFieldStreamer, StreamStats, stream_sink, create_message_streamer
+from .message_cache import MessageSkeletonCache, decision_class, render_skeleton
+from .scan_checkpoint import ScanCheckpointStore
+from .alert_queue import AlertPriorityQueue
+from .intervention_scheduler import InterventionScheduler
+from .scan_budget import ScanBudget
+from .state_codec import CODEC_VERSION, to_wire, from_wire
+from .tracing import SpanStats, span
 
 __all__ = [
     "MemoryHandler",
@@ -11,7 +28,58 @@ __all__ = [
     "ProactiveMonitor",
     "CustomerHealthScore",
     "create_proactive_monitor",
+    "customer_shard",
     "EscalationTracker",
     "EscalationRecord",
-    "FestivalContextManager"
+    "FestivalContextManager",
+    "AgentPrompt",
+    "PromptStats",
+    "build_agent_prompt",
+    "invoke_prompt",
+    "token_meter",
+    "ContextSection",
+    "TokenBudget",
+    "count_tokens",
+    "ResponseParseError",
+    "ParseStats",
+    "extract_json_object",
+    "parse_response",
+    "invoke_structured",
+    "create_chat_model",
+    "create_tiered_chat_models",
+    "model_cost",
+    "ModelRouter",
+    "MODEL_TIERS",
+    "JsonFieldStreamer",
+    "StreamStats",
+    "stream_sink",
+    "create_message_streamer",
+    "MessageSkeletonCache",
+    "decision_class",
+    "render_skeleton",
+    "ScanCheckpointStore",
+    "AlertPriorityQueue",
+    "InterventionScheduler",
+    "ScanBudget",
+    "CODEC_VERSION",
+    "to_wire",
+    "from_wire",
+    "SpanStats",
+    "span",
+    "FakeChatModel",
+    "FakeLLMError",
+    "is_fake_model",
+    "CallGuard",
+    "CircuitBreaker",
+    "LLMCallError",
+    "LLMTimeoutError",
+    "CircuitOpenError",
+    "guarded_invoke",
+    "DegradationController",
+    "DEGRADATION_MODES",
+    "TrafficScheduler",
+    "RateLimitWaitError",
+    "PRIORITY_CLASSES",
+    "traffic_priority",
+    "classify_traffic"
 ]
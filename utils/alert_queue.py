@@ -0,0 +1,101 @@
+"""
+Alert Queue - Bounded priority queue between churn scoring and agent workers.
+
+A pipelined scan queues alerts chunk by chunk while scoring continues, and
+agent workers take the riskiest queued alert first. The queue never holds
+more alerts than the scan can still process: when it is full, a new alert
+displaces the least risky queued one (or is dropped if it is the least
+risky itself), so scoring never waits on the workers. With `max_taken`,
+the queue hands out at most that many alerts in total, so a slot of the
+scan is only used up when a worker actually takes an alert.
+"""
+import bisect
+import itertools
+import threading
+from typing import Dict, Any, List, Optional
+
+
+class AlertPriorityQueue:
+    """Thread-safe alerts ordered by churn risk (highest first), bounded to `maxsize`."""
+    
+    def __init__(self, maxsize: int, max_taken: Optional[int] = None):
+        """
+        Create an empty queue.
+        
+        Args:
+            maxsize: Most alerts held at once
+            max_taken: Most alerts handed out in total (None = no limit)
+        """
+        self.maxsize = max(1, maxsize)
+        self.max_taken = max_taken
+        self._items: List[tuple] = []   # (-churn_risk, sequence, alert), riskiest first
+        self._sequence = itertools.count()
+        self._ready = threading.Condition()
+        self._closed = False
+        self.stats = {"queued": 0, "displaced": 0, "dropped": 0, "taken": 0}
+    
+    def put(self, alert: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Queue an alert.
+        
+        Args:
+            alert: At-risk customer alert (see ProactiveMonitor)
+            
+        Returns:
+            The alert pushed out of a full queue (possibly `alert` itself), or None
+        """
+        item = (-alert['churn_risk'], next(self._sequence), alert)
+        with self._ready:
+            self.stats["queued"] += 1
+            if len(self._items) >= self.maxsize:
+                if item >= self._items[-1]:
+                    self.stats["dropped"] += 1
+                    return alert
+                displaced = self._items.pop()[2]
+                self.stats["displaced"] += 1
+            else:
+                displaced = None
+            bisect.insort(self._items, item)
+            self._ready.notify()
+            return displaced
+    
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Take the riskiest queued alert, waiting for one if the queue is empty.
+        
+        Args:
+            timeout: Seconds to wait (None = until an alert arrives or the queue is closed)
+            
+        Returns:
+            Alert, or None once the queue is closed and empty, `max_taken`
+            alerts were handed out (or on timeout)
+        """
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._items or self._closed or self._exhausted(), timeout):
+                return None
+            if not self._items or self._exhausted():
+                return None
+            self.stats["taken"] += 1
+            if self._exhausted():
+                self._ready.notify_all()  # Wake the other waiting workers: nothing more to take
+            return self._items.pop(0)[2]
+    
+    def _exhausted(self) -> bool:
+        """Whether `max_taken` alerts were handed out (caller holds the lock)."""
+        return self.max_taken is not None and self.stats["taken"] >= self.max_taken
+    
+    @property
+    def exhausted(self) -> bool:
+        """Whether the queue will hand out no more alerts (every slot of the scan is taken)."""
+        with self._ready:
+            return self._exhausted()
+    
+    def close(self):
+        """No more alerts will be queued; waiting workers finish once it is drained."""
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+    
+    def __len__(self) -> int:
+        with self._ready:
+            return len(self._items)
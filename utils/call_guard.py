@@ -0,0 +1,381 @@
+"""
+Call Guard - Deadlines, hedged requests and circuit breakers for LLM calls.
+
+Every agent call goes through `guarded_invoke`:
+1. If the agent's circuit breaker is open, CircuitOpenError is raised at once
+   so the agent drops straight to its deterministic fallback
+2. The call waits for a rate-limit slot from the TrafficScheduler (RPM/TPM
+   budgets shared by the whole process, served by priority class)
+3. The call runs on a worker thread and is abandoned after the agent's
+   deadline (LLMTimeoutError), so a slow provider cannot stall a scan. The
+   deadline counts from when a worker starts the call; waiting for a free
+   worker is capped at LLM_SCHEDULER_MAX_WAIT_SECONDS
+4. Optionally, a duplicate "hedge" request is sent once the call has taken
+   longer than the agent's observed p95 latency and a slot is free right
+   away; the first answer wins (streamed calls are never hedged)
+5. Consecutive failures/timeouts open the breaker; after a cool-down one
+   trial call is let through (half-open) and closes it again on success
+   
+A request that loses the race or is abandoned is cancelled if no worker has
+started it yet; otherwise it settles its own rate-limit reservation when it
+finishes, and its response is passed to `on_late_response` so the tokens it
+spent are still recorded.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from config import settings
+from .degradation import DegradationController
+from .token_budget import count_tokens
+from .traffic_scheduler import TrafficScheduler, RateLimitWaitError
+
+
+class LLMCallError(RuntimeError):
+    """Base class for guarded call errors."""
+
+
+class LLMTimeoutError(LLMCallError):
+    """Raised when a call misses its deadline."""
+
+
+class CircuitOpenError(LLMCallError):
+    """Raised when an agent's circuit breaker is open."""
+
+
+_executor = ThreadPoolExecutor(max_workers=settings.LLM_CALL_WORKERS, thread_name_prefix="llm-call")
+
+
+def _agent_setting(values: Dict[str, float], agent: str, default: float) -> float:
+    """Per-agent setting lookup (`<agent>_repair` calls use the agent's value)."""
+    if agent in values:
+        return values[agent]
+    return values.get(agent.replace("_repair", ""), default)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one agent."""
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Check whether a call may be sent (claims the half-open trial slot)."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+    
+    def release(self):
+        """Give back a claimed trial slot when no call was made."""
+        with self._lock:
+            self.trial_in_flight = False
+    
+    def record_success(self):
+        """Close the breaker."""
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+    
+    def record_failure(self) -> bool:
+        """
+        Count a failure.
+        
+        Returns:
+            True if this failure opened the breaker
+        """
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class CallGuard:
+    """Per-agent deadlines, latency history, hedging and breakers (shared across agents)."""
+    
+    _lock = threading.Lock()
+    _breakers: Dict[str, CircuitBreaker] = {}
+    _latencies: Dict[str, deque] = {}
+    _stats: Dict[str, Dict[str, int]] = {}
+    
+    @classmethod
+    def breaker(cls, agent: str) -> CircuitBreaker:
+        """Get (or create) the circuit breaker for an agent."""
+        with cls._lock:
+            if agent not in cls._breakers:
+                cls._breakers[agent] = CircuitBreaker(
+                    settings.CIRCUIT_BREAKER_FAILURES,
+                    settings.CIRCUIT_BREAKER_RESET_SECONDS
+                )
+            return cls._breakers[agent]
+    
+    @classmethod
+    def deadline(cls, agent: str) -> float:
+        """Deadline in seconds for one call of an agent."""
+        return _agent_setting(settings.AGENT_TIMEOUT_SECONDS, agent, settings.TIMEOUT_SECONDS)
+    
+    @classmethod
+    def hedge_delay(cls, agent: str) -> Optional[float]:
+        """
+        Delay before sending a hedge request: the agent's p95 latency.
+        
+        Returns:
+            Seconds, or None if hedging is off or there is too little history
+        """
+        if not settings.HEDGE_REQUESTS:
+            return None
+        with cls._lock:
+            history = sorted(cls._latencies.get(agent, ()))
+        if len(history) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        p95 = history[min(len(history) - 1, int(len(history) * 0.95))]
+        return max(p95, settings.HEDGE_MIN_DELAY_SECONDS)
+    
+    @classmethod
+    def count(cls, agent: str, key: str):
+        """Increment a per-agent counter."""
+        with cls._lock:
+            stats = cls._stats.setdefault(agent, {
+                "calls": 0,
+                "succeeded": 0,
+                "errors": 0,
+                "timeouts": 0,
+                "hedged": 0,
+                "hedge_wins": 0,
+                "short_circuited": 0,
+                "breaker_opened": 0,
+                "pool_timeouts": 0,
+                "late_responses": 0
+            })
+            stats[key] += 1
+    
+    @classmethod
+    def record_latency(cls, agent: str, latency: float):
+        """Add a successful call latency to the agent's history."""
+        with cls._lock:
+            cls._latencies.setdefault(agent, deque(maxlen=settings.HEDGE_HISTORY_SIZE)).append(latency)
+    
+    @classmethod
+    def get_call_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize guarded calls per agent.
+        
+        Returns:
+            Mapping of agent to counters, breaker state, deadline and current
+            hedge delay
+        """
+        with cls._lock:
+            snapshot = {agent: dict(stats) for agent, stats in cls._stats.items()}
+            breakers = {agent: breaker.state for agent, breaker in cls._breakers.items()}
+        
+        for agent, stats in snapshot.items():
+            stats["breaker_state"] = breakers.get(agent, "closed")
+            stats["deadline_s"] = cls.deadline(agent)
+            stats["hedge_delay_s"] = cls.hedge_delay(agent)
+        return snapshot
+    
+    @classmethod
+    def reset(cls):
+        """Clear statistics, latency history and breakers."""
+        with cls._lock:
+            cls._breakers = {}
+            cls._latencies = {}
+            cls._stats = {}
+
+
+def _submit(fn: Callable[..., Any], *args) -> Tuple[Future, threading.Event]:
+    """
+    Run a call on the worker pool, keeping callbacks/tracing context.
+    
+    Returns:
+        Tuple of (future, event set once a worker starts the call)
+    """
+    context = contextvars.copy_context()
+    running = threading.Event()
+    
+    def run():
+        running.set()
+        return fn(*args)
+    
+    return _executor.submit(context.run, run), running
+
+
+def _stream(llm: Any, messages: List[Any], on_chunk: Callable[[str], None], abandoned: threading.Event):
+    """Stream a call, passing each content chunk on, and return the merged message."""
+    message = None
+    for chunk in llm.stream(messages):
+        if abandoned.is_set():
+            break
+        message = chunk if message is None else message + chunk
+        if chunk.content:
+            on_chunk(chunk.content)
+    return message
+
+
+def _release_losers(futures, agent: str, estimated_tokens: int, on_late_response: Optional[Callable[[Any], None]]):
+    """
+    Stop or settle the requests of a call that were not used.
+    
+    Requests no worker has started are cancelled and their rate-limit
+    reservation is given back. The others finish in the background: each
+    then settles its reservation with its real usage and passes its response
+    to `on_late_response` (in the caller's context, e.g. its token meter).
+    """
+    caller_context = contextvars.copy_context()
+    
+    def settle(future: Future):
+        if future.cancelled():
+            TrafficScheduler.settle(estimated_tokens, 0)
+            return
+        try:
+            response = future.result()
+        except Exception:
+            return  # Failed after being abandoned: the estimate stays charged
+        usage = getattr(response, "usage_metadata", None) or {}
+        TrafficScheduler.settle(estimated_tokens, usage.get("total_tokens"))
+        CallGuard.count(agent, "late_responses")
+        if on_late_response is not None and response is not None:
+            try:
+                caller_context.copy().run(on_late_response, response)
+            except Exception as e:
+                print(f"[WARN] {agent}: could not record a late response: {e}")
+    
+    for future in futures:
+        future.cancel()
+        future.add_done_callback(settle)
+
+
+def _estimate_tokens(messages: List[Any]) -> int:
+    """Prompt tokens of the messages plus the expected completion."""
+    prompt_tokens = sum(count_tokens(str(getattr(message, "content", message))) for message in messages)
+    return prompt_tokens + settings.LLM_COMPLETION_TOKEN_ESTIMATE
+
+
+def guarded_invoke(llm: Any, messages: List[Any], agent: str,
+                   on_chunk: Optional[Callable[[str], None]] = None,
+                   on_late_response: Optional[Callable[[Any], None]] = None) -> Any:
+    """
+    Invoke a chat model with the agent's deadline, hedging and circuit breaker.
+    
+    Args:
+        llm: Chat model
+        messages: Messages to send
+        agent: Agent name (selects deadline, latency history and breaker)
+        on_chunk: If given, the call is streamed and each content chunk is
+            passed to it as it arrives (called from the worker thread)
+        on_late_response: Called with the response of a request that
+            finished after losing to a hedge or being abandoned (its tokens
+            were spent too)
+        
+    Returns:
+        Model response message
+        
+    Raises:
+        CircuitOpenError: The agent's breaker is open (no call was made)
+        RateLimitWaitError: No rate-limit slot in time (no call was made)
+        LLMTimeoutError: No response within the deadline, or no worker free
+            to start the call
+        Exception: The provider error, if every request failed
+    """
+    breaker = CallGuard.breaker(agent)
+    if not breaker.allow():
+        CallGuard.count(agent, "short_circuited")
+        raise CircuitOpenError(f"{agent}: circuit breaker open - using fallback")
+    
+    estimated_tokens = _estimate_tokens(messages)
+    try:
+        TrafficScheduler.acquire(agent, estimated_tokens)
+    except RateLimitWaitError:
+        breaker.release()
+        raise
+    
+    CallGuard.count(agent, "calls")
+    hedge_delay = CallGuard.hedge_delay(agent)
+    
+    abandoned = threading.Event()
+    if on_chunk is not None:
+        # Chunks already shown to a client cannot be raced by a hedge
+        hedge_delay = None
+        primary, running = _submit(_stream, llm, messages, on_chunk, abandoned)
+    else:
+        primary, running = _submit(llm.invoke, messages)
+    
+    # The deadline starts with the call, not while it waits for a worker
+    if not running.wait(settings.LLM_SCHEDULER_MAX_WAIT_SECONDS) and primary.cancel():
+        TrafficScheduler.settle(estimated_tokens, 0)
+        breaker.release()
+        CallGuard.count(agent, "pool_timeouts")
+        raise LLMTimeoutError(f"{agent}: no call worker free within {settings.LLM_SCHEDULER_MAX_WAIT_SECONDS:.0f}s")
+    started = time.monotonic()
+    deadline = started + CallGuard.deadline(agent)
+    pending = {primary}
+    error = None
+    
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        
+        # Wake up at the hedge point if a hedge is still to be sent
+        hedge_due = hedge_delay is not None and len(pending) == 1 and primary in pending
+        timeout = min(remaining, max(0.0, started + hedge_delay - time.monotonic())) if hedge_due else remaining
+        
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            
+            CallGuard.record_latency(agent, time.monotonic() - started)
+            DegradationController.observe_latency(agent, time.monotonic() - started)
+            CallGuard.count(agent, "succeeded")
+            if future is not primary:
+                CallGuard.count(agent, "hedge_wins")
+            breaker.record_success()
+            usage = getattr(response, "usage_metadata", None) or {}
+            TrafficScheduler.settle(estimated_tokens, usage.get("total_tokens"))
+            _release_losers(pending, agent, estimated_tokens, on_late_response)
+            return response
+        
+        if hedge_due and not done and time.monotonic() - started >= hedge_delay:
+            # Hedges never wait for the rate limiter: no free slot, no hedge
+            if TrafficScheduler.acquire(agent, estimated_tokens, blocking=False):
+                CallGuard.count(agent, "hedged")
+                pending.add(_submit(llm.invoke, messages)[0])
+            hedge_delay = None
+    
+    if pending:
+        # Abandoned calls finish in the background (settled and recorded by _release_losers)
+        abandoned.set()
+        _release_losers(pending, agent, estimated_tokens, on_late_response)
+        CallGuard.count(agent, "timeouts")
+        DegradationController.observe_latency(agent, time.monotonic() - started)
+        error = LLMTimeoutError(f"{agent}: no response within {CallGuard.deadline(agent):.0f}s")
+    else:
+        CallGuard.count(agent, "errors")
+    
+    if breaker.record_failure():
+        CallGuard.count(agent, "breaker_opened")
+        print(f"[WARN] Circuit breaker opened for {agent} after repeated failures")
+    raise error
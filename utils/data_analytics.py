@@ -75,6 +75,12 @@ class DataAnalytics:
             print(f"X DataAnalytics: Error loading dataset: {e}")
             self.df = None
     
+    def preload(self):
+        """Load the lazily loaded sheets now (e.g. before forking scan worker processes)."""
+        self._load_support_tickets()
+        self._load_nps_survey()
+        self._load_payments()
+    
     def _load_orders(self):
         """Load orders sheet for purchase behavior analysis."""
         try:
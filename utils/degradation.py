@@ -0,0 +1,181 @@
+"""
+Degradation Controller - Switches pipeline stages to deterministic mode under load.
+
+The controller watches the scan queue depth and recent per-agent LLM latency.
+While either is past its SLO it steps down one level at a time:
+
+    full              all four agents call the model
+    pattern_rules     pattern agent uses data-driven churn analysis only
+    context_rules     + context agent accepts rule-based analysis at any confidence
+    template_empathy  + empathy agent sends the templated message
+    
+Once queue depth and latency are comfortably back under the SLOs it steps back
+up one level at a time (with hysteresis), so full mode is restored
+automatically. Each customer run snapshots the mode at the workflow gate and
+is tagged with it in `state.metadata['degradation_mode']`.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Any
+
+from models import AgentState
+from config import settings
+
+
+DEGRADATION_MODES = ("full", "pattern_rules", "context_rules", "template_empathy")
+
+# First mode in which each stage runs deterministically
+STAGE_DEGRADED_AT = {
+    "pattern": DEGRADATION_MODES.index("pattern_rules"),
+    "context": DEGRADATION_MODES.index("context_rules"),
+    "empathy": DEGRADATION_MODES.index("template_empathy")
+}
+
+
+class DegradationController:
+    """Process-wide load-shedding controller shared by all agents and workflows."""
+    
+    _lock = threading.Lock()
+    _level = 0
+    _last_change = float("-inf")
+    _queue_depths: Dict[str, int] = {}
+    _latencies: Dict[str, deque] = {}
+    _runs_by_mode: Dict[str, int] = {mode: 0 for mode in DEGRADATION_MODES}
+    _transitions = 0
+    
+    @classmethod
+    def observe_latency(cls, agent: str, seconds: float):
+        """Record the latency of one LLM call (timeouts count as their deadline)."""
+        with cls._lock:
+            cls._latencies.setdefault(agent, deque(maxlen=200)).append((time.monotonic(), seconds))
+    
+    @classmethod
+    def report_queue_depth(cls, depth: int, source: str = "scan"):
+        """
+        Report how many customers are waiting in a queue.
+        
+        Args:
+            depth: Customers still queued
+            source: Queue name (depths of all sources are summed)
+        """
+        with cls._lock:
+            cls._queue_depths[source] = max(0, depth)
+    
+    @classmethod
+    def _stage_latencies(cls, now: float) -> Dict[str, float]:
+        """p90 latency per agent over the recent window (caller holds the lock)."""
+        window_start = now - settings.DEGRADE_LATENCY_WINDOW_SECONDS
+        latencies = {}
+        for agent, samples in cls._latencies.items():
+            recent = sorted(seconds for timestamp, seconds in samples if timestamp >= window_start)
+            if len(recent) >= settings.DEGRADE_MIN_SAMPLES:
+                latencies[agent] = recent[min(len(recent) - 1, int(len(recent) * 0.9))]
+        return latencies
+    
+    @classmethod
+    def evaluate(cls) -> str:
+        """
+        Re-check the SLOs, step the level up/down if needed and return the mode.
+        
+        Returns:
+            Current degradation mode
+        """
+        if not settings.DEGRADATION_ENABLED:
+            return DEGRADATION_MODES[0]
+        
+        with cls._lock:
+            now = time.monotonic()
+            queue_depth = sum(cls._queue_depths.values())
+            latencies = cls._stage_latencies(now)
+            slos = settings.DEGRADE_STAGE_LATENCY_SLO
+            
+            overloaded = queue_depth > settings.DEGRADE_QUEUE_DEPTH_SLO or any(
+                latency > slos[agent] for agent, latency in latencies.items() if agent in slos
+            )
+            ratio = settings.DEGRADE_RECOVERY_RATIO
+            recovered = queue_depth <= settings.DEGRADE_QUEUE_DEPTH_SLO * ratio and all(
+                latency <= slos[agent] * ratio for agent, latency in latencies.items() if agent in slos
+            )
+            
+            since_change = now - cls._last_change
+            previous = cls._level
+            if overloaded and cls._level < len(DEGRADATION_MODES) - 1 and since_change >= settings.DEGRADE_STEP_SECONDS:
+                cls._level += 1
+            elif recovered and cls._level > 0 and since_change >= settings.DEGRADE_RECOVERY_SECONDS:
+                cls._level -= 1
+            
+            if cls._level != previous:
+                cls._last_change = now
+                cls._transitions += 1
+                print(f"[DEGRADE] Mode {DEGRADATION_MODES[previous]} -> {DEGRADATION_MODES[cls._level]} "
+                      f"(queue: {queue_depth}, p90 latency: "
+                      f"{', '.join(f'{agent}={latency:.1f}s' for agent, latency in latencies.items()) or 'n/a'})")
+            
+            return DEGRADATION_MODES[cls._level]
+    
+    @classmethod
+    def start_run(cls, state: AgentState) -> str:
+        """
+        Snapshot the mode for one customer run and tag the state with it.
+        
+        Args:
+            state: Agent state entering the workflow
+            
+        Returns:
+            Mode the run will use
+        """
+        mode = cls.evaluate()
+        state.metadata['degradation_mode'] = mode
+        with cls._lock:
+            cls._runs_by_mode[mode] += 1
+        return mode
+    
+    @classmethod
+    def stage_degraded(cls, state: AgentState, stage: str) -> bool:
+        """
+        Check whether a stage should run deterministically for this run.
+        
+        Args:
+            state: Current agent state (uses its snapshotted mode if present)
+            stage: "pattern", "context" or "empathy"
+            
+        Returns:
+            True if the stage should skip its LLM call
+        """
+        mode = (state.metadata or {}).get('degradation_mode') or cls.evaluate()
+        return DEGRADATION_MODES.index(mode) >= STAGE_DEGRADED_AT[stage]
+    
+    @classmethod
+    def get_status(cls) -> Dict[str, Any]:
+        """
+        Report the current mode and the signals behind it.
+        
+        Returns:
+            Mode, level, queue depth, recent p90 latency per agent vs SLO,
+            transition count and runs per mode
+        """
+        with cls._lock:
+            now = time.monotonic()
+            return {
+                "enabled": settings.DEGRADATION_ENABLED,
+                "mode": DEGRADATION_MODES[cls._level],
+                "level": cls._level,
+                "queue_depth": sum(cls._queue_depths.values()),
+                "queue_depth_slo": settings.DEGRADE_QUEUE_DEPTH_SLO,
+                "p90_latency": {agent: round(latency, 3) for agent, latency in cls._stage_latencies(now).items()},
+                "latency_slo": dict(settings.DEGRADE_STAGE_LATENCY_SLO),
+                "transitions": cls._transitions,
+                "runs_by_mode": dict(cls._runs_by_mode)
+            }
+    
+    @classmethod
+    def reset(cls):
+        """Return to full mode and clear all signals."""
+        with cls._lock:
+            cls._level = 0
+            cls._last_change = float("-inf")
+            cls._queue_depths = {}
+            cls._latencies = {}
+            cls._runs_by_mode = {mode: 0 for mode in DEGRADATION_MODES}
+            cls._transitions = 0
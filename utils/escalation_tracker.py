@@ -4,6 +4,7 @@ Tracks which customers have been escalated, their resolution status, and ensures
 proper handling across multiple proactive scans.
 """
 import json
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from pathlib import Path
@@ -75,16 +76,38 @@ class EscalationTracker:
         self.escalations_file = self.storage_path / "active_escalations.jsonl"
         self.history_file = self.storage_path / "escalation_history.jsonl"
         
-        # In-memory cache of active escalations
+        # In-memory cache of active escalations (workflow runs may share a tracker across threads)
         self.active_escalations: Dict[str, EscalationRecord] = {}
+        self._loaded_mtime: Optional[float] = None
+        self._lock = threading.RLock()
         self._load_active_escalations()
     
+    def refresh(self):
+        """
+        Re-read active escalations from disk if the file changed.
+        
+        Other tracker instances (backend, decision agent) persist escalations
+        to the same file, so pre-flight checks refresh before trusting the cache.
+        """
+        with self._lock:
+            if self._file_mtime() == self._loaded_mtime:
+                return
+            self._load_active_escalations()
+    
+    def _file_mtime(self) -> Optional[float]:
+        """Modification time of the active escalations file (None if missing)."""
+        if not self.escalations_file.exists():
+            return None
+        return self.escalations_file.stat().st_mtime
+    
     def _load_active_escalations(self):
         """Load active escalations from disk into memory."""
+        self._loaded_mtime = self._file_mtime()
         if not self.escalations_file.exists():
             return
         
         try:
+            active = {}
             with open(self.escalations_file, 'r', encoding='utf-8') as f:
                 for line in f:
                     if line.strip():
@@ -93,8 +116,10 @@ class EscalationTracker:
                         
                         # Only load if still active (not resolved or within time window)
                         if record.status in ["open", "in_progress"]:
-                            self.active_escalations[record.customer_id] = record
+                            active[record.customer_id] = record
             
+            # Swapped in whole so concurrent readers never see a half-loaded cache
+            self.active_escalations = active
             print(f"[OK] EscalationTracker: Loaded {len(self.active_escalations)} active escalations")
         except Exception as e:
             print(f"[WARN] EscalationTracker: Error loading escalations: {e}")
@@ -102,9 +127,11 @@ class EscalationTracker:
     def _save_active_escalations(self):
         """Save active escalations to disk."""
         try:
-            with open(self.escalations_file, 'w', encoding='utf-8') as f:
-                for record in self.active_escalations.values():
-                    f.write(json.dumps(record.to_dict()) + '\n')
+            with self._lock:
+                with open(self.escalations_file, 'w', encoding='utf-8') as f:
+                    for record in list(self.active_escalations.values()):
+                        f.write(json.dumps(record.to_dict()) + '\n')
+                self._loaded_mtime = self._file_mtime()
         except Exception as e:
             print(f"[ERROR] EscalationTracker: Error saving escalations: {e}")
     
@@ -188,8 +215,11 @@ class EscalationTracker:
             status="open"
         )
         
-        self.active_escalations[customer_id] = record
-        self._save_active_escalations()
+        with self._lock:
+            # Keep escalations written by other processes (sharded scans) since the last load
+            self.refresh()
+            self.active_escalations[customer_id] = record
+            self._save_active_escalations()
         
         print(f"[ESCALATION] Customer {customer_id} escalated: {reason} (Priority: {priority})")
         
@@ -387,6 +417,27 @@ class EscalationTracker:
             "context": "Previous escalation resolved, can process normally"
         }
     
+    def should_skip_customers(self, customer_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Bulk version of should_skip_customer for scan queues.
+        
+        Args:
+            customer_ids: Customer IDs to check
+            
+        Returns:
+            Mapping of customer ID to skip decision (only customers that should be skipped)
+        """
+        skipped = {}
+        for customer_id in customer_ids:
+            if customer_id not in self.active_escalations:
+                continue
+            
+            decision = self.should_skip_customer(customer_id)
+            if decision["should_skip"]:
+                skipped[customer_id] = decision
+        
+        return skipped
+    
     def get_customer_escalation_history(self, customer_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get escalation history for a customer.
@@ -0,0 +1,354 @@
+"""
+Fake Chat Model - Deterministic offline stand-in for the OpenAI chat model.
+
+Selected with LLM_MODEL=fake (or any agent model starting with "fake"). It
+recognizes each agent from its static system prompt and returns schema-valid
+JSON built from the customer data block, so the whole pipeline, the backend
+and the benchmarks run without network access.
+
+Simulated per call (all configurable in settings):
+- latency: lognormal time-to-first-token per agent (median, p95) plus
+  completion tokens / FAKE_LLM_TOKENS_PER_SECOND; FAKE_LLM_STRAGGLER_RATE
+  of calls are FAKE_LLM_STRAGGLER_FACTOR times slower (provider tail);
+  small models ("mini"/"small" in the name) are FAKE_LLM_SMALL_MODEL_SPEEDUP
+  times faster; streamed calls deliver the first chunk after the
+  time-to-first-token and the rest at the generation speed
+- failures: FAKE_LLM_FAILURE_RATE raises FakeLLMError,
+  FAKE_LLM_MALFORMED_RATE returns truncated JSON
+- token usage: prompt/completion tokens counted locally, provider prefix
+  caching reported as cache_read tokens for repeated long prefixes
+  
+Randomness is seeded from FAKE_LLM_SEED and the prompt text (timestamps
+removed), so the same prompt always gets the same response regardless of
+threading or when the run happens. Latency and errors are drawn per attempt,
+so a retried or hedged call behaves like an independent request.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple, ClassVar
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config import settings
+from config.prompts import SYSTEM_PROMPTS
+from .token_budget import count_tokens
+
+
+class FakeLLMError(RuntimeError):
+    """Simulated provider error."""
+
+
+def is_fake_model(model_name: Optional[str]) -> bool:
+    """Check whether a model name selects the fake chat model."""
+    return bool(model_name) and model_name.lower().startswith("fake")
+
+
+# Static system prompt -> agent key
+_AGENT_BY_PROMPT = {prompt: agent for agent, prompt in SYSTEM_PROMPTS.items()}
+_REPAIR_PATTERN = re.compile(r"malformed JSON produced by the (\w+) step")
+_TIMESTAMP_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?")
+
+NEGATIVE_WORDS = ("complaint", "delay", "late", "damaged", "refund", "angry", "cancel", "churn", "retention")
+POSITIVE_WORDS = ("milestone", "thank", "great", "happy", "anniversary", "upsell")
+
+STREAM_CHUNK_CHARS = 12  # Roughly 3 tokens per streamed chunk
+
+
+def _field(text: str, label: str, default: str = "") -> str:
+    """Read a `- Label: value` / `Label: value` line from a data block."""
+    match = re.search(rf"^\s*-?\s*{re.escape(label)}:\s*(.+)$", text, re.MULTILINE)
+    return match.group(1).strip() if match else default
+
+
+def _number(text: str, label: str, default: float) -> float:
+    """Read a numeric field (first number on the line)."""
+    match = re.search(r"-?\d+(?:\.\d+)?", _field(text, label))
+    return float(match.group()) if match else default
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model returning schema-valid agent responses."""
+    
+    model_name: str = "fake"
+    temperature: float = 0.0
+    
+    # Prefixes seen so far (simulated provider-side prompt caching)
+    _seen_prefixes: ClassVar[set] = set()
+    _seen_lock: ClassVar[threading.Lock] = threading.Lock()
+    _attempts: ClassVar[Dict[str, int]] = {}  # Calls per prompt (per-attempt latency draws)
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+    
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        agent, content, usage, call_rng = self._prepare(messages)
+        first_token, generation = self._latency(agent, usage["output_tokens"], call_rng)
+        time.sleep(first_token + generation)
+        
+        message = AIMessage(
+            content=content,
+            usage_metadata=usage,
+            response_metadata={"model_name": self.model_name, "finish_reason": "stop"}
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        agent, content, usage, call_rng = self._prepare(messages)
+        first_token, generation = self._latency(agent, usage["output_tokens"], call_rng)
+        time.sleep(first_token)
+        
+        # Content arrives in small pieces at the simulated generation speed
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+        for piece in pieces:
+            time.sleep(generation / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        
+        # Usage comes with the final chunk, as with stream_usage=True
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            usage_metadata=usage,
+            response_metadata={"model_name": self.model_name, "finish_reason": "stop"}
+        ))
+    
+    def _prepare(self, messages: List[BaseMessage]) -> Tuple[str, str, Dict[str, Any], random.Random]:
+        """
+        Build the response for a call (raises the simulated provider errors).
+        
+        Returns:
+            Tuple of (agent, content, usage, per-attempt rng for latency)
+        """
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        data = "\n".join(m.content for m in messages if not isinstance(m, SystemMessage))
+        agent = self._detect_agent(system)
+        # Event timestamps change every run; they must not change the outcome
+        prompt_text = f"{settings.FAKE_LLM_SEED}:{agent}:{system}:{_TIMESTAMP_PATTERN.sub('', data)}"
+        key = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+        rng = random.Random(key)
+        # Latency and errors vary per attempt, so retried/hedged calls differ
+        call_rng = random.Random(f"{key}:{self._next_attempt(key)}")
+        
+        if call_rng.random() < settings.FAKE_LLM_FAILURE_RATE:
+            time.sleep(sum(self._latency(agent, 0, call_rng)))
+            raise FakeLLMError(f"Simulated provider error for {agent}")
+        
+        base_agent = agent[:-len("_repair")] if agent.endswith("_repair") else agent
+        result = self._respond(base_agent, data, rng)
+        content = json.dumps(result, ensure_ascii=False, indent=2)
+        
+        if rng.random() < settings.FAKE_LLM_MALFORMED_RATE and not agent.endswith("_repair"):
+            content = "```json\n" + content[:len(content) // 2]
+        
+        return agent, content, self._usage(system, data, content), call_rng
+    
+    @classmethod
+    def reset(cls):
+        """Forget attempt counts and cached prefixes (fresh simulated provider)."""
+        with cls._seen_lock:
+            cls._attempts = {}
+            cls._seen_prefixes = set()
+    
+    @classmethod
+    def _next_attempt(cls, key: str) -> int:
+        """Number of earlier calls with the same prompt."""
+        with cls._seen_lock:
+            attempt = cls._attempts.get(key, 0)
+            cls._attempts[key] = attempt + 1
+        return attempt
+    
+    @staticmethod
+    def _detect_agent(system: str) -> str:
+        """Identify the calling agent from its static system prompt."""
+        if system in _AGENT_BY_PROMPT:
+            return _AGENT_BY_PROMPT[system]
+        match = _REPAIR_PATTERN.search(system)
+        if match:
+            return f"{match.group(1)}_repair"
+        return "unknown"
+    
+    def _speedup(self) -> float:
+        """Latency divisor for the simulated model size."""
+        name = self.model_name.lower()
+        return settings.FAKE_LLM_SMALL_MODEL_SPEEDUP if "mini" in name or "small" in name else 1.0
+    
+    def _latency(self, agent: str, output_tokens: int, rng: random.Random) -> Tuple[float, float]:
+        """
+        Simulated latency of one call.
+        
+        Returns:
+            Tuple of (lognormal time to first token, generation time) in seconds
+        """
+        scale = settings.FAKE_LLM_LATENCY_SCALE / self._speedup()
+        if scale <= 0:
+            return 0.0, 0.0
+        
+        median, p95 = settings.FAKE_LLM_LATENCY.get(agent, settings.FAKE_LLM_LATENCY["default"])
+        sigma = math.log(p95 / median) / 1.645 if p95 > median else 0.0
+        first_token = rng.lognormvariate(math.log(median), sigma)
+        if rng.random() < settings.FAKE_LLM_STRAGGLER_RATE:
+            first_token *= settings.FAKE_LLM_STRAGGLER_FACTOR
+        generation = output_tokens / settings.FAKE_LLM_TOKENS_PER_SECOND
+        return first_token * scale, generation * scale
+    
+    @classmethod
+    def _usage(cls, system: str, data: str, content: str) -> Dict[str, Any]:
+        """Token usage in the same shape langchain-openai reports it."""
+        prefix_tokens = count_tokens(system)
+        input_tokens = prefix_tokens + count_tokens(data)
+        output_tokens = count_tokens(content)
+        
+        # Providers cache long prefixes in fixed-size blocks after the first call
+        cached = 0
+        if prefix_tokens >= settings.PROMPT_CACHE_MIN_TOKENS:
+            with cls._seen_lock:
+                if system in cls._seen_prefixes:
+                    cached = prefix_tokens // 128 * 128
+                cls._seen_prefixes.add(system)
+        
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cached}
+        }
+    
+    def _respond(self, agent: str, data: str, rng: random.Random) -> Dict[str, Any]:
+        """Build a schema-valid response for an agent."""
+        builders = {
+            "context_agent": self._context_response,
+            "pattern_agent": self._pattern_response,
+            "decision_agent": self._decision_response,
+            "empathy_agent": self._empathy_response,
+            "fused_agent": lambda d, r: {**self._decision_response(d, r), **self._empathy_response(d, r)}
+        }
+        builder = builders.get(agent)
+        return builder(data, rng) if builder else {}
+    
+    @staticmethod
+    def _context_response(data: str, rng: random.Random) -> Dict[str, Any]:
+        text = data.lower()
+        if any(word in text for word in NEGATIVE_WORDS):
+            sentiment = rng.choice(["negative", "negative", "very_negative", "neutral"])
+        elif any(word in text for word in POSITIVE_WORDS):
+            sentiment = rng.choice(["positive", "very_positive", "neutral"])
+        else:
+            sentiment = rng.choice(["neutral", "positive", "negative"])
+        
+        risk = {"very_negative": 0.8, "negative": 0.65, "neutral": 0.4, "positive": 0.25, "very_positive": 0.15}[sentiment]
+        risk = round(min(1.0, max(0.0, risk + rng.uniform(-0.1, 0.1))), 2)
+        urgency = min(5, max(1, round(risk * 5 + rng.uniform(-0.5, 0.5))))
+        
+        return {
+            "sentiment": sentiment,
+            "urgency_level": urgency,
+            "customer_risk_score": risk,
+            "context_summary": (
+                f"{_field(data, 'Name', 'Customer')} ({_field(data, 'Segment', 'Regular')}) - "
+                f"{_field(data, 'Type', 'event')} with {sentiment.replace('_', ' ')} sentiment"
+            )
+        }
+    
+    @staticmethod
+    def _pattern_response(data: str, rng: random.Random) -> Dict[str, Any]:
+        current_risk = _number(data, "Current Risk Score", 0.5)
+        predicted = round(min(1.0, max(0.0, current_risk + rng.uniform(-0.1, 0.15))), 2)
+        segment = _field(data, "Segment", "Regular")
+        
+        return {
+            "predicted_churn_risk": predicted,
+            "historical_insights": (
+                f"{segment} customers with similar profiles respond best to fast, personal outreach; "
+                f"predicted churn risk {predicted:.0%}"
+            ),
+            "pattern_summary": f"Engagement decline consistent with the {segment} at-risk cohort",
+            "preventive_recommendations": [
+                "Personal check-in within 24 hours",
+                "Offer a relevant incentive on the preferred category",
+                "Follow up after resolution"
+            ]
+        }
+    
+    @staticmethod
+    def _decision_response(data: str, rng: random.Random) -> Dict[str, Any]:
+        churn_risk = _number(data, "Churn Risk", 0.5)
+        restricted = "RESTRICTED" in data
+        
+        if restricted or churn_risk < 0.4:
+            incentive = {"type": "none", "reasoning": "Relationship message is sufficient"}
+        elif churn_risk < 0.75:
+            incentive = {
+                "type": "discount",
+                "discount_percentage": rng.choice([5, 8, 10]),
+                "reasoning": "Moderate churn risk - small auto-approved discount"
+            }
+        else:
+            incentive = {
+                "type": "discount",
+                "discount_percentage": rng.choice([10, 12, 15]),
+                "reasoning": "High churn risk - meaningful retention incentive"
+            }
+        
+        priority = "critical" if churn_risk >= 0.85 else "high" if churn_risk >= 0.7 else "medium" if churn_risk >= 0.4 else "low"
+        
+        return {
+            "recommended_action": "Reach out personally, acknowledge recent experience and offer tailored support",
+            "escalation_needed": churn_risk >= 0.85,
+            "priority_level": priority,
+            "action_steps": [
+                "Send personalized message on preferred channel",
+                "Apply incentive if approved",
+                "Schedule follow-up in 7 days"
+            ],
+            "reasoning": f"Churn risk {churn_risk:.0%} with recent engagement decline",
+            "incentive_offered": incentive
+        }
+    
+    @staticmethod
+    def _empathy_response(data: str, rng: random.Random) -> Dict[str, Any]:
+        first_name = _field(data, "Name", "there").split()[0]
+        category = _field(data, "Preferred Category", "")
+        discount = re.search(r"AUTO-APPROVED: (\d+(?:\.\d+)?|\{DISCOUNT_PCT\})% discount", data)
+        
+        lines = [f"Dear {first_name},", "", "We noticed it has been a while and wanted to check in personally."]
+        if category and category.lower() != "none":
+            lines.append(f"We have some new {category} picks we think you'll love.")
+        if discount:
+            pct = discount.group(1)
+            if not pct.startswith("{"):
+                pct = f"{float(pct):g}"
+            lines.append(f"We've added a {pct}% discount to your account as a thank you.")
+        lines += ["If anything has not met your expectations, just reply and we'll make it right.", "",
+                  "Warm regards,", "Customer Success Team"]
+        
+        return {
+            "personalized_response": "\n".join(lines),
+            "tone": rng.choice(["warm and appreciative", "empathetic and reassuring", "friendly and personal"]),
+            "empathy_score": round(rng.uniform(0.75, 0.95), 2),
+            "key_empathy_elements": ["personal greeting", "acknowledgement", "clear next step"]
+        }
@@ -0,0 +1,225 @@
+"""
+Intervention Scheduler - Decides which at-risk customers a scan contacts now.
+
+Alerts are ranked by expected value at risk (lifetime value x churn risk),
+weighted by how soon the customer's intervention window closes (see
+intervention_window). Customers whose window closes within SCHEDULER_DUE_DAYS
+come first. A scan takes customers in that order until its intervention
+limit (throughput) or model-time budget is used up; the rest are deferred to
+a later scan. Deferred customers are remembered under DATA_DIR/scheduler so
+their window keeps counting down from when they were first deferred.
+
+Model time is workflow stage time per customer (dominated by model calls),
+estimated from the runs measured so far in this process.
+"""
+import json
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from models import AgentState
+from config import settings
+from .data_analytics import DataAnalytics
+from .monitor import intervention_window
+from .tracing import SpanStats
+
+
+DEFERRED_FILE = "deferred.json"
+DEFERRED_RETENTION_DAYS = 60  # Longest intervention window
+
+
+class InterventionScheduler:
+    """Plans scans by value and deadline (statistics shared by all scans in the process)."""
+    
+    _stats_lock = threading.Lock()
+    _stats = {
+        "plans": 0,
+        "scheduled": 0,
+        "deferred": 0,
+        "deferred_due": 0,
+        "value_scheduled": 0.0,
+        "value_deferred": 0.0,
+        "interventions": 0,
+        "value_saved": 0.0,
+        "model_s": 0.0
+    }
+    
+    def __init__(self, analytics: Optional[DataAnalytics] = None, storage_path: Optional[Path] = None):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            analytics: DataAnalytics for order history (defaults to the shared instance)
+            storage_path: Directory for deferred customers (defaults to DATA_DIR/scheduler)
+        """
+        self.analytics = analytics or DataAnalytics()
+        self.storage_path = storage_path or settings.DATA_DIR / "scheduler"
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def estimated_model_seconds() -> float:
+        """Model-seconds one customer takes (mean measured workflow run, or SCHEDULER_EST_MODEL_S)."""
+        runs = SpanStats.get_span_stats("workflow.run").get("workflow.run")
+        return runs["mean_s"] if runs and runs["mean_s"] > 0 else settings.SCHEDULER_EST_MODEL_S
+    
+    def assess(self, alert: Dict[str, Any], deferred: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Value and deadline of one alert.
+        
+        Args:
+            alert: At-risk customer alert
+            deferred: Record of an earlier deferral of the customer, if any
+            
+        Returns:
+            Value at risk, intervention window, days left until it closes,
+            whether the customer is due, and the ranking priority
+        """
+        customer = alert['customer']
+        window = intervention_window(
+            alert['churn_risk'], customer, self.analytics.get_customer_order_stats(customer)
+        )
+        value_at_risk = customer.lifetime_value * alert['churn_risk']
+        
+        waited_days = 0
+        if deferred:
+            waited_days = (datetime.now() - datetime.fromisoformat(deferred['first_deferred'])).days
+        deadline_days = window['end_days'] - waited_days
+        
+        # Full weight when the window closes within a week, less the longer it stays open
+        urgency_weight = 7 / max(7, deadline_days)
+        return {
+            "value_at_risk": round(value_at_risk, 2),
+            "window": window['urgency'],
+            "deadline_days": deadline_days,
+            "due": deadline_days <= settings.SCHEDULER_DUE_DAYS,
+            "priority": round(value_at_risk * urgency_weight, 2),
+            "deferrals": deferred['deferrals'] if deferred else 0
+        }
+    
+    def plan(
+        self,
+        alerts: List[Dict[str, Any]],
+        max_interventions: int,
+        model_budget_s: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Split a scan's alerts into customers to contact now and deferred ones.
+        
+        Each alert gets its assessment under the 'schedule' key.
+        
+        Args:
+            alerts: At-risk customer alerts
+            max_interventions: Customers the scan can process (throughput limit)
+            model_budget_s: Model-seconds the scan may spend (defaults to
+                SCHEDULER_MODEL_BUDGET_S; 0 = unlimited)
+                
+        Returns:
+            Tuple of (scheduled alerts in processing order, deferred alerts)
+        """
+        budget_s = settings.SCHEDULER_MODEL_BUDGET_S if model_budget_s is None else model_budget_s
+        per_customer_s = self.estimated_model_seconds()
+        
+        with self._lock:
+            records = self._load_deferred()
+            for alert in alerts:
+                alert['schedule'] = self.assess(alert, records.get(alert['customer'].customer_id))
+            
+            ranked = sorted(alerts, key=lambda a: (not a['schedule']['due'], -a['schedule']['priority']))
+            scheduled, deferred = [], []
+            planned_s = 0.0
+            for alert in ranked:
+                fits_budget = not budget_s or planned_s + per_customer_s <= budget_s
+                if len(scheduled) < max_interventions and fits_budget:
+                    scheduled.append(alert)
+                    planned_s += per_customer_s
+                else:
+                    deferred.append(alert)
+            
+            now = datetime.now().isoformat()
+            for alert in scheduled:
+                records.pop(alert['customer'].customer_id, None)
+            for alert in deferred:
+                record = records.setdefault(alert['customer'].customer_id, {"first_deferred": now, "deferrals": 0})
+                record["deferrals"] += 1
+                record["last_deferred"] = now
+            self._save_deferred(records)
+        
+        with self._stats_lock:
+            self._stats["plans"] += 1
+            self._stats["scheduled"] += len(scheduled)
+            self._stats["deferred"] += len(deferred)
+            self._stats["deferred_due"] += sum(1 for alert in deferred if alert['schedule']['due'])
+            self._stats["value_scheduled"] += sum(alert['schedule']['value_at_risk'] for alert in scheduled)
+            self._stats["value_deferred"] += sum(alert['schedule']['value_at_risk'] for alert in deferred)
+        return scheduled, deferred
+    
+    def _load_deferred(self) -> Dict[str, Dict[str, Any]]:
+        """Deferred customers still inside the longest window."""
+        deferred_file = self.storage_path / DEFERRED_FILE
+        if not deferred_file.exists():
+            return {}
+        try:
+            records = json.loads(deferred_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[WARN] InterventionScheduler: Unreadable deferrals {deferred_file}: {e}")
+            return {}
+        
+        cutoff = (datetime.now() - timedelta(days=DEFERRED_RETENTION_DAYS)).isoformat()
+        return {customer_id: record for customer_id, record in records.items() if record["first_deferred"] >= cutoff}
+    
+    def _save_deferred(self, records: Dict[str, Dict[str, Any]]):
+        """Replace the deferred customers atomically."""
+        temp_file = self.storage_path / f"{DEFERRED_FILE}.tmp"
+        temp_file.write_text(json.dumps(records, indent=2), encoding="utf-8")
+        temp_file.replace(self.storage_path / DEFERRED_FILE)
+    
+    @classmethod
+    def record_result(cls, alert: Dict[str, Any], state: AgentState):
+        """
+        Count the value and model time of a finished intervention.
+        
+        Args:
+            alert: Scheduled alert (carries its 'schedule' assessment)
+            state: Final state of the customer's workflow run
+        """
+        schedule = alert.get('schedule')
+        if not schedule or state.priority_level == "handled" or not state.personalized_response:
+            return
+        with cls._stats_lock:
+            cls._stats["interventions"] += 1
+            cls._stats["value_saved"] += schedule['value_at_risk']
+            cls._stats["model_s"] += sum(state.metadata.get('stage_timings', {}).values())
+    
+    @classmethod
+    def get_scheduler_stats(cls) -> Dict[str, Any]:
+        """
+        Summarize scheduling and the value it bought.
+        
+        Returns:
+            Customers scheduled and deferred (and deferred while due), value
+            at risk of each, expected value saved by finished interventions,
+            the model-seconds they took and value saved per model-second
+        """
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+        
+        stats["enabled"] = settings.INTERVENTION_SCHEDULER_ENABLED
+        stats["value_per_model_s"] = round(stats["value_saved"] / stats["model_s"], 2) if stats["model_s"] else None
+        for key in ("value_scheduled", "value_deferred", "value_saved", "model_s"):
+            stats[key] = round(stats[key], 2)
+        return stats
+    
+    @classmethod
+    def merge_stats(cls, stats: Dict[str, Any]):
+        """Add statistics reported by another process (e.g. a scan shard)."""
+        with cls._stats_lock:
+            for key in cls._stats:
+                cls._stats[key] += stats.get(key, 0)
+    
+    @classmethod
+    def reset(cls):
+        """Clear statistics."""
+        with cls._stats_lock:
+            cls._stats = {key: 0.0 if isinstance(value, float) else 0 for key, value in cls._stats.items()}
@@ -0,0 +1,84 @@
+"""
+LLM Factory - Creates the chat model used by each agent.
+
+LLM_MODEL=fake (or an agent model name starting with "fake") selects the
+deterministic offline FakeChatModel; anything else is an OpenAI model.
+With LLM_MODEL=fake, other model names are kept as a suffix ("fake-gpt-4o-mini")
+so the fake model can simulate the large/small tier difference (and is priced
+like the model it stands in for).
+"""
+from typing import Any, Dict, Optional
+
+from langchain_openai import ChatOpenAI
+
+from config import settings
+from .fake_llm import FakeChatModel, is_fake_model
+
+
+def create_chat_model(model_name: str, temperature: float) -> Any:
+    """
+    Create a chat model for an agent.
+    
+    Args:
+        model_name: Agent model name (e.g. settings.CONTEXT_AGENT_MODEL)
+        temperature: Sampling temperature
+        
+    Returns:
+        ChatOpenAI, or FakeChatModel when the fake model is selected
+    """
+    if is_fake_model(model_name):
+        return FakeChatModel(model_name=model_name, temperature=temperature)
+    if is_fake_model(settings.LLM_MODEL):
+        return FakeChatModel(model_name=f"{settings.LLM_MODEL}-{model_name}", temperature=temperature)
+    
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        openai_api_key=settings.OPENAI_API_KEY,
+        timeout=settings.TIMEOUT_SECONDS,  # Bounds calls abandoned by the call guard
+        stream_usage=True  # Token usage on streamed (empathy) calls too
+    )
+
+
+def create_tiered_chat_models(agent: str, model_name: str, temperature: float) -> Dict[str, Any]:
+    """
+    Create an agent's large and small models for the ModelRouter.
+    
+    Args:
+        agent: Agent key (selects settings.AGENT_SMALL_MODELS[agent])
+        model_name: Large model name (the agent's configured model)
+        temperature: Sampling temperature
+        
+    Returns:
+        Chat models by tier; "small" is the large model when routing is off
+        or no distinct small model is configured
+    """
+    large = create_chat_model(model_name, temperature)
+    small_name = settings.AGENT_SMALL_MODELS.get(agent, model_name)
+    if not settings.MODEL_ROUTING_ENABLED or small_name == model_name:
+        return {"large": large, "small": large}
+    return {"large": large, "small": create_chat_model(small_name, temperature)}
+
+
+def model_cost(model_name: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimated USD cost of one call.
+    
+    Args:
+        model_name: Model that served the call (fake models are priced as the
+            model named in their suffix)
+        prompt_tokens: Prompt tokens
+        completion_tokens: Completion tokens
+        
+    Returns:
+        Cost per settings.LLM_PRICES_PER_1M_TOKENS (default price for unknown models)
+    """
+    name = (model_name or "").lower()
+    if is_fake_model(name):
+        name = name.partition("-")[2]
+    matches = [prefix for prefix in settings.LLM_PRICES_PER_1M_TOKENS if name.startswith(prefix)]
+    prompt_price, completion_price = (
+        settings.LLM_PRICES_PER_1M_TOKENS[max(matches, key=len)] if matches
+        else settings.LLM_DEFAULT_PRICE_PER_1M_TOKENS
+    )
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
@@ -1,5 +1,9 @@
 """
 Memory Handler - Manages conversation history and state persistence.
+
+Interactions are appended per customer in the state_codec binary format
+(`<customer_id>.mpk`), or as JSONL with STATE_CODEC=json; files of both
+formats are read, and returned interactions are always plain dictionaries.
 """
 import json
 from typing import List, Dict, Any, Optional
@@ -8,6 +12,7 @@ from pathlib import Path
 
 from models import AgentState, CustomerEvent, Customer
 from config import settings
+from . import state_codec
 
 
 class CustomJSONEncoder(json.JSONEncoder):
@@ -73,13 +78,48 @@ class MemoryHandler:
         self.session_history.append(interaction)
         
         # Persist to disk
-        if state.customer:
-            customer_file = self.storage_path / f"{state.customer.customer_id}.jsonl"
+        if state.customer and state_codec.binary_enabled():
+            customer_file = self.storage_path / f"{state.customer.customer_id}{state_codec.BINARY_SUFFIX}"
+            with state_codec.open_record_log(customer_file) as f:
+                state_codec.append_record(f, dict(interaction, state=state))
+        elif state.customer:
+            customer_file = self.storage_path / f"{state.customer.customer_id}{state_codec.JSON_SUFFIX}"
             with open(customer_file, "a", encoding="utf-8") as f:
                 f.write(json.dumps(interaction, cls=CustomJSONEncoder) + "\n")
         
         return interaction_id
     
+    def _read_interactions(self, customer_file: Path) -> List[Dict[str, Any]]:
+        """
+        Interactions stored in one customer file (JSONL or binary records).
+        
+        Args:
+            customer_file: Memory file of a customer
+            
+        Returns:
+            Interactions in file order, with the state as a dictionary
+        """
+        if customer_file.suffix == state_codec.JSON_SUFFIX:
+            with open(customer_file, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        
+        interactions = []
+        for interaction in state_codec.read_records(customer_file, on_error=lambda e: print(
+            f"[WARN] MemoryHandler: Skipped unreadable interaction in {customer_file.name}: {e}"
+        )):
+            interaction["state"] = state_codec.state_from_payload(interaction["state"]).to_dict()
+            interactions.append(interaction)
+        return interactions
+    
+    def _customer_files(self, customer_id: Optional[str] = None) -> List[Path]:
+        """Memory files of one customer (or all customers) in both formats."""
+        stem = customer_id or "*"
+        return [
+            customer_file
+            for suffix in (state_codec.JSON_SUFFIX, state_codec.BINARY_SUFFIX)
+            for customer_file in sorted(self.storage_path.glob(f"{stem}{suffix}"))
+        ]
+    
     def get_customer_history(
         self,
         customer_id: str,
@@ -95,16 +135,9 @@ class MemoryHandler:
         Returns:
             List of past interactions
         """
-        customer_file = self.storage_path / f"{customer_id}.jsonl"
-        
-        if not customer_file.exists():
-            return []
-        
         history = []
-        with open(customer_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    history.append(json.loads(line))
+        for customer_file in self._customer_files(customer_id):
+            history.extend(self._read_interactions(customer_file))
         
         # Sort by timestamp (most recent first)
         history.sort(key=lambda x: x["timestamp"], reverse=True)
@@ -162,24 +195,20 @@ class MemoryHandler:
         similar = []
         
         # Search through all customer files
-        for customer_file in self.storage_path.glob("*.jsonl"):
-            with open(customer_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        interaction = json.loads(line)
-                        
-                        # Check event type match
-                        if interaction.get("event_type") == event_type:
-                            # Check segment if specified
-                            if customer_segment:
-                                customer_data = interaction.get("state", {}).get("customer", {})
-                                if customer_data.get("segment") != customer_segment:
-                                    continue
-                            
-                            similar.append(interaction)
-                            
-                            if len(similar) >= limit:
-                                break
+        for customer_file in self._customer_files():
+            for interaction in self._read_interactions(customer_file):
+                # Check event type match
+                if interaction.get("event_type") == event_type:
+                    # Check segment if specified
+                    if customer_segment:
+                        customer_data = interaction.get("state", {}).get("customer", {})
+                        if customer_data.get("segment") != customer_segment:
+                            continue
+                    
+                    similar.append(interaction)
+                    
+                    if len(similar) >= limit:
+                        break
             
             if len(similar) >= limit:
                 break
@@ -245,6 +274,6 @@ class MemoryHandler:
                 "export_date": datetime.now().isoformat(),
                 "total_interactions": len(history),
                 "interactions": history
-            }, f, indent=2)
+            }, f, indent=2, cls=CustomJSONEncoder)
         
         return output_path
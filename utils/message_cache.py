@@ -0,0 +1,234 @@
+"""
+Message Cache - Reuses model-written message skeletons across similar customers.
+
+Bulk proactive campaigns send many messages that differ only in the customer's
+name, preferred category and discount. The empathy agent asks the model once per
+(language, festival, segment, tone, action class, discount bucket) for a message
+skeleton with {FIRST_NAME}, {CATEGORY} and {DISCOUNT_PCT} placeholders and
+renders it locally for every customer with the same key.
+
+To keep campaigns from reading identically, each skeleton is rendered at most
+MESSAGE_CACHE_MAX_USES times and a key keeps up to MESSAGE_CACHE_VARIANTS
+skeletons; a new variant that is too similar to one already cached
+(MESSAGE_CACHE_MAX_SIMILARITY) is used once but not cached. A skeleton with a
+placeholder its key cannot fill (e.g. {DISCOUNT_PCT} without a discount) is
+never cached or sent.
+"""
+import re
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Dict, Any, List, Optional, Tuple
+
+from models import AgentState
+from config import settings
+
+
+NAME_PLACEHOLDER = "{FIRST_NAME}"
+CATEGORY_PLACEHOLDER = "{CATEGORY}"
+DISCOUNT_PLACEHOLDER = "{DISCOUNT_PCT}"
+PLACEHOLDER_PATTERN = re.compile(r"\{[A-Z_]+\}")
+
+# Generic recommended action per decision class (skeletons and speculative drafts)
+ACTION_DESCRIPTIONS = {
+    "retention_offer": "Send a personalized retention message with a small loyalty discount",
+    "engagement": "Send a personalized engagement message (no incentive)",
+    "escalation": "A specialist from our team will reach out personally to resolve this"
+}
+
+SkeletonKey = Tuple[str, ...]
+
+
+def decision_class(state: AgentState) -> Tuple[str, str]:
+    """
+    Classify a decision for matching cached or drafted messages.
+    
+    Args:
+        state: Agent state after the decision stage
+        
+    Returns:
+        Tuple of (action class, discount bucket "none"/"auto"/"approval");
+        a non-discount incentive the decision applied (loyalty points, free
+        shipping, ...) gets its own action class, e.g. "loyalty_points_incentive"
+    """
+    if not state.discount_applied:
+        bucket = "none"
+    else:
+        bucket = "auto" if state.discount_auto_approved else "approval"
+    
+    if state.escalation_needed:
+        return "escalation", bucket
+    if state.discount_applied:
+        return "retention_offer", bucket
+    incentive = state.metadata.get('incentive')
+    return (f"{incentive}_incentive" if incentive else "engagement"), bucket
+
+
+def action_description(action_class: str) -> str:
+    """Generic recommended action of a decision class (see decision_class)."""
+    if action_class in ACTION_DESCRIPTIONS:
+        return ACTION_DESCRIPTIONS[action_class]
+    incentive = action_class[:-len("_incentive")].replace("_", " ")
+    return f"Send a personalized retention message that tells the customer about their {incentive} incentive"
+
+
+def render_skeleton(skeleton: str, state: AgentState) -> str:
+    """
+    Fill a skeleton's placeholders for one customer.
+    
+    Args:
+        skeleton: Message text with placeholders
+        state: Agent state of the customer the message is for
+        
+    Returns:
+        Personalized message text
+    """
+    first_name = (state.customer.full_name or "there").split()[0]
+    text = skeleton.replace(NAME_PLACEHOLDER, first_name)
+    text = text.replace(CATEGORY_PLACEHOLDER, state.customer.preferred_category or "favourite")
+    if state.discount_applied:
+        text = text.replace(DISCOUNT_PLACEHOLDER, f"{state.discount_applied:g}")
+    return text
+
+
+def unfilled_placeholders(text: str) -> List[str]:
+    """Placeholders left in a rendered message (it must not be sent)."""
+    return PLACEHOLDER_PATTERN.findall(text)
+
+
+def fillable(skeleton: str, key: SkeletonKey) -> bool:
+    """Whether every placeholder in a skeleton can be filled for the customers of `key`."""
+    allowed = {NAME_PLACEHOLDER, CATEGORY_PLACEHOLDER}
+    if key[-1] != "none":
+        allowed.add(DISCOUNT_PLACEHOLDER)
+    return set(PLACEHOLDER_PATTERN.findall(skeleton)) <= allowed
+
+
+class MessageSkeletonCache:
+    """Process-wide message skeletons by key (shared by all empathy agents)."""
+    
+    _lock = threading.Lock()
+    _entries: Dict[SkeletonKey, List[Dict[str, Any]]] = {}
+    _stats = {
+        "lookups": 0,
+        "hits": 0,
+        "generated": 0,
+        "stored": 0,
+        "rejected_similar": 0,
+        "invalid": 0,
+        "retired": 0
+    }
+    
+    @staticmethod
+    def cacheable(state: AgentState) -> bool:
+        """
+        Whether a run's message may come from a skeleton.
+        
+        Only monitor-generated proactive events qualify; anything carrying
+        free text from the customer gets its own message.
+        """
+        if not settings.MESSAGE_CACHE_ENABLED or not state.customer or not state.event:
+            return False
+        metadata = state.event.metadata or {}
+        if metadata.get('source') != 'proactive_monitor':
+            return False
+        return not (metadata.get('customer_message') or metadata.get('notes'))
+    
+    @staticmethod
+    def validate(skeleton: str, key: SkeletonKey) -> bool:
+        """
+        A skeleton must address the customer by placeholder, carry the discount
+        if applied, and use only placeholders its key can fill.
+        """
+        if NAME_PLACEHOLDER not in skeleton or not fillable(skeleton, key):
+            return False
+        return key[-1] != "auto" or DISCOUNT_PLACEHOLDER in skeleton
+    
+    @classmethod
+    def checkout(cls, key: SkeletonKey) -> Optional[Dict[str, Any]]:
+        """
+        Take the least-used skeleton of a key that is still under its use cap.
+        
+        Args:
+            key: Skeleton key (see EmpathyAgent.skeleton_key)
+            
+        Returns:
+            Skeleton (personalized_response, tone, empathy_score), or None if
+            a new one has to be generated
+        """
+        with cls._lock:
+            cls._stats["lookups"] += 1
+            variants = cls._entries.get(key, [])
+            available = [v for v in variants if v["uses"] < settings.MESSAGE_CACHE_MAX_USES]
+            if not available:
+                return None
+            variant = min(available, key=lambda v: v["uses"])
+            variant["uses"] += 1
+            cls._stats["hits"] += 1
+            return dict(variant["skeleton"])
+    
+    @classmethod
+    def openings(cls, key: SkeletonKey) -> List[str]:
+        """First lines of the cached skeletons, so a new variant can avoid them."""
+        with cls._lock:
+            return [
+                next((line for line in v["skeleton"]["personalized_response"].splitlines()[1:] if line.strip()), "")
+                for v in cls._entries.get(key, [])
+            ]
+    
+    @classmethod
+    def store(cls, key: SkeletonKey, skeleton: Dict[str, Any]) -> bool:
+        """
+        Add a freshly generated skeleton (already used once) to its key.
+        
+        A skeleton that is too similar to a cached variant, or invalid, is not
+        stored. When the key is full, the most-used variant is retired.
+        
+        Returns:
+            True if the skeleton was cached
+        """
+        text = skeleton.get("personalized_response", "")
+        with cls._lock:
+            cls._stats["generated"] += 1
+            if not cls.validate(text, key):
+                cls._stats["invalid"] += 1
+                return False
+            
+            variants = cls._entries.setdefault(key, [])
+            for variant in variants:
+                ratio = SequenceMatcher(None, text, variant["skeleton"]["personalized_response"]).ratio()
+                if ratio >= settings.MESSAGE_CACHE_MAX_SIMILARITY:
+                    cls._stats["rejected_similar"] += 1
+                    return False
+            
+            if len(variants) >= settings.MESSAGE_CACHE_VARIANTS:
+                variants.remove(max(variants, key=lambda v: v["uses"]))
+                cls._stats["retired"] += 1
+            variants.append({"skeleton": dict(skeleton), "uses": 1, "created": time.time()})
+            cls._stats["stored"] += 1
+            return True
+    
+    @classmethod
+    def get_cache_stats(cls) -> Dict[str, Any]:
+        """
+        Summarize skeleton reuse.
+        
+        Returns:
+            Counts, hit rate, cached keys/skeletons and model calls saved
+        """
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats["keys"] = len(cls._entries)
+            stats["skeletons"] = sum(len(variants) for variants in cls._entries.values())
+        
+        stats["enabled"] = settings.MESSAGE_CACHE_ENABLED
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["llm_calls_saved"] = stats["hits"]
+        return stats
+    
+    @classmethod
+    def reset(cls):
+        """Clear cached skeletons and statistics."""
+        with cls._lock:
+            cls._entries = {}
+            cls._stats = {key: 0 for key in cls._stats}
@@ -0,0 +1,178 @@
+"""
+Model Router - Picks a large or small model per customer run.
+
+Low-value, low-risk cases do not need the large model: the router sends them
+to each agent's small model (AGENT_SMALL_MODELS) and keeps the large model for
+VIP, high-LTV and critical-risk customers. The tier is decided once at the
+workflow gate from the monitor alert (segment, lifetime value, churn risk) and
+stored in `state.metadata['model_tier']`; a run that turns into an escalation
+or critical priority is moved up to the large model for its remaining stages.
+
+Every decision and the latency of every routed call are recorded per tier so
+the thresholds can be tuned from /api/metrics or the benchmark.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from models import AgentState
+from config import settings
+from .prompt_builder import AgentPrompt
+from .response_parser import invoke_structured
+
+
+MODEL_TIERS = ("large", "small")
+
+
+class ModelRouter:
+    """Process-wide model tier routing and per-tier latency (shared by all agents)."""
+    
+    _lock = threading.Lock()
+    _decisions: Dict[str, int] = {tier: 0 for tier in MODEL_TIERS}
+    _reasons: Dict[str, int] = {}
+    _upgrades = 0
+    _recent: deque = deque(maxlen=100)
+    _latencies: Dict[Tuple[str, str], deque] = {}
+    _failures: Dict[Tuple[str, str], int] = {}
+    
+    @classmethod
+    def _classify(cls, state: AgentState) -> Tuple[str, str]:
+        """Tier and reason for a run, from the customer and its monitor alert."""
+        if not settings.MODEL_ROUTING_ENABLED:
+            return "large", "routing_disabled"
+        
+        customer = state.customer
+        alert = state.event.metadata if state.event and state.event.metadata else {}
+        if customer is None or "churn_risk" not in alert:
+            return "large", "no_alert"
+        if customer.segment in settings.ROUTING_LARGE_SEGMENTS:
+            return "large", f"segment_{customer.segment.lower()}"
+        if alert.get("risk_level") == "critical" or alert["churn_risk"] >= settings.ROUTING_SMALL_MAX_CHURN_RISK:
+            return "large", "critical_risk"
+        if customer.lifetime_value >= settings.ROUTING_SMALL_MAX_LTV:
+            return "large", "high_ltv"
+        return "small", "low_value_low_risk"
+    
+    @classmethod
+    def route(cls, state: AgentState) -> str:
+        """
+        Decide the model tier for one customer run and tag the state with it.
+        
+        Args:
+            state: Agent state entering the workflow
+            
+        Returns:
+            "large" or "small"
+        """
+        tier, reason = cls._classify(state)
+        state.metadata['model_tier'] = tier
+        state.metadata['model_route_reason'] = reason
+        
+        with cls._lock:
+            cls._decisions[tier] += 1
+            cls._reasons[reason] = cls._reasons.get(reason, 0) + 1
+            alert = state.event.metadata if state.event and state.event.metadata else {}
+            cls._recent.append({
+                "customer_id": state.customer.customer_id if state.customer else None,
+                "tier": tier,
+                "reason": reason,
+                "segment": state.customer.segment if state.customer else None,
+                "lifetime_value": state.customer.lifetime_value if state.customer else None,
+                "churn_risk": alert.get("churn_risk")
+            })
+        return tier
+    
+    @classmethod
+    def tier_for(cls, state: AgentState) -> str:
+        """
+        Tier to use for the next call of a run.
+        
+        Small-tier runs move to the large model once the decision stage has
+        escalated them or set critical priority.
+        """
+        tier = state.metadata.get('model_tier') or cls.route(state)
+        if tier == "small" and (state.escalation_needed or state.priority_level == "critical"):
+            state.metadata['model_tier'] = tier = "large"
+            state.metadata['model_route_reason'] = "escalation_upgrade"
+            with cls._lock:
+                cls._upgrades += 1
+        return tier
+    
+    @classmethod
+    def invoke(cls, llms: Dict[str, Any], state: AgentState, prompt: AgentPrompt,
+               on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Run a structured call on the model of the run's tier.
+        
+        Args:
+            llms: Chat models by tier (see create_tiered_chat_models)
+            state: Current agent state
+            prompt: Agent prompt
+            on_chunk: Stream the call (see invoke_structured)
+            
+        Returns:
+            Parsed JSON response
+        """
+        tier = cls.tier_for(state)
+        key = (tier, prompt.agent)
+        started = time.monotonic()
+        try:
+            return invoke_structured(llms.get(tier) or llms["large"], prompt, on_chunk=on_chunk)
+        except Exception:
+            with cls._lock:
+                cls._failures[key] = cls._failures.get(key, 0) + 1
+            raise
+        finally:
+            with cls._lock:
+                cls._latencies.setdefault(key, deque(maxlen=500)).append(time.monotonic() - started)
+    
+    @classmethod
+    def get_routing_stats(cls, recent: int = 20) -> Dict[str, Any]:
+        """
+        Summarize routing decisions and per-tier latency.
+        
+        Args:
+            recent: Number of most recent decisions to include
+            
+        Returns:
+            Thresholds, decisions and reasons, escalation upgrades, call
+            latency (mean/p50/p95) per tier and agent, and recent decisions
+        """
+        with cls._lock:
+            latency: Dict[str, Dict[str, Any]] = {}
+            for (tier, agent), samples in cls._latencies.items():
+                ordered = sorted(samples)
+                latency.setdefault(tier, {})[agent] = {
+                    "calls": len(ordered),
+                    "failures": cls._failures.get((tier, agent), 0),
+                    "mean_s": round(sum(ordered) / len(ordered), 3),
+                    "p50_s": round(ordered[len(ordered) // 2], 3),
+                    "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+                }
+            recent_decisions: List[Dict[str, Any]] = list(cls._recent)[-recent:][::-1] if recent > 0 else []
+            
+            return {
+                "enabled": settings.MODEL_ROUTING_ENABLED,
+                "thresholds": {
+                    "large_segments": list(settings.ROUTING_LARGE_SEGMENTS),
+                    "small_max_ltv": settings.ROUTING_SMALL_MAX_LTV,
+                    "small_max_churn_risk": settings.ROUTING_SMALL_MAX_CHURN_RISK
+                },
+                "decisions": dict(cls._decisions),
+                "reasons": dict(cls._reasons),
+                "escalation_upgrades": cls._upgrades,
+                "latency": latency,
+                "recent": recent_decisions
+            }
+    
+    @classmethod
+    def reset(cls):
+        """Clear decisions and latency history."""
+        with cls._lock:
+            cls._decisions = {tier: 0 for tier in MODEL_TIERS}
+            cls._reasons = {}
+            cls._upgrades = 0
+            cls._recent = deque(maxlen=100)
+            cls._latencies = {}
+            cls._failures = {}
@@ -1,14 +1,74 @@
 """
 Proactive Monitor - Detects at-risk customers and triggers preventive actions.
 """
+import zlib
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 
 from models import Customer
 from config import settings
 from utils.data_analytics import DataAnalytics
+from utils.escalation_tracker import EscalationTracker
+
+
+def customer_shard(customer_id: str, shards: int) -> int:
+    """
+    Shard of a customer in a scan split across `shards` worker processes.
+    
+    Uses CRC32 of the ID rather than hash(), which is salted per process.
+    """
+    return zlib.crc32(str(customer_id).encode("utf-8")) % shards
+
+
+def intervention_window(churn_risk: float, customer: Customer,
+                        order_stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Calculate optimal time window for proactive intervention.
+    Enhanced with order patterns and engagement data.
+    
+    Args:
+        churn_risk: Current churn risk (0-1)
+        customer: Customer to contact
+        order_stats: Order statistics (DataAnalytics.get_customer_order_stats)
+        
+    Returns:
+        Window start/end in days from now, urgency and message
+    """
+    # Get days since last order if available
+    days_since_order = order_stats.get('days_since_last_order') if order_stats else None
+    
+    # Adjust urgency based on churn risk and engagement
+    if churn_risk >= 0.7:
+        urgency_msg = "Act within 7 days to prevent churn"
+        if customer.is_inactive and days_since_order and days_since_order > 60:
+            urgency_msg = f"CRITICAL: Customer inactive for {customer.days_since_active} days, last order {days_since_order} days ago"
+        
+        return {
+            "start_days": 0,
+            "end_days": 7,
+            "urgency": "immediate",
+            "message": urgency_msg
+        }
+    elif churn_risk >= 0.5:
+        urgency_msg = "Reach out within 2-3 weeks"
+        if days_since_order and days_since_order > 30:
+            urgency_msg = f"Customer hasn't ordered in {days_since_order} days - re-engagement needed"
+        
+        return {
+            "start_days": 7,
+            "end_days": 21,
+            "urgency": "soon",
+            "message": urgency_msg
+        }
+    else:
+        return {
+            "start_days": 21,
+            "end_days": 60,
+            "urgency": "normal",
+            "message": "Monitor and engage within 2 months"
+        }
 
 
 class CustomerHealthScore:
@@ -213,6 +273,7 @@ class ProactiveMonitor:
         self.dataset_path = dataset_path or settings.DATASET_PATH
         self.analytics = DataAnalytics(dataset_path=self.dataset_path)
         self.health_calculator = CustomerHealthScore()
+        self.escalation_tracker = EscalationTracker()
         
         print("[OK] ProactiveMonitor initialized")
     
@@ -220,7 +281,8 @@ class ProactiveMonitor:
         self,
         min_churn_risk: float = 0.6,
         min_lifetime_value: float = 1000.0,
-        segments: Optional[List[str]] = None
+        segments: Optional[List[str]] = None,
+        shard: Optional[Tuple[int, int]] = None
     ) -> List[Dict[str, Any]]:
         """
         Detect customers at risk of churning.
@@ -229,15 +291,53 @@ class ProactiveMonitor:
             min_churn_risk: Minimum churn risk threshold (0-1)
             min_lifetime_value: Minimum LTV to consider
             segments: Optional list of segments to focus on (e.g., ["VIP", "Loyal"])
+            shard: (index, shards) - only score the customers of this shard
+                (see customer_shard); the shards together cover the full scan
             
         Returns:
             List of at-risk customer alerts with details
         """
+        at_risk_customers = [
+            alert
+            for chunk in self.iter_churn_risks(min_churn_risk, min_lifetime_value, segments, shard)
+            for alert in chunk
+        ]
+        
+        # Sort by churn risk (highest first)
+        at_risk_customers.sort(key=lambda x: x['churn_risk'], reverse=True)
+        
+        print(f"[WARNING] Found {len(at_risk_customers)} at-risk customers")
+        
+        return at_risk_customers
+    
+    def iter_churn_risks(
+        self,
+        min_churn_risk: float = 0.6,
+        min_lifetime_value: float = 1000.0,
+        segments: Optional[List[str]] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Score customers in chunks, yielding each chunk's alerts as soon as it is scored.
+        
+        Lets a pipelined scan start interventions before the whole book is
+        scored; detect_churn_risks collects all chunks.
+        
+        Args:
+            min_churn_risk: Minimum churn risk threshold (0-1)
+            min_lifetime_value: Minimum LTV to consider
+            segments: Optional list of segments to focus on (e.g., ["VIP", "Loyal"])
+            shard: (index, shards) - only score the customers of this shard
+            chunk_size: Customers scored per chunk (defaults to settings.SCAN_CHUNK_SIZE)
+            
+        Yields:
+            At-risk customer alerts of one chunk, highest churn risk first
+            (possibly empty)
+        """
         if self.analytics.df is None:
             print("[ERROR] No dataset available")
-            return []
-        
-        at_risk_customers = []
+            return
         
         # Filter customers - DIVERSE SELECTION across all segments
         df = self.analytics.df.copy()
@@ -259,87 +359,140 @@ class ProactiveMonitor:
             df = df[df['segment'].isin(segments)]
         
         df = df[df['lifetime_value'] >= min_lifetime_value]
+        if shard:
+            index, shards = shard
+            df = df[df['customer_id'].map(lambda customer_id: customer_shard(customer_id, shards) == index)]
         
         print(f"\n[SCAN] Scanning {len(df)} customers for churn risk...")
         
-        for _, row in df.iterrows():
-            # Create Customer object
-            customer = Customer(
-                customer_id=row['customer_id'],
-                first_name=row['first_name'],
-                last_name=row['last_name'],
-                email=row['email'],
-                segment=row['segment'],
-                lifetime_value=float(row['lifetime_value']),
-                preferred_category=row['preferred_category'],
-                loyalty_tier=row['loyalty_tier'],
-                # New fields from original dataset
-                phone=str(row['phone']) if pd.notna(row.get('phone')) else None,
-                signup_date=str(row['signup_date']) if pd.notna(row.get('signup_date')) else None,
-                country=str(row['country']) if pd.notna(row.get('country')) else None,
-                avg_order_value=float(row['avg_order_value']) if pd.notna(row.get('avg_order_value')) else None,
-                last_active_date=str(row['last_active_date']) if pd.notna(row.get('last_active_date')) else None,
-                opt_in_marketing=bool(row['opt_in_marketing']) if pd.notna(row.get('opt_in_marketing')) else None,
-                language=str(row['language']) if pd.notna(row.get('language')) else None
-            )
-            
-            # Calculate health and churn risk
-            health_score = self.health_calculator.calculate_health_score(
-                customer, self.analytics
-            )
-            churn_risk = self.health_calculator.calculate_churn_risk(
-                health_score, customer, self.analytics  # Pass analytics for churn data
-            )
+        chunk_size = max(1, chunk_size or settings.SCAN_CHUNK_SIZE)
+        for start in range(0, len(df), chunk_size):
+            chunk = []
+            for _, row in df.iloc[start:start + chunk_size].iterrows():
+                alert = self._score_customer(row, min_churn_risk)
+                if alert:
+                    chunk.append(alert)
+            chunk.sort(key=lambda x: x['churn_risk'], reverse=True)
+            yield chunk
+    
+    def _score_customer(self, row: pd.Series, min_churn_risk: float) -> Optional[Dict[str, Any]]:
+        """
+        Score one customer row.
+        
+        Args:
+            row: Customer row of the dataset
+            min_churn_risk: Minimum churn risk threshold (0-1)
             
-            # Check if at risk
-            if churn_risk >= min_churn_risk:
-                # Get similar customers for context
-                similar = self.analytics.find_similar_customers(customer, limit=3)
-                
-                # Get cohort comparison
-                cohort_data = self.analytics.compare_with_cohort(customer)
-                
-                # Determine risk reasons
-                reasons = []
-                if health_score < 0.4:
-                    reasons.append("Low health score")
-                if customer.segment in ["VIP", "Loyal"]:
-                    reasons.append("High-value segment at risk")
-                if cohort_data and cohort_data.get('customer_percentile', 50) < 30:
-                    reasons.append("Below-average in cohort")
-                if not reasons:
-                    reasons.append("General churn risk indicators")
-                
-                # Determine recommended action
-                if customer.segment == "VIP":
-                    action = "immediate_personal_outreach"
-                elif customer.lifetime_value > 5000:
-                    action = "retention_offer_premium"
-                elif customer.segment == "Loyal":
-                    action = "retention_offer_standard"
-                else:
-                    action = "engagement_campaign"
-                
-                alert = {
-                    'customer': customer,
-                    'health_score': health_score,
-                    'churn_risk': churn_risk,
-                    'risk_level': self._categorize_risk(churn_risk),
-                    'reasons': reasons,
-                    'recommended_action': action,
-                    'similar_customers_count': len(similar),
-                    'cohort_percentile': cohort_data.get('customer_percentile') if cohort_data else None,
-                    'detected_at': datetime.now().isoformat()
-                }
-                
-                at_risk_customers.append(alert)
+        Returns:
+            Alert if the customer is at risk, otherwise None
+        """
+        # Create Customer object
+        customer = Customer(
+            customer_id=row['customer_id'],
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            email=row['email'],
+            segment=row['segment'],
+            lifetime_value=float(row['lifetime_value']),
+            preferred_category=row['preferred_category'],
+            loyalty_tier=row['loyalty_tier'],
+            # New fields from original dataset
+            phone=str(row['phone']) if pd.notna(row.get('phone')) else None,
+            signup_date=str(row['signup_date']) if pd.notna(row.get('signup_date')) else None,
+            country=str(row['country']) if pd.notna(row.get('country')) else None,
+            avg_order_value=float(row['avg_order_value']) if pd.notna(row.get('avg_order_value')) else None,
+            last_active_date=str(row['last_active_date']) if pd.notna(row.get('last_active_date')) else None,
+            opt_in_marketing=bool(row['opt_in_marketing']) if pd.notna(row.get('opt_in_marketing')) else None,
+            language=str(row['language']) if pd.notna(row.get('language')) else None
+        )
+        
+        # Calculate health and churn risk
+        health_score = self.health_calculator.calculate_health_score(
+            customer, self.analytics
+        )
+        churn_risk = self.health_calculator.calculate_churn_risk(
+            health_score, customer, self.analytics  # Pass analytics for churn data
+        )
+        
+        # Check if at risk
+        if churn_risk < min_churn_risk:
+            return None
+        # Get similar customers for context
+        similar = self.analytics.find_similar_customers(customer, limit=3)
+        
+        # Get cohort comparison
+        cohort_data = self.analytics.compare_with_cohort(customer)
+        
+        # Determine risk reasons
+        reasons = []
+        if health_score < 0.4:
+            reasons.append("Low health score")
+        if customer.segment in ["VIP", "Loyal"]:
+            reasons.append("High-value segment at risk")
+        if cohort_data and cohort_data.get('customer_percentile', 50) < 30:
+            reasons.append("Below-average in cohort")
+        if not reasons:
+            reasons.append("General churn risk indicators")
+        
+        # Determine recommended action
+        if customer.segment == "VIP":
+            action = "immediate_personal_outreach"
+        elif customer.lifetime_value > 5000:
+            action = "retention_offer_premium"
+        elif customer.segment == "Loyal":
+            action = "retention_offer_standard"
+        else:
+            action = "engagement_campaign"
+        
+        return {
+            'customer': customer,
+            'health_score': health_score,
+            'churn_risk': churn_risk,
+            'risk_level': self._categorize_risk(churn_risk),
+            'reasons': reasons,
+            'recommended_action': action,
+            'similar_customers_count': len(similar),
+            'cohort_percentile': cohort_data.get('customer_percentile') if cohort_data else None,
+            'detected_at': datetime.now().isoformat(),
+            'source': 'proactive_monitor'  # System-generated (no free text)
+        }
+    
+    def split_escalated_alerts(
+        self,
+        alerts: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Bulk pre-flight gate: separate alerts for customers already with a human.
         
-        # Sort by churn risk (highest first)
-        at_risk_customers.sort(key=lambda x: x['churn_risk'], reverse=True)
+        Customers with an active open/in-progress escalation would only be
+        marked `handled` by the workflow, so they are removed from the scan
+        queue before any model traffic is generated.
         
-        print(f"[WARNING] Found {len(at_risk_customers)} at-risk customers")
+        Args:
+            alerts: At-risk customer alerts from detect_churn_risks
+            
+        Returns:
+            Tuple of (alerts to process, handled alerts). Handled alerts carry
+            the skip decision under the 'escalation' key.
+        """
+        self.escalation_tracker.refresh()
+        skipped = self.escalation_tracker.should_skip_customers(
+            [alert['customer'].customer_id for alert in alerts]
+        )
+        
+        to_process = []
+        handled = []
+        for alert in alerts:
+            skip_decision = skipped.get(alert['customer'].customer_id)
+            if skip_decision:
+                handled.append({**alert, 'escalation': skip_decision})
+            else:
+                to_process.append(alert)
         
-        return at_risk_customers
+        if handled:
+            print(f"[SKIP] {len(handled)} at-risk customers already escalated to a human agent")
+        
+        return to_process, handled
     
     def detect_high_value_inactivity(
         self,
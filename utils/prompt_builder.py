@@ -0,0 +1,332 @@
+"""
+Prompt Builder - Cache-friendly agent prompts with prefix and token instrumentation.
+
+Every agent call is sent as two messages:
+1. A static system message (instructions, rules, JSON schema) that is
+   byte-identical across customers, so provider-side prefix caching can hit
+2. A compact per-customer data block (profile, analysis, enhanced context)
+
+Each prompt records its prefix hash and token counts; responses record the
+provider-reported prompt/completion/cached tokens, estimated cost and call
+latency per agent. Ranked context sections are fitted to the agent's token
+budget. `token_meter(usage)` around a workflow run (a context variable, like
+stream_sink) additionally adds that run's calls to `usage`, so a scan can
+account for each customer separately.
+"""
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+from langchain_core.messages import SystemMessage, HumanMessage
+
+from config.prompts import SYSTEM_PROMPTS, DATA_TEMPLATES
+from config import settings
+from .token_budget import ContextSection, TokenBudget, count_tokens
+from .call_guard import guarded_invoke
+from .llm_factory import model_cost
+from .tracing import span
+
+
+_current_meter = contextvars.ContextVar("token_meter", default=None)
+
+def prefix_hash(text: str) -> str:
+    """Short stable hash of a prompt prefix."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class AgentPrompt:
+    """A prompt split into a static system prefix and a per-customer data block."""
+    agent: str
+    system: str
+    data: str
+    prefix_hash: str
+    prefix_tokens: int
+    data_tokens: int
+    budget_report: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def total_tokens(self) -> int:
+        """Total prompt tokens (prefix + data)."""
+        return self.prefix_tokens + self.data_tokens
+    
+    def to_messages(self) -> List[Any]:
+        """Messages for chat model invocation (system prefix first)."""
+        return [SystemMessage(content=self.system), HumanMessage(content=self.data)]
+
+
+# Static prefixes never change at runtime, so their hash/token count is computed once
+_prefix_cache: Dict[str, tuple] = {}
+
+
+def build_agent_prompt(
+    agent: str,
+    fields: Dict[str, Any],
+    extra_context: str = "",
+    sections: Optional[List[ContextSection]] = None
+) -> AgentPrompt:
+    """
+    Build an agent prompt from config/prompts.py.
+    
+    Args:
+        agent: Prompt key (context_agent, pattern_agent, ...)
+        fields: Values for the agent's data template
+        extra_context: Enhanced context appended to the data block
+        sections: Ranked context sections fitted to the agent's token budget.
+            Sections with a `field` fill that template field (joined in
+            order, blank line between); the others are appended after
+            `extra_context`.
+        
+    Returns:
+        AgentPrompt with prefix hash, token counts and budget report
+    """
+    with span("prompt.build", agent=agent, sections=len(sections) if sections else 0):
+        system = SYSTEM_PROMPTS[agent]
+        if agent not in _prefix_cache:
+            _prefix_cache[agent] = (prefix_hash(system), count_tokens(system))
+        system_hash, system_tokens = _prefix_cache[agent]
+        
+        budget_report = {}
+        appended = ""
+        if sections:
+            section_fields = {section.field for section in sections if section.field}
+            base_fields = dict(fields, **{name: "" for name in section_fields})
+            reserved = system_tokens + count_tokens(DATA_TEMPLATES[agent].format(**base_fields)) + count_tokens(extra_context)
+            
+            fitted, budget_report = TokenBudget(agent).fit(sections, reserved)
+            
+            fields = dict(fields)
+            for name in section_fields:
+                fields[name] = "\n\n".join(section.text for section in fitted if section.field == name and section.text)
+            appended = "\n\n".join(section.text for section in fitted if not section.field and section.text)
+        
+        data = DATA_TEMPLATES[agent].format(**fields)
+        if extra_context:
+            data += extra_context
+        if appended:
+            data += appended
+        
+        return AgentPrompt(
+            agent=agent,
+            system=system,
+            data=data,
+            prefix_hash=system_hash,
+            prefix_tokens=system_tokens,
+            data_tokens=count_tokens(data),
+            budget_report=budget_report
+        )
+
+
+@contextmanager
+def token_meter(usage: Dict[str, Dict[str, Any]]):
+    """
+    Add the calls made by agents in this block to `usage`.
+    
+    Args:
+        usage: Per-agent totals (calls, prompt_tokens, completion_tokens,
+            cost), updated in place as calls finish
+    """
+    token = _current_meter.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_meter.reset(token)
+
+
+class PromptStats:
+    """Per-agent prompt and token telemetry shared across all agent instances."""
+    
+    _lock = threading.Lock()
+    _stats: Dict[str, Dict[str, Any]] = {}
+    _recent_calls = deque(maxlen=200)  # Per-call telemetry for inspection
+    
+    @classmethod
+    def record(cls, prompt: AgentPrompt, response: Any = None, latency: Optional[float] = None):
+        """
+        Record a prompt and (optionally) the provider response.
+        
+        Args:
+            prompt: Prompt that was sent
+            response: AIMessage returned by the chat model
+            latency: Call latency in seconds
+        """
+        usage = getattr(response, "usage_metadata", None) or {}
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        # Provider-reported counts when available, local estimate otherwise
+        prompt_tokens = usage.get("input_tokens") or prompt.total_tokens
+        completion_tokens = usage.get("output_tokens")
+        if completion_tokens is None:
+            completion_tokens = count_tokens(getattr(response, "content", "") or "")
+        model = (getattr(response, "response_metadata", None) or {}).get("model_name")
+        cost = model_cost(model, prompt_tokens, completion_tokens)
+        
+        call = {
+            "agent": prompt.agent,
+            "timestamp": datetime.now().isoformat(),
+            "prefix_hash": prompt.prefix_hash,
+            "estimated_prompt_tokens": prompt.total_tokens,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "model": model,
+            "cost": round(cost, 6),
+            "trimmed_tokens": prompt.budget_report.get("trimmed_tokens", 0),
+            "section_tokens": prompt.budget_report.get("section_tokens", {}),
+            "latency": round(latency, 3) if latency is not None else None
+        }
+        
+        with cls._lock:
+            stats = cls._stats.setdefault(prompt.agent, {
+                "calls": 0,
+                "prefix_hashes": set(),
+                "prefix_tokens": prompt.prefix_tokens,
+                "data_tokens_total": 0,
+                "prompt_tokens_total": 0,
+                "completion_tokens_total": 0,
+                "cached_tokens_total": 0,
+                "cost_total": 0.0,
+                "cache_hit_calls": 0,
+                "trimmed_tokens_total": 0,
+                "budget_trimmed_calls": 0,
+                "section_tokens_total": {},
+                "latency_total": 0.0,
+                "timed_calls": 0
+            })
+            stats["calls"] += 1
+            stats["prefix_hashes"].add(prompt.prefix_hash)
+            stats["prefix_tokens"] = prompt.prefix_tokens
+            stats["data_tokens_total"] += prompt.data_tokens
+            stats["prompt_tokens_total"] += prompt_tokens
+            stats["completion_tokens_total"] += completion_tokens
+            stats["cached_tokens_total"] += cached_tokens
+            stats["cost_total"] += cost
+            if cached_tokens:
+                stats["cache_hit_calls"] += 1
+            if call["trimmed_tokens"]:
+                stats["trimmed_tokens_total"] += call["trimmed_tokens"]
+                stats["budget_trimmed_calls"] += 1
+            for name, tokens in call["section_tokens"].items():
+                stats["section_tokens_total"][name] = stats["section_tokens_total"].get(name, 0) + tokens
+            if latency is not None:
+                stats["latency_total"] += latency
+                stats["timed_calls"] += 1
+            cls._recent_calls.append(call)
+            
+            meter = _current_meter.get()
+            if meter is not None:
+                run_usage = meter.setdefault(prompt.agent, {
+                    "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0
+                })
+                run_usage["calls"] += 1
+                run_usage["prompt_tokens"] += prompt_tokens
+                run_usage["completion_tokens"] += completion_tokens
+                run_usage["cost"] += cost
+        
+        if settings.TOKEN_TELEMETRY_LOG:
+            cls._append_log(call)
+    
+    @staticmethod
+    def _append_log(call: Dict[str, Any]):
+        """Append one call record to the JSONL telemetry log."""
+        try:
+            with open(settings.LOGS_DIR / "token_telemetry.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(call) + "\n")
+        except OSError as e:
+            print(f"[WARN] Could not write token telemetry: {e}")
+    
+    @classmethod
+    def get_prompt_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize prompt instrumentation per agent.
+        
+        Returns:
+            Mapping of agent to prefix hash(es), token counts, cache hit rate,
+            estimated cost, budget trimming, per-section token totals and
+            average call latency
+        """
+        with cls._lock:
+            snapshot = {agent: dict(stats,
+                                    prefix_hashes=sorted(stats["prefix_hashes"]),
+                                    section_tokens_total=dict(stats["section_tokens_total"]))
+                        for agent, stats in cls._stats.items()}
+        
+        summary = {}
+        for agent, stats in snapshot.items():
+            calls = stats["calls"]
+            summary[agent] = {
+                "calls": calls,
+                "prefix_hash": stats["prefix_hashes"][-1] if stats["prefix_hashes"] else None,
+                "prefix_variants": len(stats["prefix_hashes"]),  # 1 = byte-stable prefix
+                "prefix_tokens": stats["prefix_tokens"],
+                "prefix_cacheable": stats["prefix_tokens"] >= settings.PROMPT_CACHE_MIN_TOKENS,
+                "avg_data_tokens": round(stats["data_tokens_total"] / calls, 1) if calls else 0.0,
+                "prompt_tokens": stats["prompt_tokens_total"],
+                "completion_tokens": stats["completion_tokens_total"],
+                "avg_prompt_tokens": round(stats["prompt_tokens_total"] / calls, 1) if calls else 0.0,
+                "avg_completion_tokens": round(stats["completion_tokens_total"] / calls, 1) if calls else 0.0,
+                "token_budget": settings.PROMPT_TOKEN_BUDGETS.get(agent),
+                "budget_trimmed_calls": stats["budget_trimmed_calls"],
+                "trimmed_tokens": stats["trimmed_tokens_total"],
+                "section_tokens": stats["section_tokens_total"],
+                "cached_tokens": stats["cached_tokens_total"],
+                "cache_hit_rate": stats["cache_hit_calls"] / calls if calls else 0.0,
+                "cost": round(stats["cost_total"], 6),
+                "avg_latency": round(stats["latency_total"] / stats["timed_calls"], 3) if stats["timed_calls"] else None
+            }
+        return summary
+    
+    @classmethod
+    def get_recent_calls(cls, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Get per-call token telemetry, most recent first.
+        
+        Args:
+            limit: Maximum number of calls to return
+            
+        Returns:
+            List of call records
+        """
+        with cls._lock:
+            calls = list(cls._recent_calls)
+        return calls[::-1][:limit]
+    
+    @classmethod
+    def reset(cls):
+        """Clear all recorded statistics."""
+        with cls._lock:
+            cls._stats = {}
+            cls._recent_calls.clear()
+
+
+def invoke_prompt(llm: Any, prompt: AgentPrompt, on_chunk: Optional[Callable[[str], None]] = None) -> Any:
+    """
+    Send an AgentPrompt to a chat model and record its instrumentation.
+    
+    The call is guarded by the agent's deadline, hedging and circuit breaker
+    (see utils/call_guard.py).
+    
+    Args:
+        llm: Chat model (ChatOpenAI or compatible)
+        prompt: Prompt built with build_agent_prompt
+        on_chunk: Stream the call, passing each raw content chunk to this
+        
+    Returns:
+        Model response message
+        
+    Raises:
+        CircuitOpenError, LLMTimeoutError: The caller should use its fallback
+    """
+    started = time.perf_counter()
+    with span("llm.call", agent=prompt.agent, prompt_tokens=prompt.total_tokens, streamed=on_chunk is not None):
+        # Losing hedges and abandoned calls are still paid for: record them when they finish
+        response = guarded_invoke(llm, prompt.to_messages(), prompt.agent, on_chunk=on_chunk,
+                                  on_late_response=lambda late: PromptStats.record(prompt, late))
+    PromptStats.record(prompt, response, time.perf_counter() - started)
+    return response
@@ -0,0 +1,300 @@
+"""
+Response Parser - Shared structured-output parsing for all agents.
+
+LLM responses are decoded once (orjson fast path for bare JSON, otherwise a
+single-pass scan for the first balanced JSON object, which also covers
+markdown fences and surrounding prose) and validated against the agent's
+pydantic schema. A malformed response gets at most one short "repair" call
+that only resends the broken output, never the full prompt. Outcomes are
+counted per agent.
+"""
+import json
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from pydantic import ValidationError
+
+from models.responses import RESPONSE_SCHEMAS
+from config import settings
+from .prompt_builder import AgentPrompt, invoke_prompt, prefix_hash
+from .token_budget import count_tokens
+from .tracing import span
+
+try:
+    import orjson
+except ImportError:  # Optional: standard library decoder is used instead
+    orjson = None
+
+
+REPAIR_PROMPT = """You repair malformed JSON produced by the {agent} step of a customer experience pipeline.
+
+Rewrite the previous response as a single valid JSON object that matches this JSON schema.
+Keep the original values wherever they are valid. Reply with ONLY the JSON object - no
+markdown fences, no commentary.
+
+JSON schema:
+{schema}
+"""
+
+REPAIR_MAX_CHARS = 4000  # Longest previous output resent in a repair prompt
+
+
+class ResponseParseError(ValueError):
+    """Raised when an agent response cannot be parsed or validated."""
+    
+    def __init__(self, agent: str, message: str, content: str = ""):
+        super().__init__(f"{agent}: {message}")
+        self.agent = agent
+        self.content = content
+
+
+def _loads(text: str) -> Any:
+    """Decode JSON with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Find the first balanced top-level JSON object in `text` in one pass.
+    
+    Braces inside JSON strings are ignored, so fenced blocks, leading prose
+    and trailing commentary are all handled without regex or re-splitting.
+    
+    Args:
+        text: Raw model output
+        
+    Returns:
+        The JSON object substring, or None if no complete object is found
+    """
+    start = -1
+    depth = 0
+    in_string = False
+    escaped = False
+    
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            # Quotes outside an object are prose, not JSON strings
+            in_string = depth > 0
+        elif char == "{":
+            if depth == 0:
+                start = index
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    
+    return None
+
+
+def _parse(agent: str, content: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Decode and validate a response.
+    
+    Returns:
+        Tuple of (validated result, whether the object had to be extracted)
+    """
+    content = (content or "").strip()
+    extracted = False
+    
+    try:
+        data = _loads(content)
+    except ValueError:
+        candidate = extract_json_object(content)
+        if candidate is None:
+            raise ResponseParseError(agent, "no JSON object found in response", content)
+        extracted = True
+        try:
+            data = _loads(candidate)
+        except ValueError as e:
+            raise ResponseParseError(agent, f"invalid JSON: {e}", content)
+    
+    if not isinstance(data, dict):
+        raise ResponseParseError(agent, f"expected a JSON object, got {type(data).__name__}", content)
+    
+    schema = RESPONSE_SCHEMAS.get(agent)
+    if schema is None:
+        return data, extracted
+    
+    try:
+        return schema.model_validate(data).model_dump(), extracted
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'response'}: {error['msg']}"
+            for error in e.errors()
+        )
+        raise ResponseParseError(agent, f"schema validation failed ({problems})", content)
+
+
+def parse_response(agent: str, content: str) -> Dict[str, Any]:
+    """
+    Parse and validate an agent's JSON response.
+    
+    Args:
+        agent: Agent name (key of RESPONSE_SCHEMAS)
+        content: Raw model output
+        
+    Returns:
+        Validated response as a dictionary (schema defaults filled in)
+        
+    Raises:
+        ResponseParseError: If no valid JSON object matching the schema is found
+    """
+    return _parse(agent, content)[0]
+
+
+# Repair system prompts are static per agent, so they are built once
+_repair_prefixes: Dict[str, Tuple[str, str, int]] = {}
+
+
+def build_repair_prompt(agent: str, content: str, error: Exception) -> AgentPrompt:
+    """
+    Build the short repair prompt for a malformed response.
+    
+    Args:
+        agent: Agent whose response failed to parse
+        content: The malformed output
+        error: Parse error to report back to the model
+        
+    Returns:
+        AgentPrompt recorded under `<agent>_repair`
+    """
+    if agent not in _repair_prefixes:
+        schema = RESPONSE_SCHEMAS.get(agent)
+        schema_text = json.dumps(schema.model_json_schema(), indent=1) if schema else "{}"
+        system = REPAIR_PROMPT.format(agent=agent, schema=schema_text)
+        _repair_prefixes[agent] = (system, prefix_hash(system), count_tokens(system))
+    system, system_hash, system_tokens = _repair_prefixes[agent]
+    
+    data = (
+        f"Problem: {error}\n\n"
+        f"Previous response:\n{(content or '')[:REPAIR_MAX_CHARS]}"
+    )
+    return AgentPrompt(
+        agent=f"{agent}_repair",
+        system=system,
+        data=data,
+        prefix_hash=system_hash,
+        prefix_tokens=system_tokens,
+        data_tokens=count_tokens(data)
+    )
+
+
+class ParseStats:
+    """Per-agent response parsing outcomes shared across all agent instances."""
+    
+    _lock = threading.Lock()
+    _stats: Dict[str, Dict[str, Any]] = {}
+    
+    @classmethod
+    def record(cls, agent: str, outcome: str, extracted: bool = False,
+               error: Optional[Exception] = None, repair_attempted: bool = False):
+        """
+        Record one parse outcome.
+        
+        Args:
+            agent: Agent name
+            outcome: "parsed", "repaired" or "failed"
+            extracted: The JSON object had to be extracted from surrounding text
+            error: Last parse error for repaired/failed responses
+            repair_attempted: A repair call was made
+        """
+        with cls._lock:
+            stats = cls._stats.setdefault(agent, {
+                "responses": 0,
+                "parsed": 0,
+                "extracted": 0,
+                "repair_attempts": 0,
+                "repaired": 0,
+                "failed": 0,
+                "last_error": None
+            })
+            stats["responses"] += 1
+            stats[outcome] += 1
+            if extracted:
+                stats["extracted"] += 1
+            if repair_attempted:
+                stats["repair_attempts"] += 1
+            if error is not None:
+                stats["last_error"] = str(error)
+    
+    @classmethod
+    def get_parse_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize parsing outcomes per agent.
+        
+        Returns:
+            Mapping of agent to counts plus first-pass and failure rates
+        """
+        with cls._lock:
+            snapshot = {agent: dict(stats) for agent, stats in cls._stats.items()}
+        
+        for stats in snapshot.values():
+            responses = stats["responses"]
+            stats["first_pass_rate"] = stats["parsed"] / responses if responses else 0.0
+            stats["failure_rate"] = stats["failed"] / responses if responses else 0.0
+        return snapshot
+    
+    @classmethod
+    def reset(cls):
+        """Clear all recorded statistics."""
+        with cls._lock:
+            cls._stats = {}
+
+
+def invoke_structured(llm: Any, prompt: AgentPrompt,
+                      on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    Invoke a chat model and return its validated JSON response.
+    
+    A malformed response gets at most one repair call (if
+    settings.RESPONSE_REPAIR_ENABLED); the full prompt is never re-run.
+    
+    Args:
+        llm: Chat model (ChatOpenAI or compatible)
+        prompt: Prompt built with build_agent_prompt
+        on_chunk: Stream the first call, passing each raw content chunk to
+            this (the repair call is never streamed)
+        
+    Returns:
+        Validated response dictionary
+        
+    Raises:
+        ResponseParseError: If the response (and its repair) cannot be parsed
+    """
+    agent = prompt.agent
+    response = invoke_prompt(llm, prompt, on_chunk=on_chunk)
+    
+    try:
+        with span("response.parse", agent=agent):
+            result, extracted = _parse(agent, response.content)
+        ParseStats.record(agent, "parsed", extracted)
+        return result
+    except ResponseParseError as e:
+        error = e
+    
+    repair_attempted = settings.RESPONSE_REPAIR_ENABLED
+    if repair_attempted:
+        repair_prompt = build_repair_prompt(agent, response.content, error)
+        try:
+            repaired = invoke_prompt(llm, repair_prompt)
+            with span("response.parse", agent=agent, repair=True):
+                result, extracted = _parse(agent, repaired.content)
+            ParseStats.record(agent, "repaired", extracted, error, repair_attempted=True)
+            return result
+        except ResponseParseError as e:
+            error = e
+        except Exception as e:
+            print(f"[WARN] {agent} repair call failed: {e}")
+    
+    ParseStats.record(agent, "failed", error=error, repair_attempted=repair_attempted)
+    raise error
@@ -0,0 +1,271 @@
+"""
+Scan Budget - Hard limits on the tokens, cost and wall-clock time of one scan.
+
+A scan asks `admit` before it starts each customer. The customer is admitted
+only if the tokens and cost already spent, plus the projections reserved for
+runs still in flight, plus one more projected run stay within the budget, and
+the projected run would finish before the deadline. Once a customer is
+refused the scan stops admitting: runs in flight finish normally and the
+remaining customers are deferred (a checkpointed scan can resume them).
+
+Projections are per-stage averages of the runs this scan finished (tokens
+and cost per agent from `token_meter`, seconds per stage from the run's
+stage timings). Until a run has finished, the process-wide PromptStats and
+SpanStats averages are used, then SCAN_BUDGET_EST_RUN_TOKENS / _COST and
+SCHEDULER_EST_MODEL_S.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from models import AgentState
+from config import settings
+from .prompt_builder import PromptStats, token_meter
+from .tracing import SpanStats
+
+
+class ScanBudget:
+    """Budget of one scan (outcome counters shared by all scans)."""
+    
+    _stats_lock = threading.Lock()
+    _stats = {
+        "scans": 0,
+        "stopped": 0,
+        "admitted": 0,
+        "deferred": 0,
+        "tokens": 0,
+        "cost": 0.0
+    }
+    _last_report: Optional[Dict[str, Any]] = None
+    
+    def __init__(self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                 deadline_s: Optional[float] = None):
+        """
+        Start a scan's budget (the deadline counts from now).
+        
+        Args:
+            max_tokens: Prompt + completion tokens (defaults to SCAN_TOKEN_BUDGET; 0 = no limit)
+            max_cost: USD (defaults to SCAN_COST_BUDGET; 0 = no limit)
+            deadline_s: Wall-clock seconds (defaults to SCAN_DEADLINE_S; 0 = no limit)
+        """
+        self.max_tokens = settings.SCAN_TOKEN_BUDGET if max_tokens is None else max_tokens
+        self.max_cost = settings.SCAN_COST_BUDGET if max_cost is None else max_cost
+        self.deadline_s = settings.SCAN_DEADLINE_S if deadline_s is None else deadline_s
+        self.started = time.monotonic()
+        self.stop_reason: Optional[str] = None
+        self.deferred: List[str] = []
+        self._lock = threading.Lock()
+        self._reserved: Dict[str, Dict[str, float]] = {}   # Projections of runs in flight
+        self._usage: Dict[str, Dict[str, Dict[str, Any]]] = {}  # Per-agent usage of runs in flight
+        self._stage_totals: Dict[str, Dict[str, float]] = {}
+        self._measured_runs = 0
+        self._admitted = 0
+        self._settled = 0
+        self._settled_usage: List[Dict[str, Dict[str, Any]]] = []  # Kept: late calls still add to them
+    
+    @property
+    def limited(self) -> bool:
+        """Whether any limit is set."""
+        return bool(self.max_tokens or self.max_cost or self.deadline_s)
+    
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the scan started."""
+        return time.monotonic() - self.started
+    
+    def projected_run(self) -> Dict[str, float]:
+        """
+        Projected tokens, cost and seconds of one more customer.
+        
+        Returns:
+            Dictionary with tokens, cost, seconds and the source of the
+            projection ("scan", "process" or "estimate")
+        """
+        with self._lock:
+            runs = self._measured_runs
+            totals = {stage: dict(stage_totals) for stage, stage_totals in self._stage_totals.items()}
+        
+        if runs:
+            return {
+                "tokens": sum(stage["tokens"] for stage in totals.values()) / runs,
+                "cost": sum(stage["cost"] for stage in totals.values()) / runs,
+                "seconds": sum(stage["seconds"] for stage in totals.values()) / runs,
+                "source": "scan"
+            }
+        
+        workflow_runs = SpanStats.get_span_stats("workflow.run").get("workflow.run")
+        prompts = PromptStats.get_prompt_stats()
+        if workflow_runs and prompts:
+            node_spans = SpanStats.get_span_stats("node.")
+            return {
+                "tokens": sum(s["prompt_tokens"] + s["completion_tokens"] for s in prompts.values()) / workflow_runs["count"],
+                "cost": sum(s["cost"] for s in prompts.values()) / workflow_runs["count"],
+                "seconds": sum(s["mean_s"] for s in node_spans.values()) or workflow_runs["mean_s"],
+                "source": "process"
+            }
+        
+        return {
+            "tokens": float(settings.SCAN_BUDGET_EST_RUN_TOKENS),
+            "cost": settings.SCAN_BUDGET_EST_RUN_COST,
+            "seconds": settings.SCHEDULER_EST_MODEL_S,
+            "source": "estimate"
+        }
+    
+    def admit(self, customer_id: str) -> bool:
+        """
+        Reserve the projected spend of one customer, or stop admitting.
+        
+        Args:
+            customer_id: Customer about to start
+            
+        Returns:
+            True if the customer may start; False if it is deferred (every
+            later call also returns False)
+        """
+        projection = self.projected_run() if self.limited else None
+        with self._lock:
+            if self.stop_reason is None and projection is not None:
+                spent = self._spent()
+                tokens = spent["tokens"] + sum(r["tokens"] for r in self._reserved.values()) + projection["tokens"]
+                cost = spent["cost"] + sum(r["cost"] for r in self._reserved.values()) + projection["cost"]
+                if self.max_tokens and tokens > self.max_tokens:
+                    self.stop_reason = "token budget"
+                elif self.max_cost and cost > self.max_cost:
+                    self.stop_reason = "cost budget"
+                elif self.deadline_s and self.elapsed + projection["seconds"] > self.deadline_s:
+                    self.stop_reason = "deadline"
+            
+            if self.stop_reason is not None:
+                self.deferred.append(customer_id)
+                return False
+            
+            self._reserved[customer_id] = projection or {"tokens": 0.0, "cost": 0.0, "seconds": 0.0}
+            self._usage[customer_id] = {}
+            self._admitted += 1
+            return True
+    
+    def release(self, customer_id: str):
+        """Give back the reservation of an admitted customer that was not run (e.g. contacted recently)."""
+        with self._lock:
+            if self._reserved.pop(customer_id, None) is not None:
+                self._usage.pop(customer_id, None)
+                self._admitted -= 1
+    
+    @contextmanager
+    def meter(self, customer_id: str):
+        """Count the model calls of an admitted customer's run (enter around the run)."""
+        with token_meter(self._usage.setdefault(customer_id, {})):
+            yield
+    
+    def settle(self, customer_id: str, state: Optional[AgentState] = None):
+        """
+        Replace a finished run's reservation with what it actually spent.
+        
+        Args:
+            customer_id: Admitted customer
+            state: Final state of a completed run (its stage timings and
+                usage feed the projections); None for a failed run
+        """
+        with self._lock:
+            if self._reserved.pop(customer_id, None) is None:
+                return
+            usage = self._usage.pop(customer_id, {})
+            self._settled += 1
+            self._settled_usage.append(usage)
+            
+            if state is None:
+                return
+            self._measured_runs += 1
+            for agent, agent_usage in usage.items():
+                stage = self._stage_totals.setdefault(agent, {"tokens": 0.0, "cost": 0.0, "seconds": 0.0})
+                stage["tokens"] += agent_usage["prompt_tokens"] + agent_usage["completion_tokens"]
+                stage["cost"] += agent_usage["cost"]
+            for name, seconds in state.metadata.get('stage_timings', {}).items():
+                stage = self._stage_totals.setdefault(name, {"tokens": 0.0, "cost": 0.0, "seconds": 0.0})
+                stage["seconds"] += seconds
+    
+    def _spent(self) -> Dict[str, float]:
+        """Tokens/cost of settled runs, including hedges or abandoned calls that finished afterwards (lock held)."""
+        spent = {"tokens": 0, "cost": 0.0}
+        for usage in self._settled_usage:
+            for agent_usage in list(usage.values()):
+                spent["tokens"] += agent_usage["prompt_tokens"] + agent_usage["completion_tokens"]
+                spent["cost"] += agent_usage["cost"]
+        return spent
+    
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the scan's spend against its limits.
+        
+        Returns:
+            Limits, tokens/cost spent, elapsed seconds, processed vs deferred
+            customers, why admission stopped, and the current projection per
+            customer with its per-stage averages
+        """
+        projection = self.projected_run()
+        with self._lock:
+            runs = self._measured_runs
+            stages = {
+                name: {key: round(value / runs, 4) for key, value in totals.items()}
+                for name, totals in self._stage_totals.items()
+            } if runs else {}
+            spent = self._spent()
+            return {
+                "limits": {"tokens": self.max_tokens, "cost": self.max_cost, "deadline_s": self.deadline_s},
+                "tokens": spent["tokens"],
+                "cost": round(spent["cost"], 6),
+                "elapsed_s": round(self.elapsed, 3),
+                "admitted": self._admitted,
+                "processed": self._settled,
+                "in_flight": len(self._reserved),
+                "deferred": len(self.deferred),
+                "stop_reason": self.stop_reason,
+                "projected_run": {
+                    "tokens": round(projection["tokens"]),
+                    "cost": round(projection["cost"], 6),
+                    "seconds": round(projection["seconds"], 3),
+                    "source": projection["source"]
+                },
+                "stage_averages": stages
+            }
+    
+    def finish(self) -> Dict[str, Any]:
+        """
+        Record the finished scan in the shared statistics.
+        
+        Returns:
+            Final report (see `report`)
+        """
+        report = self.report()
+        with self._stats_lock:
+            self._stats["scans"] += 1
+            self._stats["stopped"] += 1 if self.stop_reason else 0
+            self._stats["admitted"] += report["admitted"]
+            self._stats["deferred"] += report["deferred"]
+            self._stats["tokens"] += report["tokens"]
+            self._stats["cost"] += report["cost"]
+            ScanBudget._last_report = report
+        return report
+    
+    @classmethod
+    def get_budget_stats(cls) -> Dict[str, Any]:
+        """
+        Summarize budgeted scans in this process.
+        
+        Returns:
+            Scans, scans stopped by a limit, customers admitted and deferred,
+            tokens and cost spent, and the last scan's report
+        """
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+            stats["last_scan"] = cls._last_report
+        stats["cost"] = round(stats["cost"], 6)
+        return stats
+    
+    @classmethod
+    def reset(cls):
+        """Clear statistics."""
+        with cls._stats_lock:
+            cls._stats = {key: 0.0 if isinstance(value, float) else 0 for key, value in cls._stats.items()}
+            cls._last_report = None
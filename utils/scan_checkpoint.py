@@ -0,0 +1,343 @@
+"""
+Scan Checkpoints - Durable per-customer, per-stage progress of proactive scans.
+
+Every scan gets an ID and a directory under DATA_DIR/scans holding its
+manifest (parameters, customers, status) and one append-only record file per
+customer (state_codec binary records, or JSONL with STATE_CODEC=json; both
+are read). The workflow appends the customer's full AgentState after each
+stage it completes, so a scan restarted after a crash restores every
+customer from its last completed stage and the workflow skips the stages
+already recorded - an LLM stage that finished is never run (or paid for)
+twice. A record truncated by a crash mid-write is ignored, and cut off
+before the resumed run appends to the file.
+"""
+import json
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from models import AgentState
+from config import settings
+from .memory_handler import CustomJSONEncoder
+from .state_codec import (
+    BINARY_SUFFIX, JSON_SUFFIX, append_record, binary_enabled, open_record_log, read_records, record_suffix,
+    state_from_payload
+)
+
+
+MANIFEST_FILE = "scan.json"
+
+
+class ScanCheckpointStore:
+    """Checkpoints of one proactive scan (stage counters shared by all scans)."""
+    
+    _stats_lock = threading.Lock()
+    _stats = {
+        "stages_recorded": 0,
+        "stages_skipped": 0,
+        "customers_resumed": 0,
+        "write_errors": 0
+    }
+    
+    def __init__(self, scan_id: str, storage_path: Optional[Path] = None):
+        """
+        Open the checkpoint directory of a scan.
+        
+        Args:
+            scan_id: Durable scan ID
+            storage_path: Directory holding all scans (defaults to DATA_DIR/scans)
+        """
+        self.scan_id = scan_id
+        self.path = (storage_path or settings.DATA_DIR / "scans") / scan_id
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def create(cls, params: Dict[str, Any], customer_ids: List[str],
+               storage_path: Optional[Path] = None) -> "ScanCheckpointStore":
+        """
+        Start a new scan with a fresh ID.
+        
+        Args:
+            params: Scan parameters (risk threshold, intervention limit, ...)
+            customer_ids: Customers selected for the scan, in processing order
+            storage_path: Directory holding all scans
+            
+        Returns:
+            Checkpoint store of the new scan
+        """
+        cls.prune(storage_path)
+        scan_id = f"scan_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        store = cls(scan_id, storage_path)
+        store._write_manifest({
+            "scan_id": scan_id,
+            "status": "running",
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None,
+            "params": params,
+            "customer_ids": list(customer_ids)
+        })
+        return store
+    
+    @classmethod
+    def open(cls, scan_id: str, storage_path: Optional[Path] = None) -> Optional["ScanCheckpointStore"]:
+        """Open an existing scan, or None if it has no manifest."""
+        root = storage_path or settings.DATA_DIR / "scans"
+        if not (root / scan_id / MANIFEST_FILE).exists():
+            return None
+        return cls(scan_id, storage_path)
+    
+    @classmethod
+    def latest_incomplete(cls, storage_path: Optional[Path] = None) -> Optional["ScanCheckpointStore"]:
+        """Most recently started scan that did not complete, if any."""
+        for manifest in cls.list_scans(storage_path):
+            if manifest["status"] != "complete":
+                return cls(manifest["scan_id"], storage_path)
+        return None
+    
+    @classmethod
+    def list_scans(cls, storage_path: Optional[Path] = None) -> List[Dict[str, Any]]:
+        """
+        Manifests of all checkpointed scans, newest first.
+        
+        Returns:
+            Manifest dictionaries (scan_id, status, params, customer_ids, ...)
+        """
+        root = storage_path or settings.DATA_DIR / "scans"
+        if not root.exists():
+            return []
+        
+        manifests = []
+        for manifest_file in root.glob(f"*/{MANIFEST_FILE}"):
+            try:
+                manifests.append(json.loads(manifest_file.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                print(f"[WARN] ScanCheckpointStore: Unreadable manifest {manifest_file}: {e}")
+        manifests.sort(key=lambda m: m.get("created_at", ""), reverse=True)
+        return manifests
+    
+    @classmethod
+    def prune(cls, storage_path: Optional[Path] = None):
+        """Delete completed scans older than SCAN_CHECKPOINT_RETENTION_DAYS."""
+        root = storage_path or settings.DATA_DIR / "scans"
+        cutoff = (datetime.now() - timedelta(days=settings.SCAN_CHECKPOINT_RETENTION_DAYS)).isoformat()
+        for manifest in cls.list_scans(storage_path):
+            if manifest["status"] == "complete" and (manifest.get("completed_at") or "") < cutoff:
+                shutil.rmtree(root / manifest["scan_id"], ignore_errors=True)
+    
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        """Scan manifest."""
+        return json.loads((self.path / MANIFEST_FILE).read_text(encoding="utf-8"))
+    
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        """Replace the manifest atomically."""
+        temp_file = self.path / f"{MANIFEST_FILE}.tmp"
+        temp_file.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        temp_file.replace(self.path / MANIFEST_FILE)
+    
+    def add_customer(self, customer_id: str):
+        """Add a customer to the scan (pipelined scans pick customers while scoring)."""
+        with self._lock:
+            manifest = self.manifest
+            if customer_id not in manifest["customer_ids"]:
+                manifest["customer_ids"].append(customer_id)
+                self._write_manifest(manifest)
+    
+    def _customer_file(self, customer_id: str) -> Path:
+        """Checkpoint file of one customer in the current format."""
+        return self.path / f"{customer_id}{record_suffix()}"
+    
+    def _has_entries(self, customer_id: str) -> bool:
+        """Whether the customer has a checkpoint file in either format."""
+        return any((self.path / f"{customer_id}{suffix}").exists() for suffix in (JSON_SUFFIX, BINARY_SUFFIX))
+    
+    def _read_entries(self, customer_id: str) -> List[Dict[str, Any]]:
+        """Checkpoint entries of one customer (a truncated last record is skipped)."""
+        entries = []
+        json_file = self.path / f"{customer_id}{JSON_SUFFIX}"
+        if json_file.exists():
+            with open(json_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        
+        binary_file = self.path / f"{customer_id}{BINARY_SUFFIX}"
+        if binary_file.exists():
+            entries.extend(read_records(binary_file, on_error=lambda e: print(
+                f"[WARN] ScanCheckpointStore: Skipped unreadable checkpoint of {customer_id}: {e}"
+            )))
+        return entries
+    
+    def _append(self, customer_id: str, entry: Dict[str, Any]):
+        """Append one entry and flush it to disk."""
+        if binary_enabled():
+            with self._lock, open_record_log(self._customer_file(customer_id)) as f:
+                append_record(f, entry)
+            return
+        
+        line = json.dumps(entry, cls=CustomJSONEncoder) + "\n"
+        with self._lock, open(self._customer_file(customer_id), "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+    
+    def attach(self, state: AgentState) -> AgentState:
+        """
+        Bind a customer's run to this scan.
+        
+        Args:
+            state: Fresh initial state for the customer
+            
+        Returns:
+            The customer's state as of its last completed stage if the scan
+            checkpointed one, otherwise `state` tagged for checkpointing
+        """
+        restored = self.load(state.customer.customer_id)
+        if restored is not None:
+            restored.metadata['checkpoint']['resumed'] = True
+            with self._stats_lock:
+                self._stats["customers_resumed"] += 1
+            return restored
+        
+        state.metadata['checkpoint'] = {"scan_id": self.scan_id, "dir": str(self.path), "stages": []}
+        return state
+    
+    def load(self, customer_id: str) -> Optional[AgentState]:
+        """State after the customer's last completed stage, or None."""
+        for entry in reversed(self._read_entries(customer_id)):
+            if "state" in entry:
+                return state_from_payload(entry["state"])
+        return None
+    
+    @classmethod
+    def record_stage(cls, state: AgentState, stage: str):
+        """
+        Checkpoint a run after one of its stages completed.
+        
+        Called by the workflow for runs bound with `attach`; runs without a
+        checkpoint tag are ignored. A failed write is reported but does not
+        fail the run (it only costs a re-run of the stage on resume).
+        
+        Args:
+            state: State returned by the stage
+            stage: Workflow node name
+        """
+        checkpoint = state.metadata.get('checkpoint')
+        if not checkpoint or not state.customer:
+            return
+        
+        checkpoint['stages'].append(stage)
+        store = cls(checkpoint['scan_id'], Path(checkpoint['dir']).parent)
+        try:
+            store._append(state.customer.customer_id, {
+                "stage": stage,
+                "recorded_at": datetime.now().isoformat(),
+                "state": state
+            })
+            with cls._stats_lock:
+                cls._stats["stages_recorded"] += 1
+        except (OSError, TypeError, ValueError) as e:
+            checkpoint['stages'].remove(stage)
+            with cls._stats_lock:
+                cls._stats["write_errors"] += 1
+            print(f"[WARN] ScanCheckpointStore: Could not checkpoint {stage} for {state.customer.customer_id}: {e}")
+    
+    @staticmethod
+    def stage_recorded(state: AgentState, stage: str) -> bool:
+        """Whether the run's checkpoint holds `stage` (not counted, see stage_completed)."""
+        checkpoint = state.metadata.get('checkpoint')
+        return bool(checkpoint) and stage in checkpoint['stages']
+    
+    @classmethod
+    def stage_completed(cls, state: AgentState, stage: str) -> bool:
+        """Whether a restored run already completed `stage` (counted as skipped)."""
+        if not cls.stage_recorded(state, stage):
+            return False
+        with cls._stats_lock:
+            cls._stats["stages_skipped"] += 1
+        return True
+    
+    def complete_customer(self, customer_id: str, status: str):
+        """
+        Mark a customer finished, so a resumed scan does not process it again.
+        
+        Args:
+            customer_id: Customer ID
+            status: Outcome recorded for the customer (sent, escalated, skipped, failed, ...)
+        """
+        self._append(customer_id, {"done": status, "recorded_at": datetime.now().isoformat()})
+    
+    def completed_customers(self) -> Dict[str, str]:
+        """Outcome of every customer the scan has finished."""
+        completed = {}
+        for customer_id in self.manifest["customer_ids"]:
+            for entry in self._read_entries(customer_id):
+                if "done" in entry:
+                    completed[customer_id] = entry["done"]
+        return completed
+    
+    def complete(self):
+        """Mark the whole scan complete."""
+        manifest = self.manifest
+        manifest["status"] = "complete"
+        manifest["completed_at"] = datetime.now().isoformat()
+        self._write_manifest(manifest)
+    
+    def get_progress(self) -> Dict[str, Any]:
+        """
+        Summarize how far the scan got.
+        
+        Returns:
+            Scan ID, status, customer counts (total, done, in progress) and
+            outcomes of finished customers
+        """
+        manifest = self.manifest
+        completed = self.completed_customers()
+        in_progress = [
+            customer_id for customer_id in manifest["customer_ids"]
+            if customer_id not in completed and self._has_entries(customer_id)
+        ]
+        outcomes: Dict[str, int] = {}
+        for status in completed.values():
+            outcomes[status] = outcomes.get(status, 0) + 1
+        
+        return {
+            "scan_id": self.scan_id,
+            "status": manifest["status"],
+            "created_at": manifest["created_at"],
+            "customers": len(manifest["customer_ids"]),
+            "completed": len(completed),
+            "in_progress": len(in_progress),
+            "outcomes": outcomes
+        }
+    
+    @classmethod
+    def get_checkpoint_stats(cls) -> Dict[str, Any]:
+        """
+        Summarize checkpoint activity in this process.
+        
+        Returns:
+            Stages recorded and skipped on resume, customers resumed, write errors
+        """
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+        stats["enabled"] = settings.SCAN_CHECKPOINTS_ENABLED
+        return stats
+    
+    @classmethod
+    def merge_stats(cls, stats: Dict[str, Any]):
+        """Add counters reported by another process (e.g. a scan shard's get_checkpoint_stats)."""
+        with cls._stats_lock:
+            for key in cls._stats:
+                cls._stats[key] += stats.get(key, 0)
+    
+    @classmethod
+    def reset(cls):
+        """Clear statistics."""
+        with cls._stats_lock:
+            cls._stats = {key: 0 for key in cls._stats}
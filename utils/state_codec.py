@@ -0,0 +1,377 @@
+"""
+State Codec - Compact versioned binary encoding of AgentState, Customer and CustomerEvent.
+
+`dumps`/`loads` encode any value that may hold these models (a checkpoint
+entry, a memory record, a batch of scan alerts or results) with ormsgpack:
+
+- models are positional field lists in an ext type, not key/value maps
+- enums (event type, sentiment, segment, loyalty tier) are small ints: their
+  position in the enum, so new members must be appended
+- datetimes are int64 microseconds since 1970-01-01 (wall clock, exact for
+  the naive datetimes used throughout; aware ones are stored as UTC)
+- a customer shared by a state and its event is stored once
+
+Every payload starts with a magic byte (0xC1, never used by msgpack),
+CODEC_VERSION and a 4-byte SCHEMA_FINGERPRINT: a hash of the model field
+lists and enum tables the positional layout depends on. `loads` rejects
+versions it does not know and payloads written with another schema, so
+adding or reordering a model field or enum member can never put stored
+values into the wrong fields (bump CODEC_VERSION when it changes; the tests
+pin the layout of each version). Without ormsgpack
+(or with STATE_CODEC=json), `dumps` falls back to the JSON of the models'
+to_dict and `loads` accepts either format.
+
+`append_record`/`read_records` store payloads as length-prefixed records, so
+checkpoints and the memory store can append to a file. A record truncated by
+a crash ends the file for readers, and `open_record_log` cuts it off before
+the next append so later records are not read misaligned.
+"""
+import hashlib
+import json
+import os
+import struct
+from dataclasses import asdict, fields, is_dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+
+from models import AgentState, Customer, CustomerEvent, EventType, SentimentType, Segment, LoyaltyTier
+from config import settings
+
+try:
+    import ormsgpack
+except ImportError:  # Optional: JSON is used instead
+    ormsgpack = None
+
+
+CODEC_VERSION = 2
+MAGIC = 0xC1
+JSON_SUFFIX = ".jsonl"
+BINARY_SUFFIX = ".mpk"
+
+# Ext type codes
+EXT_DATETIME = 1
+EXT_CUSTOMER = 2
+EXT_EVENT = 3
+EXT_STATE = 4
+
+_EPOCH = datetime(1970, 1, 1)
+_RECORD_HEADER = struct.Struct(">I")
+_INT64 = struct.Struct(">q")
+
+CUSTOMER_FIELDS = [f.name for f in fields(Customer)]
+EVENT_FIELDS = [f.name for f in fields(CustomerEvent)]
+STATE_FIELDS = [f.name for f in fields(AgentState) if f.name not in ("event", "customer", "sentiment")]
+
+_EVENT_TYPES = list(EventType)
+_SENTIMENTS = list(SentimentType)
+_SEGMENTS = [segment.value for segment in Segment]
+_TIERS = [tier.value for tier in LoyaltyTier]
+
+
+def schema_layout() -> Dict[str, List[str]]:
+    """Field lists and enum tables the positional binary layout depends on."""
+    return {
+        "customer": CUSTOMER_FIELDS,
+        "event": EVENT_FIELDS,
+        "state": STATE_FIELDS,
+        "event_types": [event_type.value for event_type in _EVENT_TYPES],
+        "sentiments": [sentiment.value for sentiment in _SENTIMENTS],
+        "segments": _SEGMENTS,
+        "tiers": _TIERS
+    }
+
+
+SCHEMA_FINGERPRINT = hashlib.sha256(json.dumps(schema_layout(), sort_keys=True).encode("utf-8")).digest()[:4]
+_HEADER_SIZE = 2 + len(SCHEMA_FINGERPRINT)
+
+# Version 1 payloads carry no fingerprint; they are read while the schema is still the one they were written with
+_V1_SCHEMA_FINGERPRINT = bytes.fromhex("f82f6732")
+
+_PACK_OPTIONS = 0
+if ormsgpack is not None:
+    _PACK_OPTIONS = (ormsgpack.OPT_PASSTHROUGH_DATETIME | ormsgpack.OPT_PASSTHROUGH_DATACLASS
+                     | ormsgpack.OPT_NON_STR_KEYS | ormsgpack.OPT_SERIALIZE_NUMPY)
+
+
+def binary_enabled() -> bool:
+    """Whether payloads are written in the binary format (ormsgpack installed and STATE_CODEC=msgpack)."""
+    return ormsgpack is not None and settings.STATE_CODEC == "msgpack"
+
+
+def record_suffix() -> str:
+    """File suffix for record logs in the current format."""
+    return BINARY_SUFFIX if binary_enabled() else JSON_SUFFIX
+
+
+def _small_int(value: str, values: List[str]) -> Any:
+    """Position of a known string value, or the string itself."""
+    try:
+        return values.index(value)
+    except ValueError:
+        return value
+
+
+def _datetime_micros(value: datetime) -> int:
+    """Microseconds since 1970-01-01 (aware datetimes as UTC)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _micros_datetime(micros: int) -> datetime:
+    """Inverse of _datetime_micros."""
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def _pack_customer(customer: Customer) -> list:
+    """Customer fields in declaration order (segment and tier as small ints)."""
+    values = [getattr(customer, name) for name in CUSTOMER_FIELDS]
+    values[CUSTOMER_FIELDS.index("segment")] = _small_int(customer.segment, _SEGMENTS)
+    values[CUSTOMER_FIELDS.index("loyalty_tier")] = _small_int(customer.loyalty_tier, _TIERS)
+    return values
+
+
+def _unpack_customer(values: list) -> Customer:
+    """Inverse of _pack_customer."""
+    data = dict(zip(CUSTOMER_FIELDS, values))
+    if isinstance(data["segment"], int):
+        data["segment"] = _SEGMENTS[data["segment"]]
+    if isinstance(data["loyalty_tier"], int):
+        data["loyalty_tier"] = _TIERS[data["loyalty_tier"]]
+    return Customer(**data)
+
+
+def _pack_event(event: CustomerEvent, customer: Optional[Customer]) -> list:
+    """
+    Event fields; the customer (and a monitor alert's copy of it in the
+    metadata) is left out when it is the enclosing state's `customer`.
+    """
+    metadata = event.metadata or {}
+    alert_customer = metadata.get("customer") is event.customer
+    if alert_customer:
+        metadata = {key: value for key, value in metadata.items() if key != "customer"}
+    return [
+        event.event_id,
+        None if event.customer is customer else event.customer,
+        _EVENT_TYPES.index(event.event_type),
+        event.timestamp,
+        event.description,
+        metadata,
+        alert_customer
+    ]
+
+
+def _unpack_event(values: list, customer: Optional[Customer] = None) -> CustomerEvent:
+    """Inverse of _pack_event (`customer` fills a left-out customer)."""
+    event_id, event_customer, event_type, timestamp, description, metadata, alert_customer = values
+    event_customer = event_customer or customer
+    if alert_customer:
+        metadata["customer"] = event_customer
+    return CustomerEvent(
+        event_id=event_id,
+        customer=event_customer,
+        event_type=_EVENT_TYPES[event_type],
+        timestamp=timestamp,
+        description=description,
+        metadata=metadata
+    )
+
+
+def _pack_state(state: AgentState) -> list:
+    """Customer, event, sentiment, then the remaining state fields in declaration order."""
+    return [
+        state.customer,
+        _pack_event(state.event, state.customer) if state.event else None,
+        _SENTIMENTS.index(state.sentiment) if state.sentiment else None
+    ] + [getattr(state, name) for name in STATE_FIELDS]
+
+
+def _unpack_state(values: list) -> AgentState:
+    """Inverse of _pack_state."""
+    customer, event, sentiment = values[:3]
+    return AgentState(
+        customer=customer,
+        event=_unpack_event(event, customer) if event else None,
+        sentiment=_SENTIMENTS[sentiment] if sentiment is not None else None,
+        **dict(zip(STATE_FIELDS, values[3:]))
+    )
+
+
+def _pack_body(value: Any) -> bytes:
+    """msgpack of a value, models and datetimes as ext types."""
+    return ormsgpack.packb(value, default=_default, option=_PACK_OPTIONS)
+
+
+def _default(value: Any) -> Any:
+    """Ext types for models and datetimes (called by ormsgpack for unsupported values)."""
+    if isinstance(value, datetime):
+        return ormsgpack.Ext(EXT_DATETIME, _INT64.pack(_datetime_micros(value)))
+    if isinstance(value, AgentState):
+        return ormsgpack.Ext(EXT_STATE, _pack_body(_pack_state(value)))
+    if isinstance(value, Customer):
+        return ormsgpack.Ext(EXT_CUSTOMER, _pack_body(_pack_customer(value)))
+    if isinstance(value, CustomerEvent):
+        return ormsgpack.Ext(EXT_EVENT, _pack_body(_pack_event(value, None)))
+    if hasattr(value, "item"):  # numpy / pandas scalars not covered by OPT_SERIALIZE_NUMPY
+        return value.item()
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if is_dataclass(value):
+        return asdict(value)
+    if hasattr(value, "__dict__"):  # Same as CustomJSONEncoder
+        return value.__dict__
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    """Decode the ext types written by _default."""
+    if code == EXT_DATETIME:
+        return _micros_datetime(_INT64.unpack(data)[0])
+    values = ormsgpack.unpackb(data, ext_hook=_ext_hook, option=ormsgpack.OPT_NON_STR_KEYS)
+    if code == EXT_STATE:
+        return _unpack_state(values)
+    if code == EXT_CUSTOMER:
+        return _unpack_customer(values)
+    if code == EXT_EVENT:
+        return _unpack_event(values)
+    raise ValueError(f"Unknown state codec ext type {code}")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encode a value that may contain AgentState, Customer and CustomerEvent objects.
+    
+    Args:
+        value: Model, or dict/list holding models, datetimes and plain values
+        
+    Returns:
+        Binary payload (or UTF-8 JSON when the binary format is off)
+    """
+    if not binary_enabled():
+        return json.dumps(value, cls=_json_encoder()).encode("utf-8")
+    return bytes((MAGIC, CODEC_VERSION)) + SCHEMA_FINGERPRINT + _pack_body(value)
+
+
+def loads(payload: bytes) -> Any:
+    """
+    Decode a payload written by `dumps` in either format.
+    
+    Binary payloads restore the models and datetimes; JSON payloads return
+    the plain to_dict structures (see AgentState.from_dict).
+    
+    Raises:
+        ValueError: Unknown codec version, a payload written with another
+            model schema, or a corrupt payload
+    """
+    if payload[:1] != bytes((MAGIC,)):
+        return json.loads(payload)
+    if ormsgpack is None:
+        raise ValueError("Binary state payload needs ormsgpack")
+    if payload[1] == 1 and SCHEMA_FINGERPRINT == _V1_SCHEMA_FINGERPRINT:
+        body = payload[2:]
+    elif payload[1] != CODEC_VERSION:
+        raise ValueError(f"Unsupported state codec version {payload[1]} (this build reads {CODEC_VERSION})")
+    else:
+        fingerprint = payload[2:_HEADER_SIZE]
+        if fingerprint != SCHEMA_FINGERPRINT:
+            raise ValueError(f"State payload was written with another model schema "
+                             f"({fingerprint.hex()}, this build {SCHEMA_FINGERPRINT.hex()})")
+        body = payload[_HEADER_SIZE:]
+    try:
+        return ormsgpack.unpackb(body, ext_hook=_ext_hook, option=ormsgpack.OPT_NON_STR_KEYS)
+    except ormsgpack.MsgpackDecodeError as e:
+        raise ValueError(f"Corrupt state payload: {e}") from e
+
+
+def _json_encoder():
+    """JSON encoder of the fallback format (imported late: memory_handler imports this module)."""
+    from .memory_handler import CustomJSONEncoder
+    return CustomJSONEncoder
+
+
+def to_wire(value: Any) -> Any:
+    """Payload to hand to another process: binary when enabled, otherwise `value` itself (pickled)."""
+    return dumps(value) if binary_enabled() else value
+
+
+def from_wire(payload: Any) -> Any:
+    """Inverse of to_wire."""
+    return loads(payload) if isinstance(payload, bytes) else payload
+
+
+def open_record_log(path: Path) -> BinaryIO:
+    """
+    Open a record file for append_record, first cutting off a record truncated by a crash.
+    
+    Without this, the stale length header of a partial record would swallow
+    the next appended record and misalign every record after it.
+    
+    Args:
+        path: Record file (created if missing)
+        
+    Returns:
+        Binary file open for appending
+    """
+    f = open(path, "a+b")
+    try:
+        size = f.seek(0, os.SEEK_END)
+        end = 0
+        while end + _RECORD_HEADER.size <= size:
+            f.seek(end)
+            (length,) = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+            if end + _RECORD_HEADER.size + length > size:
+                break
+            end += _RECORD_HEADER.size + length
+        if end < size:
+            f.truncate(end)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def append_record(f: BinaryIO, value: Any):
+    """Append one length-prefixed payload to a file from open_record_log and flush it."""
+    body = dumps(value)
+    f.write(_RECORD_HEADER.pack(len(body)) + body)
+    f.flush()
+
+
+def read_records(path: Path, on_error: Optional[Callable[[Exception], None]] = None) -> Iterator[Any]:
+    """
+    Decode the payloads of a record file (a record truncated by a crash ends the file).
+    
+    Args:
+        path: File written with append_record
+        on_error: Called for a record that cannot be decoded (it is skipped)
+    """
+    data = path.read_bytes()
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(data):
+        (length,) = _RECORD_HEADER.unpack_from(data, offset)
+        offset += _RECORD_HEADER.size
+        if offset + length > len(data):
+            return
+        try:
+            yield loads(data[offset:offset + length])
+        except ValueError as e:
+            if on_error:
+                on_error(e)
+        offset += length
+
+
+def state_from_payload(value: Any) -> AgentState:
+    """AgentState from a decoded payload (binary payloads hold it already, JSON ones its to_dict)."""
+    return value if isinstance(value, AgentState) else AgentState.from_dict(value)
+
+
+def codec_info() -> Dict[str, Any]:
+    """Format in use (for metrics and benchmarks)."""
+    return {
+        "format": "msgpack" if binary_enabled() else "json",
+        "version": CODEC_VERSION,
+        "schema": SCHEMA_FINGERPRINT.hex(),
+        "ormsgpack": getattr(ormsgpack, "__version__", None)
+    }
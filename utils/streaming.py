@@ -0,0 +1,185 @@
+"""
+Streaming - Forwards the customer message to dashboard clients while it is generated.
+
+The empathy (and fused) agent asks the model for JSON, so the raw token stream
+is not something an operator should see. `JsonFieldStreamer` follows the
+stream and passes on only the decoded text of one string field
+(`personalized_response`) as it arrives; the complete response is still
+parsed and validated as usual once the call finishes.
+
+Where the text goes is set by the caller with `stream_sink(...)` around a
+workflow run (a context variable, so concurrent runs on other threads keep
+their own sink). Without a sink, agents make a normal non-streaming call.
+"""
+import contextvars
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Optional
+
+from config import settings
+
+
+StreamSink = Callable[[str, str], None]  # (agent, text)
+
+_current_sink = contextvars.ContextVar("stream_sink", default=None)
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+@contextmanager
+def stream_sink(sink: StreamSink):
+    """
+    Forward message text streamed by agents in this block to `sink`.
+    
+    Args:
+        sink: Called with (agent, text chunk) from the LLM worker thread
+    """
+    token = _current_sink.set(sink)
+    try:
+        yield
+    finally:
+        _current_sink.reset(token)
+
+
+def current_stream_sink() -> Optional[StreamSink]:
+    """Sink of the calling context, or None if streaming is off / not requested."""
+    if not settings.EMPATHY_STREAMING:
+        return None
+    return _current_sink.get()
+
+
+def create_message_streamer(agent: str) -> Optional["JsonFieldStreamer"]:
+    """
+    Streamer for an agent's `personalized_response`, if the caller set a sink.
+    
+    Args:
+        agent: Agent generating the customer message
+        
+    Returns:
+        JsonFieldStreamer to pass as `on_chunk`, or None for a normal call
+    """
+    sink = current_stream_sink()
+    if sink is None:
+        return None
+    return JsonFieldStreamer(agent, "personalized_response", sink)
+
+
+class JsonFieldStreamer:
+    """Incrementally decodes one top-level JSON string field from raw chunks."""
+    
+    def __init__(self, agent: str, field: str, sink: StreamSink):
+        self.agent = agent
+        self.sink = sink
+        self._start = re.compile(rf'"{re.escape(field)}"\s*:\s*"')
+        self._head = ""      # Raw text before the field's opening quote
+        self._escape = ""    # Incomplete escape sequence carried between chunks
+        self._state = "search"
+        self._started = time.monotonic()
+        self._first_chunk: Optional[float] = None
+    
+    def __call__(self, raw: str):
+        """Consume one raw model chunk and forward any decoded field text."""
+        if self._state == "search":
+            self._head += raw
+            match = self._start.search(self._head)
+            if not match:
+                return
+            raw = self._head[match.end():]
+            self._head = ""
+            self._state = "field"
+        if self._state != "field":
+            return
+        
+        text = []
+        for char in raw:
+            if self._escape:
+                self._escape += char
+                decoded = self._decode_escape()
+                if decoded is not None:
+                    text.append(decoded)
+                    self._escape = ""
+            elif char == "\\":
+                self._escape = char
+            elif char == '"':
+                self._state = "done"
+                break
+            else:
+                text.append(char)
+        
+        if text:
+            if self._first_chunk is None:
+                self._first_chunk = time.monotonic()
+            self.sink(self.agent, "".join(text))
+    
+    def _decode_escape(self) -> Optional[str]:
+        """Decode the pending escape, or None if more characters are needed."""
+        escape = self._escape
+        if escape[1] != "u":
+            return _ESCAPES.get(escape[1], escape[1])
+        if len(escape) < 6:
+            return None
+        code = int(escape[2:6], 16)
+        if 0xD800 <= code < 0xDC00:
+            # High surrogate: wait for the low half (\uXXXX\uXXXX)
+            if len(escape) < 12:
+                return None
+            low = int(escape[8:12], 16)
+            return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00))
+        return chr(code)
+    
+    def finish(self):
+        """Record time-to-first-chunk vs total time for this stream."""
+        StreamStats.record(self.agent, self._first_chunk and self._first_chunk - self._started,
+                           time.monotonic() - self._started)
+
+
+class StreamStats:
+    """Time-to-first-chunk of streamed messages (shared across agents)."""
+    
+    _lock = threading.Lock()
+    _stats: Dict[str, Dict[str, Any]] = {}
+    
+    @classmethod
+    def record(cls, agent: str, first_chunk: Optional[float], total: float):
+        """Add one finished stream."""
+        with cls._lock:
+            stats = cls._stats.setdefault(agent, {
+                "streams": 0,
+                "empty_streams": 0,
+                "total_first_chunk_s": 0.0,
+                "total_duration_s": 0.0
+            })
+            stats["streams"] += 1
+            stats["total_duration_s"] += total
+            if first_chunk is None:
+                stats["empty_streams"] += 1
+            else:
+                stats["total_first_chunk_s"] += first_chunk
+    
+    @classmethod
+    def get_stream_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize streaming per agent.
+        
+        Returns:
+            Stream count, mean time to first message chunk and mean total time
+        """
+        with cls._lock:
+            summary = {}
+            for agent, stats in cls._stats.items():
+                with_text = stats["streams"] - stats["empty_streams"]
+                summary[agent] = {
+                    "streams": stats["streams"],
+                    "empty_streams": stats["empty_streams"],
+                    "avg_first_chunk_s": round(stats["total_first_chunk_s"] / with_text, 3) if with_text else None,
+                    "avg_duration_s": round(stats["total_duration_s"] / stats["streams"], 3)
+                }
+            return summary
+    
+    @classmethod
+    def reset(cls):
+        """Clear statistics."""
+        with cls._lock:
+            cls._stats = {}
@@ -0,0 +1,170 @@
+"""
+Token Budget Manager - Keeps agent prompts within a per-agent token budget.
+
+Enhanced context is passed as ranked sections. When a prompt would exceed its
+budget, the lowest-priority sections are compacted first (leading lines kept,
+the rest replaced by an omission note) and dropped entirely if needed.
+Required sections are never touched.
+"""
+from dataclasses import dataclass, replace
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import settings
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens locally (tiktoken if available, ~4 chars/token otherwise).
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        Token count
+    """
+    global _encoding
+    if not text:
+        return 0
+    
+    if _encoding is None:
+        _encoding = _load_encoding()
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    
+    return max(1, len(text) // 4)
+
+
+def _load_encoding():
+    """Load the tiktoken encoding, or False if unavailable (not installed / offline)."""
+    if tiktoken is None:
+        return False
+    try:
+        return tiktoken.encoding_for_model(settings.LLM_MODEL)
+    except KeyError:
+        pass
+    except Exception:
+        return False
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Encoding files are downloaded on first use; offline hosts estimate instead
+        return False
+
+
+@dataclass
+class ContextSection:
+    """A ranked block of enhanced prompt context."""
+    name: str
+    text: str
+    priority: int = 1  # Higher = kept longer
+    field: Optional[str] = None  # Data template field to fill (None = appended after the data block)
+    required: bool = False  # Never compacted or dropped
+    min_lines: int = 1  # Leading lines kept when compacting (section header)
+
+
+class TokenBudget:
+    """Fits ranked context sections into an agent's prompt token budget."""
+    
+    def __init__(self, agent: str, max_tokens: Optional[int] = None):
+        """
+        Initialize the budget.
+        
+        Args:
+            agent: Agent name (key of settings.PROMPT_TOKEN_BUDGETS)
+            max_tokens: Explicit budget (defaults to the agent's configured budget)
+        """
+        self.agent = agent
+        self.max_tokens = max_tokens or settings.PROMPT_TOKEN_BUDGETS.get(agent)
+    
+    def fit(self, sections: List[ContextSection], reserved_tokens: int = 0) -> Tuple[List[ContextSection], Dict[str, Any]]:
+        """
+        Compact sections, lowest priority first, until they fit the budget.
+        
+        Args:
+            sections: Context sections in prompt order
+            reserved_tokens: Tokens already used by the rest of the prompt
+            
+        Returns:
+            Tuple of (fitted sections in original order, report with
+            per-section token counts and what was compacted/dropped)
+        """
+        sizes = [count_tokens(section.text) for section in sections]
+        report = {
+            "budget": self.max_tokens,
+            "section_tokens": {section.name: size for section, size in zip(sections, sizes)},
+            "trimmed_tokens": 0,
+            "compacted": [],
+            "dropped": []
+        }
+        
+        if not self.max_tokens:
+            return list(sections), report
+        
+        overflow = reserved_tokens + sum(sizes) - self.max_tokens
+        if overflow <= 0:
+            return list(sections), report
+        
+        fitted = list(sections)
+        # Lowest priority first; among equals, later sections go first
+        order = sorted(
+            (index for index, section in enumerate(sections) if not section.required and section.text),
+            key=lambda index: (sections[index].priority, -index)
+        )
+        
+        for index in order:
+            if overflow <= 0:
+                break
+            
+            section = sections[index]
+            target = sizes[index] - overflow
+            compacted = self._compact(section, target) if target > 0 else None
+            
+            if compacted is not None:
+                new_size = count_tokens(compacted)
+                fitted[index] = replace(section, text=compacted)
+                report["compacted"].append(section.name)
+            else:
+                new_size = 0
+                fitted[index] = replace(section, text="")
+                report["dropped"].append(section.name)
+            
+            saved = sizes[index] - new_size
+            overflow -= saved
+            report["trimmed_tokens"] += saved
+        
+        return fitted, report
+    
+    @staticmethod
+    def _compact(section: ContextSection, target_tokens: int) -> Optional[str]:
+        """
+        Keep as many leading lines as fit in `target_tokens`.
+        
+        Returns:
+            Compacted text, or None if not even the header lines fit
+        """
+        lines = section.text.split("\n")
+        
+        def keep_lines(keep: int) -> str:
+            omitted = len(lines) - keep
+            return "\n".join(lines[:keep] + [f"  [... {omitted} more lines omitted to fit token budget]"])
+        
+        # Binary search for the largest number of leading lines that fits
+        low, high = section.min_lines, len(lines) - 1
+        best = None
+        while low <= high:
+            keep = (low + high) // 2
+            text = keep_lines(keep)
+            if count_tokens(text) <= target_tokens:
+                best = text
+                low = keep + 1
+            else:
+                high = keep - 1
+        return best
@@ -0,0 +1,182 @@
+"""
+Tracing - Timing spans around workflow stages, LLM calls, prompt builds, parsing and analytics.
+
+`span(name, **attributes)` opens an OpenTelemetry span (exported per
+TRACING_EXPORTER: "console", "file" for JSONL in logs/, or "none") and
+always records its duration in `SpanStats`, so /api/metrics and the CLI can
+show where time actually goes without an exporter. Spans nest through the
+context of the calling thread; work handed to pools with
+contextvars.copy_context keeps its parent span.
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from config import settings
+
+try:
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SpanExporter,
+        SpanExportResult
+    )
+except ImportError:  # Optional: durations are still recorded in SpanStats
+    TracerProvider = None
+    SpanExporter = object
+
+
+class JsonlFileSpanExporter(SpanExporter):
+    """Writes finished spans as one JSON object per line."""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def export(self, spans) -> "SpanExportResult":
+        lines = "".join(json.dumps(json.loads(span.to_json())) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            print(f"[WARN] Tracing: could not write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+    
+    def shutdown(self):
+        pass
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+_tracer_ready = False
+
+
+def _get_tracer():
+    """OpenTelemetry tracer for the configured exporter (None = stats only)."""
+    global _tracer, _tracer_ready
+    if _tracer_ready:
+        return _tracer
+    
+    with _tracer_lock:
+        if not _tracer_ready:
+            exporter = settings.TRACING_EXPORTER
+            if TracerProvider is not None and exporter in ("console", "file"):
+                provider = TracerProvider(resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}))
+                if exporter == "console":
+                    provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+                else:
+                    provider.add_span_processor(BatchSpanProcessor(JsonlFileSpanExporter(settings.TRACING_FILE)))
+                _tracer = provider.get_tracer("procx")
+            elif exporter not in ("none", "console", "file"):
+                print(f"[WARN] Tracing: unknown TRACING_EXPORTER '{exporter}' - spans are not exported")
+            _tracer_ready = True
+    return _tracer
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a span.
+    
+    Args:
+        name: Span name (e.g. "node.context_agent", "llm.call")
+        **attributes: Span attributes (None values are dropped)
+        
+    Yields:
+        The OpenTelemetry span, or None when spans are not exported
+    """
+    tracer = _get_tracer()
+    started = time.perf_counter()
+    failed = False
+    try:
+        if tracer is None:
+            yield None
+        else:
+            attributes = {key: value for key, value in attributes.items() if value is not None}
+            with tracer.start_as_current_span(name, attributes=attributes) as current:
+                yield current
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        SpanStats.record(name, time.perf_counter() - started, failed)
+
+
+class SpanStats:
+    """Durations per span name (shared across all threads)."""
+    
+    _lock = threading.Lock()
+    _stats: Dict[str, Dict[str, Any]] = {}
+    
+    @staticmethod
+    def _new_stats() -> Dict[str, Any]:
+        """Empty statistics of one span name."""
+        return {"count": 0, "errors": 0, "total_s": 0.0, "samples": deque(maxlen=500)}
+    
+    @classmethod
+    def record(cls, name: str, duration: float, failed: bool = False):
+        """Add one finished span."""
+        with cls._lock:
+            stats = cls._stats.setdefault(name, cls._new_stats())
+            stats["count"] += 1
+            stats["total_s"] += duration
+            stats["samples"].append(duration)
+            if failed:
+                stats["errors"] += 1
+    
+    @classmethod
+    def get_span_stats(cls, prefix: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize span durations.
+        
+        Args:
+            prefix: Only spans whose name starts with this (e.g. "node.")
+            
+        Returns:
+            Mapping of span name to count, errors, total and mean/p50/p95 seconds
+        """
+        with cls._lock:
+            summary = {}
+            for name, stats in sorted(cls._stats.items()):
+                if prefix and not name.startswith(prefix):
+                    continue
+                ordered = sorted(stats["samples"])
+                summary[name] = {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "total_s": round(stats["total_s"], 3),
+                    "mean_s": round(stats["total_s"] / stats["count"], 3),
+                    "p50_s": round(ordered[len(ordered) // 2], 3),
+                    "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+                }
+            return summary
+    
+    @classmethod
+    def snapshot(cls) -> Dict[str, Dict[str, Any]]:
+        """Raw statistics (picklable), e.g. to send from a scan worker process to `merge`."""
+        with cls._lock:
+            return {name: {**stats, "samples": list(stats["samples"])} for name, stats in cls._stats.items()}
+    
+    @classmethod
+    def merge(cls, snapshot: Dict[str, Dict[str, Any]]):
+        """Add statistics recorded in another process (see `snapshot`)."""
+        with cls._lock:
+            for name, other in snapshot.items():
+                stats = cls._stats.setdefault(name, cls._new_stats())
+                stats["count"] += other["count"]
+                stats["errors"] += other["errors"]
+                stats["total_s"] += other["total_s"]
+                stats["samples"].extend(other["samples"])
+    
+    @classmethod
+    def reset(cls):
+        """Clear statistics."""
+        with cls._lock:
+            cls._stats = {}
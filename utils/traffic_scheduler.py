@@ -0,0 +1,278 @@
+"""
+Traffic Scheduler - Client-side RPM/TPM budgets and priorities for model calls.
+
+Every guarded LLM call takes a slot from this process-wide scheduler before it
+is sent, so a UI-triggered scan and interactive single-customer requests
+running on different threads share one provider budget instead of tripping
+its rate limits:
+
+1. Two token buckets refill continuously: requests per minute and tokens per
+   minute (prompt tokens counted locally plus an estimated completion,
+   corrected with the real usage once the response arrives)
+2. Waiting calls are served strictly by priority class, FIFO within a class:
+
+       interactive  single-customer requests from the dashboard/API
+       vip          VIP customers and critical-risk alerts in a scan
+       bulk         everything else (scan traffic)
+
+3. A call that cannot get a slot within LLM_SCHEDULER_MAX_WAIT_SECONDS raises
+   RateLimitWaitError, so the agent drops to its deterministic fallback
+
+The priority class is carried in a context variable; callers wrap a customer
+run in `traffic_priority(...)` and every agent call of that run inherits it.
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from config import settings
+
+
+PRIORITY_CLASSES = ("interactive", "vip", "bulk")
+
+_current_priority = contextvars.ContextVar("traffic_priority", default="bulk")
+
+
+class RateLimitWaitError(RuntimeError):
+    """Raised when a call waits longer than the scheduler allows."""
+
+
+@contextmanager
+def traffic_priority(priority: str):
+    """
+    Run a block (e.g. one customer's workflow) under a priority class.
+    
+    Args:
+        priority: One of PRIORITY_CLASSES
+    """
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown traffic priority: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    """Priority class of the calling context."""
+    return _current_priority.get()
+
+
+def classify_traffic(customer: Any, alert: Optional[Dict[str, Any]] = None, interactive: bool = False) -> str:
+    """
+    Pick the priority class for a customer run.
+    
+    Args:
+        customer: Customer being processed
+        alert: Churn alert from the monitor (scan traffic)
+        interactive: True for a user-triggered single-customer request
+        
+    Returns:
+        Priority class name
+    """
+    if interactive:
+        return "interactive"
+    if getattr(customer, "is_vip", False) or (alert and alert.get("risk_level") == "critical"):
+        return "vip"
+    return "bulk"
+
+
+class TokenBucket:
+    """Continuously refilling budget of `per_minute` units (callers hold the lock)."""
+    
+    def __init__(self, per_minute: float, burst_seconds: float = 60.0):
+        self.per_minute = float(per_minute)
+        self.rate = self.per_minute / 60.0
+        # Providers smooth limits over short windows, so bursts are capped too
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def refill(self, now: float):
+        """Add the units earned since the last update."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        # Requests larger than the whole bucket go through once it is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+    
+    def take(self, amount: float):
+        """Consume units (the level may go negative when usage is corrected)."""
+        self.level -= amount
+
+
+class TrafficScheduler:
+    """Process-wide admission control for model calls (shared by all agents)."""
+    
+    _cond = threading.Condition()
+    _requests: Optional[TokenBucket] = None
+    _tokens: Optional[TokenBucket] = None
+    _waiting: list = []
+    _sequence = itertools.count()
+    _waits: Dict[str, deque] = {}
+    _stats: Dict[str, Dict[str, Any]] = {}
+    
+    @classmethod
+    def _buckets(cls):
+        """Create the buckets lazily so settings overrides take effect (caller holds the lock)."""
+        if cls._requests is None:
+            cls._requests = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE, settings.LLM_RATE_LIMIT_BURST_SECONDS)
+            cls._tokens = TokenBucket(settings.LLM_TOKENS_PER_MINUTE, settings.LLM_RATE_LIMIT_BURST_SECONDS)
+        return cls._requests, cls._tokens
+    
+    @classmethod
+    def _record(cls, priority: str, key: str, waited: Optional[float] = None):
+        """Update per-class counters (caller holds the lock)."""
+        stats = cls._stats.setdefault(priority, {
+            "requests": 0,
+            "admitted": 0,
+            "delayed": 0,
+            "rejected": 0,
+            "skipped": 0,
+            "total_wait_s": 0.0,
+            "max_wait_s": 0.0
+        })
+        stats[key] += 1
+        if waited is not None:
+            stats["total_wait_s"] += waited
+            stats["max_wait_s"] = max(stats["max_wait_s"], waited)
+            if waited > 0:
+                stats["delayed"] += 1
+            cls._waits.setdefault(priority, deque(maxlen=500)).append(waited)
+    
+    @classmethod
+    def acquire(cls, agent: str, estimated_tokens: int, priority: Optional[str] = None,
+                blocking: bool = True) -> bool:
+        """
+        Wait for a request slot and `estimated_tokens` of the token budget.
+        
+        Args:
+            agent: Agent making the call (for error messages)
+            estimated_tokens: Prompt tokens plus expected completion tokens
+            priority: Priority class (defaults to the calling context's class)
+            blocking: If False, take a slot only if one is free right now
+            
+        Returns:
+            True once admitted; False if non-blocking and no slot was free
+            
+        Raises:
+            RateLimitWaitError: No slot within LLM_SCHEDULER_MAX_WAIT_SECONDS
+        """
+        if not settings.LLM_RATE_LIMIT_ENABLED:
+            return True
+        
+        priority = priority or current_priority()
+        ticket = (PRIORITY_CLASSES.index(priority), next(cls._sequence))
+        started = time.monotonic()
+        give_up_at = started + settings.LLM_SCHEDULER_MAX_WAIT_SECONDS
+        
+        with cls._cond:
+            requests, tokens = cls._buckets()
+            cls._record(priority, "requests")
+            heapq.heappush(cls._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    requests.refill(now)
+                    tokens.refill(now)
+                    
+                    # Only the highest-priority waiter may take the next slot
+                    wait = 0.0
+                    if cls._waiting[0] == ticket:
+                        wait = max(requests.wait_time(1), tokens.wait_time(estimated_tokens))
+                        if wait == 0.0:
+                            requests.take(1)
+                            tokens.take(estimated_tokens)
+                            cls._record(priority, "admitted", now - started)
+                            return True
+                    
+                    if not blocking:
+                        cls._record(priority, "skipped")
+                        return False
+                    if now >= give_up_at:
+                        cls._record(priority, "rejected")
+                        raise RateLimitWaitError(
+                            f"{agent}: no {priority} rate-limit slot within "
+                            f"{settings.LLM_SCHEDULER_MAX_WAIT_SECONDS:.0f}s - using fallback"
+                        )
+                    cls._cond.wait(timeout=min(give_up_at - now, wait or settings.LLM_SCHEDULER_MAX_WAIT_SECONDS))
+            finally:
+                cls._waiting.remove(ticket)
+                heapq.heapify(cls._waiting)
+                cls._cond.notify_all()
+    
+    @classmethod
+    def settle(cls, estimated_tokens: int, actual_tokens: Optional[int]):
+        """
+        Correct the token budget with the real usage of an admitted call.
+        
+        Args:
+            estimated_tokens: Amount taken at admission
+            actual_tokens: Total tokens reported by the provider (None if unknown)
+        """
+        if not settings.LLM_RATE_LIMIT_ENABLED or actual_tokens is None:
+            return
+        with cls._cond:
+            _, tokens = cls._buckets()
+            tokens.take(actual_tokens - estimated_tokens)
+            cls._cond.notify_all()
+    
+    @classmethod
+    def get_traffic_stats(cls) -> Dict[str, Any]:
+        """
+        Summarize admission control.
+        
+        Returns:
+            Limits, current bucket levels, queued calls per class and queue-wait
+            metrics (mean/p95/max) per priority class
+        """
+        with cls._cond:
+            requests, tokens = cls._buckets()
+            now = time.monotonic()
+            requests.refill(now)
+            tokens.refill(now)
+            queued = {priority: 0 for priority in PRIORITY_CLASSES}
+            for index, _ in cls._waiting:
+                queued[PRIORITY_CLASSES[index]] += 1
+            
+            classes = {}
+            for priority, stats in cls._stats.items():
+                waits = sorted(cls._waits.get(priority, ()))
+                classes[priority] = {
+                    **stats,
+                    "total_wait_s": round(stats["total_wait_s"], 3),
+                    "max_wait_s": round(stats["max_wait_s"], 3),
+                    "avg_wait_s": round(stats["total_wait_s"] / stats["admitted"], 3) if stats["admitted"] else 0.0,
+                    "p95_wait_s": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                    "queued": queued[priority]
+                }
+            
+            return {
+                "enabled": settings.LLM_RATE_LIMIT_ENABLED,
+                "requests_per_minute": requests.per_minute,
+                "tokens_per_minute": tokens.per_minute,
+                "requests_available": round(requests.level, 1),
+                "tokens_available": round(tokens.level),
+                "classes": classes
+            }
+    
+    @classmethod
+    def reset(cls):
+        """Refill the buckets (re-reading the limits) and clear statistics."""
+        with cls._cond:
+            cls._requests = None
+            cls._tokens = None
+            cls._waits = {}
+            cls._stats = {}
+            cls._cond.notify_all()
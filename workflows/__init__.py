@@ -5,7 +5,9 @@ from .cx_workflow import (
     create_proactive_workflow,
     run_workflow,
     run_workflow_async,
-    stream_workflow
+    run_workflow_batch,
+    stream_workflow,
+    BatchResult
 )
 
 __all__ = [
@@ -14,5 +16,7 @@ __all__ = [
     "create_proactive_workflow",
     "run_workflow",
     "run_workflow_async",
-    "stream_workflow"
+    "run_workflow_batch",
+    "stream_workflow",
+    "BatchResult"
 ]
@@ -1,7 +1,11 @@
 """
 AgentMAX CX Workflow - LangGraph implementation of the multi-agent system.
 """
-from typing import Dict, Any, TypedDict
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Callable, ContextManager, Dict, Any, Iterable, Iterator, TypedDict, Optional
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, SystemMessage
 
@@ -10,8 +14,16 @@ from agents import (
     create_context_agent,
     create_pattern_agent,
     create_decision_agent,
-    create_empathy_agent
+    create_empathy_agent,
+    create_fused_agent,
+    create_speculative_agent
 )
+from agents.decision_agent import mark_state_handled
+from utils.degradation import DegradationController
+from utils.model_router import ModelRouter
+from utils.scan_checkpoint import ScanCheckpointStore
+from utils.tracing import span
+from config import settings
 
 
 class WorkflowState(TypedDict):
@@ -19,16 +31,201 @@ class WorkflowState(TypedDict):
     state: AgentState
 
 
-def create_cx_workflow():
+@dataclass
+class BatchResult:
+    """Outcome of one run in run_workflow_batch."""
+    index: int                          # Position of the initial state in the input
+    state: AgentState                   # Final state (the initial state if the run failed)
+    error: Optional[Exception] = None   # Exception raised by the run, if any
+    elapsed: float = 0.0                # Seconds the run took on its worker
+
+
+def _create_escalation_gate(escalation_tracker, pattern_agent=None, pattern_stage: str = "pattern_agent"):
+    """
+    Create the pre-flight escalation gate node.
+    
+    Customers with an active open/in-progress escalation are already with a
+    human agent, so they are marked `handled` before any LLM call is made
+    (except when the escalation is the one this run's own decision stage
+    created before a crash, see `state.metadata['escalation_id']`).
+    Every other run is tagged with the current degradation mode and its model
+    tier, which all stages of the run then follow, and starts the pattern
+    agent's analytics prefetch (unless a resumed run already checkpointed
+    its pattern stage).
+    
+    Args:
+        escalation_tracker: EscalationTracker shared with the decision agent
+        pattern_agent: Pattern agent whose local analytics are prefetched
+        pattern_stage: Node name of the pattern stage in this workflow
+        
+    Returns:
+        Gate node function
+    """
+    def escalation_gate_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Short-circuit customers already escalated to a human."""
+        agent_state: AgentState = state["state"]
+        
+        if agent_state.customer:
+            escalation_tracker.refresh()
+            skip_decision = escalation_tracker.should_skip_customer(agent_state.customer.customer_id)
+            own_escalation = agent_state.metadata.get('escalation_id')
+            if skip_decision['should_skip'] and not (own_escalation and skip_decision.get('escalation_id') == own_escalation):
+                agent_state = mark_state_handled(agent_state, skip_decision, agent="escalation_gate")
+                return {"state": agent_state}
+        
+        DegradationController.start_run(agent_state)
+        ModelRouter.route(agent_state)
+        if pattern_agent and not ScanCheckpointStore.stage_recorded(agent_state, pattern_stage):
+            pattern_agent.prefetch(agent_state)
+        return {"state": agent_state}
+    
+    return escalation_gate_node
+
+
+def _checkpointed(stage: str, node: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """
+    Wrap a node so runs bound to a scan checkpoint each completed stage.
+    
+    A run restored from a checkpoint passes straight through the stages it
+    already completed (their output is in the restored state).
+    
+    Args:
+        stage: Node name
+        node: Node function
+        
+    Returns:
+        Checkpointing node function
+    """
+    def checkpointed_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        agent_state: AgentState = state["state"]
+        if ScanCheckpointStore.stage_completed(agent_state, stage):
+            return {"state": agent_state}
+        
+        result = node(state)
+        ScanCheckpointStore.record_stage(result["state"], stage)
+        return result
+    
+    return checkpointed_node
+
+
+def _traced(stage: str, node: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """
+    Wrap a node in a `node.<stage>` span and record its duration.
+    
+    The duration is stored in `state.metadata['stage_timings']` so callers
+    can report real per-agent times (LLM calls, prompt builds, parsing and
+    analytics show up as child spans).
+    
+    Args:
+        stage: Node name
+        node: Node function
+        
+    Returns:
+        Traced node function
+    """
+    def traced_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        agent_state: AgentState = state["state"]
+        started = time.perf_counter()
+        with span(f"node.{stage}",
+                  customer_id=agent_state.customer.customer_id if agent_state.customer else None,
+                  model_tier=agent_state.metadata.get('model_tier'),
+                  degradation_mode=agent_state.metadata.get('degradation_mode')):
+            result = node(state)
+        
+        timings = result["state"].metadata.setdefault('stage_timings', {})
+        timings[stage] = round(timings.get(stage, 0.0) + time.perf_counter() - started, 3)
+        return result
+    
+    return traced_node
+
+
+def _stage_node(stage: str, node: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """Wrap a workflow node with its timing span and scan checkpointing."""
+    return _checkpointed(stage, _traced(stage, node))
+
+
+def _gate_node(node: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """
+    Wrap the escalation gate with its timing span only.
+    
+    The gate is never checkpointed: a resumed run must re-check for an
+    escalation made since the crash and restart its degradation mode,
+    routing and pattern prefetch (the gate makes no model call).
+    """
+    return _traced("escalation_gate", node)
+
+
+def _cancel_prefetch_on_error(pattern_agent, node: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """
+    Wrap the stage between the gate and the pattern stage so a failed run
+    drops the analytics the gate prefetched for it.
+    """
+    def cancelling_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return node(state)
+        except Exception:
+            pattern_agent.cancel_prefetch(state["state"])
+            raise
+    
+    return cancelling_node
+
+
+def _route_after_gate(next_node: str):
+    """Route handled customers straight to END, everyone else to `next_node`."""
+    def route(state: Dict[str, Any]) -> str:
+        agent_state: AgentState = state["state"]
+        if agent_state.priority_level == "handled":
+            return END
+        return next_node
+    
+    return route
+
+
+def _pipeline_mode(fused: Optional[bool], speculative: Optional[bool]) -> str:
+    """Resolve the pipeline mode (explicit arguments win over settings.PIPELINE_MODE)."""
+    if fused is None and speculative is None:
+        return settings.PIPELINE_MODE
+    if fused:
+        return "fused"
+    if speculative:
+        return "speculative"
+    return "standard"
+
+
+def _create_decision_empathy_agent(decision_agent, empathy_agent,
+                                   fused: Optional[bool], speculative: Optional[bool]):
+    """
+    Create the combined decision+empathy stage for the pipeline mode.
+    
+    Returns:
+        Fused or speculative agent, or None for separate decision and empathy nodes
+    """
+    mode = _pipeline_mode(fused, speculative)
+    if mode == "fused":
+        return create_fused_agent(decision_agent, empathy_agent)
+    if mode == "speculative":
+        return create_speculative_agent(decision_agent, empathy_agent)
+    return None
+
+
+def create_cx_workflow(fused: Optional[bool] = None, speculative: Optional[bool] = None):
     """
     Create the AgentMAX CX workflow using LangGraph.
     
     The workflow follows this sequence:
+    0. Escalation Gate - Skips customers already with a human (no LLM calls)
     1. Context Agent - Analyzes the event and extracts context
     2. Pattern Agent - Identifies patterns and predicts behavior
     3. Decision Agent - Makes decisions on actions and escalations
     4. Empathy Agent - Generates personalized response
     
+    In fused mode steps 3 and 4 run as a single `decision_empathy` call; in
+    speculative mode the `decision_empathy` node drafts step 4 while step 3 runs.
+    
+    Args:
+        fused: Use the fused decision+empathy stage (defaults to settings.PIPELINE_MODE)
+        speculative: Draft the message in parallel with the decision (defaults to settings.PIPELINE_MODE)
+        
     Returns:
         Compiled LangGraph workflow
     """
@@ -38,6 +235,7 @@ def create_cx_workflow():
     pattern_agent = create_pattern_agent()
     decision_agent = create_decision_agent()
     empathy_agent = create_empathy_agent()
+    decision_empathy_agent = _create_decision_empathy_agent(decision_agent, empathy_agent, fused, speculative)
     
     # Define workflow nodes
     def context_node(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -64,35 +262,60 @@ def create_cx_workflow():
         updated_state = empathy_agent(agent_state)
         return {"state": updated_state}
     
+    def decision_empathy_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Combined decision + empathy node (fused call or speculative draft)."""
+        agent_state: AgentState = state["state"]
+        updated_state = decision_empathy_agent(agent_state)
+        return {"state": updated_state}
+    
     # Create the graph
     workflow = StateGraph(WorkflowState)
     
     # Add nodes
-    workflow.add_node("context_agent", context_node)
-    workflow.add_node("pattern_agent", pattern_node)
-    workflow.add_node("decision_agent", decision_node)
-    workflow.add_node("empathy_agent", empathy_node)
+    workflow.add_node("escalation_gate", _gate_node(_create_escalation_gate(decision_agent.escalation_tracker, pattern_agent)))
+    workflow.add_node("context_agent", _cancel_prefetch_on_error(pattern_agent, _stage_node("context_agent", context_node)))
+    workflow.add_node("pattern_agent", _stage_node("pattern_agent", pattern_node))
+    if decision_empathy_agent:
+        workflow.add_node("decision_empathy", _stage_node("decision_empathy", decision_empathy_node))
+    else:
+        workflow.add_node("decision_agent", _stage_node("decision_agent", decision_node))
+        workflow.add_node("empathy_agent", _stage_node("empathy_agent", empathy_node))
     
     # Define edges (sequential flow)
-    workflow.set_entry_point("context_agent")
+    workflow.set_entry_point("escalation_gate")
+    workflow.add_conditional_edges(
+        "escalation_gate",
+        _route_after_gate("context_agent"),
+        {"context_agent": "context_agent", END: END}
+    )
     workflow.add_edge("context_agent", "pattern_agent")
-    workflow.add_edge("pattern_agent", "decision_agent")
-    workflow.add_edge("decision_agent", "empathy_agent")
-    workflow.add_edge("empathy_agent", END)
+    
+    if decision_empathy_agent:
+        workflow.add_edge("pattern_agent", "decision_empathy")
+        workflow.add_edge("decision_empathy", END)
+    else:
+        workflow.add_edge("pattern_agent", "decision_agent")
+        workflow.add_edge("decision_agent", "empathy_agent")
+        workflow.add_edge("empathy_agent", END)
     
     # Compile the graph
     return workflow.compile()
 
 
-def create_cx_workflow_with_routing():
+def create_cx_workflow_with_routing(fused: Optional[bool] = None, speculative: Optional[bool] = None):
     """
     Create an advanced workflow with conditional routing.
     
     This version includes:
+    - Early exit for customers already escalated to a human
     - Early exit for simple inquiries
     - Escalation routing
     - Retry logic for failed steps
     
+    Args:
+        fused: Use the fused decision+empathy stage (defaults to settings.PIPELINE_MODE)
+        speculative: Draft the message in parallel with the decision (defaults to settings.PIPELINE_MODE)
+    
     Returns:
         Compiled LangGraph workflow with routing
     """
@@ -102,6 +325,8 @@ def create_cx_workflow_with_routing():
     pattern_agent = create_pattern_agent()
     decision_agent = create_decision_agent()
     empathy_agent = create_empathy_agent()
+    decision_empathy_agent = _create_decision_empathy_agent(decision_agent, empathy_agent, fused, speculative)
+    decision_step = "decision_empathy" if decision_empathy_agent else "decision_agent"
     
     # Define workflow nodes
     def context_node(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -128,12 +353,21 @@ def create_cx_workflow_with_routing():
         updated_state = empathy_agent(agent_state)
         return {"state": updated_state}
     
+    def decision_empathy_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Combined decision + empathy node (fused call or speculative draft)."""
+        agent_state: AgentState = state["state"]
+        updated_state = decision_empathy_agent(agent_state)
+        return {"state": updated_state}
+    
     def escalation_node(state: Dict[str, Any]) -> Dict[str, Any]:
         """Handle escalation to human agent - but still generate empathy response first."""
         agent_state: AgentState = state["state"]
         
-        # Generate empathy response even for escalated cases
-        updated_state = empathy_agent(agent_state)
+        # Generate empathy response even for escalated cases (fused/speculative mode already has one)
+        if agent_state.personalized_response:
+            updated_state = agent_state
+        else:
+            updated_state = empathy_agent(agent_state)
         
         # Add detailed escalation context for human agent
         escalation_message = "🚨 ESCALATED TO HUMAN AGENT\n"
@@ -155,7 +389,8 @@ def create_cx_workflow_with_routing():
         # Skip pattern analysis for very simple inquiries
         if agent_state.urgency_level and agent_state.urgency_level <= 2:
             if agent_state.sentiment and agent_state.sentiment.value == "positive":
-                return "decision_agent"  # Skip to decision for simple positive inquiries
+                pattern_agent.cancel_prefetch(agent_state)
+                return decision_step  # Skip to decision for simple positive inquiries
         
         return "pattern_agent"
     
@@ -166,20 +401,33 @@ def create_cx_workflow_with_routing():
         if agent_state.escalation_needed:
             return "escalation_handler"
         
+        # Fused/speculative mode has already generated the response
+        if decision_empathy_agent:
+            return END
+        
         return "empathy_agent"
     
     # Create the graph
     workflow = StateGraph(WorkflowState)
     
     # Add nodes
-    workflow.add_node("context_agent", context_node)
-    workflow.add_node("pattern_agent", pattern_node)
-    workflow.add_node("decision_agent", decision_node)
-    workflow.add_node("empathy_agent", empathy_node)
-    workflow.add_node("escalation_handler", escalation_node)
+    workflow.add_node("escalation_gate", _gate_node(_create_escalation_gate(decision_agent.escalation_tracker, pattern_agent)))
+    workflow.add_node("context_agent", _cancel_prefetch_on_error(pattern_agent, _stage_node("context_agent", context_node)))
+    workflow.add_node("pattern_agent", _stage_node("pattern_agent", pattern_node))
+    if decision_empathy_agent:
+        workflow.add_node("decision_empathy", _stage_node("decision_empathy", decision_empathy_node))
+    else:
+        workflow.add_node("decision_agent", _stage_node("decision_agent", decision_node))
+        workflow.add_node("empathy_agent", _stage_node("empathy_agent", empathy_node))
+    workflow.add_node("escalation_handler", _stage_node("escalation_handler", escalation_node))
     
     # Define edges with routing
-    workflow.set_entry_point("context_agent")
+    workflow.set_entry_point("escalation_gate")
+    workflow.add_conditional_edges(
+        "escalation_gate",
+        _route_after_gate("context_agent"),
+        {"context_agent": "context_agent", END: END}
+    )
     
     # Conditional routing after context
     workflow.add_conditional_edges(
@@ -187,43 +435,69 @@ def create_cx_workflow_with_routing():
         should_analyze_patterns,
         {
             "pattern_agent": "pattern_agent",
-            "decision_agent": "decision_agent"
+            decision_step: decision_step
         }
     )
     
-    workflow.add_edge("pattern_agent", "decision_agent")
+    workflow.add_edge("pattern_agent", decision_step)
     
     # Conditional routing after decision
-    workflow.add_conditional_edges(
-        "decision_agent",
-        should_escalate,
-        {
-            "empathy_agent": "empathy_agent",
-            "escalation_handler": "escalation_handler"
-        }
-    )
+    if decision_empathy_agent:
+        workflow.add_conditional_edges(
+            decision_step,
+            should_escalate,
+            {
+                "escalation_handler": "escalation_handler",
+                END: END
+            }
+        )
+    else:
+        workflow.add_conditional_edges(
+            decision_step,
+            should_escalate,
+            {
+                "empathy_agent": "empathy_agent",
+                "escalation_handler": "escalation_handler"
+            }
+        )
+        workflow.add_edge("empathy_agent", END)
     
     # Both paths end
-    workflow.add_edge("empathy_agent", END)
     workflow.add_edge("escalation_handler", END)
     
     # Compile the graph
     return workflow.compile()
 
 
-def run_workflow(workflow, initial_state: AgentState) -> AgentState:
+StepCallback = Callable[[str, AgentState], None]  # (node, state after the node)
+
+
+def run_workflow(workflow, initial_state: AgentState, config: Optional[Dict[str, Any]] = None,
+                 on_step: Optional[StepCallback] = None) -> AgentState:
     """
     Run the workflow with an initial state.
     
     Args:
         workflow: Compiled LangGraph workflow
         initial_state: Initial agent state
+        config: LangGraph run config (e.g. callbacks)
+        on_step: Called as each node completes (the run is streamed with
+            stream_workflow), e.g. to report agent progress while it happens
         
     Returns:
         Final agent state after workflow completion
     """
-    result = workflow.invoke({"state": initial_state})
-    return result["state"]
+    customer_id = initial_state.customer.customer_id if initial_state.customer else None
+    with span("workflow.run", customer_id=customer_id):
+        if on_step is None:
+            return workflow.invoke({"state": initial_state}, config=config)["state"]
+        
+        final_state = initial_state
+        for step in stream_workflow(workflow, initial_state, config):
+            for node, update in step.items():
+                final_state = update["state"]
+                on_step(node, final_state)
+        return final_state
 
 
 async def run_workflow_async(workflow, initial_state: AgentState) -> AgentState:
@@ -241,22 +515,119 @@ async def run_workflow_async(workflow, initial_state: AgentState) -> AgentState:
     return result["state"]
 
 
-def stream_workflow(workflow, initial_state: AgentState):
+def stream_workflow(workflow, initial_state: AgentState, config: Optional[Dict[str, Any]] = None):
     """
     Stream the workflow execution step by step.
     
     Args:
         workflow: Compiled LangGraph workflow
         initial_state: Initial agent state
+        config: LangGraph run config (e.g. callbacks)
         
     Yields:
-        Step-by-step results
+        Step-by-step results ({node: {"state": state after the node}})
     """
-    for step in workflow.stream({"state": initial_state}):
+    for step in workflow.stream({"state": initial_state}, config=config):
         yield step
 
 
-def create_proactive_workflow():
+def _run_batch_item(workflow, index: int, initial_state: AgentState,
+                    run_context: Optional[Callable[[AgentState], ContextManager]],
+                    config: Optional[Dict[str, Any]], on_step: Optional[StepCallback]) -> BatchResult:
+    """Run one batch item, capturing its error instead of raising."""
+    started = time.monotonic()
+    try:
+        if run_context:
+            with run_context(initial_state):
+                final_state = run_workflow(workflow, initial_state, config, on_step)
+        else:
+            final_state = run_workflow(workflow, initial_state, config, on_step)
+        return BatchResult(index, final_state, elapsed=time.monotonic() - started)
+    except Exception as e:
+        return BatchResult(index, initial_state, error=e, elapsed=time.monotonic() - started)
+
+
+def run_workflow_batch(
+    workflow,
+    states: Iterable[AgentState],
+    workers: Optional[int] = None,
+    ordered: bool = False,
+    queue_size: Optional[int] = None,
+    run_context: Optional[Callable[[AgentState], ContextManager]] = None,
+    config: Optional[Dict[str, Any]] = None,
+    on_step: Optional[StepCallback] = None
+) -> Iterator[BatchResult]:
+    """
+    Run many workflow invocations on a worker pool.
+    
+    `states` is consumed lazily: at most `queue_size` runs are in flight or
+    finished but not yet taken by the consumer, so a slow consumer (or a long
+    input generator) never builds an unbounded backlog. A failing run yields
+    a result carrying its exception and does not affect the others.
+    
+    Args:
+        workflow: Compiled LangGraph workflow (shared by all workers)
+        states: Initial agent states
+        workers: Worker threads (defaults to settings.BATCH_WORKERS)
+        ordered: Yield results in input order instead of completion order
+        queue_size: Backpressure bound (defaults to settings.BATCH_QUEUE_SIZE,
+            or twice the workers)
+        run_context: Called with each initial state; the returned context
+            manager is entered around that run on its worker (e.g. traffic
+            priority or stream sink)
+        config: LangGraph run config shared by all runs (e.g. callbacks)
+        on_step: Called on the run's worker as each node completes (see run_workflow)
+        
+    Yields:
+        BatchResult per input state
+    """
+    workers = max(1, workers or settings.BATCH_WORKERS)
+    queue_size = max(workers, queue_size or settings.BATCH_QUEUE_SIZE or 2 * workers)
+    
+    inputs = enumerate(states)
+    pending: Dict[Any, int] = {}
+    finished: Dict[int, BatchResult] = {}   # Completed runs held back for input order
+    next_index = 0
+    exhausted = False
+    
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="workflow-batch")
+    try:
+        while True:
+            while not exhausted and len(pending) + len(finished) < queue_size:
+                try:
+                    index, initial_state = next(inputs)
+                except StopIteration:
+                    exhausted = True
+                    break
+                # Each run starts from the caller's context (priority, stream sink, ...)
+                context = contextvars.copy_context()
+                future = executor.submit(context.run, _run_batch_item, workflow, index, initial_state,
+                                         run_context, config, on_step)
+                pending[future] = index
+            
+            if not pending:
+                break
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                result = future.result()
+                if ordered:
+                    finished[result.index] = result
+                else:
+                    yield result
+            
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+    finally:
+        # Consumer stopped early: drop runs that have not started yet
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def create_proactive_workflow(fused: Optional[bool] = None, speculative: Optional[bool] = None):
     """
     Create a PROACTIVE workflow optimized for preventive customer engagement.
     
@@ -270,8 +641,12 @@ def create_proactive_workflow():
     - Focuses on FUTURE behavior prediction
     - Emphasizes intervention timing
     - Generates preventive action plans
-    - Optimized for batch processing
+    - Optimized for batch processing (see run_workflow_batch)
     
+    Args:
+        fused: Use the fused decision+empathy stage (defaults to settings.PIPELINE_MODE)
+        speculative: Draft the message in parallel with the decision (defaults to settings.PIPELINE_MODE)
+        
     Returns:
         Compiled LangGraph workflow for proactive engagement
     """
@@ -281,6 +656,16 @@ def create_proactive_workflow():
     pattern_agent = create_pattern_agent()
     decision_agent = create_decision_agent()
     empathy_agent = create_empathy_agent()
+    decision_empathy_agent = _create_decision_empathy_agent(decision_agent, empathy_agent, fused, speculative)
+    
+    def adjust_proactive_priority(agent_state: AgentState):
+        """Proactive events are typically medium priority unless high churn risk."""
+        if agent_state.event and hasattr(agent_state.event, 'is_proactive') and agent_state.event.is_proactive:
+            if agent_state.predicted_churn_risk and agent_state.predicted_churn_risk >= 0.7:
+                agent_state.priority_level = "high"
+                agent_state.add_message("proactive_workflow", "High churn risk - elevated priority")
+            elif not agent_state.priority_level or agent_state.priority_level == "low":
+                agent_state.priority_level = "medium"
     
     # Define workflow nodes for proactive processing
     def proactive_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -323,16 +708,17 @@ def create_proactive_workflow():
         """
         agent_state: AgentState = state["state"]
         updated_state = decision_agent(agent_state)
-        
-        # Adjust priority for proactive events
-        if agent_state.event and hasattr(agent_state.event, 'is_proactive') and agent_state.event.is_proactive:
-            # Proactive events are typically medium priority unless high churn risk
-            if updated_state.predicted_churn_risk and updated_state.predicted_churn_risk >= 0.7:
-                updated_state.priority_level = "high"
-                updated_state.add_message("proactive_workflow", "High churn risk - elevated priority")
-            elif not updated_state.priority_level or updated_state.priority_level == "low":
-                updated_state.priority_level = "medium"
-        
+        adjust_proactive_priority(updated_state)
+        return {"state": updated_state}
+    
+    def proactive_decision_empathy_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Decision and proactive outreach message in one stage (fused or speculative).
+        Same proactive priority adjustment as the decision node.
+        """
+        agent_state: AgentState = state["state"]
+        updated_state = decision_empathy_agent(agent_state)
+        adjust_proactive_priority(updated_state)
         return {"state": updated_state}
     
     def proactive_empathy_node(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -356,17 +742,31 @@ def create_proactive_workflow():
     workflow = StateGraph(WorkflowState)
     
     # Add nodes
-    workflow.add_node("proactive_context", proactive_context_node)
-    workflow.add_node("proactive_pattern", proactive_pattern_node)
-    workflow.add_node("proactive_decision", proactive_decision_node)
-    workflow.add_node("proactive_empathy", proactive_empathy_node)
+    workflow.add_node("escalation_gate", _gate_node(_create_escalation_gate(decision_agent.escalation_tracker, pattern_agent, "proactive_pattern")))
+    workflow.add_node("proactive_context", _cancel_prefetch_on_error(pattern_agent, _stage_node("proactive_context", proactive_context_node)))
+    workflow.add_node("proactive_pattern", _stage_node("proactive_pattern", proactive_pattern_node))
+    if decision_empathy_agent:
+        workflow.add_node("proactive_decision_empathy", _stage_node("proactive_decision_empathy", proactive_decision_empathy_node))
+    else:
+        workflow.add_node("proactive_decision", _stage_node("proactive_decision", proactive_decision_node))
+        workflow.add_node("proactive_empathy", _stage_node("proactive_empathy", proactive_empathy_node))
     
     # Define edges (sequential flow optimized for proactive)
-    workflow.set_entry_point("proactive_context")
+    workflow.set_entry_point("escalation_gate")
+    workflow.add_conditional_edges(
+        "escalation_gate",
+        _route_after_gate("proactive_context"),
+        {"proactive_context": "proactive_context", END: END}
+    )
     workflow.add_edge("proactive_context", "proactive_pattern")
-    workflow.add_edge("proactive_pattern", "proactive_decision")
-    workflow.add_edge("proactive_decision", "proactive_empathy")
-    workflow.add_edge("proactive_empathy", END)
+    
+    if decision_empathy_agent:
+        workflow.add_edge("proactive_pattern", "proactive_decision_empathy")
+        workflow.add_edge("proactive_decision_empathy", END)
+    else:
+        workflow.add_edge("proactive_pattern", "proactive_decision")
+        workflow.add_edge("proactive_decision", "proactive_empathy")
+        workflow.add_edge("proactive_empathy", END)
     
     # Compile the graph
     return workflow.compile()